@@ -5,9 +5,6 @@ from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.http import HttpResponse
 from .models import KnowledgeSource, ChatSession, ChatMessage
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
 
 
 @admin.register(KnowledgeSource)
@@ -39,6 +36,11 @@ class ChatSessionAdmin(admin.ModelAdmin):
         Export selected ChatSessions to XLSX with full message threads.
         Format: One row per message with session metadata.
         """
+        # Import here: openpyxl (and numpy) would slow down the admin cold start
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
+
         # Create workbook
         wb = Workbook()
         ws = wb.active
@@ -36,10 +36,8 @@ class KnowledgeBaseAgent:
         Returns:
             AgentResponse with answer and sources
         """
+        from ai_assistant.retrieval import search_knowledge
         from ai_assistant.vertex_service import vertex_ai_service
-        from ai_assistant.models import KnowledgeSource
-        from django.conf import settings
-        from pgvector.django import CosineDistance
 
         logger.info(
             "KnowledgeBaseAgent: handling message for session=%d",
@@ -49,14 +47,7 @@ class KnowledgeBaseAgent:
         # Retrieve RAG documents
         context_docs_list = []
         try:
-            query_embedding = vertex_ai_service.generate_embedding(message)
-            context_docs = (
-                KnowledgeSource.objects.filter(is_active=True)
-                .annotate(distance=CosineDistance("embedding", query_embedding))
-                .filter(distance__lte=(1 - settings.RAG_SIMILARITY_THRESHOLD))
-                .order_by("distance")[: settings.RAG_TOP_K]
-            )
-            context_docs_list = list(context_docs)
+            context_docs_list = search_knowledge(message)
         except Exception as e:
             logger.warning("KnowledgeBaseAgent: RAG retrieval failed: %s", e)
 
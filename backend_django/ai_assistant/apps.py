@@ -5,3 +5,6 @@ class AiAssistantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_assistant'
     verbose_name = 'Assistente AI'
+
+    def ready(self):
+        import ai_assistant.signals  # noqa: F401
@@ -0,0 +1,318 @@
+"""
+Incremental, batched ingestion into the knowledge base.
+
+A source document (a FAQ, a Documento, a manual) is stored as one
+KnowledgeSource row per chunk, identified by (source_key, chunk_index) and
+tagged with the SHA-256 of its content. A sync only embeds chunks whose
+hash is not already stored for that document, so re-syncing after a small
+edit costs one embedding call instead of one per chunk of the whole base.
+
+Missing embeddings are requested with generate_embeddings_batch in
+provider-sized batches (settings.RAG_EMBEDDING_BATCH_SIZE texts and
+RAG_EMBEDDING_BATCH_MAX_CHARS characters per request), at most
+RAG_EMBEDDING_MAX_WORKERS requests in flight, each retried with exponential
+backoff. The database is only touched from the calling thread.
+
+Rows written before chunk tracking (empty source_key, matched by title) are
+adopted: their embedding is reused when the content is unchanged, then they
+are replaced by tracked rows.
+
+Usage:
+    from ai_assistant.ingestion import SourceDocument, chunk_text, sync_documents
+
+    doc = SourceDocument(
+        source_key='faq:12', title='FAQ: ...', source_type='FAQ',
+        chunks=chunk_text(content),
+    )
+    sync_documents([doc])   # {'embedded': 1, 'unchanged': 0, ...}
+"""
+import hashlib
+import logging
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Max characters per chunk for embedding (text-embedding-004 supports ~8k tokens ≈ 20k chars)
+CHUNK_MAX_CHARS = 15000
+
+# Rows per IN (...) lookup
+_LOOKUP_CHUNK = 500
+
+
+class SourceDocument(NamedTuple):
+    source_key: str
+    title: str
+    source_type: str
+    chunks: list
+    source_url: str = ''
+    is_active: bool = True
+    # Titles of untracked rows (source_key='') this document replaces
+    legacy_titles: tuple = ()
+
+
+def chunk_text(text, max_chars=CHUNK_MAX_CHARS):
+    """Split text into chunks, trying to break at paragraph boundaries."""
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    paragraphs = text.split('\n\n')
+    current_chunk = ''
+
+    for para in paragraphs:
+        if len(current_chunk) + len(para) + 2 > max_chars:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            # If a single paragraph exceeds max_chars, split it
+            if len(para) > max_chars:
+                for i in range(0, len(para), max_chars):
+                    chunks.append(para[i:i + max_chars].strip())
+                current_chunk = ''
+            else:
+                current_chunk = para
+        else:
+            current_chunk = current_chunk + '\n\n' + para if current_chunk else para
+
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+
+    return chunks
+
+
+def content_hash(text):
+    """Hash of a chunk's content; changes whenever its embedding would."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_title(title, index, total):
+    return title if total == 1 else f'{title} ({index + 1}/{total})'
+
+
+def make_batches(texts, batch_size=None, max_chars=None):
+    """
+    Group texts into provider-sized requests.
+
+    Returns:
+        list of lists of indexes into texts
+    """
+    batch_size = batch_size or getattr(settings, 'RAG_EMBEDDING_BATCH_SIZE', 100)
+    max_chars = max_chars or getattr(settings, 'RAG_EMBEDDING_BATCH_MAX_CHARS', 50000)
+
+    batches, current, current_chars = [], [], 0
+    for i, text in enumerate(texts):
+        if current and (len(current) >= batch_size or current_chars + len(text) > max_chars):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(i)
+        current_chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _embed_batch(texts):
+    from ai_assistant.vertex_service import vertex_ai_service
+
+    retries = getattr(settings, 'RAG_EMBEDDING_MAX_RETRIES', 3)
+    backoff = getattr(settings, 'RAG_EMBEDDING_RETRY_BACKOFF', 1.0)
+    for attempt in range(retries + 1):
+        try:
+            embeddings = vertex_ai_service.generate_embeddings_batch(texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(f'{len(embeddings)} embeddings for {len(texts)} texts')
+            return embeddings
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random() / 2)
+            logger.warning(
+                "Embedding batch of %d failed (%s), retry %d/%d in %.1fs",
+                len(texts), e, attempt + 1, retries, delay,
+            )
+            time.sleep(delay)
+
+
+def embed_texts(texts, max_workers=None):
+    """
+    Embed texts in batches, concurrently.
+
+    A batch that still fails after its retries leaves None for its texts;
+    the other batches are unaffected.
+
+    Returns:
+        list of embeddings (or None), aligned with texts
+    """
+    results = [None] * len(texts)
+    batches = make_batches(texts)
+    if not batches:
+        return results
+
+    max_workers = max_workers or getattr(settings, 'RAG_EMBEDDING_MAX_WORKERS', 4)
+
+    def run(batch):
+        try:
+            return batch, _embed_batch([texts[i] for i in batch])
+        except Exception as e:
+            logger.error("Embedding batch of %d texts failed: %s", len(batch), e, exc_info=True)
+            return batch, None
+
+    if len(batches) == 1 or max_workers <= 1:
+        outcomes = map(run, batches)
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            outcomes = list(executor.map(run, batches))
+
+    for batch, embeddings in outcomes:
+        if embeddings is not None:
+            for i, embedding in zip(batch, embeddings):
+                results[i] = embedding
+    return results
+
+
+def _existing_rows(documents):
+    from ai_assistant.models import KnowledgeSource
+
+    keys = [doc.source_key for doc in documents]
+    rows = {}
+    for start in range(0, len(keys), _LOOKUP_CHUNK):
+        for row in KnowledgeSource.objects.filter(source_key__in=keys[start:start + _LOOKUP_CHUNK]):
+            rows.setdefault(row.source_key, {})[row.chunk_index] = row
+
+    legacy = {}
+    legacy_filter = Q()
+    for doc in documents:
+        if doc.legacy_titles:
+            legacy_filter |= Q(title__in=doc.legacy_titles, source_type=doc.source_type)
+    if legacy_filter:
+        owners = {
+            (title, doc.source_type): doc.source_key
+            for doc in documents for title in doc.legacy_titles
+        }
+        for row in KnowledgeSource.objects.filter(legacy_filter, source_key=''):
+            legacy.setdefault(owners[(row.title, row.source_type)], []).append(row)
+    return rows, legacy
+
+
+def sync_documents(documents):
+    """
+    Bring the knowledge base in line with documents, embedding only new content.
+
+    Each document's chunks replace its previous chunks: unchanged chunks keep
+    their embedding (only metadata is updated), changed or new chunks are
+    embedded, extra old chunks are deleted. A chunk whose embedding fails is
+    left as it was, so the next sync retries it.
+
+    Returns:
+        Counter with created, updated, unchanged, deleted, embedded, failed
+    """
+    from ai_assistant.models import KnowledgeSource
+    from ai_assistant.retrieval import bump_knowledge_version
+
+    stats = Counter(created=0, updated=0, unchanged=0, deleted=0, embedded=0, failed=0)
+    documents = [doc for doc in documents if doc.source_key]
+    if not documents:
+        return stats
+
+    existing, legacy = _existing_rows(documents)
+
+    # Plan: (doc, index, text, hash, row or None, embedding or None)
+    plan, pending = [], {}
+    for doc in documents:
+        rows = existing.get(doc.source_key, {})
+        reusable = {
+            row.content_hash: row.embedding
+            for row in rows.values()
+            if row.content_hash and row.embedding is not None
+        }
+        for row in legacy.get(doc.source_key, []):
+            if row.embedding is not None:
+                reusable.setdefault(content_hash(row.content), row.embedding)
+
+        for index, text in enumerate(doc.chunks):
+            digest = content_hash(text)
+            embedding = reusable.get(digest)
+            if embedding is None:
+                pending.setdefault(digest, text)
+            plan.append((doc, index, text, digest, rows.get(index), embedding))
+
+    digests = list(pending)
+    embedded = dict(zip(digests, embed_texts([pending[d] for d in digests])))
+    stats['embedded'] = sum(1 for e in embedded.values() if e is not None)
+
+    to_create, to_update = [], []
+    for doc, index, text, digest, row, embedding in plan:
+        if embedding is None:
+            embedding = embedded.get(digest)
+            if embedding is None:
+                stats['failed'] += 1
+                continue
+
+        values = {
+            'title': chunk_title(doc.title, index, len(doc.chunks))[:200],
+            'source_type': doc.source_type,
+            'content': text,
+            'content_hash': digest,
+            'source_url': doc.source_url,
+            'is_active': doc.is_active,
+        }
+        if row is None:
+            to_create.append(KnowledgeSource(
+                source_key=doc.source_key, chunk_index=index, embedding=embedding, **values
+            ))
+            continue
+
+        if row.content_hash != digest:
+            row.embedding = embedding
+        elif all(getattr(row, field) == value for field, value in values.items()):
+            stats['unchanged'] += 1
+            continue
+        for field, value in values.items():
+            setattr(row, field, value)
+        row.updated_at = timezone.now()  # auto_now is skipped by bulk_update
+        to_update.append(row)
+
+    stale = [
+        row.pk
+        for doc in documents
+        for index, row in existing.get(doc.source_key, {}).items()
+        if index >= len(doc.chunks)
+    ]
+    stale += [row.pk for rows in legacy.values() for row in rows]
+
+    with transaction.atomic():
+        if stale:
+            stats['deleted'], _ = KnowledgeSource.objects.filter(pk__in=stale).delete()
+        if to_update:
+            KnowledgeSource.objects.bulk_update(
+                to_update,
+                ['title', 'source_type', 'content', 'content_hash', 'embedding',
+                 'source_url', 'is_active', 'updated_at'],
+                batch_size=_LOOKUP_CHUNK,
+            )
+        if to_create:
+            KnowledgeSource.objects.bulk_create(to_create, batch_size=_LOOKUP_CHUNK)
+
+    stats['created'] = len(to_create)
+    stats['updated'] = len(to_update)
+    # bulk_create/bulk_update send no post_save: invalidate retrieval caches
+    # here, after the caller's transaction (if any) commits
+    if to_create or to_update or stale:
+        transaction.on_commit(bump_knowledge_version)
+    return stats
+
+
+def remove_documents(source_keys):
+    """Delete every chunk of these source documents."""
+    from ai_assistant.models import KnowledgeSource
+
+    deleted, _ = KnowledgeSource.objects.filter(source_key__in=list(source_keys)).delete()
+    return deleted
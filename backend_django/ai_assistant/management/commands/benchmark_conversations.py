@@ -0,0 +1,346 @@
+"""
+Offline, deterministic replay of the scripted conversations with per-stage latency.
+
+Runs every conversation of test_conversations through the full pipeline
+(same path as ChatView: save user message, orchestrator, save answer) in
+parallel, with Vertex AI calls served from recorded fixtures
+(ai_assistant.replay). Each turn is split into stages, exclusive of each
+other:
+
+    context        ConversationOrchestrator._prepare_turn (profile, history, budget)
+    retrieval      search_knowledge (query embedding + vector search)
+    model          Vertex AI calls (replayed: fixture lookup only)
+    tool_dispatch  ConversationOrchestrator._route (agents, policy, tools)
+    db_writes      INSERT/UPDATE/DELETE statements, wherever they run
+    other          the rest of the turn
+
+Record the fixtures once against the real API (--mode record), then every
+run is offline. With --baseline, the command fails when a stage got slower
+than the previous report by more than --max-regression.
+
+The committed fixtures (AI_REPLAY_FIXTURES_DIR) cover session 19 on an
+empty database, as the test suite replays it; other sessions and real
+data need a recording of their own.
+
+Usage:
+    python manage.py benchmark_conversations --mode record          # Calls Vertex AI
+    python manage.py benchmark_conversations                        # Offline replay
+    python manage.py benchmark_conversations --workers 8 --repeat 3 --output bench.json
+    python manage.py benchmark_conversations --baseline bench.json --max-regression 0.2
+    python manage.py benchmark_conversations --model-latency recorded   # Realistic totals
+"""
+import contextlib
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from ai_assistant.management.commands.test_conversations import CONVERSATIONS
+from ai_assistant.replay import MODES, Cassette, ReplayMiss
+
+STAGES = ('context', 'retrieval', 'model', 'tool_dispatch', 'db_writes', 'other')
+
+_WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+BENCHMARK_EMAIL = 'benchmark-conversations@ainaudi.test'
+
+
+class StageRecorder:
+    """Exclusive time per stage for the turn running on the current thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def start_turn(self):
+        self._local.times = defaultdict(float)
+        self._local.stack = []
+        self._local.queries = 0
+
+    def end_turn(self):
+        times, queries = dict(self._local.times), self._local.queries
+        self._local.times = None
+        return times, queries
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        local = self._local
+        if getattr(local, 'times', None) is None:
+            yield
+            return
+        local.stack.append(0.0)  # time spent in nested stages
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = local.stack.pop()
+            local.times[name] += elapsed - nested
+            if local.stack:
+                local.stack[-1] += elapsed
+
+    def timed(self, name, func):
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook: counts queries, times writes."""
+        if getattr(self._local, 'times', None) is not None:
+            self._local.queries += 1
+            if sql.lstrip()[:6].upper() in _WRITE_STATEMENTS:
+                with self.stage('db_writes'):
+                    return execute(sql, params, many, context)
+        return execute(sql, params, many, context)
+
+
+def summarize(values):
+    """p50/p95/max/mean in milliseconds."""
+    ms = np.asarray(values, dtype=float) * 1000
+    if not len(ms):
+        return {'p50': 0.0, 'p95': 0.0, 'max': 0.0, 'mean': 0.0}
+    return {
+        'p50': round(float(np.percentile(ms, 50)), 2),
+        'p95': round(float(np.percentile(ms, 95)), 2),
+        'max': round(float(ms.max()), 2),
+        'mean': round(float(ms.mean()), 2),
+    }
+
+
+def find_regressions(report, baseline, max_regression, min_delta_ms):
+    """[(stage, percentile, baseline ms, current ms)] slower than allowed."""
+    regressions = []
+    for stage, current in report['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if not previous:
+            continue
+        for percentile in ('p50', 'p95'):
+            old, new = previous[percentile], current[percentile]
+            if new - old > min_delta_ms and new > old * (1 + max_regression):
+                regressions.append((stage, percentile, old, new))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Replay scripted AI conversations offline (recorded Vertex responses) and report per-stage latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default='replay', help='Fixture mode (default: replay)')
+        parser.add_argument(
+            '--fixtures', default=None,
+            help='Fixture directory (default: settings.AI_REPLAY_FIXTURES_DIR)',
+        )
+        parser.add_argument('--workers', type=int, default=4, help='Conversations in parallel (default: 4)')
+        parser.add_argument('--repeat', type=int, default=1, help='Runs of each conversation (default: 1)')
+        parser.add_argument('--id', type=int, action='append', help='Only this session ID (repeatable)')
+        parser.add_argument(
+            '--model-latency', choices=('none', 'recorded'), default='none',
+            help='On replay, sleep for the recorded model latency (default: none)',
+        )
+        parser.add_argument('--output', default=None, help='Save the JSON report to this file')
+        parser.add_argument('--baseline', default=None, help='Previous JSON report to compare against')
+        parser.add_argument('--max-regression', type=float, default=0.25, help='Allowed slowdown (default: 0.25)')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0, help='Ignore smaller slowdowns (default: 2)')
+
+    def handle(self, *args, **options):
+        from ai_assistant import retrieval
+        from ai_assistant.orchestrator.orchestrator import ConversationOrchestrator
+        from ai_assistant.vertex_service import vertex_ai_service
+        from core.models import User
+
+        conversations = CONVERSATIONS
+        if options['id']:
+            conversations = [c for c in conversations if c['id'] in options['id']]
+        if not conversations:
+            raise CommandError('No conversations found')
+
+        directory = options['fixtures'] or settings.AI_REPLAY_FIXTURES_DIR
+        recorder = StageRecorder()
+        cassette = Cassette(
+            directory, mode=options['mode'],
+            simulate_latency=options['model_latency'] == 'recorded',
+            stage=recorder.stage,
+        )
+
+        user, created = User.objects.get_or_create(
+            email=BENCHMARK_EMAIL, defaults={'first_name': 'Test', 'last_name': 'RDL'},
+        )
+        runs = [c for c in conversations for _ in range(options['repeat'])]
+
+        # Private retrieval cache: every run embeds (and records) its own queries.
+        # Eager background tasks: session summaries land before the next turn.
+        caches = {**settings.CACHES, 'ai-replay': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        patches = [
+            override_settings(CACHES=caches, RAG_CACHE_ALIAS='ai-replay', BACKGROUND_TASKS_EAGER=True),
+            cassette.installed(vertex_ai_service),
+            mock.patch.object(
+                ConversationOrchestrator, '_prepare_turn',
+                recorder.timed('context', ConversationOrchestrator._prepare_turn),
+            ),
+            mock.patch.object(
+                ConversationOrchestrator, '_route',
+                recorder.timed('tool_dispatch', ConversationOrchestrator._route),
+            ),
+            mock.patch.object(
+                retrieval, 'search_knowledge', recorder.timed('retrieval', retrieval.search_knowledge),
+            ),
+        ]
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n  {len(runs)} conversation runs, {options['workers']} in parallel, "
+            f"fixtures: {directory} ({options['mode']})\n"
+        ))
+
+        started = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for patch in patches:
+                    stack.enter_context(patch)
+                retrieval.clear_local_caches()
+                results = self._run_all(runs, user, recorder, options['workers'])
+        finally:
+            # Leave an account that existed before the run alone
+            if created:
+                user.delete()
+        wall = time.perf_counter() - started
+
+        report = self._report(results, wall, cassette)
+        self._print_report(report, results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"  Report saved to {options['output']}"))
+
+        errors = [r for r in results if r['error']]
+        if errors:
+            raise CommandError(f'{len(errors)} conversation runs failed (see above)')
+        if report['nondeterministic']:
+            raise CommandError(f"Different answers across repeats: sessions {report['nondeterministic']}")
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = find_regressions(
+                report, baseline, options['max_regression'], options['min_delta_ms'],
+            )
+            for stage, percentile, old, new in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"  REGRESSION {stage} {percentile}: {old:.1f}ms -> {new:.1f}ms"
+                ))
+            if regressions:
+                raise CommandError(f'{len(regressions)} stage latencies regressed beyond the baseline')
+            self.stdout.write(self.style.SUCCESS('  No regressions against the baseline'))
+
+    def _run_all(self, runs, user, recorder, workers):
+        if workers <= 1:
+            return [self._run_conversation(conv, user, recorder) for conv in runs]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bench') as executor:
+            return list(executor.map(lambda conv: self._in_worker(conv, user, recorder), runs))
+
+    def _in_worker(self, conv, user, recorder):
+        try:
+            return self._run_conversation(conv, user, recorder)
+        finally:
+            connections.close_all()
+
+    def _run_conversation(self, conv, user, recorder):
+        """One conversation, turn by turn as ChatView does. Never raises."""
+        from django.test import RequestFactory
+
+        from ai_assistant.models import ChatMessage, ChatSession
+        from ai_assistant.views import generate_ai_response
+
+        request = RequestFactory().post('/api/ai/chat/')
+        request.user = user
+        result = {'id': conv['id'], 'turns': [], 'answers': [], 'error': None}
+        session = ChatSession.objects.create(user_email=user.email, title=f"Benchmark: session {conv['id']}")
+        try:
+            with connection.execute_wrapper(recorder.execute_wrapper):
+                for message in (m['content'] for m in conv['messages'] if m['role'] == 'user'):
+                    recorder.start_turn()
+                    turn_started = time.perf_counter()
+                    try:
+                        ChatMessage.objects.create(session=session, role='user', content=message)
+                        answer = generate_ai_response(request=request, session=session, message=message)['answer']
+                        ChatMessage.objects.create(session=session, role='assistant', content=answer)
+                    finally:
+                        total = time.perf_counter() - turn_started
+                        times, queries = recorder.end_turn()
+                    times['other'] = max(0.0, total - sum(times.values()))
+                    times['total'] = total
+                    result['turns'].append({'times': times, 'queries': queries})
+                    result['answers'].append(answer)
+        except ReplayMiss as e:
+            result['error'] = f'missing fixture ({e})'
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+        finally:
+            session.delete()
+        return result
+
+    def _report(self, results, wall, cassette):
+        turns = [turn for r in results for turn in r['turns']]
+        stages = {
+            stage: summarize([turn['times'].get(stage, 0.0) for turn in turns])
+            for stage in STAGES + ('total',)
+        }
+
+        digests = defaultdict(set)
+        for r in results:
+            if not r['error']:
+                digests[r['id']].add(hashlib.sha256('\x00'.join(r['answers']).encode()).hexdigest())
+
+        queries = [turn['queries'] for turn in turns]
+        return {
+            'runs': len(results),
+            'turns': len(turns),
+            'wall_s': round(wall, 3),
+            'stages': stages,
+            'queries_per_turn': {
+                'p50': float(np.percentile(queries, 50)) if queries else 0,
+                'max': max(queries, default=0),
+            },
+            'fixtures': dict(cassette.stats),
+            'answers': {str(sid): sorted(d)[0] for sid, d in digests.items() if len(d) == 1},
+            'nondeterministic': sorted(sid for sid, d in digests.items() if len(d) > 1),
+        }
+
+    def _print_report(self, report, results):
+        for r in results:
+            if r['error']:
+                self.stdout.write(self.style.ERROR(f"  Session {r['id']}: {r['error']}"))
+
+        total_mean = report['stages']['total']['mean'] or 1
+        self.stdout.write(f"\n  {'Stage':<14} {'p50':>8} {'p95':>8} {'max':>8} {'mean':>8} {'share':>6}")
+        self.stdout.write(f"  {'─' * 14} {'─' * 8} {'─' * 8} {'─' * 8} {'─' * 8} {'─' * 6}")
+        for stage, row in report['stages'].items():
+            share = row['mean'] / total_mean
+            line = (
+                f"  {stage:<14} {row['p50']:>6.1f}ms {row['p95']:>6.1f}ms "
+                f"{row['max']:>6.1f}ms {row['mean']:>6.1f}ms {share:>6.0%}"
+            )
+            self.stdout.write(self.style.MIGRATE_LABEL(line) if stage == 'total' else line)
+
+        self.stdout.write(
+            f"\n  {report['turns']} turns in {report['runs']} runs, wall {report['wall_s']:.2f}s "
+            f"({report['turns'] / max(report['wall_s'], 1e-9):.1f} turns/s)"
+        )
+        self.stdout.write(
+            f"  Queries per turn: p50 {report['queries_per_turn']['p50']:.0f}, "
+            f"max {report['queries_per_turn']['max']}"
+        )
+        fixtures = report['fixtures']
+        self.stdout.write(
+            f"  Fixtures: {fixtures['replayed']} replayed, {fixtures['recorded']} recorded, "
+            f"{fixtures['misses']} missing\n"
+        )
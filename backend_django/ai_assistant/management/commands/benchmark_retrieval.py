@@ -0,0 +1,145 @@
+"""
+Recall/latency benchmark of knowledge-base retrieval on a synthetic corpus.
+
+Inserts --size synthetic KnowledgeSource chunks (clustered random unit
+vectors + cluster vocabulary text) inside a transaction, measures exact
+top-k (NumPy) against the HNSW index for each --ef-search value, plus the
+hybrid mode (its "recall" is overlap with the pure-vector ground truth),
+then rolls everything back.
+
+Requires PostgreSQL with pgvector (DB_HOST / DATABASE_URL).
+
+Usage:
+    python manage.py benchmark_retrieval
+    python manage.py benchmark_retrieval --size 100000 --queries 200 --ef-search 20,40,100,200
+    python manage.py benchmark_retrieval --size 10000 --k 5
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ai_assistant import retrieval
+from ai_assistant.models import KnowledgeSource
+
+_DIMENSIONS = 768
+_VOCABULARY = [
+    'scrutinio', 'seggio', 'scheda', 'verbale', 'presidente', 'scrutatore',
+    'delegato', 'rappresentante', 'lista', 'elettore', 'documento', 'urna',
+    'voto', 'nullo', 'bianco', 'contestato', 'timbro', 'firma', 'registro',
+    'apertura', 'chiusura', 'orario', 'sezione', 'comune', 'referendum',
+    'quesito', 'preferenza', 'tessera', 'identita', 'cabina', 'matita',
+]
+
+
+def _percentile(values, q):
+    return float(np.percentile(np.asarray(values) * 1000, q))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ANN recall/latency and hybrid retrieval on a synthetic corpus (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000, help='Synthetic chunks (default: 100000)')
+        parser.add_argument('--queries', type=int, default=200, help='Queries per setting (default: 200)')
+        parser.add_argument('--k', type=int, default=10, help='Top-k (default: 10)')
+        parser.add_argument('--clusters', type=int, default=1000, help='Topic clusters (default: 1000)')
+        parser.add_argument(
+            '--ef-search', default='10,20,40,100,200',
+            help='Comma-separated hnsw.ef_search values (default: 10,20,40,100,200)',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_retrieval requires PostgreSQL with pgvector')
+
+        size = options['size']
+        k = options['k']
+        ef_values = [int(v) for v in options['ef_search'].split(',') if v.strip()]
+        rng = np.random.default_rng(options['seed'])
+
+        self.stdout.write(f'Generating {size} chunks ({options["clusters"]} clusters, {_DIMENSIONS} dim)...')
+        centroids = rng.standard_normal((options['clusters'], _DIMENSIONS)).astype(np.float32)
+        labels = rng.integers(0, options['clusters'], size)
+        vectors = centroids[labels] + 0.6 * rng.standard_normal((size, _DIMENSIONS)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            ids = self._insert(vectors, labels, rng)
+            self.stdout.write(f'Inserted in {time.perf_counter() - start:.1f}s')
+
+            # Ground truth over every active row (existing + synthetic)
+            existing = [
+                (pk, emb) for pk, emb in KnowledgeSource.objects.filter(is_active=True)
+                .exclude(pk__in=ids).exclude(embedding__isnull=True)
+                .values_list('pk', 'embedding')
+            ]
+            all_ids = np.array([pk for pk, _ in existing] + ids)
+            existing_matrix = np.asarray([e for _, e in existing], dtype=np.float32).reshape(-1, _DIMENSIONS)
+            matrix = np.vstack([existing_matrix, vectors])
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+            picks = rng.integers(0, size, options['queries'])
+            queries = vectors[picks] + 0.3 * rng.standard_normal((len(picks), _DIMENSIONS)).astype(np.float32)
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+            truth = [set(all_ids[np.argsort(-(matrix @ q))[:k]].tolist()) for q in queries]
+
+            self.stdout.write(f'\n{"mode":<22}{"recall@" + str(k):>10}{"p50 ms":>10}{"p95 ms":>10}')
+            self._report('exact (no index)', queries, truth, k, exact=True)
+            for ef in ef_values:
+                self._report(f'hnsw ef_search={ef}', queries, truth, k, ef_search=ef)
+            self._report_hybrid(queries, truth, k, labels[picks])
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\nCompletato (dati sintetici rimossi)'))
+
+    def _insert(self, vectors, labels, rng, batch_size=2000):
+        ids = []
+        for start in range(0, len(vectors), batch_size):
+            batch = []
+            for i in range(start, min(start + batch_size, len(vectors))):
+                words = rng.choice(_VOCABULARY, 8)
+                batch.append(KnowledgeSource(
+                    title=f'bench-{labels[i]}-{i}',
+                    source_type=KnowledgeSource.SourceType.MANUAL,
+                    content=f'argomento{labels[i]} ' + ' '.join(words),
+                    embedding=vectors[i].tolist(),
+                ))
+            ids.extend(obj.pk for obj in KnowledgeSource.objects.bulk_create(batch))
+        return ids
+
+    def _report(self, label, queries, truth, k, ef_search=None, exact=False):
+        latencies, recalls = [], []
+        # Transaction-local settings outlive savepoints: reset after the loop
+        self._set('enable_indexscan', 'off' if exact else 'on')
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            docs = retrieval._vector_search(q.tolist(), k, threshold=-1.0, ef_search=ef_search)
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len({d.pk for d in docs} & expected) / k)
+        self._set('enable_indexscan', 'on')
+        self.stdout.write(
+            f'{label:<22}{np.mean(recalls):>10.3f}'
+            f'{_percentile(latencies, 50):>10.1f}{_percentile(latencies, 95):>10.1f}'
+        )
+
+    @staticmethod
+    def _set(name, value):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT set_config(%s, %s, true)', [name, value])
+
+    def _report_hybrid(self, queries, truth, k, topics):
+        latencies, recalls = [], []
+        for q, expected, topic in zip(queries, truth, topics):
+            start = time.perf_counter()
+            docs = retrieval._hybrid_search(q.tolist(), f'argomento{topic}', k, threshold=-1.0)
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len({d.pk for d in docs} & expected) / k)
+        self.stdout.write(
+            f'{"hybrid (rrf)":<22}{np.mean(recalls):>10.3f}'
+            f'{_percentile(latencies, 50):>10.1f}{_percentile(latencies, 95):>10.1f}'
+        )
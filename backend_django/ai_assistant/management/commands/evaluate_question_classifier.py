@@ -0,0 +1,152 @@
+"""
+Offline evaluation of the local question classifier (ai_assistant.question_classifier).
+
+Runs classify_question on the user messages of the test_conversations
+export, labelled by hand below, and reports how many it decides without
+the LLM (coverage) plus precision/recall of those decisions per label.
+Undecided messages count as missed for recall: in production they go to
+the LLM.
+
+By default only the keyword signal is used (no API calls); --embeddings
+adds the query embeddings (Vertex AI, cached) and the knowledge-base
+centroid of the current database.
+
+Usage:
+    python manage.py evaluate_question_classifier
+    python manage.py evaluate_question_classifier --embeddings
+    python manage.py evaluate_question_classifier --verbose    # One line per message
+"""
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from ai_assistant.management.commands.test_conversations import CONVERSATIONS
+from ai_assistant.question_classifier import OFF_TOPIC, SERIOUS, TRIVIAL, classify_question
+
+# (session id, message index) -> label. First user messages not listed
+# here are SERIOUS; later messages are only evaluated when listed (most
+# follow-ups can't be judged out of context).
+LABELS = {
+    (2, 2): SERIOUS,
+    (11, 2): TRIVIAL,
+    (14, 2): SERIOUS,
+    (14, 6): OFF_TOPIC,
+    (14, 8): SERIOUS,
+    (14, 10): OFF_TOPIC,
+    (16, 2): SERIOUS,
+    (17, 2): SERIOUS,
+    (18, 2): TRIVIAL,
+    (20, 2): SERIOUS,
+    (20, 4): SERIOUS,
+    (22, 2): SERIOUS,
+    (24, 2): SERIOUS,
+    (24, 6): SERIOUS,
+    (28, 2): SERIOUS,
+    (33, 2): SERIOUS,
+    (35, 2): SERIOUS,
+    (36, 2): SERIOUS,
+    (40, 0): OFF_TOPIC,
+    (40, 2): SERIOUS,
+    (41, 2): SERIOUS,
+    (46, 2): SERIOUS,
+    (47, 6): SERIOUS,
+    (50, 2): SERIOUS,
+    (53, 4): SERIOUS,
+    (64, 4): TRIVIAL,
+}
+
+
+def labelled_examples():
+    """[(session id, message index, text, label)] from CONVERSATIONS."""
+    examples = []
+    for conversation in CONVERSATIONS:
+        for index, message in enumerate(conversation['messages']):
+            if message['role'] != 'user':
+                continue
+            key = (conversation['id'], index)
+            label = LABELS.get(key, SERIOUS if index == 0 else None)
+            if label:
+                examples.append((*key, message['content'], label))
+    return examples
+
+
+def precision_recall(results, label):
+    """Precision/recall of the decided predictions for one label."""
+    predicted = sum(1 for expected, verdict in results if verdict.decided and verdict.label == label)
+    actual = sum(1 for expected, _ in results if expected == label)
+    correct = sum(
+        1 for expected, verdict in results
+        if verdict.decided and verdict.label == label and expected == label
+    )
+    precision = correct / predicted if predicted else None
+    recall = correct / actual if actual else None
+    return precision, recall, predicted, actual
+
+
+def _pct(value):
+    return f"{value:6.1%}" if value is not None else '     -'
+
+
+class Command(BaseCommand):
+    help = 'Precision/recall of the local serious/trivial/off-topic classifier on test_conversations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--embeddings', action='store_true',
+            help='Also use query embeddings and the KB centroid (calls Vertex AI)',
+        )
+        parser.add_argument('--verbose', action='store_true', help='Print every message and verdict')
+
+    def handle(self, *args, **options):
+        if options['embeddings']:
+            from ai_assistant.retrieval import get_query_embedding
+
+        results = []
+        for session_id, index, text, expected in labelled_examples():
+            embedding = get_query_embedding(text) if options['embeddings'] else None
+            verdict = classify_question(text, embedding)
+            results.append((expected, verdict))
+
+            if options['verbose']:
+                if not verdict.decided:
+                    style, mark = self.style.WARNING, 'LLM'
+                elif verdict.label == expected:
+                    style, mark = self.style.SUCCESS, 'ok '
+                else:
+                    style, mark = self.style.ERROR, 'ERR'
+                self.stdout.write(style(
+                    f"  {mark} #{session_id}/{index} {expected:>9} -> {verdict.label:>9} "
+                    f"{verdict.confidence:.2f} {verdict.reason:<18} {text[:60]!r}"
+                ))
+
+        decided = [verdict for _, verdict in results if verdict.decided]
+        correct = sum(1 for expected, verdict in results if verdict.decided and verdict.label == expected)
+        reasons = Counter(verdict.reason for _, verdict in results)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n  Local classifier on {len(results)} labelled messages"
+            f"{' (keywords + embeddings)' if options['embeddings'] else ' (keywords only)'}\n"
+        ))
+        self.stdout.write(f"  Decided locally:  {len(decided)}/{len(results)} ({len(decided) / len(results):.1%})")
+        if decided:
+            self.stdout.write(f"  Local accuracy:   {correct}/{len(decided)} ({correct / len(decided):.1%})")
+        self.stdout.write(f"  Sent to the LLM:  {len(results) - len(decided)}\n")
+
+        self.stdout.write(f"  {'Label':<11} {'Prec':>6} {'Recall':>6} {'Pred':>5} {'True':>5}")
+        for label in (SERIOUS, TRIVIAL, OFF_TOPIC):
+            precision, recall, predicted, actual = precision_recall(results, label)
+            self.stdout.write(f"  {label:<11} {_pct(precision)} {_pct(recall)} {predicted:>5} {actual:>5}")
+
+        # What the shortcut to 🤷 is about: trivial and off-topic together
+        merged = [
+            (SERIOUS if expected == SERIOUS else 'not_serious',
+             verdict._replace(label=SERIOUS if verdict.label == SERIOUS else 'not_serious'))
+            for expected, verdict in results
+        ]
+        precision, recall, predicted, actual = precision_recall(merged, 'not_serious')
+        self.stdout.write(
+            f"  {'not serious':<11} {_pct(precision)} {_pct(recall)} {predicted:>5} {actual:>5}"
+        )
+
+        self.stdout.write("\n  Decided by: " + ", ".join(f"{r}={n}" for r, n in reasons.most_common()))
+        self.stdout.write("")
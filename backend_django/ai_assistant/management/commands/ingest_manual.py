@@ -8,48 +8,17 @@ Usage:
     python manage.py ingest_manual --file path/to/doc.pdf
     python manage.py ingest_manual --file https://example.com/doc.pdf
     python manage.py ingest_manual --file doc.md --title "My Doc" --type PROCEDURE
+
+Re-ingesting the same title only embeds the chunks that changed.
 """
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from ai_assistant.models import KnowledgeSource
 from ai_assistant.extractors import PDFExtractor
-from ai_assistant.vertex_service import vertex_ai_service
+from ai_assistant.ingestion import SourceDocument, chunk_text, sync_documents
 import os
 
 
-# Max characters per chunk for embedding (text-embedding-004 supports ~8k tokens ≈ 20k chars)
-CHUNK_MAX_CHARS = 15000
-
-
-def chunk_text(text, max_chars=CHUNK_MAX_CHARS):
-    """Split text into chunks, trying to break at paragraph boundaries."""
-    if len(text) <= max_chars:
-        return [text]
-
-    chunks = []
-    paragraphs = text.split('\n\n')
-    current_chunk = ''
-
-    for para in paragraphs:
-        if len(current_chunk) + len(para) + 2 > max_chars:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            # If a single paragraph exceeds max_chars, split it
-            if len(para) > max_chars:
-                for i in range(0, len(para), max_chars):
-                    chunks.append(para[i:i + max_chars].strip())
-                current_chunk = ''
-            else:
-                current_chunk = para
-        else:
-            current_chunk = current_chunk + '\n\n' + para if current_chunk else para
-
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-
-    return chunks
-
-
 def read_content(file_source):
     """Read content from a file path or URL. Returns (text, detected_extension)."""
     is_url = file_source.startswith('http')
@@ -149,39 +118,27 @@ class Command(BaseCommand):
                     f'Document split into {total_chunks} chunks'
                 ))
 
-            # Delete existing entries for this title to avoid duplicates
-            deleted, _ = KnowledgeSource.objects.filter(
+            # Untracked rows from earlier runs are replaced (embeddings reused if unchanged)
+            legacy_titles = tuple(KnowledgeSource.objects.filter(
+                source_key='',
                 title__startswith=title,
                 source_type=source_type,
-            ).delete()
-            if deleted:
-                self.stdout.write(self.style.WARNING(
-                    f'Removed {deleted} existing entries for "{title}"'
-                ))
-
-            # Process each chunk
-            for i, chunk in enumerate(chunks):
-                chunk_title = title if total_chunks == 1 else f'{title} ({i + 1}/{total_chunks})'
-
-                self.stdout.write(self.style.WARNING(
-                    f'[{i + 1}/{total_chunks}] Generating embedding for "{chunk_title}" '
-                    f'({len(chunk)} chars)...'
-                ))
-
-                embedding = vertex_ai_service.generate_embedding(chunk)
+            ).values_list('title', flat=True))
 
-                KnowledgeSource.objects.create(
-                    title=chunk_title,
-                    source_type=source_type,
-                    content=chunk,
-                    embedding=embedding,
-                    source_url=source_url,
-                    is_active=True,
-                )
-
-                self.stdout.write(self.style.SUCCESS(
-                    f'✓ [{i + 1}/{total_chunks}] Saved "{chunk_title}"'
-                ))
+            stats = sync_documents([SourceDocument(
+                source_key=f'file:{source_type}:{title}',
+                title=title,
+                source_type=source_type,
+                chunks=chunks,
+                source_url=source_url,
+                legacy_titles=legacy_titles,
+            )])
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {stats["embedded"]} chunk(s) embedded, {stats["unchanged"]} unchanged, '
+                f'{stats["deleted"]} removed'
+            ))
+            if stats['failed']:
+                self.stdout.write(self.style.ERROR(f'✗ {stats["failed"]} chunk(s) failed, re-run to retry'))
 
             self.stdout.write(self.style.SUCCESS(
                 f'\n✓ Ingested "{title}" ({total_chunks} chunk(s)) into RAG knowledge base'
@@ -6,9 +6,12 @@ Usage:
     python manage.py vectorize_knowledge --faq-only     # Only FAQs
     python manage.py vectorize_knowledge --docs-only    # Only Docs
     python manage.py vectorize_knowledge --force        # Re-vectorize all (even if exists)
+
+Only chunks whose content changed since the last run are embedded
+(ai_assistant.ingestion); --force drops everything first.
 """
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from resources.knowledge import sync_documenti, sync_faqs
 from resources.models import FAQ, Documento
 from ai_assistant.models import KnowledgeSource
 import time
@@ -123,103 +126,48 @@ class Command(BaseCommand):
         self.stdout.write(f'\n⏱️  Time elapsed: {elapsed:.1f}s\n')
 
     def _process_faqs(self, dry_run):
-        """Process all active FAQs."""
-        stats = {
-            'faq_processed': 0,
-            'faq_created': 0,
-            'faq_updated': 0,
-            'faq_errors': 0,
-        }
-
-        faqs = FAQ.objects.filter(is_attivo=True)
-        total = faqs.count()
-
-        if total == 0:
+        """Process all active FAQs (one batched, incremental sync)."""
+        faqs = list(FAQ.objects.filter(is_attivo=True))
+        if not faqs:
             self.stdout.write(self.style.WARNING('   No active FAQs found'))
-            return stats
-
-        for i, faq in enumerate(faqs, 1):
-            try:
-                if dry_run:
-                    self.stdout.write(
-                        f'   [{i}/{total}] Would process: {faq.domanda[:50]}...'
-                    )
-                else:
-                    # Check if already exists
-                    title = f"FAQ: {faq.domanda[:100]}"
-                    existing = KnowledgeSource.objects.filter(title=title).exists()
-
-                    # Trigger signal by saving
-                    faq.save()
-
-                    stats['faq_processed'] += 1
-                    if existing:
-                        stats['faq_updated'] += 1
-                        action = 'Updated'
-                        style = self.style.SUCCESS
-                    else:
-                        stats['faq_created'] += 1
-                        action = 'Created'
-                        style = self.style.SUCCESS
-
-                    self.stdout.write(
-                        style(f'   ✅ [{i}/{total}] {action}: {faq.domanda[:50]}...')
-                    )
-            except Exception as e:
-                stats['faq_errors'] += 1
-                self.stdout.write(
-                    self.style.ERROR(f'   ❌ [{i}/{total}] Error: {faq.domanda[:50]}... - {str(e)[:50]}')
-                )
-
-        return stats
+            return self._empty_stats('faq')
 
-    def _process_docs(self, dry_run):
-        """Process all active Documenti."""
-        stats = {
-            'doc_processed': 0,
-            'doc_created': 0,
-            'doc_updated': 0,
-            'doc_errors': 0,
-        }
+        if dry_run:
+            for i, faq in enumerate(faqs, 1):
+                self.stdout.write(f'   [{i}/{len(faqs)}] Would process: {faq.domanda[:50]}...')
+            return self._empty_stats('faq')
 
-        docs = Documento.objects.filter(is_attivo=True)
-        total = docs.count()
+        return self._report('faq', len(faqs), sync_faqs(faqs))
 
-        if total == 0:
+    def _process_docs(self, dry_run):
+        """Process all active Documenti (one batched, incremental sync)."""
+        docs = list(Documento.objects.filter(is_attivo=True))
+        if not docs:
             self.stdout.write(self.style.WARNING('   No active Documenti found'))
-            return stats
-
-        for i, doc in enumerate(docs, 1):
-            try:
-                if dry_run:
-                    self.stdout.write(
-                        f'   [{i}/{total}] Would process: {doc.titolo[:50]}...'
-                    )
-                else:
-                    # Check if already exists
-                    title = f"Doc: {doc.titolo[:100]}"
-                    existing = KnowledgeSource.objects.filter(title=title).exists()
-
-                    # Trigger signal by saving
-                    doc.save()
-
-                    stats['doc_processed'] += 1
-                    if existing:
-                        stats['doc_updated'] += 1
-                        action = 'Updated'
-                        style = self.style.SUCCESS
-                    else:
-                        stats['doc_created'] += 1
-                        action = 'Created'
-                        style = self.style.SUCCESS
-
-                    self.stdout.write(
-                        style(f'   ✅ [{i}/{total}] {action}: {doc.titolo[:50]}...')
-                    )
-            except Exception as e:
-                stats['doc_errors'] += 1
-                self.stdout.write(
-                    self.style.ERROR(f'   ❌ [{i}/{total}] Error: {doc.titolo[:50]}... - {str(e)[:50]}')
-                )
-
-        return stats
+            return self._empty_stats('doc')
+
+        if dry_run:
+            for i, doc in enumerate(docs, 1):
+                self.stdout.write(f'   [{i}/{len(docs)}] Would process: {doc.titolo[:50]}...')
+            return self._empty_stats('doc')
+
+        return self._report('doc', len(docs), sync_documenti(docs))
+
+    @staticmethod
+    def _empty_stats(prefix):
+        return {f'{prefix}_{key}': 0 for key in ('processed', 'created', 'updated', 'errors')}
+
+    def _report(self, prefix, total, result):
+        """Map ingestion counters (chunks) onto the command statistics."""
+        self.stdout.write(self.style.SUCCESS(
+            f'   ✅ {total} processed: {result["embedded"]} chunks embedded, '
+            f'{result["unchanged"]} unchanged, {result["deleted"]} removed'
+        ))
+        if result['failed']:
+            self.stdout.write(self.style.ERROR(f'   ❌ {result["failed"]} failed'))
+        return {
+            f'{prefix}_processed': total,
+            f'{prefix}_created': result['created'],
+            f'{prefix}_updated': result['updated'],
+            f'{prefix}_errors': result['failed'],
+        }
@@ -0,0 +1,31 @@
+"""
+Full-text GIN index on KnowledgeSource for hybrid retrieval.
+
+The expression must match ai_assistant.retrieval._TSVECTOR_SQL for the
+planner to use the index. The HNSW index on embedding is created by 0005.
+"""
+from django.db import migrations
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('''
+            CREATE INDEX IF NOT EXISTS knowledgesource_fulltext_idx
+            ON ai_assistant_knowledgesource
+            USING gin (to_tsvector('italian', coalesce(title, '') || ' ' || coalesce(content, '')));
+        ''')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS knowledgesource_fulltext_idx;')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('ai_assistant', '0009_add_chat_attachment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
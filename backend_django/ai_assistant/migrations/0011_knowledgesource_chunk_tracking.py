@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_assistant', '0010_knowledgesource_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgesource',
+            name='chunk_index',
+            field=models.PositiveIntegerField(default=0, verbose_name='indice chunk'),
+        ),
+        migrations.AddField(
+            model_name='knowledgesource',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='hash contenuto'),
+        ),
+        migrations.AddField(
+            model_name='knowledgesource',
+            name='source_key',
+            field=models.CharField(blank=True, help_text='Documento di origine, es. "faq:12" (vuoto per inserimenti manuali)', max_length=255, verbose_name='chiave sorgente'),
+        ),
+        migrations.AddConstraint(
+            model_name='knowledgesource',
+            constraint=models.UniqueConstraint(condition=models.Q(('source_key', ''), _negated=True), fields=('source_key', 'chunk_index'), name='knowledgesource_unique_chunk'),
+        ),
+    ]
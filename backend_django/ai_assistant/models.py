@@ -44,10 +44,27 @@ class KnowledgeSource(models.Model):
     updated_at = models.DateTimeField(_('ultimo aggiornamento'), auto_now=True)
     is_active = models.BooleanField(_('attivo'), default=True)
 
+    # Ingestion bookkeeping (ai_assistant.ingestion): one row per chunk
+    source_key = models.CharField(
+        _('chiave sorgente'),
+        max_length=255,
+        blank=True,
+        help_text=_('Documento di origine, es. "faq:12" (vuoto per inserimenti manuali)')
+    )
+    chunk_index = models.PositiveIntegerField(_('indice chunk'), default=0)
+    content_hash = models.CharField(_('hash contenuto'), max_length=64, blank=True)
+
     class Meta:
         verbose_name = _('fonte conoscenza')
         verbose_name_plural = _('fonti conoscenza')
         ordering = ['source_type', 'title']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_key', 'chunk_index'],
+                condition=~models.Q(source_key=''),
+                name='knowledgesource_unique_chunk',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.title} ({self.get_source_type_display()})'
@@ -0,0 +1,169 @@
+"""
+Token budget for the context sent to the LLM on every turn.
+
+Long election-day sessions used to send the whole conversation plus the
+full profile and RAG context on every turn. ContextBudget fits the parts
+into settings.AI_CONTEXT_TOKEN_BUDGET, in priority order:
+
+1. the current user message (always sent)
+2. the user profile, capped at AI_CONTEXT_PROFILE_SHARE of the budget
+3. the rolling summary of older turns (ai_assistant.orchestrator.summary),
+   capped at AI_SUMMARY_MAX_TOKENS
+4. the turns not folded into the summary yet (the last
+   AI_HISTORY_VERBATIM_TURNS turns, plus those waiting for the next summary
+   batch), newest first, leaving AI_CONTEXT_RAG_SHARE of the budget for
+   documents
+5. RAG documents in rank order, in whatever is left
+
+Section headers and separators count against the budget too.
+
+Token counts use a pluggable tokenizer; the default estimate (4 chars per
+token) is close enough for Gemini on Italian text and costs no API call.
+
+Usage:
+    budget = ContextBudget()
+    fitted = budget.fit(profile_text, summary, conversation_history, docs)
+    fitted.conversation_history, fitted.context_text
+"""
+import math
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .summary import summary_batch
+
+# Per-message overhead (role, separators)
+_MESSAGE_OVERHEAD = 4
+
+# A truncated RAG document shorter than this is not worth sending
+_MIN_DOC_TOKENS = 100
+
+# Characters of each RAG document considered at all
+_DOC_MAX_CHARS = 2000
+
+_SUMMARY_HEADER = "RIEPILOGO DELLA CONVERSAZIONE PRECEDENTE:\n"
+_PART_SEPARATOR = "\n\n"
+_DOC_SEPARATOR = "\n\n---\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (≈ 4 characters per token)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int, tokenizer=estimate_tokens) -> str:
+    """Longest prefix of text within max_tokens (cut at a word boundary)."""
+    if max_tokens <= 0 or not text:
+        return ""
+    tokens = tokenizer(text)
+    if tokens <= max_tokens:
+        return text
+
+    cut = int(len(text) * max_tokens / tokens)
+    while cut > 0 and tokenizer(text[:cut] + " …") > max_tokens:
+        cut = int(cut * 0.9)
+    space = text.rfind(" ", 0, cut)
+    if space > cut // 2:
+        cut = space
+    return text[:cut].rstrip() + " …" if cut > 0 else ""
+
+
+class FittedContext(NamedTuple):
+    conversation_history: list
+    context_text: str
+    docs_used: int
+    tokens: int
+
+
+class ContextBudget:
+    """Fits profile, summary, history and RAG documents into a token budget."""
+
+    def __init__(
+        self,
+        total_tokens=None,
+        tokenizer=estimate_tokens,
+        verbatim_turns=None,
+        summary_tokens=None,
+        profile_share=None,
+        rag_share=None,
+    ):
+        self.total_tokens = total_tokens or getattr(settings, 'AI_CONTEXT_TOKEN_BUDGET', 8000)
+        self.tokenizer = tokenizer
+        # Uncovered messages at most (see summary.max_uncovered_messages)
+        self.history_messages = (
+            2 * (verbatim_turns or getattr(settings, 'AI_HISTORY_VERBATIM_TURNS', 6)) + summary_batch()
+        )
+        self.summary_tokens = summary_tokens or getattr(settings, 'AI_SUMMARY_MAX_TOKENS', 400)
+        self.profile_share = profile_share if profile_share is not None else getattr(settings, 'AI_CONTEXT_PROFILE_SHARE', 0.35)
+        self.rag_share = rag_share if rag_share is not None else getattr(settings, 'AI_CONTEXT_RAG_SHARE', 0.3)
+
+    def _message_tokens(self, message: dict) -> int:
+        return self.tokenizer(message["content"]) + _MESSAGE_OVERHEAD
+
+    def fit(self, profile_text: str, summary: str, conversation_history: list, docs: list) -> FittedContext:
+        """
+        Args:
+            profile_text: user profile context
+            summary: rolling summary of turns older than conversation_history ('' if none)
+            conversation_history: {role, content} dicts, oldest first; the last one
+                is the current user message
+            docs: KnowledgeSource list in rank order
+
+        Returns:
+            FittedContext (history to send, context text, documents included, tokens used)
+        """
+        current = conversation_history[-1:] if conversation_history else []
+        remaining = self.total_tokens - sum(self._message_tokens(m) for m in current)
+
+        profile = truncate_to_tokens(
+            profile_text, min(remaining, int(self.total_tokens * self.profile_share)), self.tokenizer
+        )
+        remaining -= self.tokenizer(profile)
+
+        summary_block = ""
+        if summary:
+            header = self.tokenizer(_SUMMARY_HEADER) + self.tokenizer(_PART_SEPARATOR)
+            summary = truncate_to_tokens(summary, min(remaining, self.summary_tokens) - header, self.tokenizer)
+            if summary:
+                summary_block = _SUMMARY_HEADER + summary
+                remaining -= self.tokenizer(summary_block) + self.tokenizer(_PART_SEPARATOR)
+
+        # Recent turns, newest first, keeping a reserve for documents
+        history_room = remaining - int(self.total_tokens * self.rag_share)
+        recent = []
+        for message in reversed(conversation_history[:-1][-self.history_messages:]):
+            cost = self._message_tokens(message)
+            if cost > history_room:
+                break
+            recent.append(message)
+            history_room -= cost
+            remaining -= cost
+        recent.reverse()
+        # The model expects a conversation that starts with a user turn
+        while recent and recent[0]["role"] != "user":
+            remaining += self._message_tokens(recent.pop(0))
+
+        rag_parts = []
+        for doc in docs:
+            separator = self.tokenizer(_DOC_SEPARATOR if rag_parts else _PART_SEPARATOR)
+            block = f"[{doc.source_type}] {doc.title}\n{doc.content[:_DOC_MAX_CHARS]}"
+            cost = self.tokenizer(block) + separator
+            if cost > remaining:
+                if remaining - separator >= _MIN_DOC_TOKENS:
+                    block = truncate_to_tokens(block, remaining - separator, self.tokenizer)
+                    rag_parts.append(block)
+                    remaining -= self.tokenizer(block) + separator
+                break
+            rag_parts.append(block)
+            remaining -= cost
+
+        context_text = _PART_SEPARATOR.join(p for p in (profile, summary_block) if p)
+        if rag_parts:
+            context_text += _PART_SEPARATOR + _DOC_SEPARATOR.join(rag_parts)
+
+        return FittedContext(
+            conversation_history=recent + current,
+            context_text=context_text,
+            docs_used=len(rag_parts),
+            tokens=self.total_tokens - remaining,
+        )
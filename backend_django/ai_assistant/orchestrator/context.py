@@ -3,10 +3,20 @@ User profile and conversation context builder.
 
 Builds the structured context passed to the LLM on every call.
 Extracted from the monolithic generate_ai_response.
+
+The per-(user, consultazione) part (role, consultazione, assigned sections,
+scrutinio data) is cached as a snapshot (AI_PROFILE_CACHE_ALIAS) for
+settings.AI_PROFILE_CACHE_TTL seconds and for the current day only. core.signals drops the
+snapshots touched by DesignazioneRDL, DatiSezione, DatiScheda, Delegato
+and SubDelega changes (see core.profile_cache.invalidate_profiles).
 """
 import logging
 from datetime import datetime
 
+from django.conf import settings
+
+from core.profile_cache import profile_cache, profile_cache_key
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,9 +27,7 @@ def build_user_profile_context(user, session) -> tuple[str, list[dict]]:
     Returns:
         (profile_text, user_sections_list)
     """
-    from delegations.models import DesignazioneRDL, Delegato, SubDelega
     from elections.models import ConsultazioneElettorale
-    from django.db.models import Q
 
     user_sections_list = []
 
@@ -30,21 +38,11 @@ def build_user_profile_context(user, session) -> tuple[str, list[dict]]:
         consultazione = ConsultazioneElettorale.objects.filter(is_attiva=True).first()
 
         # Determine user role
-        user_role = "RDL"
         role_description = "Rappresentante di Lista"
+        snapshot = None
         if consultazione:
-            is_delegato = Delegato.objects.filter(
-                consultazione=consultazione, email=user.email
-            ).exists()
-            is_subdelegato = SubDelega.objects.filter(
-                delegato__consultazione=consultazione, email=user.email
-            ).exists()
-            if is_delegato:
-                user_role = "DELEGATO"
-                role_description = "Delegato di Lista (supervisiona RDL nel suo territorio)"
-            elif is_subdelegato:
-                user_role = "SUBDELEGATO"
-                role_description = "Sub-Delegato (supervisiona RDL nel suo territorio)"
+            snapshot = get_profile_snapshot(user, consultazione, now)
+            role_description = snapshot["role_description"]
 
         profile_parts = [
             f"DATA E ORA: {now.strftime('%A %d %B %Y, ore %H:%M')}",
@@ -52,12 +50,9 @@ def build_user_profile_context(user, session) -> tuple[str, list[dict]]:
             f"RUOLO: {role_description}",
         ]
 
-        if consultazione:
-            profile_parts.append(_build_consultazione_context(consultazione, now))
-            user_sections_list = _build_sections_context(
-                user, consultazione, user_role, profile_parts
-            )
-            _build_scrutinio_context(user_sections_list, consultazione, profile_parts)
+        if snapshot:
+            profile_parts.extend(snapshot["parts"])
+            user_sections_list = snapshot["sections"]
         else:
             profile_parts.append("CONSULTAZIONE: Nessuna consultazione attiva al momento")
 
@@ -73,6 +68,57 @@ def build_user_profile_context(user, session) -> tuple[str, list[dict]]:
         return f"PROFILO UTENTE: {user.email}", []
 
 
+def get_profile_snapshot(user, consultazione, now: datetime) -> dict:
+    """Cached role, consultazione, sections and scrutinio context of a user."""
+    key = profile_cache_key(consultazione.id, user.email)
+    today = now.date().isoformat()
+
+    try:
+        snapshot = profile_cache().get(key)
+    except Exception as e:
+        logger.warning("Profile cache read failed: %s", e)
+        snapshot = None
+    if snapshot and snapshot.get("date") == today:
+        return snapshot
+
+    snapshot = _build_profile_snapshot(user, consultazione, now)
+    try:
+        profile_cache().set(key, snapshot, getattr(settings, "AI_PROFILE_CACHE_TTL", 600))
+    except Exception as e:
+        logger.warning("Profile cache write failed: %s", e)
+    return snapshot
+
+
+def _build_profile_snapshot(user, consultazione, now: datetime) -> dict:
+    from delegations.models import Delegato, SubDelega
+
+    user_role = "RDL"
+    role_description = "Rappresentante di Lista"
+    is_delegato = Delegato.objects.filter(
+        consultazione=consultazione, email=user.email
+    ).exists()
+    is_subdelegato = SubDelega.objects.filter(
+        delegato__consultazione=consultazione, email=user.email
+    ).exists()
+    if is_delegato:
+        user_role = "DELEGATO"
+        role_description = "Delegato di Lista (supervisiona RDL nel suo territorio)"
+    elif is_subdelegato:
+        user_role = "SUBDELEGATO"
+        role_description = "Sub-Delegato (supervisiona RDL nel suo territorio)"
+
+    parts = [_build_consultazione_context(consultazione, now)]
+    user_sections_list = _build_sections_context(user, consultazione, user_role, parts)
+    _build_scrutinio_context(user_sections_list, consultazione, parts)
+
+    return {
+        "date": now.date().isoformat(),
+        "role_description": role_description,
+        "parts": parts,
+        "sections": user_sections_list,
+    }
+
+
 def _build_consultazione_context(consultazione, now: datetime) -> str:
     today = now.date()
     data_inizio = consultazione.data_inizio
@@ -168,7 +214,7 @@ def _build_scrutinio_context(user_sections_list: list, consultazione, profile_pa
         return
 
     try:
-        from data.models import DatiSezione, DatiScheda
+        from data.models import DatiSezione
         from elections.models import SchedaElettorale
 
         schede = list(
@@ -184,11 +230,12 @@ def _build_scrutinio_context(user_sections_list: list, consultazione, profile_pa
         if not sezione_ids:
             return
 
+        # All schede data in one prefetch query (not one per section)
         dati_sezioni = {
             ds.sezione_id: ds
             for ds in DatiSezione.objects.filter(
                 sezione_id__in=sezione_ids, consultazione=consultazione
-            ).select_related("sezione")
+            ).prefetch_related("schede")
         }
 
         scrutinio_lines = []
@@ -209,9 +256,7 @@ def _build_scrutinio_context(user_sections_list: list, consultazione, profile_pa
                 vf = ds.votanti_femmine if ds.votanti_femmine is not None else "?"
                 parts.append(f"votanti M={vm}/F={vf}")
 
-            schede_dati = {
-                sd.scheda_id: sd for sd in DatiScheda.objects.filter(dati_sezione=ds)
-            }
+            schede_dati = {sd.scheda_id: sd for sd in ds.schede.all()}
             schede_complete = 0
             schede_details = []
             for scheda in schede:
@@ -9,9 +9,18 @@ Does NOT directly persist data, open/update tickets, or contain deep
 business logic. All side effects happen through specialist agents and services.
 """
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import date
 from typing import Optional
 
+from django.conf import settings
+from django.db import connections
+
+from core import background
+
 from ai_assistant.agents.knowledge import KnowledgeBaseAgent
 from ai_assistant.agents.data_capture import DataCaptureAgent
 from ai_assistant.agents.ticketing import TicketingAgent
@@ -23,7 +32,13 @@ from ai_assistant.models_typed.types import (
     RequestedAction,
 )
 from ai_assistant.policy.election_guard import ElectionPolicyGuard
+from ai_assistant.orchestrator.budget import ContextBudget
 from ai_assistant.orchestrator.context import build_user_profile_context
+from ai_assistant.orchestrator.summary import (
+    load_history,
+    needs_summary_update,
+    update_session_summary,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +48,15 @@ _data_capture_agent = DataCaptureAgent()
 _ticketing_agent = TicketingAgent()
 _policy_guard = ElectionPolicyGuard()
 
+# Bare "no relevant answer" reply (guarded in _route)
+_SHRUG = "🤷"
+
+# Replaces a 🤷 mid-conversation when the message is small talk or off-topic
+_OFF_TOPIC_REPLY = (
+    "Posso aiutarti solo con le procedure elettorali, "
+    "lo scrutinio e le segnalazioni."
+)
+
 # Map function names to action types
 _FUNCTION_ACTION_MAP = {
     "get_scrutinio_status": ActionType.GET_SCRUTINIO,
@@ -41,6 +65,74 @@ _FUNCTION_ACTION_MAP = {
     "update_incident_report": ActionType.UPDATE_INCIDENT,
 }
 
+# Tools without side effects: consecutive calls run concurrently.
+# Everything else (saves, incidents, unknown) is serialized in model order.
+_READ_ONLY_ACTIONS = frozenset({ActionType.GET_SCRUTINIO})
+
+# Per-tool latency, cumulative per process: name -> calls/errors/timeouts/total_ms/max_ms
+tool_stats = {}
+_tool_stats_lock = threading.Lock()
+
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+
+def _get_tool_executor():
+    """Lazy-init the shared pool for read-only tool calls (one per process)."""
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'AI_TOOL_MAX_WORKERS', 4),
+                    thread_name_prefix='ai-tool',
+                )
+    return _tool_executor
+
+
+def _is_read_only(function_call: dict) -> bool:
+    return _FUNCTION_ACTION_MAP.get(function_call["name"]) in _READ_ONLY_ACTIONS
+
+
+def _record_tool_latency(name: str, elapsed: float, status: str):
+    ms = elapsed * 1000
+    with _tool_stats_lock:
+        entry = tool_stats.setdefault(
+            name, {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+        entry["calls"] += 1
+        if status == "error":
+            entry["errors"] += 1
+        elif status == "timeout":
+            entry["timeouts"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+    logger.info("Orchestrator: tool=%s status=%s %.0fms", name, status, ms)
+
+
+def _is_off_topic(message: str) -> bool:
+    """
+    Local triage of the user message (ai_assistant.question_classifier):
+    True only when it is confidently small talk or off-topic.
+    """
+    from ai_assistant.question_classifier import SERIOUS, classify_question, stats
+
+    verdict = classify_question(message)
+    if not verdict.decided:
+        try:
+            from ai_assistant.retrieval import get_query_embedding
+
+            # Cached: _prepare_turn already embedded the message for retrieval
+            verdict = classify_question(message, get_query_embedding(message))
+        except Exception as e:
+            logger.warning("Orchestrator: query embedding for triage failed: %s", e)
+
+    if not verdict.decided:
+        stats["llm"] += 1
+        return False
+    stats["local"] += 1
+    return verdict.label != SERIOUS
+
 
 class ConversationOrchestrator:
     """
@@ -78,9 +170,74 @@ class ConversationOrchestrator:
         """
         from ai_assistant.tools import all_ai_tools
         from ai_assistant.vertex_service import vertex_ai_service
-        from ai_assistant.models import KnowledgeSource
-        from django.conf import settings
-        from pgvector.django import CosineDistance
+
+        turn = self._prepare_turn(request, session, message)
+
+        # 3. Call LLM with tools to classify intent
+        ai_response = vertex_ai_service.generate_with_tools(
+            conversation_history=turn["conversation_history"],
+            context=turn["context_text"],
+            tools=all_ai_tools,
+            attachments=attachment_data,
+        )
+
+        return self._route(ai_response, turn, request, session, attachment_data)
+
+    def stream_response(
+        self,
+        request,
+        session,
+        message: str,
+        attachment_data: Optional[list[dict]] = None,
+    ):
+        """
+        Streaming variant of generate_response.
+
+        Yields:
+            {'type': 'token', 'text': str}  partial answer text, as generated
+            {'type': 'reset'}               discard the tokens sent so far (a
+                                            tool call or a guard retry took over)
+            {'type': 'done', 'result': dict}  same dict as generate_response;
+                                            result['answer'] is authoritative
+        """
+        from ai_assistant.tools import all_ai_tools
+        from ai_assistant.vertex_service import vertex_ai_service
+
+        turn = self._prepare_turn(request, session, message)
+
+        streamed = []
+        pending = ""  # Held back while it could still be a bare 🤷 (see _route)
+        ai_response = None
+        for event in vertex_ai_service.generate_with_tools_stream(
+            conversation_history=turn["conversation_history"],
+            context=turn["context_text"],
+            tools=all_ai_tools,
+            attachments=attachment_data,
+        ):
+            if event["type"] == "done":
+                ai_response = event
+                continue
+            pending += event["text"]
+            if _SHRUG.startswith(pending.strip()):
+                continue
+            streamed.append(pending)
+            yield {"type": "token", "text": pending}
+            pending = ""
+
+        result = self._route(ai_response, turn, request, session, attachment_data)
+
+        answer = result.get("answer") or ""
+        sent = "".join(streamed)
+        if answer != sent:
+            if sent:
+                yield {"type": "reset"}
+            if answer:
+                yield {"type": "token", "text": answer}
+        yield {"type": "done", "result": result}
+
+    def _prepare_turn(self, request, session, message: str) -> dict:
+        """Steps 1-2: conversation history, user profile and RAG context."""
+        from ai_assistant.retrieval import search_knowledge
 
         user = request.user
 
@@ -90,9 +247,10 @@ class ConversationOrchestrator:
             session.id, user.email,
         )
 
-        history_messages = session.messages.order_by("created_at")
+        # Messages not yet folded into the rolling summary (bounded)
+        summary, messages, summarized_count = load_history(session)
         conversation_history = [
-            {"role": msg.role, "content": msg.content} for msg in history_messages
+            {"role": msg["role"], "content": msg["content"]} for msg in messages
         ]
 
         profile_text, user_sections_list = build_user_profile_context(user, session)
@@ -100,42 +258,49 @@ class ConversationOrchestrator:
         # 2. Retrieve RAG documents
         context_docs_list = []
         try:
-            query_embedding = vertex_ai_service.generate_embedding(message)
-            context_docs = (
-                KnowledgeSource.objects.filter(is_active=True)
-                .annotate(distance=CosineDistance("embedding", query_embedding))
-                .filter(distance__lte=(1 - settings.RAG_SIMILARITY_THRESHOLD))
-                .order_by("distance")[: settings.RAG_TOP_K]
-            )
-            context_docs_list = list(context_docs)
-
-            if context_docs_list:
-                rag_parts = [
-                    f"[{doc.source_type}] {doc.title}\n{doc.content[:2000]}"
-                    for doc in context_docs_list
-                ]
-                context_text = profile_text + "\n\n" + "\n\n---\n\n".join(rag_parts)
-            else:
-                context_text = profile_text
+            context_docs_list = search_knowledge(message)
         except Exception as e:
             logger.warning("Orchestrator: RAG retrieval failed: %s", e)
-            context_text = profile_text
+
+        # Fit profile, summary, history and documents into the token budget
+        fitted = ContextBudget().fit(
+            profile_text, summary, conversation_history, context_docs_list
+        )
+
+        if needs_summary_update(messages):
+            background.submit(update_session_summary, session.id)
 
         logger.info(
-            "Orchestrator: context built session=%d profile=%d chars rag_docs=%d history=%d msgs",
+            "Orchestrator: context built session=%d profile=%d chars rag_docs=%d/%d "
+            "history=%d/%d msgs summarized=%d tokens=%d",
             session.id,
             len(profile_text),
+            fitted.docs_used,
             len(context_docs_list),
+            len(fitted.conversation_history),
             len(conversation_history),
+            summarized_count,
+            fitted.tokens,
         )
 
-        # 3. Call LLM with tools to classify intent
-        ai_response = vertex_ai_service.generate_with_tools(
-            conversation_history=conversation_history,
-            context=context_text,
-            tools=all_ai_tools,
-            attachments=attachment_data,
-        )
+        return {
+            "message": message,
+            "conversation_history": fitted.conversation_history,
+            "context_text": fitted.context_text,
+            "context_docs_list": context_docs_list,
+            "user_sections_list": user_sections_list,
+            "message_count": summarized_count + len(conversation_history),
+        }
+
+    def _route(self, ai_response: dict, turn: dict, request, session, attachment_data) -> dict:
+        """Step 4: guards, then route the LLM output to an agent or a text answer."""
+        from ai_assistant.tools import all_ai_tools
+        from ai_assistant.vertex_service import vertex_ai_service
+
+        conversation_history = turn["conversation_history"]
+        context_text = turn["context_text"]
+        context_docs_list = turn["context_docs_list"]
+        user_sections_list = turn["user_sections_list"]
 
         # 4. Route based on LLM response
 
@@ -186,19 +351,25 @@ class ConversationOrchestrator:
                     user_sections_list=user_sections_list,
                 )
             else:
-                return self._handle_function_call(
-                    function_calls[0],
-                    session=session,
-                    request=request,
-                    user_sections_list=user_sections_list,
-                )
+                kwargs = {
+                    "session": session,
+                    "request": request,
+                    "user_sections_list": user_sections_list,
+                }
+                if _is_read_only(function_calls[0]):
+                    return self._run_read_only(function_calls, kwargs)[0]
+                return self._timed_function_call(function_calls[0], **kwargs)
         else:
             # Guard: never return 🤷 in the middle of a conversation
             content = (ai_response.get("content") or "").strip()
-            if content == "🤷" and len(conversation_history) > 2:
+            if content == _SHRUG and turn["message_count"] > 2 and _is_off_topic(turn["message"]):
+                # Small talk or off-topic: no retry, just steer back
+                ai_response["content"] = _OFF_TOPIC_REPLY
+                logger.info("Orchestrator: 🤷 on an off-topic message, no retry")
+            elif content == _SHRUG and turn["message_count"] > 2:
                 logger.warning(
                     "Orchestrator: blocked 🤷 in active conversation (history=%d msgs), retrying",
-                    len(conversation_history),
+                    turn["message_count"],
                 )
                 # Retry with explicit instruction appended to context
                 retry_context = (
@@ -215,7 +386,7 @@ class ConversationOrchestrator:
                     tools=all_ai_tools,
                     attachments=attachment_data,
                 )
-                if retry_response.get("content") and retry_response["content"].strip() != "🤷":
+                if retry_response.get("content") and retry_response["content"].strip() != _SHRUG:
                     ai_response = retry_response
                     logger.info("Orchestrator: retry succeeded, got meaningful response")
                 else:
@@ -240,18 +411,36 @@ class ConversationOrchestrator:
         request,
         user_sections_list: list,
     ) -> dict:
-        """Execute multiple function calls and combine their results."""
+        """
+        Execute multiple function calls and combine their results.
+
+        Calls are processed in model order. Consecutive read-only calls run
+        concurrently on the tool pool, each with its own timeout
+        (settings.AI_TOOL_TIMEOUT); a mutating call waits for the reads
+        before it and runs alone, so reads after a save see its effect.
+        """
+        kwargs = {
+            "session": session,
+            "request": request,
+            "user_sections_list": user_sections_list,
+        }
+
+        results = []
+        reads = []
+        for fc in function_calls:
+            if _is_read_only(fc):
+                reads.append(fc)
+                continue
+            results.extend(self._run_read_only(reads, kwargs))
+            reads = []
+            results.append(self._timed_function_call(fc, **kwargs))
+        results.extend(self._run_read_only(reads, kwargs))
+
         combined_answers = []
         combined_sources = []
         combined_function_results = []
 
-        for fc in function_calls:
-            result = self._handle_function_call(
-                fc,
-                session=session,
-                request=request,
-                user_sections_list=user_sections_list,
-            )
+        for result in results:
             if result.get("answer"):
                 combined_answers.append(result["answer"])
             combined_sources.extend(result.get("sources", []))
@@ -266,6 +455,61 @@ class ConversationOrchestrator:
             "user_sections_list": user_sections_list,
         }
 
+    def _run_read_only(self, function_calls: list, kwargs: dict) -> list:
+        """
+        Run read-only calls concurrently on the tool pool, each bounded by
+        settings.AI_TOOL_TIMEOUT (a single call too); results in call order.
+        """
+        timeout = getattr(settings, 'AI_TOOL_TIMEOUT', 15)
+        executor = _get_tool_executor()
+        submitted = []
+        for fc in function_calls:
+            # Taken by whoever records the call first: the worker or the timeout
+            recorded = threading.Lock()
+            future = executor.submit(self._tool_worker, fc, kwargs, recorded)
+            submitted.append((fc, time.monotonic(), recorded, future))
+
+        results = []
+        for fc, started, recorded, future in submitted:
+            try:
+                results.append(future.result(timeout=max(0, started + timeout - time.monotonic())))
+            except FutureTimeoutError:
+                # The worker keeps running; its result (and latency) is dropped
+                if recorded.acquire(blocking=False):
+                    _record_tool_latency(fc["name"], time.monotonic() - started, "timeout")
+                results.append(self._tool_timeout_response(fc, kwargs["user_sections_list"]))
+        return results
+
+    def _tool_worker(self, function_call: dict, kwargs: dict, recorded) -> dict:
+        try:
+            return self._timed_function_call(function_call, recorded=recorded, **kwargs)
+        finally:
+            # Pool threads get their own DB connections: release them
+            connections.close_all()
+
+    def _timed_function_call(self, function_call: dict, recorded=None, **kwargs) -> dict:
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return self._handle_function_call(function_call, **kwargs)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            if recorded is None or recorded.acquire(blocking=False):
+                _record_tool_latency(function_call["name"], time.perf_counter() - started, status)
+
+    @staticmethod
+    def _tool_timeout_response(function_call: dict, user_sections_list: list) -> dict:
+        message = "Non sono riuscito a recuperare i dati in tempo. Riprova tra poco."
+        return {
+            "answer": message,
+            "sources": [],
+            "retrieved_docs": 0,
+            "function_result": {"message": message, "data": None, "timeout": function_call["name"]},
+            "user_sections_list": user_sections_list,
+        }
+
     def _handle_function_call(
         self,
         function_call: dict,
@@ -0,0 +1,133 @@
+"""
+Rolling summary of the older turns of a chat session.
+
+Turns that scroll out of the verbatim window (settings.AI_HISTORY_VERBATIM_TURNS)
+are folded into a short summary stored on ChatSession.metadata["summary"]:
+
+    {"text": "...", "upto_id": <last ChatMessage id covered>, "messages": <count>}
+
+The summary is updated incrementally (previous summary + newly old
+messages) in the background after a turn, so no turn waits for it; until
+it catches up, the uncovered messages are still loaded verbatim. It is
+only updated once a full batch (AI_SUMMARY_BATCH_MESSAGES) has scrolled
+out of the window, so a long session costs one summarization call every
+few turns, not one per turn.
+
+Usage:
+    summary, messages, covered = load_history(session)
+    if needs_summary_update(messages):
+        background.submit(update_session_summary, session.id)
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_KEY = "summary"
+
+def _verbatim_messages() -> int:
+    return 2 * getattr(settings, 'AI_HISTORY_VERBATIM_TURNS', 6)
+
+
+def summary_batch() -> int:
+    """Older messages folded into the summary per LLM call."""
+    return getattr(settings, 'AI_SUMMARY_BATCH_MESSAGES', 20)
+
+
+def max_uncovered_messages() -> int:
+    """Messages left out of the summary at most: the verbatim window and one batch."""
+    return _verbatim_messages() + summary_batch()
+
+
+def load_history(session) -> tuple[str, list[dict], int]:
+    """
+    Summary text and the messages it does not cover.
+
+    At most one batch more than max_uncovered_messages() is loaded (the
+    newest ones), so a session whose summary is lagging still costs a
+    bounded query.
+
+    Returns:
+        (summary text, [{id, role, content}] oldest first, messages covered by the summary)
+    """
+    summary = (session.metadata or {}).get(SUMMARY_KEY) or {}
+    messages = list(
+        session.messages.filter(id__gt=summary.get("upto_id", 0))
+        .order_by("-created_at", "-id")
+        .values("id", "role", "content")[:max_uncovered_messages() + summary_batch()]
+    )
+    messages.reverse()
+    return summary.get("text", ""), messages, summary.get("messages", 0)
+
+
+def needs_summary_update(messages: list) -> bool:
+    """True when a full batch of uncovered messages is older than the verbatim window."""
+    return len(messages) >= max_uncovered_messages()
+
+
+def summarize_messages(previous_summary: str, messages: list[dict]) -> str:
+    """Fold messages into previous_summary with the LLM."""
+    from ai_assistant.vertex_service import vertex_ai_service
+
+    max_words = getattr(settings, 'AI_SUMMARY_MAX_TOKENS', 400) * 3 // 4
+    transcript = "\n".join(
+        f"{'RDL' if m['role'] == 'user' else 'ASSISTENTE'}: {m['content']}" for m in messages
+    )
+    prompt = (
+        "Aggiorna il riepilogo di una conversazione tra un Rappresentante di Lista (RDL) "
+        "e l'assistente elettorale.\n\n"
+        f"RIEPILOGO ATTUALE:\n{previous_summary or '(vuoto)'}\n\n"
+        f"NUOVI MESSAGGI:\n{transcript}\n\n"
+        f"Scrivi il riepilogo aggiornato in italiano, massimo {max_words} parole. "
+        "Conserva: sezioni e comuni citati, dati di scrutinio comunicati, segnalazioni "
+        "aperte (con ID), richieste ancora in sospeso e decisioni prese. "
+        "Ometti saluti e dettagli non piu rilevanti. Rispondi SOLO con il riepilogo."
+    )
+    return vertex_ai_service.complete(prompt).strip()
+
+
+def update_session_summary(session_id: int, summarizer=summarize_messages):
+    """
+    Fold the messages older than the verbatim window into the session summary.
+
+    Runs in the background; the LLM is called outside any lock and the
+    result is only written if no other update got further meanwhile.
+    """
+    from ai_assistant.models import ChatSession
+
+    session = ChatSession.objects.get(pk=session_id)
+    summary = (session.metadata or {}).get(SUMMARY_KEY) or {}
+    pending = list(
+        session.messages.filter(id__gt=summary.get("upto_id", 0))
+        .order_by("created_at", "id")
+        .values("id", "role", "content")
+    )
+    older = pending[:-_verbatim_messages()]
+    if not older:
+        return
+
+    text = summary.get("text", "")
+    batch = summary_batch()
+    for start in range(0, len(older), batch):
+        text = summarizer(text, older[start:start + batch])
+
+    with transaction.atomic():
+        locked = ChatSession.objects.select_for_update().get(pk=session_id)
+        metadata = locked.metadata or {}
+        if (metadata.get(SUMMARY_KEY) or {}).get("upto_id", 0) >= older[-1]["id"]:
+            return
+        metadata[SUMMARY_KEY] = {
+            "text": text,
+            "upto_id": older[-1]["id"],
+            "messages": summary.get("messages", 0) + len(older),
+        }
+        locked.metadata = metadata
+        # update_fields without updated_at: the session keeps its place in the list
+        locked.save(update_fields=["metadata"])
+
+    logger.info(
+        "Session %d summary updated: %d messages folded, %d chars",
+        session_id, len(older), len(text),
+    )
@@ -0,0 +1,204 @@
+"""
+Local triage of user questions: serious, trivial or off-topic.
+
+VertexAIService.is_trivial_question and clarify_off_topic_question used to
+spend a full generate_content round-trip to tell "ciao" or "ricetta della
+frittata" from a real RDL question. Most questions are easy to call
+locally from two signals:
+
+- keywords: election vocabulary (seggio, scrutinio, RDL, scheda...),
+  greetings/test strings, and off-topic topics (meteo, calcio, ricette...)
+- the cosine similarity of the query embedding (already computed for
+  retrieval, see ai_assistant.retrieval.get_query_embedding) to the
+  centroid of the knowledge base
+
+classify_question returns a Verdict; when verdict.decided is False the
+caller falls back to the LLM. In the chat path the orchestrator uses it
+before retrying a 🤷 answer mid-conversation: confidently off-topic
+messages get a fixed reply instead of a second generation.
+`manage.py evaluate_question_classifier`
+measures precision/recall on the labelled questions of test_conversations.
+
+Usage:
+    verdict = classify_question(text)                  # keywords only
+    verdict = classify_question(text, query_embedding) # + KB centroid
+    if verdict.decided:
+        is_trivial = verdict.label != SERIOUS
+"""
+import logging
+import re
+import threading
+import unicodedata
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SERIOUS = 'serious'
+TRIVIAL = 'trivial'
+OFF_TOPIC = 'off_topic'
+
+# Word prefixes of the election/RDL domain (accents stripped, lowercase)
+_DOMAIN_PREFIXES = (
+    'segg', 'sezion', 'scrutin', 'rappresentant', 'scheda', 'schede', 'verbal',
+    'president', 'vot', 'elett', 'referend', 'elezion', 'deleg', 'nomin',
+    'designa', 'quesit', 'urna', 'urne', 'cabin', 'cartellin', 'contestat',
+    'brogl', 'ainaudi', 'install', 'scaric', 'permess', 'datore', 'assegna',
+    'municipi', 'cittadinanz', 'tessera', 'irregolar', 'spoglio', 'matita',
+    'plich', 'registr', 'timbr', 'autentic',
+)
+_DOMAIN_WORDS = frozenset({'rdl', 'rtl', 'lista', 'app', 'badge', 'budge', 'nulle', 'bianche', 'sindaco'})
+
+# Messages made only of these words are small talk
+_TRIVIAL_WORDS = frozenset({
+    'ciao', 'salve', 'buongiorno', 'buonasera', 'buonanotte', 'hey', 'hello', 'hi',
+    'grazie', 'ok', 'okay', 'si', 'no', 'daje', 'boh', 'bene', 'perfetto', 'va',
+    'test', 'prova', 'asdf', 'ahah', 'ahahah', 'lol',
+})
+_TEST_PATTERNS = ('test', 'prova', 'asdf', '???', '!!!')
+
+_OFF_TOPIC_PREFIXES = (
+    'meteo', 'ricett', 'cucin', 'calcio', 'campionat', 'sanremo', 'oroscop',
+    'barzellett', 'canzon', 'pizza', 'frittat', 'pioggia', 'piove', 'vacanz',
+    'ristorant', 'film', 'partita',
+)
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+# Decisions per process: made locally vs. sent to the LLM (see vertex_service)
+stats = {'local': 0, 'llm': 0}
+
+# Per-process centroid: (knowledge version, unit vector or None)
+_centroid = None
+_centroid_lock = threading.Lock()
+
+
+class Verdict(NamedTuple):
+    label: str  # SERIOUS, TRIVIAL or OFF_TOPIC
+    confidence: float
+    reason: str  # which signal decided
+    decided: bool  # confident enough to skip the LLM
+
+
+def _words(text):
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _WORD_RE.findall(text)
+
+
+def _domain_hits(words):
+    return sum(1 for w in words if w in _DOMAIN_WORDS or w.startswith(_DOMAIN_PREFIXES))
+
+
+def _off_topic_hits(words):
+    return sum(1 for w in words if w.startswith(_OFF_TOPIC_PREFIXES))
+
+
+def knowledge_centroid():
+    """
+    Unit-length mean of the active knowledge-base embeddings (None if the
+    base is empty), recomputed once per knowledge-base version.
+    """
+    global _centroid
+    from ai_assistant.retrieval import get_knowledge_version
+
+    version = get_knowledge_version()
+    current = _centroid
+    if current is not None and current[0] == version:
+        return current[1]
+
+    with _centroid_lock:
+        if _centroid is not None and _centroid[0] == version:
+            return _centroid[1]
+        from ai_assistant.models import KnowledgeSource
+
+        total, count = None, 0
+        queryset = KnowledgeSource.objects.filter(
+            is_active=True, embedding__isnull=False
+        ).values_list('embedding', flat=True)
+        for embedding in queryset.iterator(chunk_size=2000):
+            vector = np.asarray(embedding, dtype=np.float64)
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                continue
+            total = vector / norm if total is None else total + vector / norm
+            count += 1
+
+        centroid = None
+        if count:
+            norm = np.linalg.norm(total)
+            centroid = total / norm if norm else None
+        _centroid = (version, centroid)
+        logger.info("Knowledge centroid computed from %d embeddings (version %s)", count, version)
+        return centroid
+
+
+def centroid_similarity(embedding):
+    """Cosine similarity of a query embedding to the KB centroid (None if unavailable)."""
+    centroid = knowledge_centroid()
+    if centroid is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float64)
+    norm = np.linalg.norm(vector)
+    if norm == 0 or len(vector) != len(centroid):
+        return None
+    return float(vector @ centroid / norm)
+
+
+def classify_question(text, embedding=None) -> Verdict:
+    """
+    Triage a question with keywords and, if given, its query embedding.
+
+    Args:
+        text: user question
+        embedding: query embedding (optional); without it, questions with no
+            keyword signal stay undecided
+
+    Returns:
+        Verdict; decided is False when the LLM should classify instead
+    """
+    min_confidence = getattr(settings, 'AI_TRIAGE_MIN_CONFIDENCE', 0.8)
+
+    def verdict(label, confidence, reason):
+        return Verdict(label, confidence, reason, confidence >= min_confidence)
+
+    stripped = (text or '').strip()
+    lowered = stripped.lower()
+    words = _words(stripped)
+
+    if len(lowered) < 5 or not words:
+        return verdict(TRIVIAL, 0.95, 'too_short')
+    if all(w in _TRIVIAL_WORDS for w in words):
+        return verdict(TRIVIAL, 0.95, 'small_talk')
+    if len(lowered) < 15 and any(p in lowered for p in _TEST_PATTERNS):
+        return verdict(TRIVIAL, 0.9, 'test_message')
+
+    domain = _domain_hits(words)
+    off_topic = _off_topic_hits(words)
+    if domain and not off_topic:
+        return verdict(SERIOUS, min(0.99, 0.8 + 0.05 * domain), 'keywords')
+    if off_topic and not domain:
+        return verdict(OFF_TOPIC, min(0.99, 0.8 + 0.05 * off_topic), 'keywords')
+
+    similarity = centroid_similarity(embedding) if embedding is not None else None
+    if similarity is None:
+        label = SERIOUS if domain >= off_topic else OFF_TOPIC
+        return verdict(label, 0.5, 'mixed_keywords' if domain else 'no_signal')
+
+    serious_at = getattr(settings, 'AI_TRIAGE_CENTROID_SERIOUS', 0.6)
+    off_topic_at = getattr(settings, 'AI_TRIAGE_CENTROID_OFF_TOPIC', 0.45)
+    if similarity >= serious_at:
+        return verdict(SERIOUS, 0.9, 'centroid')
+    if similarity <= off_topic_at:
+        return verdict(OFF_TOPIC, 0.85, 'centroid')
+    # In between: lean on the closer threshold, below min_confidence
+    midpoint = (serious_at + off_topic_at) / 2
+    return verdict(SERIOUS if similarity >= midpoint else OFF_TOPIC, 0.6, 'centroid_uncertain')
+
+
+def reset_centroid():
+    """Drop the cached centroid (tests)."""
+    global _centroid
+    _centroid = None
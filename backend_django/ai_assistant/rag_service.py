@@ -1,10 +1,8 @@
 """
 RAG (Retrieval-Augmented Generation) service orchestration.
 """
-from django.conf import settings
-from .models import KnowledgeSource
+from .retrieval import get_query_embedding, retrieve
 from .vertex_service import vertex_ai_service
-from pgvector.django import CosineDistance
 import logging
 
 logger = logging.getLogger(__name__)
@@ -56,20 +54,9 @@ class RAGService:
                     'retrieved_docs': 0,
                 }
 
-            # 2. Generate query embedding
-            query_embedding = vertex_ai_service.generate_embedding(user_question)
-
-            # 3. Similarity search in pgvector
-            similar_docs = (
-                KnowledgeSource.objects
-                .filter(is_active=True)
-                .annotate(
-                    distance=CosineDistance('embedding', query_embedding)
-                )
-                .filter(distance__lte=(1 - settings.RAG_SIMILARITY_THRESHOLD))  # cosine distance = 1 - similarity
-                .order_by('distance')
-                [:settings.RAG_TOP_K]
-            )
+            # 2-3. Query embedding + similarity search (both cached)
+            embedding = get_query_embedding(user_question)
+            similar_docs = retrieve(embedding, text=user_question)
 
             # 4. Check if we have relevant context
             if len(similar_docs) == 0:
@@ -77,7 +64,7 @@ class RAGService:
                 logger.info(f"No relevant context found for: {user_question[:50]}")
 
                 # Use minimal model call to clarify if question is pertinent
-                clarification = vertex_ai_service.clarify_off_topic_question(user_question)
+                clarification = vertex_ai_service.clarify_off_topic_question(user_question, embedding)
 
                 return {
                     'answer': clarification,
@@ -129,7 +116,7 @@ class RAGService:
                     }
                 else:
                     # First message or no history: ask for clarification
-                    clarification = vertex_ai_service.clarify_off_topic_question(user_question)
+                    clarification = vertex_ai_service.clarify_off_topic_question(user_question, embedding)
 
                     return {
                         'answer': clarification,
@@ -0,0 +1,217 @@
+"""
+Record/replay of Vertex AI calls for offline, deterministic conversation runs.
+
+A Cassette wraps the public methods of a VertexAIService instance
+(embeddings, generation, tool calling, streaming). In "record" mode each
+call goes to the real API and its response is stored on disk; in "replay"
+mode responses come from disk and the API is never initialized; "auto"
+replays what exists and records the rest.
+
+Fixtures are one JSON file per request under <directory>/<method>/<key>.json,
+so parallel conversations can record without contention. The key is a
+hash of the method name and its arguments, after masking the parts of a
+prompt that change from run to run (current date and time, days to the
+election, ids of incidents created during the run, see VOLATILE_PATTERNS).
+
+Usage:
+    from ai_assistant.vertex_service import vertex_ai_service
+
+    with Cassette('ai_assistant/fixtures/replay', mode='replay').installed(vertex_ai_service):
+        generate_ai_response(request, session, message)   # no API calls
+"""
+import contextlib
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+
+RECORDED_METHODS = (
+    'generate_embedding',
+    'generate_embeddings_batch',
+    'generate_response',
+    'complete',
+    'generate_with_tools',
+    'generate_with_tools_stream',
+    'extract_incident_from_conversation',
+    'is_trivial_question',
+    'clarify_off_topic_question',
+)
+
+MODES = ('record', 'replay', 'auto')
+
+# Prompt fragments that differ between otherwise identical runs
+VOLATILE_PATTERNS = [
+    (re.compile(r'DATA E ORA: [^\n]*'), 'DATA E ORA: <now>'),
+    (re.compile(r'(Mancano|Terminata da) \d+ giorni'), r'\1 <n> giorni'),
+    (re.compile(r'ID #\d+'), 'ID #<id>'),
+    (re.compile(r'"incident_id": \d+'), '"incident_id": <id>'),
+]
+
+
+class ReplayMiss(LookupError):
+    """No recorded response for a call in replay mode."""
+
+
+def _mask(text):
+    for pattern, replacement in VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _canonical(value):
+    """JSON-friendly, deterministic form of call arguments (for hashing)."""
+    if isinstance(value, str):
+        return _mask(value)
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<bytes {hashlib.sha256(bytes(value)).hexdigest()}>'
+    if isinstance(value, Mapping):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    text = repr(value)
+    # Tool declarations have a stable repr; plain objects only their type
+    return type(value).__name__ if ' at 0x' in text else _mask(text)
+
+
+def _jsonable(value):
+    """Plain JSON structure from an API response (proto maps/lists included)."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, Mapping):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if hasattr(value, 'tolist'):  # NumPy arrays and scalars
+        return _jsonable(value.tolist())
+    if isinstance(value, (list, tuple)) or (
+        hasattr(value, '__iter__') and hasattr(value, '__len__') and not isinstance(value, (bytes, str))
+    ):
+        return [_jsonable(v) for v in value]
+    return str(value)
+
+
+def request_key(method, args, kwargs):
+    payload = json.dumps(
+        {'method': method, 'args': _canonical(list(args)), 'kwargs': _canonical(kwargs)},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class Cassette:
+    """Record/replay store for VertexAIService calls."""
+
+    def __init__(self, directory, mode='replay', simulate_latency=False, stage=None):
+        """
+        Args:
+            directory: fixture directory (created on first record)
+            mode: "record", "replay" or "auto"
+            simulate_latency: on replay, sleep for the recorded duration
+            stage: optional callable(name) -> context manager wrapped around
+                every call (latency accounting, see benchmark_conversations)
+        """
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}')
+        self.directory = directory
+        self.mode = mode
+        self.simulate_latency = simulate_latency
+        self.stage = stage or (lambda name: contextlib.nullcontext())
+        self.stats = {'replayed': 0, 'recorded': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def _path(self, method, key):
+        return os.path.join(self.directory, method, f'{key}.json')
+
+    def _load(self, method, key):
+        try:
+            with open(self._path(method, key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, method, key, args, kwargs, response, elapsed):
+        path = self._path(method, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            'method': method,
+            'request': {'args': _canonical(list(args)), 'kwargs': _canonical(kwargs)},
+            'response': _jsonable(response),
+            'elapsed_ms': round(elapsed * 1000, 1),
+        }
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _lookup(self, method, args, kwargs):
+        """Recorded entry, None when the call must be recorded; ReplayMiss in replay mode."""
+        key = request_key(method, args, kwargs)
+        entry = None if self.mode == 'record' else self._load(method, key)
+        if entry is None and self.mode == 'replay':
+            self._count('misses')
+            raise ReplayMiss(f'{method}: no fixture {key} in {self.directory}')
+        if entry is not None:
+            self._count('replayed')
+            if self.simulate_latency:
+                time.sleep(entry['elapsed_ms'] / 1000)
+        return key, entry
+
+    def wrap(self, method, real):
+        """Recording/replaying replacement for a bound method."""
+        if method == 'generate_with_tools_stream':
+            return self._wrap_stream(method, real)
+
+        def call(*args, **kwargs):
+            with self.stage('model'):
+                key, entry = self._lookup(method, args, kwargs)
+                if entry is not None:
+                    return entry['response']
+                started = time.perf_counter()
+                # Same plain structures as on replay
+                response = _jsonable(real(*args, **kwargs))
+                self._save(method, key, args, kwargs, response, time.perf_counter() - started)
+                self._count('recorded')
+                return response
+
+        return call
+
+    def _wrap_stream(self, method, real):
+        def stream(*args, **kwargs):
+            with self.stage('model'):
+                key, entry = self._lookup(method, args, kwargs)
+            if entry is not None:
+                yield from entry['response']
+                return
+            started = time.perf_counter()
+            events = []
+            iterator = iter(real(*args, **kwargs))
+            while True:
+                with self.stage('model'):
+                    event = next(iterator, None)
+                if event is None:
+                    break
+                events.append(_jsonable(event))
+                yield events[-1]
+            self._save(method, key, args, kwargs, events, time.perf_counter() - started)
+            self._count('recorded')
+
+        return stream
+
+    @contextlib.contextmanager
+    def installed(self, service):
+        """Route the recorded methods of a VertexAIService instance through the cassette."""
+        for method in RECORDED_METHODS:
+            setattr(service, method, self.wrap(method, getattr(service, method)))
+        try:
+            yield self
+        finally:
+            for method in RECORDED_METHODS:
+                service.__dict__.pop(method, None)
@@ -0,0 +1,363 @@
+"""
+Knowledge-base retrieval with query-embedding and result caching.
+
+Every chat message used to pay one embedding API round-trip plus one
+pgvector scan, although RDLs ask the same few questions over and over on
+election day. Two caches sit in front of them, each with an in-process
+LRU tier and a shared tier (Django cache, so all workers benefit):
+
+- Query embeddings, keyed on the normalized question text and the
+  embedding model. They do not depend on the knowledge base.
+- Retrieval results, keyed on the knowledge-base version and a quantized
+  bucket of the query embedding. The version is bumped whenever a
+  KnowledgeSource row is saved or deleted (see ai_assistant.signals), so
+  stale results are never served.
+
+Vector backends (settings.RAG_VECTOR_BACKEND):
+- "pgvector": cosine distance in Postgres (HNSW index).
+- "numpy": in-process matrix index (ai_assistant.vector_index), for SQLite
+  and small single-VM deployments.
+- "auto" (default): pgvector on Postgres, numpy otherwise.
+
+Search modes (settings.RAG_RETRIEVAL_MODE):
+- "vector": cosine distance over the HNSW index; settings.RAG_HNSW_EF_SEARCH
+  trades recall for latency.
+- "hybrid": vector candidates and Postgres full-text candidates, merged by
+  reciprocal rank fusion. Catches exact terms ("art. 104", "verbale")
+  that embeddings rank poorly.
+
+Usage:
+    from ai_assistant.retrieval import search_knowledge
+    docs = search_knowledge(message)   # KnowledgeSource list with .distance
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+_KB_VERSION_KEY = 'ai:kb_version'
+
+# Embedding components are rounded to 1/_BUCKET_SCALE before hashing
+_BUCKET_SCALE = 256
+
+# Full-text document; must match the GIN index of migration 0010
+_TSVECTOR_SQL = "to_tsvector('italian', coalesce(title, '') || ' ' || coalesce(content, ''))"
+_TSQUERY_SQL = "websearch_to_tsquery('italian', %s)"
+
+
+class LocalLRU:
+    """Thread-safe in-process LRU with a TTL."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] >= self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_embeddings = LocalLRU(
+    getattr(settings, 'RAG_EMBEDDING_CACHE_SIZE', 2048),
+    getattr(settings, 'RAG_EMBEDDING_CACHE_TTL', 86400),
+)
+_results = LocalLRU(
+    getattr(settings, 'RAG_RETRIEVAL_CACHE_SIZE', 1024),
+    getattr(settings, 'RAG_RETRIEVAL_CACHE_TTL', 3600),
+)
+
+stats = {'embedding_hits': 0, 'embedding_misses': 0, 'retrieval_hits': 0, 'retrieval_misses': 0}
+
+
+def _shared():
+    return caches[getattr(settings, 'RAG_CACHE_ALIAS', 'default')]
+
+
+def _shared_get(key):
+    try:
+        return _shared().get(key)
+    except Exception as e:
+        logger.warning("RAG cache read failed (%s): %s", key, e)
+        return None
+
+
+def _shared_set(key, value, timeout):
+    try:
+        _shared().set(key, value, timeout)
+    except Exception as e:
+        logger.warning("RAG cache write failed (%s): %s", key, e)
+
+
+def normalize_query(text):
+    """
+    Normalize a question for cache lookup: lowercase, collapse whitespace,
+    drop trailing punctuation ("Posso fotografare la scheda?" ==
+    "posso fotografare la scheda").
+    """
+    text = re.sub(r'\s+', ' ', (text or '').strip().lower())
+    return text.rstrip(' ?!.…')
+
+
+def _digest(*parts):
+    return hashlib.sha1('\x00'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+# =============================================================================
+# Query embeddings
+# =============================================================================
+
+def get_query_embedding(text):
+    """Embedding of a user question, cached by normalized text."""
+    from ai_assistant.vertex_service import vertex_ai_service
+
+    model = getattr(settings, 'VERTEX_AI_EMBEDDING_MODEL', '')
+    key = f'ai:emb:{_digest(model, normalize_query(text))}'
+
+    embedding = _embeddings.get(key)
+    if embedding is None:
+        embedding = _shared_get(key)
+        if embedding is not None:
+            _embeddings.set(key, embedding)
+    if embedding is not None:
+        stats['embedding_hits'] += 1
+        return embedding
+
+    stats['embedding_misses'] += 1
+    embedding = list(vertex_ai_service.generate_embedding(text))
+    _embeddings.set(key, embedding)
+    _shared_set(key, embedding, getattr(settings, 'RAG_EMBEDDING_CACHE_TTL', 86400))
+    return embedding
+
+
+# =============================================================================
+# Knowledge-base version
+# =============================================================================
+
+def get_knowledge_version():
+    """Current knowledge-base version (shared across processes)."""
+    version = _shared_get(_KB_VERSION_KEY)
+    if version is None:
+        version = int(time.time())
+        _shared_set(_KB_VERSION_KEY, version, None)
+    return version
+
+
+def bump_knowledge_version():
+    """Invalidate cached retrieval results (KnowledgeSource changed)."""
+    _results.clear()
+    try:
+        _shared().incr(_KB_VERSION_KEY)
+    except ValueError:
+        # Key missing (never read, or evicted): any new value is fresh
+        _shared_set(_KB_VERSION_KEY, int(time.time() * 1000), None)
+    except Exception as e:
+        logger.warning("RAG cache version bump failed: %s", e)
+
+
+# =============================================================================
+# Retrieval
+# =============================================================================
+
+def embedding_bucket(embedding):
+    """Hash of the quantized embedding: equal questions share a bucket."""
+    quantized = ','.join(str(round(float(x) * _BUCKET_SCALE)) for x in embedding)
+    return hashlib.sha1(quantized.encode()).hexdigest()
+
+
+def _set_ann_params(ef_search=None):
+    """Per-transaction HNSW search parameters (Postgres only)."""
+    if ef_search is None:
+        ef_search = getattr(settings, 'RAG_HNSW_EF_SEARCH', 40)
+    iterative_scan = getattr(settings, 'RAG_HNSW_ITERATIVE_SCAN', None)
+    with connection.cursor() as cursor:
+        # set_config(..., true) == SET LOCAL, but accepts bound parameters
+        cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", [str(int(ef_search))])
+        if iterative_scan:
+            # pgvector >= 0.8: keep scanning when filters drop candidates
+            cursor.execute("SELECT set_config('hnsw.iterative_scan', %s, true)", [iterative_scan])
+
+
+def vector_backend():
+    """Configured vector backend name: 'pgvector' or 'numpy'."""
+    backend = getattr(settings, 'RAG_VECTOR_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = 'pgvector' if connection.vendor == 'postgresql' else 'numpy'
+    return backend
+
+
+def _vector_search(embedding, top_k, threshold, ef_search=None):
+    """
+    Active KnowledgeSource rows within the similarity threshold, ordered
+    by cosine distance (each with .distance), from the configured backend.
+    """
+    if vector_backend() == 'numpy':
+        return _numpy_search(embedding, top_k, threshold)
+    return _pgvector_search(embedding, top_k, threshold, ef_search)
+
+
+def _numpy_search(embedding, top_k, threshold):
+    from ai_assistant.models import KnowledgeSource
+    from ai_assistant.vector_index import get_numpy_index
+
+    hits = get_numpy_index().search(embedding, top_k, threshold)
+    if not hits:
+        return []
+    rows = KnowledgeSource.objects.defer('embedding').in_bulk([pk for pk, _ in hits])
+    docs = []
+    for pk, distance in hits:
+        doc = rows.get(pk)
+        if doc is not None:
+            doc.distance = distance
+            docs.append(doc)
+    return docs
+
+
+def _pgvector_search(embedding, top_k, threshold, ef_search=None):
+    from pgvector.django import CosineDistance
+    from ai_assistant.models import KnowledgeSource
+
+    queryset = (
+        KnowledgeSource.objects.filter(is_active=True)
+        .defer('embedding')
+        .annotate(distance=CosineDistance('embedding', embedding))
+        .filter(distance__lte=(1 - threshold))  # cosine distance = 1 - similarity
+        .order_by('distance')[:top_k]
+    )
+    if connection.vendor != 'postgresql':
+        return list(queryset)
+    with transaction.atomic():
+        _set_ann_params(ef_search)
+        return list(queryset)
+
+
+def _lexical_search(embedding, text, limit):
+    """Active rows matching the question in full text, by ts_rank_cd."""
+    from pgvector.django import CosineDistance
+    from ai_assistant.models import KnowledgeSource
+
+    return list(
+        KnowledgeSource.objects.filter(is_active=True)
+        .filter(RawSQL(f'{_TSVECTOR_SQL} @@ {_TSQUERY_SQL}', [text], output_field=BooleanField()))
+        .defer('embedding')
+        .annotate(
+            rank=RawSQL(f'ts_rank_cd({_TSVECTOR_SQL}, {_TSQUERY_SQL})', [text], output_field=FloatField()),
+            distance=CosineDistance('embedding', embedding),
+        )
+        .order_by('-rank', 'pk')[:limit]
+    )
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Merge ranked lists of model instances: score = Σ 1 / (k + rank).
+
+    Ties keep the order of first appearance. Each returned instance gets
+    an rrf_score attribute.
+    """
+    scores = {}
+    items = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item.pk] = scores.get(item.pk, 0.0) + 1.0 / (k + rank)
+            items.setdefault(item.pk, item)
+    merged = sorted(items.values(), key=lambda item: -scores[item.pk])
+    for item in merged:
+        item.rrf_score = scores[item.pk]
+    return merged
+
+
+def _hybrid_search(embedding, text, top_k, threshold):
+    candidates = max(top_k, getattr(settings, 'RAG_HYBRID_CANDIDATES', 20))
+    vector_docs = _vector_search(embedding, candidates, threshold)
+    lexical_docs = _lexical_search(embedding, text, candidates) if text else []
+    merged = reciprocal_rank_fusion(
+        [vector_docs, lexical_docs], k=getattr(settings, 'RAG_RRF_K', 60)
+    )
+    return merged[:top_k]
+
+
+def retrieve(embedding, top_k=None, threshold=None, text=None):
+    """
+    Top-k KnowledgeSource rows for a query embedding (each with .distance),
+    cached per knowledge-base version and embedding bucket.
+
+    In hybrid mode the question text feeds the full-text ranking.
+    """
+    if top_k is None:
+        top_k = settings.RAG_TOP_K
+    if threshold is None:
+        threshold = settings.RAG_SIMILARITY_THRESHOLD
+    mode = getattr(settings, 'RAG_RETRIEVAL_MODE', 'vector')
+    hybrid = mode == 'hybrid' and connection.vendor == 'postgresql'
+    if hybrid:
+        mode_key = f'hybrid:{_digest(normalize_query(text))}'
+    else:
+        mode_key = f"vector:{vector_backend()}:{getattr(settings, 'RAG_HNSW_EF_SEARCH', 40)}"
+
+    version = get_knowledge_version()
+    key = f'ai:rag:{version}:{mode_key}:{top_k}:{threshold}:{embedding_bucket(embedding)}'
+
+    docs = _results.get(key)
+    if docs is None:
+        docs = _shared_get(key)
+        if docs is not None:
+            _results.set(key, docs)
+    if docs is not None:
+        stats['retrieval_hits'] += 1
+        return list(docs)
+
+    stats['retrieval_misses'] += 1
+    if hybrid:
+        docs = _hybrid_search(embedding, text, top_k, threshold)
+    else:
+        docs = _vector_search(embedding, top_k, threshold)
+    _results.set(key, docs)
+    _shared_set(key, docs, getattr(settings, 'RAG_RETRIEVAL_CACHE_TTL', 3600))
+    return list(docs)
+
+
+def search_knowledge(text, top_k=None, threshold=None):
+    """Embed a question (cached) and retrieve matching documents (cached)."""
+    return retrieve(get_query_embedding(text), top_k=top_k, threshold=threshold, text=text)
+
+
+def clear_local_caches():
+    """Drop the in-process tiers (tests)."""
+    _embeddings.clear()
+    _results.clear()
+    for key in stats:
+        stats[key] = 0
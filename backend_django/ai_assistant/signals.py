@@ -0,0 +1,23 @@
+"""
+Signals for ai_assistant app.
+
+Any change to the knowledge base bumps its version once the transaction
+commits, which invalidates the cached retrieval results
+(ai_assistant.retrieval) in every process.
+
+The AI profile snapshots are invalidated by core.signals, which every
+service installs.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender='ai_assistant.KnowledgeSource')
+@receiver(post_delete, sender='ai_assistant.KnowledgeSource')
+def _bump_knowledge_version(sender, instance, **kwargs):
+    from ai_assistant.retrieval import bump_knowledge_version
+
+    # Bumped before commit, a concurrent request could cache results
+    # computed from the old rows under the new version
+    transaction.on_commit(bump_knowledge_version)
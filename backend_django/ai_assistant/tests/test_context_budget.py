@@ -0,0 +1,181 @@
+"""
+Tests for the per-turn context budget and the rolling session summary.
+
+A fake tokenizer (one token per word) makes budgets easy to reason about;
+the summarizer LLM is replaced by a recorder.
+"""
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ai_assistant.models import ChatMessage, ChatSession
+from ai_assistant.orchestrator import ConversationOrchestrator
+from ai_assistant.orchestrator.budget import ContextBudget, truncate_to_tokens
+from ai_assistant.orchestrator.summary import load_history, update_session_summary
+
+User = get_user_model()
+
+
+def words(text):
+    return len(text.split())
+
+
+def _doc(title, content):
+    return SimpleNamespace(source_type='FAQ', title=title, content=content)
+
+
+def _history(n):
+    return [
+        {'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'messaggio {i} ' + 'x ' * 8}
+        for i in range(n)
+    ]
+
+
+class ContextBudgetTest(SimpleTestCase):
+
+    def _budget(self, total=200, **kwargs):
+        options = dict(tokenizer=words, verbatim_turns=3, summary_tokens=20, profile_share=0.25, rag_share=0.25)
+        options.update(kwargs)
+        return ContextBudget(total_tokens=total, **options)
+
+    def test_truncate_to_tokens(self):
+        self.assertEqual(truncate_to_tokens('uno due tre', 5, words), 'uno due tre')
+        self.assertLessEqual(words(truncate_to_tokens('parola ' * 100, 10, words)), 10)
+        self.assertEqual(truncate_to_tokens('uno due', 0, words), '')
+
+    def test_everything_fits(self):
+        fitted = self._budget().fit('profilo breve', 'riepilogo', _history(5), [_doc('Orari', 'alle 7')])
+        self.assertEqual(len(fitted.conversation_history), 5)
+        self.assertIn('RIEPILOGO DELLA CONVERSAZIONE PRECEDENTE:\nriepilogo', fitted.context_text)
+        self.assertIn('[FAQ] Orari\nalle 7', fitted.context_text)
+        self.assertEqual(fitted.docs_used, 1)
+
+    def test_budget_is_enforced(self):
+        history = _history(21)
+        docs = [_doc(f'Doc {i}', 'testo ' * 40) for i in range(5)]
+        fitted = self._budget().fit('profilo ' * 500, 'riepilogo ' * 100, history, docs)
+
+        self.assertLessEqual(fitted.tokens, 200)
+        # Current message always sent, at most 3 turns before it, starting with a user turn
+        self.assertEqual(fitted.conversation_history[-1], history[-1])
+        self.assertLessEqual(len(fitted.conversation_history), 7)
+        self.assertEqual(fitted.conversation_history[0]['role'], 'user')
+        # Profile capped at its share, summary at its cap
+        profile = fitted.context_text.split('\n\nRIEPILOGO')[0]
+        self.assertLessEqual(words(profile), 50)
+        # Documents get the reserve: at least one (possibly truncated) is included
+        self.assertGreaterEqual(fitted.docs_used, 1)
+
+        total = (
+            sum(words(m['content']) + 4 for m in fitted.conversation_history)
+            + words(fitted.context_text)
+        )
+        self.assertLessEqual(total, 200)  # section headers and separators included
+        self.assertEqual(total, fitted.tokens)
+
+    def test_recent_history_wins_over_old(self):
+        history = _history(7)
+        fitted = self._budget(total=60, rag_share=0).fit('', '', history, [])
+        self.assertEqual(fitted.conversation_history[-1], history[-1])
+        self.assertNotIn(history[0], fitted.conversation_history)
+
+
+@override_settings(AI_HISTORY_VERBATIM_TURNS=2)
+class SessionSummaryTest(TestCase):
+
+    def setUp(self):
+        self.session = ChatSession.objects.create(user_email='rdl@example.com', metadata={'incident_id': 7})
+        self.calls = []
+
+    def _add(self, n):
+        start = self.session.messages.count()
+        for i in range(start, start + n):
+            ChatMessage.objects.create(
+                session=self.session, role='user' if i % 2 == 0 else 'assistant', content=f'm{i}'
+            )
+
+    def _summarizer(self, previous, messages):
+        self.calls.append((previous, [m['content'] for m in messages]))
+        return (previous + ' ' if previous else '') + '+'.join(m['content'] for m in messages)
+
+    def test_incremental_summary(self):
+        self._add(10)
+        update_session_summary(self.session.id, summarizer=self._summarizer)
+        self.assertEqual(self.calls, [('', ['m0', 'm1', 'm2', 'm3', 'm4', 'm5'])])
+
+        self.session.refresh_from_db()
+        summary, messages, covered = load_history(self.session)
+        self.assertEqual(summary, 'm0+m1+m2+m3+m4+m5')
+        self.assertEqual([m['content'] for m in messages], ['m6', 'm7', 'm8', 'm9'])
+        self.assertEqual(covered, 6)
+        self.assertEqual(self.session.metadata['incident_id'], 7)
+
+        # Nothing new scrolled out of the window: no LLM call
+        update_session_summary(self.session.id, summarizer=self._summarizer)
+        self.assertEqual(len(self.calls), 1)
+
+        self._add(2)
+        update_session_summary(self.session.id, summarizer=self._summarizer)
+        self.assertEqual(self.calls[-1], ('m0+m1+m2+m3+m4+m5', ['m6', 'm7']))
+
+
+@override_settings(AI_HISTORY_VERBATIM_TURNS=2, AI_SUMMARY_BATCH_MESSAGES=4, BACKGROUND_TASKS_EAGER=True)
+class PrepareTurnTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='rdl@example.com', password='x')
+        self.session = ChatSession.objects.create(user_email=self.user.email)
+        for i in range(11):
+            self._add(i)
+        for target, kwargs in [
+            ('ai_assistant.orchestrator.orchestrator.build_user_profile_context', {'return_value': ('PROFILO', [])}),
+            ('ai_assistant.retrieval.search_knowledge', {'return_value': []}),
+            ('ai_assistant.vertex_service.vertex_ai_service.complete', {'return_value': 'RIEPILOGO m0-m6'}),
+        ]:
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.request = SimpleNamespace(user=self.user, META={})
+
+    def _add(self, i):
+        return ChatMessage.objects.create(
+            session=self.session, role='user' if i % 2 == 0 else 'assistant', content=f'm{i}'
+        )
+
+    def test_long_session_is_summarized(self):
+        turn = ConversationOrchestrator()._prepare_turn(self.request, self.session, 'm10')
+
+        # Window (4) + one batch (4) of uncovered messages, starting with a user turn
+        self.assertEqual(
+            [m['content'] for m in turn['conversation_history']],
+            ['m2', 'm3', 'm4', 'm5', 'm6', 'm7', 'm8', 'm9', 'm10'],
+        )
+        self.assertEqual(turn['message_count'], 11)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.metadata['summary']['text'], 'RIEPILOGO m0-m6')
+
+        turn = ConversationOrchestrator()._prepare_turn(self.request, self.session, 'm10')
+        self.assertIn('RIEPILOGO m0-m6', turn['context_text'])
+        self.assertEqual([m['content'] for m in turn['conversation_history']], ['m8', 'm9', 'm10'])
+        self.assertEqual(turn['message_count'], 11)
+
+    def test_consecutive_turns_summarize_once_per_batch(self):
+        self.session.metadata = {'summary': {
+            'text': 'RIEPILOGO m0-m6',
+            'upto_id': self.session.messages.get(content='m6').id,
+            'messages': 7,
+        }}
+        self.session.save()
+
+        with mock.patch(
+            'ai_assistant.orchestrator.orchestrator.update_session_summary', wraps=update_session_summary,
+        ) as update:
+            for i in range(11, 17, 2):
+                self._add(i)  # answer to the previous turn
+                self._add(i + 1)  # the user message is saved before the turn
+                self.session.refresh_from_db()  # each request loads the session
+                ConversationOrchestrator()._prepare_turn(self.request, self.session, f'm{i + 1}')
+        self.assertEqual(update.call_count, 1)
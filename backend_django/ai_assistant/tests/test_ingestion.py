@@ -0,0 +1,173 @@
+"""
+Tests for incremental knowledge-base ingestion.
+
+generate_embeddings_batch is replaced by a recorder: the tests check how
+many requests (and texts) reach the provider.
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ai_assistant import ingestion
+from ai_assistant.ingestion import SourceDocument, sync_documents
+from ai_assistant.models import KnowledgeSource
+from core.testing import LOCMEM_CACHE
+from resources.knowledge import sync_faqs
+from resources.models import FAQ
+
+
+def _fake_embedding(text):
+    seed = sum(ord(c) for c in text)
+    return [((seed * (i + 1)) % 97) / 97 + 0.01 for i in range(768)]
+
+
+@override_settings(CACHES=LOCMEM_CACHE, RAG_EMBEDDING_BATCH_SIZE=10, RAG_EMBEDDING_MAX_WORKERS=3)
+class IngestionTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.requests = []
+
+        def embed(texts):
+            self.requests.append(list(texts))
+            return [_fake_embedding(t) for t in texts]
+
+        patcher = mock.patch(
+            'ai_assistant.vertex_service.vertex_ai_service.generate_embeddings_batch',
+            side_effect=embed,
+        )
+        self.embed = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _docs(self, n=25, edit=None):
+        return [
+            SourceDocument(
+                source_key=f'faq:{i}', title=f'FAQ {i}', source_type='FAQ',
+                chunks=[f'Risposta {i}' + (' (modificata)' if i == edit else '')],
+            )
+            for i in range(n)
+        ]
+
+    def test_initial_sync_is_batched(self):
+        stats = sync_documents(self._docs(25))
+        self.assertEqual(stats['created'], 25)
+        self.assertEqual(len(self.requests), 3)  # 10 + 10 + 5
+        self.assertEqual(sum(len(r) for r in self.requests), 25)
+        self.assertEqual(KnowledgeSource.objects.exclude(content_hash='').count(), 25)
+
+    def test_resync_embeds_only_changed_chunks(self):
+        sync_documents(self._docs(25))
+        self.requests.clear()
+
+        stats = sync_documents(self._docs(25))
+        self.assertEqual(self.requests, [])
+        self.assertEqual(stats['unchanged'], 25)
+
+        stats = sync_documents(self._docs(25, edit=7))
+        self.assertEqual(self.requests, [['Risposta 7 (modificata)']])
+        self.assertEqual((stats['updated'], stats['unchanged']), (1, 24))
+        row = KnowledgeSource.objects.get(source_key='faq:7')
+        self.assertEqual(row.content, 'Risposta 7 (modificata)')
+        self.assertAlmostEqual(row.embedding[0], _fake_embedding('Risposta 7 (modificata)')[0], places=5)
+
+    def test_metadata_change_does_not_embed(self):
+        sync_documents(self._docs(1))
+        self.requests.clear()
+        doc = self._docs(1)[0]._replace(title='FAQ rinominata', is_active=False)
+        stats = sync_documents([doc])
+        self.assertEqual((stats['updated'], stats['embedded']), (1, 0))
+        row = KnowledgeSource.objects.get(source_key='faq:0')
+        self.assertEqual((row.title, row.is_active), ('FAQ rinominata', False))
+
+    def test_shrinking_document_removes_extra_chunks(self):
+        doc = SourceDocument('file:MANUAL:Manuale', 'Manuale', 'MANUAL', ['uno', 'due', 'tre'])
+        sync_documents([doc])
+        self.requests.clear()
+
+        stats = sync_documents([doc._replace(chunks=['uno', 'due'])])
+        self.assertEqual(self.requests, [])
+        self.assertEqual(stats['deleted'], 1)
+        self.assertEqual(
+            list(KnowledgeSource.objects.order_by('chunk_index').values_list('title', flat=True)),
+            ['Manuale (1/2)', 'Manuale (2/2)'],
+        )
+
+    def test_legacy_rows_are_adopted(self):
+        legacy = KnowledgeSource.objects.create(
+            title='FAQ 0', source_type='FAQ', content='Risposta 0', embedding=_fake_embedding('Risposta 0'),
+        )
+        doc = self._docs(1)[0]._replace(legacy_titles=('FAQ 0',))
+        stats = sync_documents([doc])
+        self.assertEqual(self.requests, [])  # embedding reused
+        self.assertEqual((stats['created'], stats['deleted']), (1, 1))
+        self.assertFalse(KnowledgeSource.objects.filter(pk=legacy.pk).exists())
+        self.assertEqual(KnowledgeSource.objects.get().source_key, 'faq:0')
+
+    def test_knowledge_version_bumped_on_commit(self):
+        from ai_assistant.retrieval import get_knowledge_version
+
+        version = get_knowledge_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            sync_documents(self._docs(2))
+        # Not before commit: a concurrent search would re-cache the old rows
+        self.assertEqual(get_knowledge_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_knowledge_version(), version)
+
+    @mock.patch('ai_assistant.ingestion.time.sleep')
+    def test_transient_failures_are_retried(self, sleep):
+        calls = {'n': 0}
+        original = self.embed.side_effect
+
+        def flaky(texts):
+            calls['n'] += 1
+            if calls['n'] <= 2:
+                raise ConnectionError('503')
+            return original(texts)
+
+        self.embed.side_effect = flaky
+        stats = sync_documents(self._docs(3))
+        self.assertEqual(stats['created'], 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @override_settings(RAG_EMBEDDING_MAX_RETRIES=1)
+    @mock.patch('ai_assistant.ingestion.time.sleep')
+    def test_failed_batch_leaves_rows_untouched(self, sleep):
+        sync_documents(self._docs(2))
+        self.embed.side_effect = ConnectionError('quota')
+        stats = sync_documents(self._docs(2, edit=1))
+        self.assertEqual((stats['failed'], stats['unchanged']), (1, 1))
+        self.assertEqual(KnowledgeSource.objects.get(source_key='faq:1').content, 'Risposta 1')
+
+    def test_batches_respect_char_budget(self):
+        batches = ingestion.make_batches(['a' * 40, 'b' * 40, 'c' * 10], batch_size=10, max_chars=60)
+        self.assertEqual(batches, [[0], [1, 2]])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, BACKGROUND_TASKS_EAGER=True)
+class FAQIngestionSignalTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch(
+            'ai_assistant.vertex_service.vertex_ai_service.generate_embeddings_batch',
+            side_effect=lambda texts: [_fake_embedding(t) for t in texts],
+        )
+        self.embed = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_faq_edit_costs_one_embedding_call(self):
+        faqs = [FAQ.objects.create(domanda=f'Domanda {i}?', risposta='Sì.') for i in range(5)]
+        self.assertEqual(KnowledgeSource.objects.filter(source_type='FAQ').count(), 5)
+
+        self.embed.reset_mock()
+        faqs[2].risposta = 'No.'
+        faqs[2].save()
+        sync_faqs(FAQ.objects.all())  # full re-sync afterwards: nothing left to embed
+        self.assertEqual(self.embed.call_count, 1)
+        self.assertIn('RISPOSTA: No.', KnowledgeSource.objects.get(source_key=f'faq:{faqs[2].pk}').content)
+
+        faqs[0].delete()
+        self.assertEqual(KnowledgeSource.objects.filter(source_type='FAQ').count(), 4)
@@ -0,0 +1,151 @@
+"""
+Tests for the cached user profile snapshot and its invalidation.
+
+Query counts show the cache hit, the targeted invalidation on scrutinio
+and designation changes, and that the scrutinio context costs the same
+number of queries however many sections a user has.
+"""
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ai_assistant.orchestrator.context import build_user_profile_context
+from core.models import User
+from core.testing import LOCMEM_CACHE
+from data.models import DatiScheda, DatiSezione
+from delegations.models import Delegato, DesignazioneRDL, ProcessoDesignazione
+from elections.models import ConsultazioneElettorale, SchedaElettorale, TipoElezione
+from territory.models import Comune, Provincia, Regione, SezioneElettorale
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProfileContextCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='rdl@example.com', password='x')
+        cls.other = User.objects.create_user(email='altro@example.com', password='x')
+        cls.consultazione = ConsultazioneElettorale.objects.create(
+            nome='Referendum 2026', data_inizio=date(2026, 6, 8), data_fine=date(2026, 6, 9), is_attiva=True,
+        )
+        tipo = TipoElezione.objects.create(consultazione=cls.consultazione, tipo=TipoElezione.Tipo.REFERENDUM)
+        cls.scheda = SchedaElettorale.objects.create(tipo_elezione=tipo, nome='Quesito 1', colore='giallo', ordine=1)
+
+        regione = Regione.objects.create(codice_istat='12', nome='Lazio')
+        provincia = Provincia.objects.create(codice_istat='058', sigla='RM', nome='Roma', regione=regione)
+        cls.comune = Comune.objects.create(codice_istat='058091', nome='Roma', provincia=provincia)
+
+        delegato = Delegato.objects.create(
+            consultazione=cls.consultazione, cognome='Rossi', nome='Mario',
+            carica=Delegato.Carica.DEPUTATO, email='delegato@example.com',
+        )
+        cls.processo = ProcessoDesignazione.objects.create(consultazione=cls.consultazione, delegato=delegato)
+        cls.delegato = delegato
+        cls.sezioni = [cls._designate(i + 1, cls.user.email) for i in range(2)]
+        cls._designate(99, cls.other.email)
+
+    @classmethod
+    def _designate(cls, numero, email):
+        sezione = SezioneElettorale.objects.create(numero=numero, comune=cls.comune, indirizzo=f'Via {numero}')
+        DesignazioneRDL.objects.create(
+            processo=cls.processo, delegato=cls.delegato, sezione=sezione, effettivo_email=email,
+        )
+        dati = DatiSezione.objects.create(sezione=sezione, consultazione=cls.consultazione, elettori_maschi=400)
+        DatiScheda.objects.create(dati_sezione=dati, scheda=cls.scheda, schede_ricevute=500)
+        return sezione
+
+    def setUp(self):
+        cache.clear()
+
+    def _profile(self, user=None):
+        return build_user_profile_context(user or self.user, SimpleNamespace(metadata={}))
+
+    def test_second_turn_hits_the_cache(self):
+        text, sections = self._profile()
+        self.assertIn('Sez.1: elettori M=400/F=?', text)
+        self.assertIn('Quesito 1: ric=500', text)
+        self.assertEqual([s['numero'] for s in sections], [1, 2])
+
+        with self.assertNumQueries(1):  # active consultazione only
+            cached_text, cached_sections = self._profile()
+        self.assertEqual(cached_sections, sections)
+        self.assertEqual(cached_text.split('\n')[1:], text.split('\n')[1:])
+
+    def _uncached_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self._profile()
+        return len(queries)
+
+    def test_scrutinio_queries_do_not_grow_with_sections(self):
+        two_sections = self._uncached_queries()
+        self._designate(3, self.user.email)
+        self._designate(4, self.user.email)
+        self.assertEqual(len(self._profile()[1]), 2)  # invalidation waits for the commit
+        self.assertEqual(self._uncached_queries(), two_sections)
+        self.assertEqual(len(self._profile()[1]), 4)
+
+    def test_scrutinio_save_invalidates_only_the_section_rdl(self):
+        self._profile()
+        self._profile(self.other)
+
+        dati = DatiScheda.objects.get(dati_sezione__sezione=self.sezioni[0])
+        dati.schede_ricevute = 510
+        with self.captureOnCommitCallbacks(execute=True):
+            dati.save()
+
+        text, _ = self._profile()
+        self.assertIn('Quesito 1: ric=510', text)
+        with self.assertNumQueries(1):
+            self._profile(self.other)
+
+    def test_dati_sezione_save_invalidates(self):
+        self._profile()
+        dati = DatiSezione.objects.get(sezione=self.sezioni[1])
+        dati.votanti_maschi = 120
+        with self.captureOnCommitCallbacks(execute=True):
+            dati.save()
+        self.assertIn('Sez.2: elettori M=400/F=?, votanti M=120/F=?', self._profile()[0])
+
+    def test_revoked_designation_invalidates(self):
+        self.assertEqual(len(self._profile()[1]), 2)
+        designazione = DesignazioneRDL.objects.get(sezione=self.sezioni[1])
+        designazione.is_attiva = False
+        with self.captureOnCommitCallbacks(execute=True):
+            designazione.save()
+        self.assertEqual([s['numero'] for s in self._profile()[1]], [1])
+
+    def test_processo_conferma_invalidates_replaced_rdl(self):
+        from rest_framework.test import APIClient
+
+        self.assertEqual(len(self._profile()[1]), 2)
+        DesignazioneRDL.objects.filter(processo=self.processo).update(stato='CONFERMATA')
+        admin = User.objects.create_superuser(email='admin@example.com', password='x')
+        nuovo = ProcessoDesignazione.objects.create(
+            consultazione=self.consultazione, delegato=self.delegato, stato='GENERATO',
+            created_by_email=admin.email,
+        )
+        DesignazioneRDL.objects.create(
+            processo=nuovo, delegato=self.delegato, sezione=self.sezioni[1], effettivo_email=self.other.email,
+        )
+
+        # conferma revokes the old designazione with a queryset update (no signals)
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/deleghe/processi/{nuovo.id}/conferma/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s['numero'] for s in self._profile()[1]], [1])
+
+    def test_snapshot_expires_at_midnight(self):
+        from ai_assistant.orchestrator.context import get_profile_snapshot
+
+        self._profile()
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = get_profile_snapshot(self.user, self.consultazione, datetime(2099, 1, 1, 8, 0))
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(snapshot['date'], '2099-01-01')
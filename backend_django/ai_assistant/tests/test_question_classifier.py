@@ -0,0 +1,152 @@
+"""
+Tests for the local serious/trivial/off-topic classifier and its use in
+VertexAIService (the LLM is only called for low-confidence questions).
+"""
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ai_assistant import question_classifier, retrieval
+from ai_assistant.management.commands.evaluate_question_classifier import labelled_examples
+from ai_assistant.models import KnowledgeSource
+from ai_assistant.question_classifier import OFF_TOPIC, SERIOUS, TRIVIAL, classify_question
+from ai_assistant.vertex_service import VertexAIService
+from core.testing import LOCMEM_CACHE
+
+
+def _axis(i, dim=768):
+    v = np.zeros(dim)
+    v[i] = 1.0
+    return v
+
+
+class KeywordClassifierTest(SimpleTestCase):
+
+    def test_keywords(self):
+        cases = [
+            ('ciao', TRIVIAL),
+            ('Buongiorno, grazie!', TRIVIAL),
+            ('test 123', TRIVIAL),
+            ('Come si fa lo scrutinio?', SERIOUS),
+            ("A che ora apre il seggio?", SERIOUS),
+            ('Chi vince la partita di calcio?', OFF_TOPIC),
+            ('Ricetta della frittata', OFF_TOPIC),
+        ]
+        for text, label in cases:
+            with self.subTest(text=text):
+                verdict = classify_question(text)
+                self.assertEqual(verdict.label, label)
+                self.assertTrue(verdict.decided)
+
+    def test_no_signal_is_undecided(self):
+        verdict = classify_question('Sei già operativa?')
+        self.assertFalse(verdict.decided)
+        # Mixed signals too: a film of the seggio is not obviously off-topic
+        self.assertFalse(classify_question('posso fare un film del seggio').decided)
+
+    def test_labelled_conversations(self):
+        results = [(label, classify_question(text)) for _, _, text, label in labelled_examples()]
+        decided = [(label, v) for label, v in results if v.decided]
+        self.assertGreaterEqual(len(decided) / len(results), 0.8)
+        self.assertEqual([(label, v.label) for label, v in decided if v.label != label], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, AI_TRIAGE_CENTROID_SERIOUS=0.6, AI_TRIAGE_CENTROID_OFF_TOPIC=0.3)
+class CentroidClassifierTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        retrieval.clear_local_caches()
+        question_classifier.reset_centroid()
+        self.addCleanup(question_classifier.reset_centroid)
+        # Knowledge base around axes 0 and 1: centroid = (e0 + e1) / √2
+        for i, axis in enumerate([0, 1, 0, 1]):
+            KnowledgeSource.objects.create(
+                title=f'Doc {i}', content='...', source_type='FAQ', embedding=_axis(axis),
+            )
+
+    def test_centroid_similarity_decides(self):
+        serious = classify_question('Sei già operativa?', _axis(0) + _axis(1))
+        self.assertEqual((serious.label, serious.reason, serious.decided), (SERIOUS, 'centroid', True))
+
+        off_topic = classify_question('Sei già operativa?', _axis(5))
+        self.assertEqual((off_topic.label, off_topic.decided), (OFF_TOPIC, True))
+
+        # cos = 0.5: between the thresholds
+        uncertain = classify_question('Sei già operativa?', _axis(0) + _axis(5) * 0.73)
+        self.assertFalse(uncertain.decided)
+
+    def test_centroid_follows_knowledge_version(self):
+        self.assertAlmostEqual(question_classifier.centroid_similarity(_axis(0)), 2 ** -0.5)
+        KnowledgeSource.objects.filter(embedding__isnull=False).update(is_active=False)
+        retrieval.bump_knowledge_version()
+        self.assertIsNone(question_classifier.centroid_similarity(_axis(0)))
+
+
+class VertexTriageTest(SimpleTestCase):
+
+    def setUp(self):
+        self.service = VertexAIService()
+        self.service._initialized = True
+        self.service._llm = mock.Mock()
+        self.service._llm.generate_content.return_value = mock.Mock(text='BANALE')
+
+    def test_confident_cases_skip_the_llm(self):
+        self.assertTrue(self.service.is_trivial_question('ciao'))
+        self.assertFalse(self.service.is_trivial_question('Come si compila il verbale?'))
+        self.assertEqual(self.service.clarify_off_topic_question('Che tempo fa? meteo di domani'), '🤷')
+        self.service._llm.generate_content.assert_not_called()
+
+    def test_low_confidence_falls_back_to_llm(self):
+        with mock.patch('ai_assistant.retrieval.get_query_embedding', side_effect=ConnectionError):
+            self.assertTrue(self.service.is_trivial_question('Sei già operativa?'))
+        self.service._llm.generate_content.assert_called_once()
+
+    def test_query_embedding_is_used_when_keywords_are_silent(self):
+        with mock.patch('ai_assistant.retrieval.get_query_embedding', return_value=[0.1]) as embed, \
+                mock.patch.object(question_classifier, 'centroid_similarity', return_value=0.9):
+            self.assertFalse(self.service.is_trivial_question('Sei già operativa?'))
+        embed.assert_called_once_with('Sei già operativa?')
+        self.service._llm.generate_content.assert_not_called()
+
+
+class OrchestratorShrugGuardTest(SimpleTestCase):
+    """A 🤷 mid-conversation is retried only when the message may be serious."""
+
+    def _route(self, message):
+        from ai_assistant.orchestrator.orchestrator import ConversationOrchestrator
+
+        turn = {
+            'message': message, 'conversation_history': [], 'context_text': '',
+            'context_docs_list': [], 'user_sections_list': [], 'message_count': 6,
+        }
+        shrug = {'content': '🤷', 'function_call': None}
+        retry = {'content': 'Il seggio apre alle 7.', 'function_call': None}
+        with mock.patch(
+            'ai_assistant.vertex_service.vertex_ai_service.generate_with_tools', return_value=retry,
+        ) as llm, mock.patch('ai_assistant.retrieval.get_query_embedding', side_effect=ConnectionError):
+            result = ConversationOrchestrator()._route(shrug, turn, None, None, None)
+        return result['answer'], llm.call_count
+
+    def test_off_topic_skips_the_retry(self):
+        answer, calls = self._route('Chi vince il campionato di calcio?')
+        self.assertEqual(calls, 0)
+        self.assertNotIn('🤷', answer)
+
+    def test_serious_or_undecided_is_retried(self):
+        self.assertEqual(self._route('Come si compila il verbale?'), ('Il seggio apre alle 7.', 1))
+        self.assertEqual(self._route('Sei già operativa?'), ('Il seggio apre alle 7.', 1))
+
+
+class EvaluateCommandTest(SimpleTestCase):
+
+    def test_reports_precision_recall(self):
+        out = StringIO()
+        call_command('evaluate_question_classifier', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Decided locally:', output)
+        self.assertIn('not serious', output)
@@ -0,0 +1,152 @@
+"""
+Tests for Vertex AI record/replay (ai_assistant.replay) and the offline
+conversation benchmark built on it.
+
+The "real" API is a deterministic fake patched on VertexAIService; replay
+runs patch it to fail, so any call that is not served from the fixtures
+breaks the test.
+"""
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from ai_assistant.management.commands.benchmark_conversations import BENCHMARK_EMAIL, find_regressions
+from core.models import User
+from ai_assistant.replay import Cassette, ReplayMiss, request_key
+from ai_assistant.vertex_service import VertexAIService
+
+
+def fake_generate_with_tools(self, conversation_history, context=None, tools=None, attachments=None):
+    question = conversation_history[-1]['content']
+    return {
+        'content': f'Risposta {len(conversation_history)}: {question[:20]}',
+        'function_call': None,
+        'function_calls': [],
+        'finish_reason': 'STOP',
+    }
+
+
+def fake_stream(self, conversation_history, context=None, tools=None, attachments=None):
+    yield {'type': 'text', 'text': 'Il seggio '}
+    yield {'type': 'done', 'content': 'Il seggio apre', 'function_call': None,
+           'function_calls': [], 'finish_reason': 'STOP'}
+
+
+def _offline(*args, **kwargs):
+    raise AssertionError('Vertex AI called during replay')
+
+
+FAKE_API = {
+    'generate_with_tools': fake_generate_with_tools,
+    'generate_with_tools_stream': fake_stream,
+    'generate_embedding': lambda self, text: [0.0] * 767 + [1.0],
+    'complete': lambda self, prompt: 'Riepilogo',
+}
+
+
+class CassetteTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def _patch_api(self, api):
+        for name, func in api.items():
+            patcher = mock.patch.object(VertexAIService, name, func)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_record_then_replay_offline(self):
+        history = [{'role': 'user', 'content': 'A che ora apre il seggio?'}]
+        context = 'DATA E ORA: lunedi 08 giugno 2026, ore 07:10\nPROFILO UTENTE: rdl@example.com'
+
+        self._patch_api(FAKE_API)
+        service = VertexAIService()
+        with Cassette(self.directory, mode='record').installed(service) as cassette:
+            recorded = service.generate_with_tools(history, context=context)
+            streamed = list(service.generate_with_tools_stream(history, context=context))
+        self.assertEqual(cassette.stats['recorded'], 2)
+        self.assertNotIn('generate_with_tools', service.__dict__)  # uninstalled
+
+        self._patch_api({name: _offline for name in FAKE_API})
+        later = context.replace('07:10', '18:45')  # volatile: same fixture
+        with Cassette(self.directory, mode='replay').installed(service) as cassette:
+            self.assertEqual(service.generate_with_tools(history, context=later), recorded)
+            self.assertEqual(list(service.generate_with_tools_stream(history, context=later)), streamed)
+            with self.assertRaises(ReplayMiss):
+                service.generate_with_tools(history, context='PROFILO UTENTE: altro@example.com')
+        self.assertEqual(cassette.stats, {'replayed': 2, 'recorded': 0, 'misses': 1})
+
+        entry_files = os.listdir(os.path.join(self.directory, 'generate_with_tools'))
+        self.assertEqual(entry_files, [f"{request_key('generate_with_tools', (history,), {'context': later})}.json"])
+
+    def test_auto_mode_records_only_missing(self):
+        calls = []
+        self._patch_api({'complete': lambda self, prompt: calls.append(prompt) or prompt.upper()})
+        service = VertexAIService()
+        with Cassette(self.directory, mode='auto').installed(service):
+            self.assertEqual(service.complete('uno'), 'UNO')
+            self.assertEqual(service.complete('uno'), 'UNO')
+            self.assertEqual(service.complete('due'), 'DUE')
+        self.assertEqual(calls, ['uno', 'due'])
+
+
+class RegressionCheckTest(SimpleTestCase):
+
+    def test_find_regressions(self):
+        baseline = {'stages': {'context': {'p50': 10.0, 'p95': 20.0}, 'model': {'p50': 1.0, 'p95': 1.0}}}
+        report = {'stages': {'context': {'p50': 11.0, 'p95': 30.0}, 'model': {'p50': 2.5, 'p95': 2.5}}}
+        # context p95 +50%; model +150% but only 1.5ms (noise)
+        self.assertEqual(find_regressions(report, baseline, 0.25, 2.0), [('context', 'p95', 20.0, 30.0)])
+
+
+class BenchmarkConversationsTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def _run(self, mode, api):
+        output = os.path.join(self.directory, f'{mode}.json')
+        with mock.patch.multiple(VertexAIService, **api):
+            call_command(
+                'benchmark_conversations', mode=mode, fixtures=self.directory, workers=1,
+                id=[14, 19], output=output, stdout=StringIO(),
+            )
+        with open(output) as f:
+            return json.load(f)
+
+    def test_replay_matches_recording(self):
+        recorded = self._run('record', FAKE_API)
+        self.assertGreater(recorded['fixtures']['recorded'], 0)
+
+        replayed = self._run('replay', {name: _offline for name in FAKE_API})
+        self.assertEqual(replayed['fixtures']['misses'], 0)
+        self.assertEqual(replayed['answers'], recorded['answers'])
+        self.assertEqual(replayed['turns'], 7)  # 6 user messages in session 14, 1 in 19
+        self.assertEqual(
+            set(replayed['stages']),
+            {'context', 'retrieval', 'model', 'tool_dispatch', 'db_writes', 'other', 'total'},
+        )
+        self.assertGreater(replayed['stages']['db_writes']['p50'], 0)
+        self.assertFalse(User.objects.filter(email=BENCHMARK_EMAIL).exists())
+
+    def test_committed_fixtures_replay(self):
+        output = os.path.join(self.directory, 'report.json')
+        with mock.patch.multiple(VertexAIService, **{name: _offline for name in FAKE_API}):
+            call_command('benchmark_conversations', workers=1, id=[19], output=output, stdout=StringIO())
+        with open(output) as f:
+            report = json.load(f)
+        self.assertEqual((report['turns'], report['fixtures']['misses']), (1, 0))
+        self.assertGreater(report['fixtures']['replayed'], 0)
+
+    def test_existing_user_is_kept(self):
+        user = User.objects.create_user(email=BENCHMARK_EMAIL, password='x')
+        self._run('record', FAKE_API)
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
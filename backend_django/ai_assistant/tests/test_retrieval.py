@@ -0,0 +1,125 @@
+"""
+Tests for the query-embedding and retrieval caches.
+
+The embedding API and the pgvector scan are replaced by counters: the
+tests check how many times they are reached, not their results.
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ai_assistant import retrieval
+from ai_assistant.models import KnowledgeSource
+from core.testing import LOCMEM_CACHE
+
+
+def _fake_embedding(text):
+    # Deterministic, depends on the raw text (like the real API)
+    seed = sum(ord(c) for c in text.lower().strip(' ?'))
+    return [((seed * (i + 1)) % 97) / 97 for i in range(8)]
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RetrievalCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        retrieval.clear_local_caches()
+        self.doc = KnowledgeSource.objects.create(
+            title='Fotografare la scheda', source_type='FAQ', content='No.'
+        )
+        self.doc.distance = 0.1
+
+        embed = mock.patch(
+            'ai_assistant.vertex_service.vertex_ai_service.generate_embedding',
+            side_effect=_fake_embedding,
+        )
+        search = mock.patch(
+            'ai_assistant.retrieval._vector_search',
+            side_effect=lambda embedding, top_k, threshold: [self.doc],
+        )
+        self.embed = embed.start()
+        self.search = search.start()
+        self.addCleanup(embed.stop)
+        self.addCleanup(search.stop)
+
+    def test_normalize_query(self):
+        self.assertEqual(
+            retrieval.normalize_query('  Posso   fotografare la SCHEDA?? '),
+            'posso fotografare la scheda',
+        )
+
+    def test_repeated_question_skips_embedding_and_scan(self):
+        for question in ['Posso fotografare la scheda?', 'posso fotografare la scheda', 'POSSO FOTOGRAFARE LA SCHEDA ?']:
+            docs = retrieval.search_knowledge(question)
+            self.assertEqual([d.pk for d in docs], [self.doc.pk])
+        self.assertEqual(self.embed.call_count, 1)
+        self.assertEqual(self.search.call_count, 1)
+
+    def test_shared_tier_survives_local_eviction(self):
+        retrieval.search_knowledge('A che ora apre il seggio?')
+        # Another worker process: empty local tiers, same shared cache
+        retrieval.clear_local_caches()
+        retrieval.search_knowledge('a che ora apre il seggio')
+        self.assertEqual(self.embed.call_count, 1)
+        self.assertEqual(self.search.call_count, 1)
+        self.assertEqual(retrieval.stats['embedding_hits'], 1)
+        self.assertEqual(retrieval.stats['retrieval_hits'], 1)
+
+    def test_knowledge_source_change_invalidates_results(self):
+        retrieval.search_knowledge('A che ora apre il seggio?')
+        version = retrieval.get_knowledge_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            KnowledgeSource.objects.create(title='Orari', source_type='FAQ', content='Alle 7.')
+            self.assertEqual(retrieval.get_knowledge_version(), version)  # not before commit
+        self.assertNotEqual(retrieval.get_knowledge_version(), version)
+
+        retrieval.search_knowledge('A che ora apre il seggio?')
+        self.assertEqual(self.embed.call_count, 1)  # embedding still cached
+        self.assertEqual(self.search.call_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doc.delete()
+        retrieval.search_knowledge('A che ora apre il seggio?')
+        self.assertEqual(self.search.call_count, 3)
+
+    def test_different_settings_use_different_entries(self):
+        retrieval.search_knowledge('seggio', top_k=3)
+        retrieval.search_knowledge('seggio', top_k=5)
+        self.assertEqual(self.search.call_count, 2)
+
+
+class ReciprocalRankFusionTest(TestCase):
+
+    def test_fusion_order(self):
+        a, b, c, d = (KnowledgeSource(pk=i) for i in range(1, 5))
+        # b is 2nd in both rankings: beats a (1st in one only)
+        merged = retrieval.reciprocal_rank_fusion([[a, b, c], [d, b]], k=60)
+        self.assertEqual([x.pk for x in merged], [2, 1, 4, 3])
+        self.assertAlmostEqual(merged[0].rrf_score, 2 / 62)
+
+    @override_settings(CACHES=LOCMEM_CACHE, RAG_RETRIEVAL_MODE='hybrid')
+    def test_hybrid_falls_back_to_vector_without_postgres(self):
+        retrieval.clear_local_caches()
+        with mock.patch('ai_assistant.retrieval._vector_search', return_value=[]) as search, \
+                mock.patch('ai_assistant.retrieval._lexical_search') as lexical:
+            retrieval.retrieve([0.1] * 8, text='verbale di scrutinio')
+        self.assertEqual(search.call_count, 1)
+        self.assertFalse(lexical.called)
+
+
+class LocalLRUTest(TestCase):
+
+    def test_eviction_and_ttl(self):
+        lru = retrieval.LocalLRU(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+        expired = retrieval.LocalLRU(maxsize=2, ttl=0)
+        expired.set('a', 1)
+        self.assertIsNone(expired.get('a'))
@@ -0,0 +1,193 @@
+"""
+Tests for streamed chat answers (SSE endpoint, orchestrator, Vertex stream).
+
+A fake streaming LLM replaces generate_with_tools_stream: it yields its
+tokens with a fixed delay, so time-to-first-token can be measured against
+the full generation time.
+"""
+import json
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ai_assistant.models import ChatMessage, ChatSession
+from ai_assistant.vertex_service import VertexAIService
+
+User = get_user_model()
+
+
+class FakeStreamingLLM:
+    """Stand-in for vertex_ai_service.generate_with_tools_stream."""
+
+    def __init__(self, tokens, delay=0.05, function_calls=(), fail_after=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.function_calls = list(function_calls)
+        self.fail_after = fail_after
+
+    def __call__(self, conversation_history, context=None, tools=None, attachments=None):
+        for i, token in enumerate(self.tokens):
+            if self.fail_after is not None and i == self.fail_after:
+                raise ConnectionError('stream interrupted')
+            time.sleep(self.delay)
+            yield {'type': 'text', 'text': token}
+        yield {
+            'type': 'done',
+            'content': ''.join(self.tokens) or None,
+            'function_call': self.function_calls[0] if self.function_calls else None,
+            'function_calls': self.function_calls,
+            'finish_reason': 'STOP',
+        }
+
+
+def _parse_sse(chunks):
+    """[(event, data, seconds since start)] from timed SSE chunks."""
+    events = []
+    for chunk, elapsed in chunks:
+        for frame in chunk.decode().split('\n\n'):
+            if not frame.strip():
+                continue
+            lines = dict(line.split(': ', 1) for line in frame.split('\n'))
+            events.append((lines['event'], json.loads(lines['data']), elapsed))
+    return events
+
+
+class ChatStreamViewTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='rdl@example.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        for target, kwargs in [
+            ('ai_assistant.orchestrator.orchestrator.build_user_profile_context',
+             {'return_value': ('PROFILO', [])}),
+            ('ai_assistant.retrieval.search_knowledge', {'return_value': []}),
+            ('ai_assistant.views.generate_session_title', {'return_value': 'Apertura seggio'}),
+        ]:
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _stream(self, llm, message='A che ora apre il seggio?'):
+        with mock.patch(
+            'ai_assistant.vertex_service.vertex_ai_service.generate_with_tools_stream', llm
+        ):
+            start = time.perf_counter()
+            response = self.client.post('/api/ai/chat/stream/', {'message': message}, format='json')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            chunks = [(chunk, time.perf_counter() - start) for chunk in response.streaming_content]
+        return _parse_sse(chunks)
+
+    def test_tokens_stream_before_completion(self):
+        tokens = ['Il seggio ', 'apre ', 'alle ', '7', '.']
+        events = self._stream(FakeStreamingLLM(tokens, delay=0.05))
+
+        names = [name for name, _, _ in events]
+        self.assertEqual(names, ['start'] + ['token'] * 5 + ['done'])
+        self.assertEqual(''.join(data['text'] for name, data, _ in events if name == 'token'), 'Il seggio apre alle 7.')
+
+        time_to_first_token = events[1][2]
+        total = events[-1][2]
+        self.assertGreaterEqual(total, 0.25)
+        self.assertLess(time_to_first_token, total / 2)
+
+        done = events[-1][1]
+        self.assertEqual(done['message']['content'], 'Il seggio apre alle 7.')
+        self.assertEqual(done['title'], 'Apertura seggio')
+        session = ChatSession.objects.get(pk=done['session_id'])
+        self.assertEqual(
+            list(session.messages.order_by('created_at').values_list('role', 'content')),
+            [('user', 'A che ora apre il seggio?'), ('assistant', 'Il seggio apre alle 7.')],
+        )
+
+    def test_function_call_resets_streamed_text(self):
+        llm = FakeStreamingLLM(['Salvo i dati...'], delay=0, function_calls=[
+            {'name': 'save_scrutinio_data', 'args': {'sezione': 12}},
+        ])
+        agent_result = {
+            'answer': 'Dati salvati per la sezione 12.', 'sources': [], 'retrieved_docs': 0,
+            'function_result': {'message': 'ok', 'data': None}, 'user_sections_list': [],
+        }
+        with mock.patch(
+            'ai_assistant.orchestrator.orchestrator.ConversationOrchestrator._handle_function_call',
+            return_value=agent_result,
+        ) as handle:
+            events = self._stream(llm, message='Sezione 12: 120 votanti')
+
+        self.assertEqual(handle.call_args.args[0]['name'], 'save_scrutinio_data')
+        self.assertEqual([name for name, _, _ in events], ['start', 'token', 'reset', 'token', 'done'])
+        self.assertEqual(events[3][1]['text'], 'Dati salvati per la sezione 12.')
+        self.assertEqual(events[-1][1]['function_result'], {'message': 'ok', 'data': None})
+
+    def test_shrug_is_held_back(self):
+        events = self._stream(FakeStreamingLLM(['🤷'], delay=0), message='Chi vince Sanremo?')
+        self.assertEqual([name for name, _, _ in events], ['start', 'token', 'done'])
+        self.assertEqual(events[-1][1]['message']['content'], '🤷')
+
+    def test_error_mid_stream_persists_fallback(self):
+        events = self._stream(FakeStreamingLLM(['Il seggio ', 'apre'], delay=0, fail_after=1))
+        self.assertEqual([name for name, _, _ in events], ['start', 'token', 'done'])
+        done = events[-1][1]
+        self.assertEqual(done['message']['id'], 0)
+        self.assertTrue(ChatMessage.objects.filter(
+            session_id=done['session_id'], role='assistant', content=done['message']['content'],
+        ).exists())
+
+    def test_validation_errors_are_plain_json(self):
+        response = self.client.post('/api/ai/chat/stream/', {'message': ''}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+def _chunk(text=None, function_call=None, finish_reason=0):
+    part = SimpleNamespace(text=text, function_call=function_call)
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason=finish_reason)
+    return SimpleNamespace(candidates=[candidate])
+
+
+class VertexStreamTest(TestCase):
+
+    def _service(self, generate_content):
+        service = VertexAIService()
+        service._initialized = True
+        model = SimpleNamespace(generate_content=generate_content)
+        service._build_tool_request = lambda *args: (model, [], {'tools': ['t']})
+        return service
+
+    def test_yields_text_then_summary(self):
+        fc = SimpleNamespace(name='get_scrutinio_status', args={'sezione': 3})
+        service = self._service(lambda contents, stream, tools: iter([
+            _chunk('Contro'), _chunk('llo...'), _chunk(function_call=fc, finish_reason='STOP'),
+        ]))
+        events = list(service.generate_with_tools_stream([{'role': 'user', 'content': 'stato'}]))
+        self.assertEqual([e.get('text') for e in events[:-1]], ['Contro', 'llo...'])
+        self.assertEqual(events[-1]['content'], 'Controllo...')
+        self.assertEqual(events[-1]['function_call'], {'name': 'get_scrutinio_status', 'args': {'sezione': 3}})
+        self.assertEqual(events[-1]['finish_reason'], 'STOP')
+
+    @mock.patch('time.sleep')
+    def test_retries_only_before_first_chunk(self, sleep):
+        attempts = []
+
+        def flaky(contents, stream, tools):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError('503')
+            yield _chunk('ok')
+
+        events = list(self._service(flaky).generate_with_tools_stream([]))
+        self.assertEqual(events[-1]['content'], 'ok')
+        self.assertEqual(len(attempts), 2)
+
+        def broken(contents, stream, tools):
+            yield _chunk('mezza ')
+            raise ConnectionError('reset')
+
+        stream = self._service(broken).generate_with_tools_stream([])
+        self.assertEqual(next(stream)['text'], 'mezza ')
+        with self.assertRaises(ConnectionError):
+            next(stream)
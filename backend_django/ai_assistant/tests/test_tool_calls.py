@@ -0,0 +1,110 @@
+"""
+Tests for concurrent execution of tool calls in the orchestrator.
+
+_handle_function_call is replaced by a recorder that sleeps, so the tests
+check scheduling (overlap, order, timeouts), not the agents.
+"""
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ai_assistant.orchestrator import orchestrator as orchestrator_module
+from ai_assistant.orchestrator import ConversationOrchestrator
+
+
+def _get(sezione):
+    return {'name': 'get_scrutinio_status', 'args': {'sezione': sezione}}
+
+
+def _save(sezione):
+    return {'name': 'save_scrutinio_data', 'args': {'sezione': sezione}}
+
+
+class ToolCallSchedulingTest(SimpleTestCase):
+
+    def setUp(self):
+        self.spans = []  # (name, sezione, start, end)
+        self.lock = threading.Lock()
+        self.delays = {'get_scrutinio_status': 0.2, 'save_scrutinio_data': 0.05}
+        orchestrator_module.tool_stats.clear()
+
+        def handle(orchestrator, function_call, session, request, user_sections_list):
+            start = time.monotonic()
+            time.sleep(self.delays[function_call['name']])
+            with self.lock:
+                self.spans.append((function_call['name'], function_call['args']['sezione'], start, time.monotonic()))
+            sezione = function_call['args']['sezione']
+            return {
+                'answer': f"{function_call['name']} {sezione}",
+                'sources': [],
+                'retrieved_docs': 0,
+                'function_result': {'message': 'ok', 'data': sezione},
+                'user_sections_list': user_sections_list,
+            }
+
+        patcher = mock.patch.object(ConversationOrchestrator, '_handle_function_call', autospec=True, side_effect=handle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, calls):
+        return ConversationOrchestrator()._handle_multiple_function_calls(
+            calls, session=None, request=SimpleNamespace(user=None, META={}), user_sections_list=[],
+        )
+
+    def test_read_only_calls_overlap(self):
+        result = self._run([_get(1), _get(2), _get(3)])
+
+        # Every read started before any of them finished
+        self.assertLess(max(start for _, _, start, _ in self.spans), min(end for _, _, _, end in self.spans))
+        self.assertEqual(result['answer'].split('\n\n---\n\n'), [
+            'get_scrutinio_status 1', 'get_scrutinio_status 2', 'get_scrutinio_status 3',
+        ])
+        self.assertEqual(orchestrator_module.tool_stats['get_scrutinio_status']['calls'], 3)
+
+    def test_mutations_are_serialized_in_order(self):
+        self._run([_get(1), _get(2), _save(1), _save(2), _get(3)])
+        span = {(name, sezione): (start, end) for name, sezione, start, end in self.spans}
+
+        # Saves wait for the reads before them and run one at a time, in model order
+        self.assertGreaterEqual(span[('save_scrutinio_data', 1)][0], span[('get_scrutinio_status', 2)][1])
+        self.assertGreaterEqual(span[('save_scrutinio_data', 2)][0], span[('save_scrutinio_data', 1)][1])
+        # A read after a save sees it
+        self.assertGreaterEqual(span[('get_scrutinio_status', 3)][0], span[('save_scrutinio_data', 2)][1])
+
+    @override_settings(AI_TOOL_TIMEOUT=0.05)
+    def test_slow_read_times_out(self):
+        # Timed-out workers keep running: let them finish before the next test
+        self.addCleanup(time.sleep, 0.25)
+        result = self._run([_get(1), _get(2)])
+        self.assertIn('in tempo', result['answer'])
+        self.assertEqual(
+            [r['timeout'] for r in result['function_result']['results']],
+            ['get_scrutinio_status', 'get_scrutinio_status'],
+        )
+        self.assertEqual(orchestrator_module.tool_stats['get_scrutinio_status']['timeouts'], 2)
+
+        # The abandoned workers finish without being recorded a second time
+        time.sleep(0.25)
+        self.assertEqual(orchestrator_module.tool_stats['get_scrutinio_status']['calls'], 2)
+
+    @override_settings(AI_TOOL_TIMEOUT=0.05)
+    def test_single_read_times_out(self):
+        self.addCleanup(time.sleep, 0.25)
+        turn = {
+            'message': 'Sezione 1?', 'conversation_history': [], 'context_text': '',
+            'context_docs_list': [], 'user_sections_list': [], 'message_count': 1,
+        }
+        ai_response = {'content': None, 'function_call': _get(1), 'function_calls': [_get(1)]}
+        result = ConversationOrchestrator()._route(
+            ai_response, turn, SimpleNamespace(user=None, META={}), None, None,
+        )
+        self.assertEqual(result['function_result']['timeout'], 'get_scrutinio_status')
+
+    @override_settings(AI_TOOL_TIMEOUT=0.05)
+    def test_single_save_is_not_abandoned(self):
+        self.delays['save_scrutinio_data'] = 0.1
+        result = self._run([_save(1)])
+        self.assertEqual(result['answer'], 'save_scrutinio_data 1')
@@ -0,0 +1,109 @@
+"""
+Tests for the NumPy vector index backend (retrieval without pgvector).
+"""
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ai_assistant import retrieval
+from ai_assistant.models import KnowledgeSource
+from ai_assistant.vector_index import NumpyVectorIndex, get_numpy_index, reset_numpy_index
+from core.testing import LOCMEM_CACHE
+
+
+def _unit(rng, n, dim=768):
+    m = rng.standard_normal((n, dim)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+class NumpyVectorIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.matrix = _unit(rng, 500)
+        self.index = NumpyVectorIndex(np.arange(100, 600), self.matrix)
+        self.queries = _unit(rng, 20)
+
+    def test_matches_exact_ordering(self):
+        for q in self.queries:
+            expected = np.argsort(-(self.matrix @ q), kind='stable')[:5] + 100
+            hits = self.index.search(q, top_k=5, threshold=-1.0)
+            self.assertEqual([pk for pk, _ in hits], expected.tolist())
+            distances = [d for _, d in hits]
+            self.assertEqual(distances, sorted(distances))
+
+    def test_threshold_and_batch(self):
+        q = self.matrix[7] * 3.0  # norm does not matter
+        hits = self.index.search(q, top_k=5, threshold=0.99)
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0][0], 107)
+        self.assertAlmostEqual(hits[0][1], 0.0, places=5)
+        for batched, q in zip(self.index.search_many(self.queries, 3, -1.0), self.queries):
+            single = self.index.search(q, 3, -1.0)
+            self.assertEqual([pk for pk, _ in batched], [pk for pk, _ in single])
+            for (_, a), (_, b) in zip(batched, single):
+                self.assertAlmostEqual(a, b, places=5)
+
+    def test_save_and_load_memory_mapped(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.index.save(directory, 5)
+        loaded = NumpyVectorIndex.load(directory, 5)
+        self.assertIsInstance(loaded.matrix, np.memmap)
+        self.assertEqual(loaded.search(self.queries[0], 3, -1.0), self.index.search(self.queries[0], 3, -1.0))
+        self.assertIsNone(NumpyVectorIndex.load(directory, 6))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, RAG_VECTOR_BACKEND='numpy')
+class NumpyBackendRetrievalTest(TestCase):
+    """End-to-end retrieval on SQLite: only the embedding API is faked."""
+
+    def setUp(self):
+        cache.clear()
+        retrieval.clear_local_caches()
+        reset_numpy_index()
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir, True)
+        override = override_settings(RAG_NUMPY_INDEX_DIR=self.index_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        rng = np.random.default_rng(3)
+        self.vectors = _unit(rng, 3, dim=8)
+        self.docs = [
+            KnowledgeSource.objects.create(
+                title=title, source_type='FAQ', content=title, embedding=vector.tolist()
+            )
+            for title, vector in zip(['Scheda', 'Orari', 'Verbale'], self.vectors)
+        ]
+        KnowledgeSource.objects.create(title='Senza embedding', source_type='FAQ', content='-')
+        KnowledgeSource.objects.create(
+            title='Disattivo', source_type='FAQ', content='-', is_active=False,
+            embedding=self.vectors[0].tolist(),
+        )
+
+        patcher = mock.patch('ai_assistant.vertex_service.vertex_ai_service.generate_embedding')
+        self.embed = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_search_knowledge_without_pgvector(self):
+        self.embed.return_value = self.vectors[1].tolist()
+        docs = retrieval.search_knowledge('A che ora apre il seggio?', top_k=3, threshold=0.99)
+        self.assertEqual([d.title for d in docs], ['Orari'])
+        self.assertAlmostEqual(docs[0].distance, 0.0, places=5)
+
+    def test_index_refreshed_on_change(self):
+        index = get_numpy_index()
+        self.assertEqual(sorted(index.ids.tolist()), sorted(d.pk for d in self.docs))
+        self.assertIs(get_numpy_index(), index)
+
+        self.docs[0].is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.docs[0].save()
+        refreshed = get_numpy_index()
+        self.assertIsNot(refreshed, index)
+        self.assertNotIn(self.docs[0].pk, refreshed.ids.tolist())
@@ -2,10 +2,11 @@
 AI Assistant URL configuration.
 """
 from django.urls import path
-from .views import ChatView, ChatBranchView, ChatSessionsView, KnowledgeSourcesView
+from .views import ChatView, ChatStreamView, ChatBranchView, ChatSessionsView, KnowledgeSourcesView
 
 urlpatterns = [
     path('chat/', ChatView.as_view(), name='ai-chat'),
+    path('chat/stream/', ChatStreamView.as_view(), name='ai-chat-stream'),
     path('chat/branch/', ChatBranchView.as_view(), name='ai-chat-branch'),
     path('sessions/', ChatSessionsView.as_view(), name='ai-sessions'),
     path('knowledge/', KnowledgeSourcesView.as_view(), name='ai-knowledge'),
@@ -0,0 +1,190 @@
+"""
+In-process NumPy vector index for KnowledgeSource embeddings.
+
+Retrieval backend for deployments without pgvector (SQLite dev/test
+setups, the single-VM fallback): the active embeddings are kept as one
+L2-normalized float32 matrix, so cosine top-k is a matrix-vector product
+plus argpartition, with no database round-trip.
+
+The matrix is written to settings.RAG_NUMPY_INDEX_DIR as .npy files named
+after the knowledge-base version and loaded memory-mapped, so worker
+processes on the same machine share one copy through the page cache.
+A version bump (any KnowledgeSource save/delete, see ai_assistant.signals)
+makes the next search rebuild or reload the index.
+
+Usage:
+    index = get_numpy_index()
+    index.search(embedding, top_k=3, threshold=0.7)   # [(pk, distance), ...]
+"""
+import glob
+import logging
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Query rows per matrix product in search_many (rows × corpus float32)
+_BATCH_ROWS = 256
+
+_current = None  # (version, NumpyVectorIndex)
+_lock = threading.Lock()
+
+
+class NumpyVectorIndex:
+    """Cosine top-k over a normalized embedding matrix."""
+
+    def __init__(self, ids, matrix):
+        """
+        Args:
+            ids: int64 array of KnowledgeSource pks, one per row
+            matrix: float32 array (rows × dimensions), L2-normalized
+        """
+        self.ids = ids
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls):
+        """Build from the active KnowledgeSource rows with an embedding."""
+        from ai_assistant.models import KnowledgeSource
+
+        ids, rows = [], []
+        queryset = (
+            KnowledgeSource.objects.filter(is_active=True, embedding__isnull=False)
+            .order_by('pk').values_list('pk', 'embedding')
+        )
+        for pk, embedding in queryset.iterator(chunk_size=2000):
+            ids.append(pk)
+            rows.append(np.asarray(embedding, dtype=np.float32))
+
+        if not rows:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+
+        matrix = np.vstack(rows)
+        norms = np.linalg.norm(matrix, axis=1)
+        keep = norms > 0
+        matrix = matrix[keep] / norms[keep, None]
+        return cls(np.asarray(ids, dtype=np.int64)[keep], np.ascontiguousarray(matrix, dtype=np.float32))
+
+    @staticmethod
+    def _paths(directory, version):
+        base = os.path.join(directory, f'kb-{version}')
+        return f'{base}.ids.npy', f'{base}.matrix.npy'
+
+    def save(self, directory, version):
+        """Write the index atomically (tmp file + rename) for this version."""
+        os.makedirs(directory, exist_ok=True)
+        for path, array in zip(self._paths(directory, version), (self.ids, self.matrix)):
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, directory, version):
+        """Memory-mapped index for this version, or None if not on disk."""
+        ids_path, matrix_path = cls._paths(directory, version)
+        try:
+            return cls(np.load(ids_path), np.load(matrix_path, mmap_mode='r'))
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+    def _top_k(self, similarities, top_k, threshold):
+        n = similarities.shape[-1]
+        if top_k < n:
+            candidates = np.argpartition(similarities, n - top_k)[n - top_k:]
+        else:
+            candidates = np.arange(n)
+        order = candidates[np.argsort(-similarities[candidates], kind='stable')]
+        return [
+            (int(self.ids[i]), float(1.0 - similarities[i]))
+            for i in order
+            if similarities[i] >= threshold
+        ]
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def search(self, embedding, top_k, threshold):
+        """
+        Top-k rows by cosine similarity, similarity >= threshold.
+
+        Returns:
+            list of (pk, cosine distance), ascending distance
+        """
+        if not len(self):
+            return []
+        similarities = self.matrix @ self._normalize(embedding)
+        return self._top_k(similarities, top_k, threshold)
+
+    def search_many(self, embeddings, top_k, threshold):
+        """search() for many query embeddings, batched matrix products."""
+        if not len(self):
+            return [[] for _ in embeddings]
+        queries = self._normalize(embeddings)
+        results = []
+        for start in range(0, len(queries), _BATCH_ROWS):
+            block = queries[start:start + _BATCH_ROWS] @ self.matrix.T
+            results.extend(self._top_k(row, top_k, threshold) for row in block)
+        return results
+
+
+def _index_dir():
+    return getattr(settings, 'RAG_NUMPY_INDEX_DIR', None)
+
+
+def _remove_stale(directory, version):
+    keep = set(NumpyVectorIndex._paths(directory, version))
+    for path in glob.glob(os.path.join(directory, 'kb-*.npy')):
+        if path not in keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def get_numpy_index():
+    """NumpyVectorIndex for the current knowledge-base version."""
+    global _current
+    from ai_assistant.retrieval import get_knowledge_version
+
+    version = get_knowledge_version()
+    current = _current
+    if current is not None and current[0] == version:
+        return current[1]
+
+    with _lock:
+        if _current is not None and _current[0] == version:
+            return _current[1]
+
+        directory = _index_dir()
+        index = NumpyVectorIndex.load(directory, version) if directory else None
+        if index is None:
+            index = NumpyVectorIndex.build()
+            if directory:
+                try:
+                    index.save(directory, version)
+                    _remove_stale(directory, version)
+                    index = NumpyVectorIndex.load(directory, version) or index
+                except OSError as e:
+                    logger.warning("NumPy index not persisted to %s: %s", directory, e)
+            logger.info("NumPy vector index built: %d rows (kb version %s)", len(index), version)
+
+        _current = (version, index)
+        return index
+
+
+def reset_numpy_index():
+    """Drop the in-process index (tests)."""
+    global _current
+    with _lock:
+        _current = None
@@ -70,25 +70,33 @@ class VertexAIService:
             logger.error(f"✗ Vertex AI initialization failed: {e}", exc_info=True)
             raise
 
-    def is_trivial_question(self, question: str) -> bool:
+    def is_trivial_question(self, question: str, embedding=None) -> bool:
         """
-        Check if question is trivial/silly using minimal model call.
+        Check if question is trivial/silly.
+
+        Decided locally (ai_assistant.question_classifier) when confident:
+        keywords first, then similarity of the query embedding to the
+        knowledge base. Only low-confidence cases cost a model call.
 
         Returns True if question is: greeting, joke, nonsense, off-topic
         """
-        # Quick pattern matching for obvious cases (no API call)
-        question_lower = question.lower().strip()
+        from ai_assistant.question_classifier import SERIOUS, classify_question, stats
+
+        verdict = classify_question(question, embedding)
+        if not verdict.decided and embedding is None:
+            try:
+                from ai_assistant.retrieval import get_query_embedding
 
-        # Obvious greetings
-        greetings = ['ciao', 'salve', 'buongiorno', 'buonasera', 'hey', 'hello', 'hi']
-        if question_lower in greetings or len(question_lower) < 5:
-            return True
+                # Cached: retrieval reuses it for the same question
+                verdict = classify_question(question, get_query_embedding(question))
+            except Exception as e:
+                logger.warning(f"Query embedding for classification failed: {e}")
 
-        # Test patterns
-        test_patterns = ['test', 'prova', 'asdf', '???', '!!!']
-        if any(pattern in question_lower for pattern in test_patterns) and len(question_lower) < 15:
-            return True
+        if verdict.decided:
+            stats['local'] += 1
+            return verdict.label != SERIOUS
 
+        stats['llm'] += 1
         self._ensure_initialized()
 
         try:
@@ -110,12 +118,23 @@ Rispondi: SERIA o BANALE"""
             logger.warning(f"Classification failed, assuming serious: {e}")
             return False  # In caso di errore, tratta come seria
 
-    def clarify_off_topic_question(self, question: str) -> str:
+    def clarify_off_topic_question(self, question: str, embedding=None) -> str:
         """
         Handle questions without relevant RAG context (likely off-topic).
 
+        Questions the local classifier confidently calls trivial/off-topic
+        get the shrug without a model call.
+
         Returns a brief clarification or shrug emoji.
         """
+        from ai_assistant.question_classifier import SERIOUS, classify_question, stats
+
+        verdict = classify_question(question, embedding)
+        if verdict.decided and verdict.label != SERIOUS:
+            stats['local'] += 1
+            return "🤷"
+
+        stats['llm'] += 1
         self._ensure_initialized()
 
         try:
@@ -149,6 +168,20 @@ IMPORTANTE: Rispondi DIRETTAMENTE all'utente, NON citare queste istruzioni."""
             logger.error(f"Clarification failed: {e}", exc_info=True)
             return "Non ho capito la domanda. Puoi essere più specifico?"
 
+    def complete(self, prompt: str) -> str:
+        """
+        Single-shot generation of an internal prompt (summaries, classification),
+        without the RDL system prompt and date context of generate_response.
+        """
+        self._ensure_initialized()
+
+        try:
+            response = self._llm.generate_content(prompt)
+            return response.text
+        except Exception as e:
+            logger.error(f"Errore Gemini completion: {e}", exc_info=True)
+            raise
+
     def generate_response(self, prompt: str, context: str = None) -> str:
         """
         Generate response using Gemini 1.5 Flash.
@@ -342,6 +375,78 @@ Rispondi SOLO con JSON:
             logger.error(f"Errore incident extraction: {e}", exc_info=True)
             raise
 
+    def _build_tool_request(self, conversation_history: list, context: str = None, tools: list = None, attachments: list = None) -> tuple:
+        """
+        Build the generate_content arguments shared by generate_with_tools
+        and generate_with_tools_stream.
+
+        Returns:
+            (model, contents, kwargs)
+        """
+        from vertexai.generative_models import Content, Part, ToolConfig
+
+        contents = []
+
+        # Add conversation history FIRST (so the model sees the full conversation)
+        for msg in conversation_history[:-1]:  # All messages except the last (current user message)
+            role = "user" if msg['role'] == 'user' else "model"
+            contents.append(Content(role=role, parts=[Part.from_text(msg['content'])]))
+
+        # Build the current user message parts
+        current_parts = []
+        current_message = conversation_history[-1]['content'] if conversation_history else ""
+
+        # Add text part (with context appended)
+        if context:
+            text_content = f"""{current_message}
+
+---
+CONTESTO (dati reali dal sistema e documenti di riferimento — per date e consultazione, fidati SOLO di questi):
+{context}"""
+        else:
+            text_content = current_message
+
+        if text_content:
+            current_parts.append(Part.from_text(text_content))
+
+        # Add multimodal attachments (images, audio)
+        if attachments:
+            for att in attachments:
+                try:
+                    current_parts.append(Part.from_data(
+                        data=att['data'],
+                        mime_type=att['mime_type']
+                    ))
+                    logger.info(f"Added multimodal part: {att['mime_type']} ({len(att['data'])} bytes)")
+                except Exception as e:
+                    logger.warning(f"Failed to add attachment part ({att['mime_type']}): {e}")
+
+        if current_parts:
+            contents.append(Content(role="user", parts=current_parts))
+
+        if not tools:
+            return self._llm, contents, {}
+
+        # Configure function calling (AUTO mode)
+        tool_config = ToolConfig(
+            function_calling_config=ToolConfig.FunctionCallingConfig(
+                mode=ToolConfig.FunctionCallingConfig.Mode.AUTO,
+            )
+        )
+        return self._llm_with_tools, contents, {
+            'tools': tools,
+            'tool_config': tool_config,
+            'generation_config': {'temperature': 0.7},
+        }
+
+    @staticmethod
+    def _function_call_dict(part) -> dict:
+        fc = part.function_call
+        return {
+            'name': fc.name,
+            'args': dict(fc.args) if fc.args else {}
+        }
+
     def generate_with_tools(self, conversation_history: list, context: str = None, tools: list = None, attachments: list = None) -> dict:
         """
         Generate response with tool/function calling support and optional multimodal input.
@@ -362,71 +467,16 @@ Rispondi SOLO con JSON:
         self._ensure_initialized()
 
         try:
-            from vertexai.generative_models import Content, Part, ToolConfig
-            from datetime import datetime
-
-            contents = []
-
-            # Add conversation history FIRST (so the model sees the full conversation)
-            for msg in conversation_history[:-1]:  # All messages except the last (current user message)
-                role = "user" if msg['role'] == 'user' else "model"
-                contents.append(Content(role=role, parts=[Part.from_text(msg['content'])]))
-
-            # Build the current user message parts
-            current_parts = []
-            current_message = conversation_history[-1]['content'] if conversation_history else ""
-
-            # Add text part (with context appended)
-            if context:
-                text_content = f"""{current_message}
-
----
-CONTESTO (dati reali dal sistema e documenti di riferimento — per date e consultazione, fidati SOLO di questi):
-{context}"""
-            else:
-                text_content = current_message
-
-            if text_content:
-                current_parts.append(Part.from_text(text_content))
-
-            # Add multimodal attachments (images, audio)
-            if attachments:
-                for att in attachments:
-                    try:
-                        current_parts.append(Part.from_data(
-                            data=att['data'],
-                            mime_type=att['mime_type']
-                        ))
-                        logger.info(f"Added multimodal part: {att['mime_type']} ({len(att['data'])} bytes)")
-                    except Exception as e:
-                        logger.warning(f"Failed to add attachment part ({att['mime_type']}): {e}")
-
-            if current_parts:
-                contents.append(Content(role="user", parts=current_parts))
-
-            # Configure function calling (AUTO mode)
-            tool_config = None
-            if tools:
-                tool_config = ToolConfig(
-                    function_calling_config=ToolConfig.FunctionCallingConfig(
-                        mode=ToolConfig.FunctionCallingConfig.Mode.AUTO,
-                    )
-                )
+            model, contents, kwargs = self._build_tool_request(
+                conversation_history, context, tools, attachments
+            )
 
             # Generate with retry (max 2 attempts)
             response = None
             last_error = None
             for attempt in range(1, 3):
                 try:
-                    if tools:
-                        response = self._llm_with_tools.generate_content(
-                            contents,
-                            tools=tools,
-                            tool_config=tool_config,
-                            generation_config={'temperature': 0.7}
-                        )
-                    else:
-                        response = self._llm.generate_content(contents)
+                    response = model.generate_content(contents, **kwargs)
                     break  # Success
                 except Exception as e:
                     last_error = e
@@ -456,11 +506,7 @@ CONTESTO (dati reali dal sistema e documenti di riferimento — per date e consu
             if response.candidates and response.candidates[0].content.parts:
                 for part in response.candidates[0].content.parts:
                     if hasattr(part, 'function_call') and part.function_call:
-                        fc = part.function_call
-                        fc_dict = {
-                            'name': fc.name,
-                            'args': dict(fc.args) if fc.args else {}
-                        }
+                        fc_dict = self._function_call_dict(part)
                         result['function_calls'].append(fc_dict)
                         if result['function_call'] is None:
                             result['function_call'] = fc_dict
@@ -483,6 +529,70 @@ CONTESTO (dati reali dal sistema e documenti di riferimento — per date e consu
             )
             raise
 
+    def generate_with_tools_stream(self, conversation_history: list, context: str = None, tools: list = None, attachments: list = None):
+        """
+        Streaming variant of generate_with_tools.
+
+        Yields:
+            {'type': 'text', 'text': str} for each partial text as it arrives, then
+            {'type': 'done', 'content', 'function_call', 'function_calls', 'finish_reason'}
+            with the same fields as generate_with_tools ('content' is the full text).
+
+        A failure before the first text chunk is retried once; after that
+        it is raised to the consumer (partial text was already delivered).
+        """
+        self._ensure_initialized()
+
+        model, contents, kwargs = self._build_tool_request(
+            conversation_history, context, tools, attachments
+        )
+
+        for attempt in range(1, 3):
+            texts = []
+            result = {
+                'content': None,
+                'function_call': None,
+                'function_calls': [],
+                'finish_reason': 'UNKNOWN',
+            }
+            try:
+                for response in model.generate_content(contents, stream=True, **kwargs):
+                    if not response.candidates:
+                        continue
+                    candidate = response.candidates[0]
+                    if candidate.finish_reason:
+                        result['finish_reason'] = str(candidate.finish_reason)
+                    if not candidate.content or not candidate.content.parts:
+                        continue
+                    for part in candidate.content.parts:
+                        if hasattr(part, 'function_call') and part.function_call:
+                            fc_dict = self._function_call_dict(part)
+                            result['function_calls'].append(fc_dict)
+                            if result['function_call'] is None:
+                                result['function_call'] = fc_dict
+                        elif hasattr(part, 'text') and part.text:
+                            texts.append(part.text)
+                            yield {'type': 'text', 'text': part.text}
+                break
+            except Exception as e:
+                if texts or attempt == 2:
+                    logger.error(
+                        f"generate_with_tools_stream FAILED: {type(e).__name__}: {e} | "
+                        f"chunks_sent={len(texts)}",
+                        exc_info=True
+                    )
+                    raise
+                logger.warning(f"Vertex AI stream attempt {attempt}/2 failed: {type(e).__name__}: {e}")
+                import time
+                time.sleep(1)  # Brief pause before retry
+
+        result['content'] = ''.join(texts) or None
+        logger.info(
+            f"Streamed with tools: finish_reason={result['finish_reason']}, "
+            f"function_calls={len(result['function_calls'])}, chunks={len(texts)}"
+        )
+        yield {'type': 'done', **result}
+
 
 # Singleton instance (lazy initialization)
 vertex_ai_service = VertexAIService()
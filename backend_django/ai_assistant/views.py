@@ -4,7 +4,11 @@ Views for AI Assistant endpoints.
 Thin API layer: validates input, manages sessions/messages, delegates
 all AI logic to the ConversationOrchestrator.
 """
+import json
+
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
@@ -14,6 +18,7 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from core.permissions import CanAskToAIAssistant
 from .models import KnowledgeSource, ChatSession, ChatMessage, ChatAttachment
 from .orchestrator import ConversationOrchestrator
+from .orchestrator.summary import SUMMARY_KEY
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +73,8 @@ class ChatView(APIView):
 
     POST /api/ai/chat/
     GET /api/ai/chat/?session_id=1
+
+    See ChatStreamView for the streaming variant of POST.
     """
 
     permission_classes = [permissions.IsAuthenticated, CanAskToAIAssistant]
@@ -144,9 +151,41 @@ class ChatView(APIView):
         )
 
     def post(self, request):
+        turn, error = self._start_turn(request)
+        if error:
+            return error
+
+        # Generate AI response via orchestrator
+        try:
+            rag_result = generate_ai_response(
+                request,
+                turn["session"],
+                turn["message"],
+                attachment_data=turn["attachment_data"],
+            )
+            return Response(self._complete_turn(turn, rag_result))
+
+        except Exception as e:
+            logger.error(
+                "ChatView.post FAILED: user=%s session=%d error=%s: %s",
+                request.user.email,
+                turn["session"].id,
+                type(e).__name__,
+                e,
+                exc_info=True,
+            )
+            return Response(self._failed_turn(turn))
+
+    def _start_turn(self, request):
+        """
+        Validate the request, get or create the session and save the user message.
+
+        Returns:
+            (turn dict, None) or (None, error Response)
+        """
         # Check feature flag
         if not settings.FEATURE_FLAGS.get("AI_ASSISTANT", False):
-            return Response(
+            return None, Response(
                 {"error": "AI Assistant non abilitato"},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
@@ -156,7 +195,8 @@ class ChatView(APIView):
         context = request.data.get("context")
 
         logger.info(
-            "ChatView.post: user=%s session_id=%s context=%s message='%s'",
+            "%s.post: user=%s session_id=%s context=%s message='%s'",
+            type(self).__name__,
             request.user.email,
             session_id,
             context,
@@ -164,13 +204,13 @@ class ChatView(APIView):
         )
 
         if not message:
-            return Response(
+            return None, Response(
                 {"error": "message required"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
         if len(message) > 2000:
-            return Response(
+            return None, Response(
                 {"error": "Message too long (max 2000 characters)"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
@@ -182,12 +222,12 @@ class ChatView(APIView):
                     id=session_id, user_email=request.user.email
                 )
             except ChatSession.DoesNotExist:
-                return Response({"error": "Session not found"}, status=404)
+                return None, Response({"error": "Session not found"}, status=404)
         else:
             session = ChatSession.objects.create(
                 user_email=request.user.email, context=context
             )
-            logger.info("ChatView.post: new session=%d", session.id)
+            logger.info("%s.post: new session=%d", type(self).__name__, session.id)
 
         # Handle file attachment
         attachment_data = None
@@ -199,7 +239,7 @@ class ChatView(APIView):
                 | ChatAttachment.SUPPORTED_AUDIO_TYPES
             )
             if mime_type not in supported_types:
-                return Response(
+                return None, Response(
                     {
                         "error": (
                             f"Tipo file non supportato: {mime_type}. "
@@ -211,7 +251,7 @@ class ChatView(APIView):
                 )
             if attachment_file.size > ChatAttachment.MAX_FILE_SIZE:
                 max_mb = ChatAttachment.MAX_FILE_SIZE // (1024 * 1024)
-                return Response(
+                return None, Response(
                     {"error": f"File troppo grande (max {max_mb}MB)."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
@@ -238,104 +278,171 @@ class ChatView(APIView):
                 file_size=attachment_file.size,
             )
 
-        # Generate AI response via orchestrator
-        try:
-            rag_result = generate_ai_response(
-                request, session, message, attachment_data=attachment_data
-            )
+        user_msg_data = {
+            "id": user_message.id,
+            "role": user_message.role,
+            "content": user_message.content,
+        }
+        if saved_attachment:
+            user_msg_data["attachments"] = [
+                {
+                    "id": saved_attachment.id,
+                    "filename": saved_attachment.filename,
+                    "file_type": saved_attachment.file_type,
+                    "mime_type": saved_attachment.mime_type,
+                    "file_size": saved_attachment.file_size,
+                    "url": (
+                        saved_attachment.file.url if saved_attachment.file else None
+                    ),
+                }
+            ]
 
-            assistant_message = ChatMessage.objects.create(
-                session=session,
-                role=ChatMessage.Role.ASSISTANT,
-                content=rag_result["answer"],
-                sources_cited=[s["id"] for s in rag_result["sources"]],
-            )
+        return {
+            "session": session,
+            "message": message,
+            "attachment_data": attachment_data,
+            "user_message": user_msg_data,
+        }, None
+
+    def _complete_turn(self, turn, rag_result):
+        """Persist the assistant message and build the response payload."""
+        session = turn["session"]
+        assistant_message = ChatMessage.objects.create(
+            session=session,
+            role=ChatMessage.Role.ASSISTANT,
+            content=rag_result["answer"],
+            sources_cited=[s["id"] for s in rag_result["sources"]],
+        )
 
-            # Generate title for first message
-            if session.messages.count() == 2 and not session.title:
-                try:
-                    session.title = generate_session_title(message)
-                    session.save(update_fields=["title"])
-                except Exception as e:
-                    logger.warning("Title generation failed: %s", e)
-
-            user_msg_data = {
-                "id": user_message.id,
-                "role": user_message.role,
-                "content": user_message.content,
-            }
-            if saved_attachment:
-                user_msg_data["attachments"] = [
-                    {
-                        "id": saved_attachment.id,
-                        "filename": saved_attachment.filename,
-                        "file_type": saved_attachment.file_type,
-                        "mime_type": saved_attachment.mime_type,
-                        "file_size": saved_attachment.file_size,
-                        "url": (
-                            saved_attachment.file.url if saved_attachment.file else None
-                        ),
-                    }
-                ]
+        # Generate title for first message
+        if session.messages.count() == 2 and not session.title:
+            try:
+                session.title = generate_session_title(turn["message"])
+                session.save(update_fields=["title"])
+            except Exception as e:
+                logger.warning("Title generation failed: %s", e)
+
+        response_data = {
+            "session_id": session.id,
+            "title": session.title,
+            "user_message": turn["user_message"],
+            "message": {
+                "id": assistant_message.id,
+                "role": assistant_message.role,
+                "content": assistant_message.content,
+                "sources": rag_result["sources"],
+                "retrieved_docs": rag_result["retrieved_docs"],
+            },
+        }
+
+        # Include function_result so frontend can invalidate caches
+        if rag_result.get("function_result"):
+            response_data["function_result"] = rag_result["function_result"]
+
+        return response_data
+
+    def _failed_turn(self, turn):
+        """Persist and return the fallback answer after a generation error."""
+        session = turn["session"]
+        error_content = (
+            "Scusa, Ainaudino e un po' sovraccarico in questo momento e non riesce a rispondere. "
+            "Riprova tra qualche secondo! Se il problema persiste, prova ad aprire una nuova conversazione."
+        )
+        ChatMessage.objects.create(
+            session=session,
+            role=ChatMessage.Role.ASSISTANT,
+            content=error_content,
+            sources_cited=[],
+        )
+
+        return {
+            "session_id": session.id,
+            "title": session.title,
+            "user_message": {
+                key: turn["user_message"][key] for key in ("id", "role", "content")
+            },
+            "message": {
+                "id": 0,
+                "role": "assistant",
+                "content": error_content,
+                "sources": [],
+                "retrieved_docs": 0,
+            },
+        }
 
-            response_data = {
-                "session_id": session.id,
-                "title": session.title,
-                "user_message": user_msg_data,
-                "message": {
-                    "id": assistant_message.id,
-                    "role": assistant_message.role,
-                    "content": assistant_message.content,
-                    "sources": rag_result["sources"],
-                    "retrieved_docs": rag_result["retrieved_docs"],
-                },
-            }
 
-            # Include function_result so frontend can invalidate caches
-            if rag_result.get("function_result"):
-                response_data["function_result"] = rag_result["function_result"]
+def _sse(event, data):
+    """One Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
 
-            return Response(response_data)
+
+class ChatStreamView(ChatView):
+    """
+    Send a message and stream the answer as Server-Sent Events.
+
+    POST /api/ai/chat/stream/  (same body as POST /api/ai/chat/)
+
+    Events:
+        start  {"session_id", "user_message"}   user message saved
+        token  {"text"}                         partial answer, append it
+        reset  {}                               drop the text received so far
+        done   same payload as POST /api/ai/chat/ (assistant message saved;
+               message.content is the final answer)
+    """
+
+    http_method_names = ["post", "options"]
+
+    def post(self, request):
+        turn, error = self._start_turn(request)
+        if error:
+            return error
+
+        response = StreamingHttpResponse(
+            self._stream(request, turn), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx / GAE: don't buffer
+        return response
+
+    def _stream(self, request, turn):
+        session = turn["session"]
+        yield _sse("start", {
+            "session_id": session.id,
+            "user_message": turn["user_message"],
+        })
+
+        try:
+            rag_result = None
+            for event in _orchestrator.stream_response(
+                request,
+                session,
+                turn["message"],
+                attachment_data=turn["attachment_data"],
+            ):
+                if event["type"] == "token":
+                    yield _sse("token", {"text": event["text"]})
+                elif event["type"] == "reset":
+                    yield _sse("reset", {})
+                else:
+                    rag_result = event["result"]
+            payload = self._complete_turn(turn, rag_result)
+
+        except GeneratorExit:
+            logger.info("ChatStreamView: client disconnected session=%d", session.id)
+            raise
 
         except Exception as e:
             logger.error(
-                "ChatView.post FAILED: user=%s session=%d error=%s: %s",
+                "ChatStreamView.post FAILED: user=%s session=%d error=%s: %s",
                 request.user.email,
                 session.id,
                 type(e).__name__,
                 e,
                 exc_info=True,
             )
+            payload = self._failed_turn(turn)
 
-            error_content = (
-                "Scusa, Ainaudino e un po' sovraccarico in questo momento e non riesce a rispondere. "
-                "Riprova tra qualche secondo! Se il problema persiste, prova ad aprire una nuova conversazione."
-            )
-            ChatMessage.objects.create(
-                session=session,
-                role=ChatMessage.Role.ASSISTANT,
-                content=error_content,
-                sources_cited=[],
-            )
-
-            return Response(
-                {
-                    "session_id": session.id,
-                    "title": session.title,
-                    "user_message": {
-                        "id": user_message.id,
-                        "role": user_message.role,
-                        "content": user_message.content,
-                    },
-                    "message": {
-                        "id": 0,
-                        "role": "assistant",
-                        "content": error_content,
-                        "sources": [],
-                        "retrieved_docs": 0,
-                    },
-                }
-            )
+        yield _sse("done", payload)
 
 
 class ChatBranchView(APIView):
@@ -387,9 +494,12 @@ class ChatBranchView(APIView):
             context=original_session.context,
             parent_session=original_session,
             sezione=original_session.sezione,
-            metadata=(
-                original_session.metadata.copy() if original_session.metadata else {}
-            ),
+            metadata={
+                # The rolling summary refers to the original session's messages
+                key: value
+                for key, value in (original_session.metadata or {}).items()
+                if key != SUMMARY_KEY
+            },
         )
 
         # Copy messages before the edited one
@@ -0,0 +1,136 @@
+"""
+Fixtures for the endpoint benchmark suite.
+
+The suite runs only with BENCHMARK=1 (and pytest-benchmark installed), so
+the regular `pytest` run does not pay for the dataset. The test database is
+filled once per session by `generate_election_dataset` at BENCHMARK_SCALE
+(default 0.02: ~160 comuni, ~1,200 sezioni, ~2,000 registrazioni); with
+DB_HOST/DATABASE_URL set it runs on PostgreSQL like production.
+
+Requests go through the real stack (JWT Bearer tokens, middleware,
+permission classes); only throttling is disabled.
+
+Usage:
+    make benchmark               # compare with the stored baseline
+    make benchmark-baseline      # store a new baseline
+    make query-plans             # EXPLAIN the hot paths (test_query_plans.py)
+    BENCHMARK=1 BENCHMARK_SCALE=0.1 pytest benchmarks
+"""
+import io
+import os
+
+import pytest
+
+if not os.environ.get('BENCHMARK'):
+    collect_ignore_glob = ['test_*.py']
+else:
+    pytest.importorskip('pytest_benchmark')
+
+SCALE = float(os.environ.get('BENCHMARK_SCALE', '0.02'))
+
+DELEGATO_EMAIL = 'delegato@rdl.example.org'
+
+# Permissions the Delegato/Subdelegato groups don't carry in every database
+EXTRA_PERMISSIONS = ['can_view_live_results', 'can_manage_mappatura']
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    from django.core.management import call_command
+
+    with django_db_blocker.unblock():
+        call_command('generate_election_dataset', scale=SCALE, stdout=io.StringIO())
+
+
+@pytest.fixture(scope='session', autouse=True)
+def no_throttling():
+    from rest_framework.views import APIView
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(APIView, 'throttle_classes', [])
+        yield
+
+
+class Dataset:
+    """Handles on the generated dataset: the users and the territory to query."""
+
+    def __init__(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Permission
+        from django.db.models import Count
+
+        from delegations.models import DesignazioneRDL, SubDelega
+        from elections.models import ConsultazioneElettorale, SchedaElettorale
+        from territory.models import Comune, Municipio
+
+        User = get_user_model()
+        self.consultazione = ConsultazioneElettorale.objects.filter(is_attiva=True).latest('data_inizio')
+        self.schede = list(SchedaElettorale.objects.filter(tipo_elezione__consultazione=self.consultazione))
+
+        # The largest comune (a capoluogo with municipi) and its chain
+        self.comune = (
+            Comune.objects.annotate(n=Count('sezioni')).order_by('-n').select_related('provincia__regione').first()
+        )
+        self.provincia = self.comune.provincia
+        self.regione = self.provincia.regione
+        self.municipio = Municipio.objects.filter(comune=self.comune).order_by('numero').first()
+
+        self.delegato = User.objects.get(email=DELEGATO_EMAIL)
+        sub_delega = SubDelega.objects.get(province=self.provincia)
+        self.sub_delegato = User.objects.get(email=sub_delega.email)
+        permissions = Permission.objects.filter(content_type__app_label='core', codename__in=EXTRA_PERMISSIONS)
+        for user in (self.delegato, self.sub_delegato):
+            user.user_permissions.add(*permissions)
+
+        # An RDL effettivo in the largest comune
+        designazione = (
+            DesignazioneRDL.objects
+            .filter(sezione__comune=self.comune, is_attiva=True, stato='CONFERMATA')
+            .order_by('sezione__numero')
+            .first()
+        )
+        self.rdl = User.objects.get(email=designazione.effettivo_email)
+        self.rdl_sezione = designazione.sezione
+
+    def levels(self):
+        """Territory filters of the drill-down screens, nazionale to municipio."""
+        levels = {
+            'nazionale': {},
+            'regione': {'regione_id': self.regione.id},
+            'provincia': {'regione_id': self.regione.id, 'provincia_id': self.provincia.id},
+            'comune': {'regione_id': self.regione.id, 'provincia_id': self.provincia.id, 'comune_id': self.comune.id},
+        }
+        if self.municipio is not None:
+            levels['municipio'] = {**levels['comune'], 'municipio_id': self.municipio.id}
+        return levels
+
+
+@pytest.fixture(scope='session')
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        return Dataset()
+
+
+def _client(user):
+    from rest_framework.test import APIClient
+
+    from core.views import get_tokens_for_user
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+    return client
+
+
+@pytest.fixture
+def rdl_client(db, dataset):
+    return _client(dataset.rdl)
+
+
+@pytest.fixture
+def delegato_client(db, dataset):
+    return _client(dataset.delegato)
+
+
+@pytest.fixture
+def sub_delegato_client(db, dataset):
+    return _client(dataset.sub_delegato)
@@ -0,0 +1,77 @@
+"""
+EXPLAIN helpers for the query-plan tests (test_query_plans.py).
+
+A hot path is a request; its queries are captured and each one is
+explained to find full scans of the large tables:
+
+- PostgreSQL: EXPLAIN (FORMAT JSON) with enable_seqscan off, so the planner
+  takes any usable index even on the small benchmark dataset; a Seq Scan
+  left in the plan means no index can serve the query
+- SQLite: EXPLAIN QUERY PLAN, where "SCAN <table>" without an index is a
+  full scan (aliases like U0 are mapped back to their table)
+"""
+import json
+import re
+
+from django.db import connection, transaction
+
+_EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+# FROM "territory_sezioneelettorale" U0 / INNER JOIN "core_user" T3
+_ALIAS_RE = re.compile(r'"(\w+)"\s+(?:AS\s+)?([A-Z]\d+)\b')
+_SQLITE_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$')
+
+
+def _postgres_seq_scans(sql):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+        # SET LOCAL outlives a released savepoint (an error rolls it back)
+        cursor.execute('SET LOCAL enable_seqscan = on')
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = set()
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Node Type') == 'Seq Scan':
+            scans.add(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def _sqlite_seq_scans(sql):
+    aliases = {alias: table for table, alias in _ALIAS_RE.findall(sql)}
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        rows = cursor.fetchall()
+
+    scans = set()
+    for row in rows:
+        match = _SQLITE_SCAN_RE.match(row[-1])
+        if match:
+            name = match.group(2) or match.group(1)
+            scans.add(aliases.get(name, match.group(1)))
+    return scans
+
+
+def seq_scans(sql) -> set:
+    """Tables read with a full scan by this statement (empty if not explainable)."""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return set()
+    if connection.vendor == 'postgresql':
+        return _postgres_seq_scans(sql)
+    if connection.vendor == 'sqlite':
+        return _sqlite_seq_scans(sql)
+    return set()
+
+
+def scans_of(queries, tables) -> list:
+    """[(table, sql)] for the captured queries that fully scan one of `tables`."""
+    found = []
+    for query in queries:
+        for table in sorted(seq_scans(query['sql']) & set(tables)):
+            found.append((table, query['sql']))
+    return found
@@ -0,0 +1,153 @@
+"""
+Benchmarks of the components behind the hot endpoints.
+
+Unlike test_hot_endpoints.py these time a single service in isolation, on
+data built by the benchmark itself. Correctness is covered by the regular
+test suite; each benchmark only checks that the work was actually done.
+"""
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+from django.conf import settings
+
+SCHOOL_ADDRESSES = 5000
+GEOCODED_SEZIONI = 2600
+GEOCODED_RDL = 3000
+VECTOR_QUERIES = 50
+
+# Rome bounding box (roughly GRA + Ostia)
+ROMA_LAT = (41.75, 42.02)
+ROMA_LON = (12.30, 12.65)
+
+
+@pytest.fixture(scope='module')
+def school_indexes():
+    from territory.address_matching import MIM_SCHOOL_FILES, build_school_indexes
+
+    fixtures_dir = Path(settings.BASE_DIR) / 'fixtures'
+    paths = [fixtures_dir / name for name in MIM_SCHOOL_FILES if (fixtures_dir / name).exists()]
+    if not paths:
+        pytest.skip('MIM school files not available')
+    indexes, _ = build_school_indexes(paths)
+    return indexes
+
+
+@pytest.mark.benchmark(group='address-matching')
+def test_address_matching(benchmark, school_indexes):
+    rng = random.Random(11)
+    comuni = sorted(school_indexes)
+    sezioni = []
+    for _ in range(SCHOOL_ADDRESSES):
+        index = school_indexes[rng.choice(comuni)]
+        sezioni.append((index, rng.choice(index.payloads)['indirizzo']))
+
+    matches = benchmark(lambda: [index.match(address, min_score=0.6) for index, address in sezioni])
+    assert all(match is not None for match in matches)
+
+
+@pytest.fixture
+def geocoded_comune(db, dataset):
+    """
+    A Rome-sized comune of its own, with geocoded sections and RDLs (the
+    generated dataset is not geocoded and is shared by the other benchmarks).
+    """
+    from datetime import date
+
+    from campaign.models import RdlRegistration
+    from territory.models import Comune, SezioneElettorale
+    from territory.spatial import invalidate_plessi_index
+
+    rng = random.Random(7)
+    comune = Comune.objects.create(
+        provincia=dataset.provincia, codice_istat='999999', codice_catastale='Z999', nome='Geocodificato',
+    )
+    SezioneElettorale.objects.bulk_create([
+        SezioneElettorale(
+            comune=comune, numero=numero, indirizzo=f'VIA PLESSO {numero // 2}',
+            latitudine=round(rng.uniform(*ROMA_LAT), 6), longitudine=round(rng.uniform(*ROMA_LON), 6),
+        )
+        for numero in range(1, GEOCODED_SEZIONI + 1)
+    ])
+    RdlRegistration.objects.bulk_create([
+        RdlRegistration(
+            email=f'geo{i}@benchmark.example.org', nome='Mario', cognome=f'Rossi{i}', telefono='3331234567',
+            comune_nascita='Roma', data_nascita=date(1980, 1, 1),
+            comune_residenza='Roma', indirizzo_residenza=f'Via Test {i}', comune=comune,
+            latitudine=round(rng.uniform(*ROMA_LAT), 6), longitudine=round(rng.uniform(*ROMA_LON), 6),
+        )
+        for i in range(GEOCODED_RDL)
+    ])
+    yield comune
+    # The rows roll back with the test; the cached index would not
+    invalidate_plessi_index(comune.id)
+
+
+@pytest.mark.benchmark(group='sezioni-vicine')
+def test_ricalcola_sezioni_vicine(benchmark, geocoded_comune):
+    from campaign.models import RdlRegistration
+    from campaign.services.plessi_vicini import ricalcola_sezioni_vicine
+    from territory.spatial import invalidate_plessi_index
+
+    queryset = RdlRegistration.objects.filter(comune=geocoded_comune)
+    updated = benchmark.pedantic(ricalcola_sezioni_vicine, args=(queryset,), setup=invalidate_plessi_index, rounds=5)
+    assert updated == GEOCODED_RDL
+
+
+def _unit_vectors(rng, n, dim=768):
+    m = rng.standard_normal((n, dim)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+@pytest.fixture(scope='module', params=[5000, 50000], ids=lambda n: f'{n}-chunks')
+def vector_index(request):
+    from ai_assistant.vector_index import NumpyVectorIndex
+
+    rng = np.random.default_rng(2)
+    return NumpyVectorIndex(np.arange(request.param), _unit_vectors(rng, request.param)), rng
+
+
+@pytest.mark.benchmark(group='vector-index')
+def test_vector_search(benchmark, vector_index):
+    index, rng = vector_index
+    queries = _unit_vectors(rng, VECTOR_QUERIES)
+    results = benchmark(lambda: [index.search(q, 3, 0.7) for q in queries])
+    assert len(results) == VECTOR_QUERIES
+
+
+@pytest.mark.benchmark(group='vector-index')
+def test_vector_search_many(benchmark, vector_index):
+    index, rng = vector_index
+    queries = _unit_vectors(rng, VECTOR_QUERIES)
+    results = benchmark(index.search_many, queries, 3, 0.7)
+    assert len(results) == VECTOR_QUERIES
+
+
+@pytest.mark.benchmark(group='metrics')
+def test_metrics_middleware_unsampled(benchmark, settings):
+    """Per-request cost of the middleware on a hot scrutinio view (1% sampling)."""
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from core.metrics import registry
+    from core.middleware import RequestMetricsMiddleware
+
+    settings.METRICS_SAMPLE_RATES = {'scrutinio-sezione-detail': 0.01}
+    request = RequestFactory().get('/api/scrutinio/sezioni/1')
+    request.resolver_match = resolve('/api/scrutinio/sezioni/1')
+
+    def view(request):
+        return HttpResponse()
+
+    middleware = RequestMetricsMiddleware(view)
+
+    def handle():
+        request.__dict__.pop('_metrics_sample', None)
+        middleware.process_view(request, view, (), {})
+        return middleware(request)
+
+    registry.reset()
+    assert benchmark(handle).status_code == 200
+    registry.reset()
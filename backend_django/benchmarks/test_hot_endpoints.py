@@ -0,0 +1,110 @@
+"""
+Benchmarks of the endpoints under load on election day.
+
+Each benchmark times a full request (auth, middleware, view, serialization)
+against the synthetic national dataset and checks the response, so a
+"faster" run that fails is not mistaken for an improvement.
+"""
+import pytest
+
+LEVELS = ['nazionale', 'regione', 'provincia', 'comune', 'municipio']
+
+
+def _params(dataset, level):
+    levels = dataset.levels()
+    if level not in levels:
+        pytest.skip(f'nessun {level} nel dataset (BENCHMARK_SCALE troppo basso)')
+    return {'consultazione_id': dataset.consultazione.id, **levels[level]}
+
+
+def _ok(response):
+    assert response.status_code == 200, response.content[:500]
+    return response
+
+
+@pytest.mark.benchmark(group='scrutinio')
+def test_miei_seggi_light(benchmark, dataset, rdl_client):
+    response = _ok(benchmark(
+        rdl_client.get, '/api/scrutinio/miei-seggi-light',
+        {'consultazione_id': dataset.consultazione.id},
+    ))
+    assert response.json()['seggi']
+
+
+@pytest.mark.benchmark(group='scrutinio')
+def test_scrutinio_save(benchmark, dataset, rdl_client):
+    from data.models import DatiSezione
+
+    sezione = dataset.rdl_sezione
+    url = f'/api/scrutinio/sezioni/{sezione.id}/save'
+
+    def setup():
+        version = DatiSezione.objects.get(sezione=sezione, consultazione=dataset.consultazione).version
+        body = {
+            'consultazione_id': dataset.consultazione.id,
+            'version': version,
+            'dati_seggio': {
+                'elettori_maschi': 400, 'elettori_femmine': 420,
+                'votanti_maschi': 250, 'votanti_femmine': 270,
+                'is_complete': True,
+            },
+            'schede': [
+                {
+                    'scheda_id': scheda.id,
+                    'schede_ricevute': 820, 'schede_autenticate': 820,
+                    'schede_bianche': 6, 'schede_nulle': 4, 'schede_contestate': 0,
+                    'voti': {'si': 200 + version % 50, 'no': 310 - version % 50},
+                }
+                for scheda in dataset.schede
+            ],
+        }
+        return (url, body), {'format': 'json'}
+
+    response = _ok(benchmark.pedantic(rdl_client.post, setup=setup, rounds=30))
+    assert response.json()['success']
+
+
+@pytest.mark.benchmark(group='scrutinio-aggregato')
+@pytest.mark.parametrize('level', LEVELS)
+def test_scrutinio_aggregato(benchmark, dataset, delegato_client, level):
+    _ok(benchmark(delegato_client.get, '/api/scrutinio/aggregato', _params(dataset, level)))
+
+
+@pytest.mark.benchmark(group='scrutinio-aggregato')
+def test_scrutinio_aggregato_sub_delegato(benchmark, dataset, sub_delegato_client):
+    _ok(benchmark(sub_delegato_client.get, '/api/scrutinio/aggregato', _params(dataset, 'provincia')))
+
+
+@pytest.mark.benchmark(group='mappatura')
+@pytest.mark.parametrize('level', LEVELS)
+def test_mappatura_gerarchica(benchmark, dataset, delegato_client, level):
+    _ok(benchmark(delegato_client.get, '/api/mapping/gerarchica/', _params(dataset, level)))
+
+
+@pytest.mark.benchmark(group='kpi')
+@pytest.mark.parametrize('endpoint', ['dati', 'sezioni'])
+def test_kpi(benchmark, dataset, delegato_client, endpoint):
+    _ok(benchmark(delegato_client.get, f'/api/kpi/{endpoint}', {'consultazione_id': dataset.consultazione.id}))
+
+
+@pytest.mark.benchmark(group='permissions')
+@pytest.mark.parametrize('role', ['rdl', 'delegato'])
+def test_permissions(benchmark, request, role):
+    client = request.getfixturevalue(f'{role}_client')
+    response = _ok(benchmark(client.get, '/api/permissions'))
+    assert response.json()
+
+
+@pytest.mark.benchmark(group='permissions')
+def test_permissions_cold_cache(benchmark, dataset, rdl_client):
+    from django.conf import settings
+    from django.core.cache import caches
+
+    def setup():
+        for alias in {settings.AUTH_CACHE_ALIAS, settings.PERMISSIONS_CACHE_ALIAS}:
+            caches[alias].clear()
+
+    _ok(benchmark.pedantic(
+        rdl_client.get, args=('/api/permissions', {'consultazione': dataset.consultazione.id}),
+        setup=setup, rounds=30,
+    ))
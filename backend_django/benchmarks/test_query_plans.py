@@ -0,0 +1,112 @@
+"""
+Query-plan regression tests for the hot paths.
+
+Each registered hot path is requested on the synthetic dataset; every query
+it runs is explained (benchmarks/query_plans.py) and the test fails when one
+of them reads a large table with a full scan, i.e. when a filter has no
+index to use. Meant to run on PostgreSQL (DB_HOST/DATABASE_URL set, see
+conftest.py); on SQLite the same check uses EXPLAIN QUERY PLAN.
+
+Case-insensitive lookups compile to UPPER(col) on PostgreSQL and are served
+by expression indexes there (UPPER() btree for iexact, pg_trgm GIN for
+icontains); SQLite uses LIKE, which they can't serve. Tables listed in a
+path's `postgres_only` are checked on PostgreSQL and tolerated elsewhere.
+
+To register a hot path add a HotPath to HOT_PATHS.
+"""
+from typing import Callable, NamedTuple
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from query_plans import scans_of
+
+pytestmark = pytest.mark.django_db
+
+
+class HotPath(NamedTuple):
+    name: str
+    role: str | None  # client fixture prefix, None = anonymous
+    method: str
+    request: Callable  # dataset -> (url, data)
+    postgres_only: tuple = ()
+
+
+def _large_tables():
+    from campaign.models import RdlRegistration
+    from core.models import RoleAssignment, User
+    from data.models import DatiScheda, DatiSezione, SectionAssignment, SectionDataHistory
+    from delegations.models import DesignazioneRDL
+    from territory.models import Comune, SezioneElettorale
+
+    models = [
+        Comune, SezioneElettorale, RdlRegistration, SectionAssignment, DesignazioneRDL,
+        DatiSezione, DatiScheda, SectionDataHistory, User, RoleAssignment,
+    ]
+    return {model._meta.db_table for model in models}
+
+
+def _save_body(dataset):
+    from data.models import DatiSezione
+
+    version = DatiSezione.objects.get(sezione=dataset.rdl_sezione, consultazione=dataset.consultazione).version
+    return {
+        'consultazione_id': dataset.consultazione.id,
+        'version': version,
+        'dati_seggio': {'elettori_maschi': 400, 'elettori_femmine': 420},
+        'schede': [{'scheda_id': scheda.id, 'voti': {'si': 1, 'no': 2}} for scheda in dataset.schede],
+    }
+
+
+HOT_PATHS = [
+    HotPath('miei-seggi-light', 'rdl', 'get', lambda d: (
+        '/api/scrutinio/miei-seggi-light', {'consultazione_id': d.consultazione.id})),
+    HotPath('scrutinio-sezioni', 'rdl', 'get', lambda d: ('/api/scrutinio/sezioni', {})),
+    HotPath('scrutinio-sezione-save', 'rdl', 'post', lambda d: (
+        f'/api/scrutinio/sezioni/{d.rdl_sezione.id}/save', _save_body(d))),
+    HotPath('scrutinio-save', 'rdl', 'post', lambda d: ('/api/scrutinio/save', {
+        'comune': d.rdl_sezione.comune.nome.upper(),
+        'sezione': d.rdl_sezione.numero,
+        'dati_seggio': {'elettori_maschi': 400},
+        'schede': {str(scheda.id): {'voti': {'si': 1, 'no': 2}} for scheda in d.schede},
+    }), postgres_only=('territory_comune',)),
+    HotPath('scrutinio-aggregato-comune', 'delegato', 'get', lambda d: (
+        '/api/scrutinio/aggregato', {'consultazione_id': d.consultazione.id, **d.levels()['comune']})),
+    HotPath('scrutinio-aggregato-sub-delegato', 'sub_delegato', 'get', lambda d: (
+        '/api/scrutinio/aggregato', {'consultazione_id': d.consultazione.id, **d.levels()['provincia']})),
+    HotPath('mappatura-gerarchica-comune', 'delegato', 'get', lambda d: (
+        '/api/mapping/gerarchica/', {'consultazione_id': d.consultazione.id, **d.levels()['comune']})),
+    HotPath('mappatura-gerarchica-search', 'delegato', 'get', lambda d: (
+        '/api/mapping/gerarchica/',
+        {'consultazione_id': d.consultazione.id, **d.levels()['provincia'], 'search': d.comune.nome[:4]},
+    ), postgres_only=('territory_comune',)),
+    HotPath('kpi-sezioni', 'sub_delegato', 'get', lambda d: ('/api/kpi/sezioni', {})),
+    HotPath('registrations-pending', 'sub_delegato', 'get', lambda d: (
+        '/api/rdl/registrations', {'status': 'PENDING', 'comune': d.comune.id})),
+    HotPath('permissions', 'rdl', 'get', lambda d: ('/api/permissions', {})),
+    HotPath('sezioni-search-public', None, 'get', lambda d: (
+        '/api/sections/search-public/', {'comune_id': d.comune.id, 'q': 'Via'})),
+    HotPath('comuni-search', None, 'get', lambda d: (
+        '/api/rdl/comuni/search', {'q': d.comune.nome[:4]}), postgres_only=('territory_comune',)),
+]
+
+
+@pytest.mark.parametrize('path', HOT_PATHS, ids=lambda path: path.name)
+def test_no_full_scans(request, dataset, path):
+    from rest_framework.test import APIClient
+
+    client = request.getfixturevalue(f'{path.role}_client') if path.role else APIClient()
+    url, data = path.request(dataset)
+    with CaptureQueriesContext(connection) as captured:
+        if path.method == 'post':
+            response = client.post(url, data, format='json')
+        else:
+            response = client.get(url, data)
+    assert response.status_code == 200, response.content[:500]
+
+    tolerated = set(path.postgres_only) if connection.vendor != 'postgresql' else set()
+    scans = scans_of(captured.captured_queries, _large_tables() - tolerated)
+    assert not scans, f'{path.name}: full scan of ' + '\n\n'.join(
+        f'{table}:\n{sql}' for table, sql in scans
+    )
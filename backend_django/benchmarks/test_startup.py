@@ -0,0 +1,31 @@
+"""
+Cold start budgets of the Cloud Run services (core.startup).
+
+Each service is started in a fresh interpreter and timed, so the result
+depends on the machine: these run with the benchmark suite, next to
+`make startup-profile`, not in the regular test run.
+
+Usage:
+    BENCHMARK=1 pytest benchmarks/test_startup.py -p no:cacheprovider --benchmark-disable
+"""
+import io
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.startup import SERVICES, profile_service
+
+
+@pytest.mark.parametrize('service', SERVICES)
+def test_service_starts_within_budget(service, settings):
+    profile = profile_service(service)
+    assert not profile.problems(settings.STARTUP_BUDGETS[service], settings.STARTUP_LAZY_MODULES)
+
+
+def test_command_fails_over_budget(settings):
+    settings.STARTUP_BUDGETS = {'pdf': 0.001}
+    out = io.StringIO()
+    with pytest.raises(CommandError, match='over the 0.00s budget'):
+        call_command('profile_startup', service=['pdf'], runs=1, check=True, stdout=out)
+    assert 'django' in out.getvalue()
@@ -1,38 +1,28 @@
 """
-Geocode RDL registrations using Google Geocoding API.
+Geocode RDL registrations through the geocoding service.
 
-Uses in-memory address cache to avoid duplicate API calls for RDLs
-with the same normalized address.
+Addresses are deduplicated and looked up in the persistent geocoding cache
+(shared with sections) before calling the provider, with --workers
+concurrent requests under a global --qps limit.
 
 Usage:
     python manage.py geocode_rdl --limit 500 --dry-run
     python manage.py geocode_rdl --comune-id 123 --limit 500
     python manage.py geocode_rdl --force  # ricalcola tutti
 """
-import re
-import time
-import unicodedata
-
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
 from campaign.models import RdlRegistration
-from territory.geocoding import build_rdl_address, geocode_address
-
+from campaign.services.plessi_vicini import ricalcola_sezioni_vicine
+from territory.geocoding import build_rdl_address
+from territory.geocoding_service import build_geocoding_service, normalize_address_key
 
-def _normalize_address_key(address):
-    """
-    Normalize an address for cache deduplication.
-    Uppercase, strip accents, collapse whitespace.
-    """
-    if not address:
-        return ""
-    s = str(address).strip().upper()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = re.sub(r"[^A-Z0-9\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+_GEOCODE_FIELDS = [
+    "latitudine", "longitudine",
+    "geocoded_at", "geocode_source",
+    "geocode_quality", "geocode_place_id",
+]
 
 
 class Command(BaseCommand):
@@ -51,10 +41,16 @@ class Command(BaseCommand):
             help="Numero massimo di RDL da geocodificare (default: 500)",
         )
         parser.add_argument(
-            "--sleep-ms",
+            "--workers",
             type=int,
-            default=120,
-            help="Pausa tra richieste API in millisecondi (default: 120)",
+            default=None,
+            help="Richieste API concorrenti (default: GEOCODING_MAX_WORKERS)",
+        )
+        parser.add_argument(
+            "--qps",
+            type=float,
+            default=None,
+            help="Limite globale richieste/secondo (default: GEOCODING_QPS)",
         )
         parser.add_argument(
             "--dry-run",
@@ -70,7 +66,8 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         comune_id = options.get("comune_id")
         limit = options["limit"]
-        sleep_ms = options["sleep_ms"]
+        workers = options["workers"]
+        qps = options["qps"]
         dry_run = options["dry_run"]
         force = options["force"]
 
@@ -98,43 +95,32 @@ class Command(BaseCommand):
             self.stdout.write("Nessun RDL da geocodificare.")
             return
 
-        # In-memory cache: normalized_address → (lat, lon, place_id, quality)
-        cache = {}
-        ok_count = 0
-        fail_count = 0
-        cache_hit_count = 0
-        api_call_count = 0
-        sleep_sec = sleep_ms / 1000.0
-
-        for i, rdl in enumerate(rdl_list, 1):
-            address = build_rdl_address(rdl)
-            cache_key = _normalize_address_key(address)
-
-            # Check cache
-            if cache_key in cache:
-                result = cache[cache_key]
-                cache_hit_count += 1
-            elif dry_run:
-                result = None  # Don't call API in dry-run
-            else:
-                result = geocode_address(address)
-                api_call_count += 1
-                if result is not None:
-                    cache[cache_key] = result
-
-                if sleep_sec > 0 and i < batch_size:
-                    time.sleep(sleep_sec)
+        pad = len(str(batch_size))
 
-            label = f"{rdl.cognome} {rdl.nome}"
-            pad = len(str(batch_size))
-
-            if dry_run:
+        if dry_run:
+            for i, rdl in enumerate(rdl_list, 1):
                 self.stdout.write(
                     f"[{i:>{pad}}/{batch_size}] "
-                    f"{label} - {address} [DRY RUN]"
+                    f"{rdl.cognome} {rdl.nome} - {build_rdl_address(rdl)} [DRY RUN]"
                 )
-                ok_count += 1
-                continue
+            self.stdout.write(self.style.WARNING(
+                f"\nDRY RUN completato: {batch_size} RDL trovati"
+            ))
+            return
+
+        service = build_geocoding_service(qps=qps)
+        addresses = {rdl.pk: build_rdl_address(rdl) for rdl in rdl_list}
+        results = service.geocode_many(
+            addresses.values(), max_workers=workers, use_cache=not force
+        )
+
+        now = timezone.now()
+        to_update = []
+        fail_count = 0
+        for i, rdl in enumerate(rdl_list, 1):
+            address = addresses[rdl.pk]
+            result = results.get(normalize_address_key(address))
+            label = f"{rdl.cognome} {rdl.nome}"
 
             if result is None:
                 fail_count += 1
@@ -142,33 +128,30 @@ class Command(BaseCommand):
                     f"[{i:>{pad}}/{batch_size}] "
                     f"{label} - {address} → FALLITA"
                 )
-            else:
-                lat, lon, place_id, location_type = result
-                rdl.latitudine = lat
-                rdl.longitudine = lon
-                rdl.geocoded_at = timezone.now()
-                rdl.geocode_source = "google"
-                rdl.geocode_quality = location_type
-                rdl.geocode_place_id = place_id
-                rdl.save(update_fields=[
-                    "latitudine", "longitudine",
-                    "geocoded_at", "geocode_source",
-                    "geocode_quality", "geocode_place_id",
-                ])
-                ok_count += 1
-                hit = " [cache]" if cache_key in cache and api_call_count == 0 else ""
-                self.stdout.write(
-                    f"[{i:>{pad}}/{batch_size}] "
-                    f"{label} - {address} → "
-                    f"{lat}, {lon} ({location_type}){hit}"
-                )
+                continue
 
-        if dry_run:
-            self.stdout.write(self.style.WARNING(
-                f"\nDRY RUN completato: {ok_count} RDL trovati"
-            ))
-        else:
-            self.stdout.write(self.style.SUCCESS(
-                f"\nCompletato: {ok_count} ok, {fail_count} falliti, "
-                f"{api_call_count} chiamate API, {cache_hit_count} cache hit"
-            ))
+            lat, lon, place_id, location_type = result
+            rdl.latitudine = lat
+            rdl.longitudine = lon
+            rdl.geocoded_at = now
+            rdl.geocode_source = service.provider.name
+            rdl.geocode_quality = location_type
+            rdl.geocode_place_id = place_id
+            to_update.append(rdl)
+            self.stdout.write(
+                f"[{i:>{pad}}/{batch_size}] "
+                f"{label} - {address} → "
+                f"{lat}, {lon} ({location_type})"
+            )
+
+        # bulk_update skips post_save: compute sezioni_vicine in bulk too
+        RdlRegistration.objects.bulk_update(to_update, _GEOCODE_FIELDS, batch_size=500)
+        ricalcola_sezioni_vicine(
+            RdlRegistration.objects.filter(pk__in=[rdl.pk for rdl in to_update])
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\nCompletato: {len(to_update)} ok, {fail_count} falliti, "
+            f"{service.stats['api_calls']} chiamate API, "
+            f"{service.stats['cache_hits']} cache hit"
+        ))
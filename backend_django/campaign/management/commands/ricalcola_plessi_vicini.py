@@ -1,21 +1,25 @@
 """
 Ricalcola sezioni_vicine per gli RDL geocodificati.
 
-Esegue una save() su ogni RDL per scatenare il post_save signal
-che ricalcola i plessi vicini se la lista è vuota.
+Raggruppa gli RDL per comune e calcola i plessi vicini con l'indice
+spaziale del comune (territory.spatial), poi scrive con bulk_update.
+Non esegue save() né signal.
 
 Usage:
     python manage.py ricalcola_plessi_vicini
     python manage.py ricalcola_plessi_vicini --force
     python manage.py ricalcola_plessi_vicini --comune-id 058091
 """
+import time
+
 from django.core.management.base import BaseCommand
 
 from campaign.models import RdlRegistration
+from campaign.services.plessi_vicini import ricalcola_sezioni_vicine
 
 
 class Command(BaseCommand):
-    help = "Ricalcola sezioni_vicine per RDL geocodificati (triggera post_save)"
+    help = "Ricalcola sezioni_vicine per RDL geocodificati (indice spaziale + bulk_update)"
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -52,16 +56,13 @@ class Command(BaseCommand):
             self.stdout.write("Niente da fare.")
             return
 
-        updated = 0
-        for i, rdl in enumerate(qs.iterator(), 1):
-            # Se --force, setta il flag per forzare il ricalcolo nel signal
-            if force:
-                rdl._force_recalculate_sezioni_vicine = True
-            rdl.save()
-            updated += 1
-            if i % 50 == 0:
-                self.stdout.write(f"  {i}/{total}...")
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total}...")
+
+        start = time.monotonic()
+        updated = ricalcola_sezioni_vicine(qs, progress=progress)
+        elapsed = time.monotonic() - start
 
         self.stdout.write(self.style.SUCCESS(
-            f"Completato: {updated} RDL aggiornati"
+            f"Completato: {updated} RDL aggiornati in {elapsed:.1f}s"
         ))
@@ -14,6 +14,7 @@ Usage:
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 from campaign.models import RdlRegistration
+from campaign.services.plessi_vicini import ricalcola_sezioni_vicine
 
 
 # Sezioni che sono state spostate/eliminate nel 2026
@@ -98,15 +99,14 @@ class Command(BaseCommand):
             self.stdout.write(f"Per aggiornare veramente, esegui senza --dry-run")
             return
 
-        # Aggiorna i RDL (scatena il post_save signal che ricalcola i plessi)
-        # Setta il flag per forzare il ricalcolo nel signal
-        updated = 0
-        for i, rdl in enumerate(rdl_da_aggiornare, 1):
-            rdl._force_recalculate_sezioni_vicine = True
-            rdl.save()
-            updated += 1
-            if i % 50 == 0:
-                self.stdout.write(f"  {i}/{total}...")
+        # Ricalcola i plessi con l'indice spaziale + bulk_update
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total}...")
+
+        updated = ricalcola_sezioni_vicine(
+            RdlRegistration.objects.filter(pk__in=[rdl.pk for rdl in rdl_da_aggiornare]),
+            progress=progress,
+        )
 
         self.stdout.write()
         self.stdout.write(self.style.SUCCESS(
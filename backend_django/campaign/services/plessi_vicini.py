@@ -0,0 +1,60 @@
+"""
+Bulk recompute of RdlRegistration.sezioni_vicine.
+
+Groups RDLs by comune, computes the nearest plessi for the whole group
+with one vectorized pass over the comune's PlessiIndex, and writes back
+with bulk_update (no per-RDL save(), no signals).
+"""
+import logging
+from itertools import groupby
+
+from territory.spatial import get_plessi_index
+
+logger = logging.getLogger(__name__)
+
+TOP_PLESSI = 10
+
+
+def ricalcola_sezioni_vicine(queryset, batch_size=500, progress=None):
+    """
+    Recompute sezioni_vicine for the geocoded RDLs in queryset.
+
+    Args:
+        queryset: RdlRegistration queryset (non-geocoded rows are skipped)
+        batch_size: rows per bulk_update statement
+        progress: optional callable(done, total) for command output
+
+    Returns:
+        int: number of RDLs updated
+    """
+    from campaign.models import RdlRegistration
+
+    rows = list(
+        queryset.filter(latitudine__isnull=False, longitudine__isnull=False)
+        .order_by('comune_id', 'pk')
+        .values_list('pk', 'comune_id', 'latitudine', 'longitudine')
+    )
+    total = len(rows)
+    updated = 0
+
+    for comune_id, group in groupby(rows, key=lambda r: r[1]):
+        group = list(group)
+        index = get_plessi_index(comune_id)
+        results = index.nearest_many(
+            [(float(lat), float(lon)) for _, _, lat, lon in group],
+            k=TOP_PLESSI,
+        )
+
+        objs = [
+            RdlRegistration(pk=pk, sezioni_vicine=sezioni_vicine)
+            for (pk, _, _, _), sezioni_vicine in zip(group, results)
+        ]
+        RdlRegistration.objects.bulk_update(objs, ['sezioni_vicine'], batch_size=batch_size)
+        updated += len(objs)
+
+        logger.info("Comune %s: sezioni_vicine ricalcolate per %d RDL (%d plessi)",
+                    comune_id, len(objs), len(index))
+        if progress:
+            progress(updated, total)
+
+    return updated
@@ -1,13 +1,14 @@
 """
 Signals for campaign app.
 
-Geocodes RdlRegistration on save (idempotent):
+Geocodes RdlRegistration on save (idempotent, in the background via
+core.background and the cached territory.geocoding_service):
 - New record: always geocode
 - Update: re-geocode only if address fields changed
 - Partial update (update_fields) that doesn't touch address: skip entirely
 
 After geocoding, computes sezioni_vicine (top 10 nearest sections in the
-same comune).
+same comune). Bulk recompute: campaign.services.plessi_vicini.
 """
 import logging
 
@@ -44,7 +45,7 @@ def geocode_rdl_on_save(sender, instance, created, update_fields, **kwargs):
     - update_fields doesn't touch address fields (e.g. status-only update)
     - Already geocoded and address hasn't changed
     """
-    from territory.geocoding import build_rdl_address, geocode_address
+    from territory.geocoding import build_rdl_address
 
     # Partial update that doesn't touch address fields → skip
     if update_fields is not None:
@@ -90,30 +91,53 @@ def geocode_rdl_on_save(sender, instance, created, update_fields, **kwargs):
             instance.pk, old_address, new_address,
         )
 
-    result = geocode_address(new_address)
+    # Geocoding (cache lookup + possibly a Google call) runs after the
+    # response, on the background pool.
+    from core import background
+    background.submit(geocode_rdl_registration, instance.pk, new_address)
+
+
+def geocode_rdl_registration(rdl_id, address):
+    """
+    Geocode an RDL through the cached geocoding service, then compute
+    sezioni_vicine. Runs in the background (see geocode_rdl_on_save).
+
+    Skips if the RDL was deleted or its address changed again meanwhile
+    (the newer save has queued its own job).
+    """
+    from campaign.models import RdlRegistration
+    from territory.geocoding import build_rdl_address
+    from territory.geocoding_service import get_geocoding_service
+
+    rdl = RdlRegistration.objects.filter(pk=rdl_id).first()
+    if rdl is None or build_rdl_address(rdl) != address:
+        return
+
+    service = get_geocoding_service()
+    result = service.geocode(address)
     if result is None:
-        logger.warning("Geocode failed for RDL %s: %s", instance.pk, new_address)
+        logger.warning("Geocode failed for RDL %s: %s", rdl_id, address)
         return
 
     lat, lon, place_id, location_type = result
 
     # Compute nearby sections
-    sezioni_vicine = _find_sezioni_vicine(instance.comune_id, lat, lon)
+    sezioni_vicine = _find_sezioni_vicine(rdl.comune_id, lat, lon)
 
     # Save via queryset.update() to avoid re-triggering signals
-    sender.objects.filter(pk=instance.pk).update(
+    RdlRegistration.objects.filter(pk=rdl_id).update(
         latitudine=lat,
         longitudine=lon,
         geocoded_at=timezone.now(),
-        geocode_source='google',
+        geocode_source=service.provider.name,
         geocode_quality=location_type,
         geocode_place_id=place_id,
         sezioni_vicine=sezioni_vicine,
     )
     logger.info(
         "Geocoded RDL %s (%s %s): %s -> %s, %s (%s) - %d sezioni vicine",
-        instance.pk, instance.cognome, instance.nome,
-        new_address, lat, lon, location_type, len(sezioni_vicine),
+        rdl_id, rdl.cognome, rdl.nome,
+        address, lat, lon, location_type, len(sezioni_vicine),
     )
 
 
@@ -122,7 +146,8 @@ def _find_sezioni_vicine(comune_id, lat, lon):
     Return the top N nearest plessi (grouped by address) in the same comune.
 
     Sections sharing the same address are grouped into a single entry.
-    Distance is computed once per unique address (using the first section's coords).
+    Uses the cached per-comune index (territory.spatial), so no section
+    query runs once the comune has been loaded by this process.
 
     Returns list of dicts sorted by distance ascending:
     [
@@ -134,37 +159,6 @@ def _find_sezioni_vicine(comune_id, lat, lon):
         ...
     ]
     """
-    from collections import defaultdict
-
-    from territory.geocoding import haversine_km
-    from territory.models import SezioneElettorale
-
-    sezioni = SezioneElettorale.objects.filter(
-        comune_id=comune_id,
-        latitudine__isnull=False,
-        longitudine__isnull=False,
-    ).only('id', 'numero', 'indirizzo', 'latitudine', 'longitudine')
-
-    # Group by address → {indirizzo: [(numero, lat, lon), ...]}
-    by_address = defaultdict(list)
-    for s in sezioni:
-        key = (s.indirizzo or '').strip().upper()
-        by_address[key].append(s)
+    from territory.spatial import get_plessi_index
 
-    # Compute distance per unique address (use first section's coords)
-    plessi = []
-    for key, group in by_address.items():
-        ref = group[0]
-        dist = haversine_km(lat, lon, float(ref.latitudine), float(ref.longitudine))
-        plessi.append((dist, key, group))
-
-    plessi.sort(key=lambda x: x[0])
-
-    return [
-        {
-            'indirizzo': group[0].indirizzo or '',
-            'distanza_km': round(dist, 2),
-            'sezioni': sorted(s.numero for s in group),
-        }
-        for dist, key, group in plessi[:_TOP_SEZIONI]
-    ]
+    return get_plessi_index(comune_id).nearest(lat, lon, k=_TOP_SEZIONI)
@@ -1,3 +1,189 @@
-from django.test import TestCase
+"""
+Tests for campaign app: nearest plessi (sezioni_vicine) computation.
+"""
+import math
+import random
+from collections import defaultdict
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from campaign.models import RdlRegistration
+from campaign.services.plessi_vicini import ricalcola_sezioni_vicine
+from territory.geocoding import haversine_km
+from territory.geocoding_service import FakeGeocodingProvider, get_geocoding_service, reset_geocoding_service
+from territory.models import Regione, Provincia, Comune, SezioneElettorale
+from territory.spatial import PlessiIndex, get_plessi_index, invalidate_plessi_index
+
+# Rome bounding box (roughly GRA + Ostia)
+ROMA_LAT = (41.75, 42.02)
+ROMA_LON = (12.30, 12.65)
+
+
+def _reference_sezioni_vicine(sezioni, lat, lon, k=10):
+    """Pre-index implementation: per-address Python haversine."""
+    by_address = defaultdict(list)
+    for s in sezioni:
+        by_address[(s.indirizzo or '').strip().upper()].append(s)
+    plessi = []
+    for key, group in by_address.items():
+        ref = group[0]
+        plessi.append((haversine_km(lat, lon, float(ref.latitudine), float(ref.longitudine)), key, group))
+    plessi.sort(key=lambda x: x[0])
+    return [
+        {
+            'indirizzo': group[0].indirizzo or '',
+            'distanza_km': round(dist, 2),
+            'sezioni': sorted(s.numero for s in group),
+        }
+        for dist, key, group in plessi[:k]
+    ]
+
+
+def _build_roma(n_sezioni, sezioni_per_plesso=2, seed=42):
+    rng = random.Random(seed)
+    regione = Regione.objects.create(codice_istat='12', nome='Lazio')
+    provincia = Provincia.objects.create(codice_istat='058', sigla='RM', nome='Roma', regione=regione)
+    comune = Comune.objects.create(codice_istat='058091', nome='Roma', provincia=provincia)
+    sezioni = []
+    for numero in range(1, n_sezioni + 1):
+        plesso = (numero - 1) // sezioni_per_plesso
+        if (numero - 1) % sezioni_per_plesso == 0:
+            lat = round(rng.uniform(*ROMA_LAT), 6)
+            lon = round(rng.uniform(*ROMA_LON), 6)
+        sezioni.append(SezioneElettorale(
+            comune=comune, numero=numero, indirizzo=f'VIA PLESSO {plesso}, {plesso % 200 + 1}',
+            latitudine=lat, longitudine=lon,
+        ))
+    SezioneElettorale.objects.bulk_create(sezioni)
+    return comune
+
+
+def _rdl(comune, i, lat=None, lon=None, **kwargs):
+    return RdlRegistration(
+        email=f'rdl{i}@example.com', nome='Mario', cognome=f'Rossi{i}', telefono='3331234567',
+        comune_nascita='Roma', data_nascita=date(1980, 1, 1),
+        comune_residenza='Roma', indirizzo_residenza=f'Via Test {i}',
+        comune=comune, latitudine=lat, longitudine=lon, **kwargs,
+    )
+
+
+class PlessiIndexTest(TestCase):
+
+    def setUp(self):
+        invalidate_plessi_index()
+        self.comune = _build_roma(300, sezioni_per_plesso=3)
+        self.sezioni = list(SezioneElettorale.objects.filter(comune=self.comune))
+
+    def test_matches_reference(self):
+        index = PlessiIndex.for_comune(self.comune.id)
+        self.assertEqual(len(index), 100)
+        rng = random.Random(1)
+        for _ in range(50):
+            lat, lon = rng.uniform(*ROMA_LAT), rng.uniform(*ROMA_LON)
+            expected = _reference_sezioni_vicine(self.sezioni, lat, lon)
+            got = index.nearest(lat, lon)
+            self.assertEqual([p['sezioni'] for p in got], [p['sezioni'] for p in expected])
+            for g, e in zip(got, expected):
+                self.assertTrue(math.isclose(g['distanza_km'], e['distanza_km'], abs_tol=0.011))
+
+    def test_nearest_many_matches_nearest(self):
+        index = PlessiIndex.for_comune(self.comune.id)
+        points = [(41.9, 12.5), (41.8, 12.4), (42.0, 12.6)]
+        self.assertEqual(index.nearest_many(points), [index.nearest(*p) for p in points])
+
+    def test_empty_comune(self):
+        index = PlessiIndex.from_sezioni([])
+        self.assertEqual(index.nearest(41.9, 12.5), [])
+        self.assertEqual(index.nearest_many([(41.9, 12.5)]), [[]])
+
+    def test_cache_invalidated_on_sezione_save(self):
+        first = get_plessi_index(self.comune.id)
+        with self.assertNumQueries(0):
+            self.assertIs(get_plessi_index(self.comune.id), first)
+        sezione = self.sezioni[0]
+        sezione.indirizzo = 'PIAZZA NUOVA 1'
+        sezione.save()
+        self.assertIsNot(get_plessi_index(self.comune.id), first)
+
+
+@override_settings(
+    BACKGROUND_TASKS_EAGER=True,
+    GEOCODING_PROVIDER='territory.geocoding_service.FakeGeocodingProvider',
+)
+class GeocodeRdlOnSaveTest(TestCase):
+
+    def setUp(self):
+        invalidate_plessi_index()
+        reset_geocoding_service()
+        self.comune = _build_roma(300, sezioni_per_plesso=3)
+        self.sezioni = list(SezioneElettorale.objects.filter(comune=self.comune))
+
+    def tearDown(self):
+        reset_geocoding_service()
+
+    def test_signal_geocodes_and_uses_index(self):
+        rdl = _rdl(self.comune, 1)
+        rdl.save()
+        rdl.refresh_from_db()
+        self.assertEqual(rdl.geocode_source, 'fake')
+        self.assertEqual(len(rdl.sezioni_vicine), 10)
+        self.assertEqual(
+            rdl.sezioni_vicine,
+            _reference_sezioni_vicine(self.sezioni, float(rdl.latitudine), float(rdl.longitudine)),
+        )
+
+    def test_same_address_geocoded_once(self):
+        _rdl(self.comune, 1).save()
+        other = _rdl(self.comune, 2)
+        other.indirizzo_residenza = 'Via Test 1'
+        other.save()
+        provider = get_geocoding_service().provider
+        self.assertIsInstance(provider, FakeGeocodingProvider)
+        self.assertEqual(len(provider.calls), 1)
+
+    def test_status_update_does_not_geocode(self):
+        rdl = _rdl(self.comune, 1)
+        rdl.save()
+        rdl.status = RdlRegistration.Status.APPROVED
+        rdl.save(update_fields=['status'])
+        self.assertEqual(len(get_geocoding_service().provider.calls), 1)
+
+
+class RicalcolaSezioniVicineTest(TestCase):
+    """
+    Recompute sezioni_vicine for every RDL of a comune. Small chunks and
+    batches make a handful of rows cover the chunked distance matrix and
+    the bulk_update batching (the timed Rome-sized run is in benchmarks/).
+    """
+    N_SEZIONI = 60  # 30 plessi, more than the 10 kept per RDL
+    N_RDL = 25
+
+    @mock.patch('territory.spatial._BATCH_ROWS', 8)
+    def test_recompute_all_rdl(self):
+        invalidate_plessi_index()
+        comune = _build_roma(self.N_SEZIONI)
+        rng = random.Random(7)
+        RdlRegistration.objects.bulk_create([
+            _rdl(comune, i, round(rng.uniform(*ROMA_LAT), 6), round(rng.uniform(*ROMA_LON), 6))
+            for i in range(self.N_RDL)
+        ])
+
+        with CaptureQueriesContext(connection) as ctx:
+            updated = ricalcola_sezioni_vicine(RdlRegistration.objects.all(), batch_size=10)
+
+        self.assertEqual(updated, self.N_RDL)
+        # RDL select + section select + 3 bulk_update batches; no per-RDL queries
+        self.assertLess(len(ctx.captured_queries), 10)
+
+        sezioni = list(SezioneElettorale.objects.filter(comune=comune))
+        for rdl in RdlRegistration.objects.all():
+            expected = _reference_sezioni_vicine(
+                sezioni, float(rdl.latitudine), float(rdl.longitudine))
+            self.assertEqual(
+                [p['sezioni'] for p in rdl.sezioni_vicine],
+                [p['sezioni'] for p in expected],
+            )
@@ -5,6 +5,7 @@ For production deployment on Google App Engine with Cloud SQL.
 """
 
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -78,6 +79,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -88,6 +91,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'core.middleware.UserIdentityMapMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -158,6 +162,62 @@ elif os.environ.get('DB_HOST'):
         },
     }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    # Verify persistent connections before reuse (Cloud SQL restarts, failovers)
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+    # Native connection pool (psycopg 3): one pool per process, sized for the
+    # gunicorn threads; replaces persistent connections (CONN_MAX_AGE).
+    # Connections are checked before being handed out.
+    if os.environ.get('DB_POOL', 'False').lower() == 'true':
+        from psycopg_pool import ConnectionPool
+
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 6)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'max_idle': 300,
+            'check': ConnectionPool.check_connection,
+        }
+
+# Read replica (see core/db_router.py): DB_REPLICA_HOST enables it for the
+# views in DATABASE_REPLICA_VIEWS. With SQLite (development, tests) the
+# alias is a second local database, unused unless DATABASE_REPLICA_ALIAS is set.
+# Test runs mirror it to the default test database.
+if os.environ.get('DB_REPLICA_HOST') and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default'].get('PORT', '5432')),
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICA_ALIAS = 'replica'
+else:
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db_replica.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        }
+    DATABASE_REPLICA_ALIAS = ''
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Read-only views served from the replica (URL names)
+DATABASE_REPLICA_VIEWS = [
+    'scrutinio-aggregato',
+    'kpi-dati',
+    'kpi-sezioni',
+    'mappatura-gerarchica',
+]
+# Read-your-writes: after a write, the user reads from the primary for this long
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+# Replica lag (seconds) beyond which reads fall back to the primary
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = 5
+
 
 # =============================================================================
 # AUTHENTICATION
@@ -197,7 +257,7 @@ ACCOUNT_UNIQUE_EMAIL = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -230,8 +290,17 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
+    # Recomputes the delegation-role claims on refresh (core/authentication.py)
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.RoleClaimsTokenRefreshSerializer',
 }
 
+# Cached JWT users (core/authentication.py)
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))  # seconds
+AUTH_JWT_ROLE_CLAIMS = os.environ.get('AUTH_JWT_ROLE_CLAIMS', 'True').lower() == 'true'
+PERMISSIONS_CACHE_TTL = int(os.environ.get('PERMISSIONS_CACHE_TTL', 3600))  # /api/permissions snapshots
+AUTH_CACHE_ALIAS = 'shared'  # See CACHES
+PERMISSIONS_CACHE_ALIAS = 'shared'
+
 # dj-rest-auth settings
 REST_AUTH = {
     'USE_JWT': True,
@@ -420,6 +489,30 @@ VERTEX_AI_LOCATION = os.environ.get('VERTEX_AI_LOCATION', 'europe-west1')  # Bel
 VERTEX_AI_LLM_MODEL = os.environ.get('VERTEX_AI_LLM_MODEL', 'gemini-2.0-flash-001')  # Modello stabile
 VERTEX_AI_EMBEDDING_MODEL = 'text-embedding-005'  # Latest stable (già 768 dim)
 
+# Tool calls returned together by the model (see ai_assistant/orchestrator)
+AI_TOOL_MAX_WORKERS = int(os.environ.get('AI_TOOL_MAX_WORKERS', 4))  # Concurrent read-only calls per process
+AI_TOOL_TIMEOUT = 15  # Seconds per read-only call
+
+# Context sent to the LLM per turn (see ai_assistant/orchestrator/budget.py)
+AI_CONTEXT_TOKEN_BUDGET = int(os.environ.get('AI_CONTEXT_TOKEN_BUDGET', 8000))
+AI_CONTEXT_PROFILE_SHARE = 0.35  # Max share of the budget for the user profile
+AI_CONTEXT_RAG_SHARE = 0.3  # Share reserved for RAG documents
+AI_HISTORY_VERBATIM_TURNS = 6  # Recent user/assistant turns sent verbatim
+AI_SUMMARY_MAX_TOKENS = 400  # Rolling summary of older turns (ChatSession.metadata)
+AI_SUMMARY_BATCH_MESSAGES = 20  # Older messages folded per summary update
+AI_PROFILE_CACHE_TTL = 600  # Per-user profile snapshot (ai_assistant/orchestrator/context.py)
+AI_PROFILE_CACHE_ALIAS = 'shared'
+
+# Local serious/trivial/off-topic triage (see ai_assistant/question_classifier.py)
+AI_TRIAGE_MIN_CONFIDENCE = 0.8  # Below this the LLM classifies
+AI_TRIAGE_CENTROID_SERIOUS = 0.6  # Similarity to the KB centroid: at or above = serious
+AI_TRIAGE_CENTROID_OFF_TOPIC = 0.45  # At or below = off-topic
+
+# Recorded Vertex AI responses for offline conversation replay (manage.py benchmark_conversations)
+AI_REPLAY_FIXTURES_DIR = os.environ.get(
+    'AI_REPLAY_FIXTURES_DIR', str(BASE_DIR / 'ai_assistant' / 'fixtures' / 'replay')
+)
+
 
 # =============================================================================
 # RAG CONFIGURATION
@@ -429,6 +522,34 @@ RAG_TOP_K = 3  # Number of documents retrieved per query (quality over quantity)
 RAG_SIMILARITY_THRESHOLD = 0.70  # Minimum cosine similarity (70% - more strict for relevance)
 RAG_MAX_CONTEXT_TOKENS = 4000  # Max tokens for context
 
+# Query embedding / retrieval caches (see ai_assistant/retrieval.py)
+RAG_CACHE_ALIAS = 'shared'
+RAG_EMBEDDING_CACHE_SIZE = 2048  # In-process entries
+RAG_EMBEDDING_CACHE_TTL = 7 * 86400  # Seconds (embeddings depend only on the model)
+RAG_RETRIEVAL_CACHE_SIZE = 1024
+RAG_RETRIEVAL_CACHE_TTL = 3600  # Also invalidated on every KnowledgeSource change
+
+# Vector backend: 'pgvector', 'numpy' (in-process index) or 'auto' (numpy off Postgres)
+RAG_VECTOR_BACKEND = os.environ.get('RAG_VECTOR_BACKEND', 'auto')
+# Where the numpy backend keeps its memory-mapped matrix (shared by workers)
+RAG_NUMPY_INDEX_DIR = os.environ.get(
+    'RAG_NUMPY_INDEX_DIR', os.path.join(tempfile.gettempdir(), 'ainaudi-rag-index')
+)
+
+# Retrieval mode: 'vector' (HNSW only) or 'hybrid' (vector + full-text, RRF)
+RAG_RETRIEVAL_MODE = os.environ.get('RAG_RETRIEVAL_MODE', 'vector')
+RAG_HNSW_EF_SEARCH = int(os.environ.get('RAG_HNSW_EF_SEARCH', 40))  # Higher = better recall, slower
+RAG_HNSW_ITERATIVE_SCAN = os.environ.get('RAG_HNSW_ITERATIVE_SCAN') or None  # 'relaxed_order' (pgvector >= 0.8)
+RAG_HYBRID_CANDIDATES = 20  # Candidates per ranking before fusion
+RAG_RRF_K = 60  # Reciprocal rank fusion constant
+
+# Knowledge-base ingestion (see ai_assistant/ingestion.py)
+RAG_EMBEDDING_BATCH_SIZE = 100  # Texts per embedding request (Vertex limit: 250)
+RAG_EMBEDDING_BATCH_MAX_CHARS = 50000  # ≈ 15k tokens (Vertex limit: 20k tokens per request)
+RAG_EMBEDDING_MAX_WORKERS = int(os.environ.get('RAG_EMBEDDING_MAX_WORKERS', 4))  # Requests in flight
+RAG_EMBEDDING_MAX_RETRIES = 3
+RAG_EMBEDDING_RETRY_BACKOFF = 1.0  # Seconds, doubled at each retry
+
 # System prompt for AI Assistant
 RAG_SYSTEM_PROMPT = """Sei AInaudi, l'assistente AI della piattaforma AInaudi del Movimento 5 Stelle per i Rappresentanti di Lista (RDL).
 
@@ -583,6 +704,11 @@ GCS_PROJECT_ID = os.environ.get('GOOGLE_CLOUD_PROJECT', 'rdl-europee-2024')
 
 GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY', '')
 
+# Geocoding service (territory/geocoding_service.py)
+GEOCODING_PROVIDER = os.environ.get('GEOCODING_PROVIDER', 'territory.geocoding_service.GoogleGeocodingProvider')
+GEOCODING_QPS = float(os.environ.get('GEOCODING_QPS', 10))  # Global per process, all workers
+GEOCODING_MAX_WORKERS = int(os.environ.get('GEOCODING_MAX_WORKERS', 4))
+
 
 # =============================================================================
 # EMAIL CONFIGURATION (for Magic Link)
@@ -731,10 +857,37 @@ CACHES = {
     }
 }
 
+# Hot-path cache (AUTH_, PERMISSIONS_, AI_PROFILE_, RAG_CACHE_ALIAS): read on
+# every authenticated request. Redis when REDIS_HOST is set; otherwise its own
+# database table, sized so it is never culled in practice (a cull deletes the
+# alphabetically first third of the keys, auth versions included).
+if os.environ.get('REDIS_HOST'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://{}:{}/{}'.format(
+            os.environ['REDIS_HOST'],
+            os.environ.get('REDIS_PORT', '6379'),
+            os.environ.get('REDIS_DB', '0'),
+        ),
+    }
+else:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache_shared',
+        'OPTIONS': {'MAX_ENTRIES': 200000},
+    }
+
 # PDF Preview Expiry (24 hours default)
 PDF_PREVIEW_EXPIRY_SECONDS = int(os.environ.get('PDF_PREVIEW_EXPIRY_SECONDS', 86400))
 
 
+# =============================================================================
+# BACKGROUND TASKS (in-process, see core/background.py)
+# =============================================================================
+BACKGROUND_TASKS_EAGER = os.environ.get('BACKGROUND_TASKS_EAGER', 'False').lower() == 'true'
+BACKGROUND_TASKS_MAX_WORKERS = int(os.environ.get('BACKGROUND_TASKS_MAX_WORKERS', 4))
+
+
 # =============================================================================
 # FIREBASE CLOUD MESSAGING (FCM) - Push Notifications
 # =============================================================================
@@ -765,6 +918,53 @@ CLOUD_TASKS_TARGET_HOST = os.environ.get('CLOUD_TASKS_TARGET_HOST', '')
 INTERNAL_API_SECRET = os.environ.get('INTERNAL_API_SECRET', '')
 
 
+# =============================================================================
+# REQUEST METRICS (Server-Timing + /api/internal/metrics, see core/metrics.py)
+# =============================================================================
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', 'True').lower() == 'true'
+# Fraction of requests with DB/cache figures (total time is always recorded)
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '0.1'))
+# Hot election-day paths: polled by every RDL, sampled less
+METRICS_SAMPLE_RATES = {
+    'scrutinio-info': 0.01,
+    'scrutinio-miei-seggi-light': 0.01,
+    'scrutinio-sezione-detail': 0.01,
+    'scrutinio-sezione-save': 0.01,
+    'scrutinio-save': 0.01,
+}
+
+
+# =============================================================================
+# COLD START BUDGETS (manage.py profile_startup, see core/startup.py)
+# =============================================================================
+
+# Seconds to import each Cloud Run service's WSGI app and URLconf
+STARTUP_BUDGETS = {
+    'api': 1.5,
+    'rdl': 1.5,
+    'pdf': 1.5,
+    'ai': 1.5,
+    'admin': 2.0,
+}
+# Heavy integrations loaded on first use (accessor functions, imports inside
+# the views/services using them), never while a service starts
+STARTUP_LAZY_MODULES = [
+    'vertexai',
+    'firebase_admin',
+    'pandas',
+    'numpy',
+    'pikepdf',
+    'reportlab',
+    'PyPDF2',
+    'PIL',
+    'openpyxl',
+    'google.cloud.storage',
+    'google.cloud.tasks_v2',
+]
+
+
 # =============================================================================
 # NOTIFICATION SCHEDULING OFFSETS
 # =============================================================================
@@ -791,3 +991,16 @@ ASSIGNMENT_NOTIFICATION_OFFSETS = [
 
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
 TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET', '')
+# Concurrent chats processed by the update dispatcher (telegram_bot/dispatcher.py)
+TELEGRAM_UPDATE_WORKERS = int(os.environ.get('TELEGRAM_UPDATE_WORKERS', 4))
+# An update PROCESSING for longer than this is claimed again (its worker died)
+TELEGRAM_UPDATE_LEASE_SECONDS = int(os.environ.get('TELEGRAM_UPDATE_LEASE_SECONDS', 600))
+# Bot API client (telegram_bot/telegram_client.py): the global limit is shared by
+# every worker and instance through TELEGRAM_RATE_CACHE_ALIAS, the per-chat one per process
+TELEGRAM_RATE_GLOBAL = float(os.environ.get('TELEGRAM_RATE_GLOBAL', 25))  # messages/s, all chats
+TELEGRAM_RATE_CACHE_ALIAS = 'shared'
+TELEGRAM_RATE_PER_CHAT = float(os.environ.get('TELEGRAM_RATE_PER_CHAT', 1))  # messages/s, one chat
+TELEGRAM_RATE_CHAT_BURST = int(os.environ.get('TELEGRAM_RATE_CHAT_BURST', 3))
+TELEGRAM_MAX_RETRIES = int(os.environ.get('TELEGRAM_MAX_RETRIES', 3))
+TELEGRAM_BROADCAST_BATCH = int(os.environ.get('TELEGRAM_BROADCAST_BATCH', 100))
+# TELEGRAM_API_URL = 'https://api.telegram.org/bot{token}'
@@ -11,6 +11,7 @@ from core.admin_views import (
     AdminMagicLinkRequestView,
     AdminMagicLinkVerifyView,
 )
+from core.metrics import MetricsView
 from core.views import PermissionsView, ClientErrorView
 from data.views import (
     RdlEmailsView,
@@ -72,6 +73,9 @@ urlpatterns = [
     # Internal endpoints (called by Cloud Tasks)
     path('api/internal/', include('notifications.urls_internal')),
 
+    # Request metrics (Prometheus, INTERNAL_API_SECRET)
+    path('api/internal/metrics', MetricsView.as_view(), name='internal-metrics'),
+
     # Admin endpoints (notifications)
     path('api/admin/', include('notifications.urls_admin')),
 
@@ -8,6 +8,7 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.metrics import MetricsView
 from core.admin_views import (
     AdminMagicLinkRequestView,
     AdminMagicLinkVerifyView,
@@ -20,6 +21,9 @@ urlpatterns = [
 
     # Django Admin
     path('admin/', admin.site.urls),
+
+    # Request metrics (Prometheus, INTERNAL_API_SECRET)
+    path('api/internal/metrics', MetricsView.as_view(), name='internal-metrics'),
 ]
 
 # Serve media files in development
@@ -5,6 +5,9 @@ Only exposes /api/ai/* endpoints.
 """
 from django.urls import path, include
 
+from core.metrics import MetricsView
+
 urlpatterns = [
     path('api/ai/', include('ai_assistant.urls')),
+    path('api/internal/metrics', MetricsView.as_view(), name='internal-metrics'),
 ]
@@ -6,6 +6,7 @@ All API endpoints except /admin/ and /api/ai/.
 from django.urls import path, include
 from django.conf import settings
 
+from core.metrics import MetricsView
 from core.views import PermissionsView, ClientErrorView
 from data.views import (
     RdlEmailsView,
@@ -53,6 +54,9 @@ urlpatterns = [
     # Internal endpoints (called by Cloud Tasks, not by users)
     path('api/internal/', include('notifications.urls_internal')),
 
+    # Request metrics (Prometheus, INTERNAL_API_SECRET)
+    path('api/internal/metrics', MetricsView.as_view(), name='internal-metrics'),
+
     # Admin endpoints (elevated permissions)
     path('api/admin/', include('notifications.urls_admin')),
 
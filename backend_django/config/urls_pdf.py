@@ -5,6 +5,7 @@ Only exposes /api/deleghe/processi/* (routed via dispatch.yaml).
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from core.metrics import MetricsView
 from delegations.views_processo import ProcessoDesignazioneViewSet
 
 router = DefaultRouter()
@@ -12,4 +13,5 @@ router.register(r'processi', ProcessoDesignazioneViewSet, basename='processo')
 
 urlpatterns = [
     path('api/deleghe/', include(router.urls)),
+    path('api/internal/metrics', MetricsView.as_view(), name='internal-metrics'),
 ]
@@ -4,6 +4,7 @@ URL configuration for RDL service (scrutinio + risorse).
 High-traffic endpoints used by RDLs on election day.
 """
 from django.urls import path, include
+from core.metrics import MetricsView
 from data.urls import scrutinio_urlpatterns
 
 urlpatterns = [
@@ -13,4 +14,7 @@ urlpatterns = [
     # Risorse (FAQ, documenti)
     path('api/resources/', include('resources.urls')),
     path('api/risorse/', include('resources.urls')),
+
+    # Request metrics (Prometheus, INTERNAL_API_SECRET)
+    path('api/internal/metrics', MetricsView.as_view(), name='internal-metrics'),
 ]
@@ -5,3 +5,6 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'Utenti e Autenticazione'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,283 @@
+"""
+JWT authentication with a shared user cache and delegation-role claims.
+
+JWTAuthentication loads the User row on every request, and the
+permission classes then load its permissions; the RDL screens poll
+every few seconds on election day. CachedJWTAuthentication resolves the
+user from the cache instead (AUTH_CACHE_ALIAS: 'shared' in the settings,
+so all services see the same entries and versions; 'default' if unset),
+pickled with its permission cache already filled, for AUTH_USER_CACHE_TTL
+seconds.
+
+Each user has an auth version in the cache. Saving the User, changing its
+groups/permissions, its RoleAssignments or the Delegato/SubDelega/
+DesignazioneRDL rows for its email sets a new version (core.signals), which
+makes the cached entry stale. Changing the permissions of a Group sets a
+new global version (all users).
+
+With AUTH_JWT_ROLE_CLAIMS, access tokens also carry the user's delegation
+flags for the active consultazioni and the auth version they were computed
+at:
+
+    "roles": {"3": {"is_delegato": false, "is_sub_delegato": false, "is_rdl": true}},
+    "auth_ver": 1718000000000000000
+
+They are recomputed on every token refresh (RoleClaimsRefreshToken) and
+trusted only while the version matches: authenticated users get them as
+user.delegation_flags, which get_user_delegation_roles uses instead of
+querying the delegation chain.
+
+cached_for_user() stores other per-user values under the same versions
+(e.g. the /api/permissions snapshot in PERMISSIONS_CACHE_ALIAS,
+core.views.PermissionsView).
+
+Usage (settings):
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = ['core.authentication.CachedJWTAuthentication', ...]
+    SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'] = 'core.authentication.RoleClaimsTokenRefreshSerializer'
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+ROLES_CLAIM = 'roles'
+VERSION_CLAIM = 'auth_ver'
+
+_GLOBAL_VERSION_KEY = 'auth:version:global'
+
+
+def _cache(alias=None):
+    return caches[alias or getattr(settings, 'AUTH_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id):
+    return f'auth:version:{user_id}'
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def _current_versions(cache, found, keys):
+    """
+    Versions for `keys` from a get_many() result; a missing one (never set,
+    or evicted) is created, so entries and claims from before can't match.
+    """
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _new_version(), timeout=None)
+            version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+def auth_version(user_id):
+    """Current auth version of a user (what role claims are checked against)."""
+    cache = _cache()
+    key = _version_key(user_id)
+    return _current_versions(cache, cache.get_many([key]), [key])[0]
+
+
+def _on_commit(func):
+    """Run a cache write after commit; a cache outage must not break the write path."""
+    def run():
+        try:
+            func()
+        except Exception as e:
+            logger.warning("Auth cache invalidation failed: %s", e)
+
+    transaction.on_commit(run)
+
+
+def invalidate_users(user_ids):
+    """Give users a new auth version once the current transaction commits."""
+    keys = {_version_key(user_id): None for user_id in user_ids if user_id}
+    if keys:
+        _on_commit(lambda: _cache().set_many({key: _new_version() for key in keys}, timeout=None))
+
+
+def invalidate_emails(emails):
+    """invalidate_users for the users with these emails."""
+    emails = {email for email in emails if email}
+    if emails:
+        _on_commit(lambda: invalidate_users(
+            get_user_model().objects.filter(email__in=emails).values_list('id', flat=True)
+        ))
+
+
+def invalidate_all():
+    """New global version: every cached user is stale (e.g. group permissions changed)."""
+    _on_commit(lambda: _cache().set(_GLOBAL_VERSION_KEY, _new_version(), timeout=None))
+
+
+def _versioned_get(user_id, key, alias=None):
+    """
+    (value, versions) for a per-user cache entry (in the `alias` cache, the
+    auth cache by default): value is None when missing or stored under other
+    versions; versions is None when the cache is unavailable (then nothing
+    should be stored).
+    """
+    cache = _cache()
+    entries = _cache(alias)
+    version_key = _version_key(user_id)
+    try:
+        if entries is cache:
+            found = cache.get_many([key, version_key, _GLOBAL_VERSION_KEY])
+        else:
+            found = {**cache.get_many([version_key, _GLOBAL_VERSION_KEY]), key: entries.get(key)}
+        versions = _current_versions(cache, found, [version_key, _GLOBAL_VERSION_KEY])
+    except Exception as e:
+        logger.warning("Auth cache unavailable: %s", e)
+        return None, None
+    entry = found.get(key)
+    if entry is not None and entry['versions'] == versions:
+        return entry['value'], versions
+    return None, versions
+
+
+def _versioned_set(key, value, versions, timeout, alias=None):
+    if versions is None:
+        return
+    try:
+        _cache(alias).set(key, {'value': value, 'versions': versions}, timeout=timeout)
+    except Exception as e:
+        logger.warning("Auth cache unavailable: %s", e)
+
+
+def cached_for_user(user_id, name, build, timeout=None, alias=None):
+    """
+    Per-user value (e.g. a permissions snapshot) cached until the user's
+    auth version changes: build() is called on a miss.
+    """
+    key = f'auth:{name}:{user_id}'
+    value, versions = _versioned_get(user_id, key, alias)
+    if value is None:
+        value = build()
+        _versioned_set(key, value, versions, timeout, alias)
+    return value
+
+
+def get_cached_user(user_id):
+    """
+    User by id through the cache (None if it doesn't exist), and its
+    current auth version (None if the cache is unavailable).
+
+    Users loaded from the database have their permissions loaded too, so
+    has_perm() on the cached copy makes no query.
+    """
+    user, versions = _versioned_get(user_id, _user_key(user_id))
+    if user is None:
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            return None, None
+        user.get_all_permissions()
+        _versioned_set(_user_key(user_id), user, versions, getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+    return user, versions[0] if versions else None
+
+
+def delegation_flags(user):
+    """
+    {consultazione_id (str): {'is_delegato', 'is_sub_delegato', 'is_rdl'}}
+    for the active consultazioni, same rules as get_user_delegation_roles.
+    """
+    from delegations.models import Delegato, DesignazioneRDL, SubDelega
+    from elections.models import ConsultazioneElettorale
+
+    ids = list(ConsultazioneElettorale.objects.filter(is_attiva=True).values_list('id', flat=True))
+    if not ids:
+        return {}
+
+    delegato = set(
+        Delegato.objects.filter(email=user.email, consultazione_id__in=ids)
+        .values_list('consultazione_id', flat=True)
+    )
+    sub_delegato = set(
+        SubDelega.objects.filter(email=user.email, is_attiva=True, delegato__consultazione_id__in=ids)
+        .values_list('delegato__consultazione_id', flat=True)
+    )
+    rdl = set()
+    for direct, via_sub_delega in DesignazioneRDL.objects.filter(
+        Q(effettivo_email=user.email) | Q(supplente_email=user.email),
+        Q(delegato__consultazione_id__in=ids) | Q(sub_delega__delegato__consultazione_id__in=ids),
+        is_attiva=True,
+    ).values_list('delegato__consultazione_id', 'sub_delega__delegato__consultazione_id'):
+        rdl.update({direct, via_sub_delega})
+
+    return {
+        str(consultazione_id): {
+            'is_delegato': consultazione_id in delegato,
+            'is_sub_delegato': consultazione_id in sub_delegato,
+            'is_rdl': consultazione_id in rdl,
+        }
+        for consultazione_id in ids
+    }
+
+
+class RoleClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry fresh delegation-role claims."""
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        if getattr(settings, 'AUTH_JWT_ROLE_CLAIMS', False):
+            user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+            user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+            if user is not None:
+                try:
+                    # Version first: a change committed while computing makes the claims stale, not wrong
+                    access[VERSION_CLAIM] = auth_version(user.pk)
+                except Exception as e:
+                    logger.warning("Auth cache unavailable, token without role claims: %s", e)
+                    return access
+                access[ROLES_CLAIM] = delegation_flags(user)
+        return access
+
+
+class RoleClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """/api/auth/token/refresh/: recomputes the role claims of the new access token."""
+    token_class = RoleClaimsRefreshToken
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication resolving users through get_cached_user."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user, version = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Same check as JWTAuthentication, on the cached row
+            from rest_framework_simplejwt.utils import get_md5_hash_password
+
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        if version is not None and validated_token.get(VERSION_CLAIM) == version:
+            user.delegation_flags = validated_token.get(ROLES_CLAIM) or {}
+        return user
@@ -0,0 +1,63 @@
+"""
+In-process background execution.
+
+The services run on Cloud Run / App Engine without a worker tier, so work
+that must not block the request (image processing, geocoding, embeddings)
+is handed to a small bounded thread pool once the surrounding transaction
+commits.
+
+Settings:
+    BACKGROUND_TASKS_EAGER: run tasks inline in the caller (tests, commands)
+    BACKGROUND_TASKS_MAX_WORKERS: size of the shared pool
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Lazy-init the shared pool (one per process)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_TASKS_MAX_WORKERS', 4),
+                    thread_name_prefix='background',
+                )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        # Worker threads get their own DB connections: release them so
+        # idle pool threads don't hold Postgres slots.
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) off the request thread after commit.
+
+    Exceptions are logged, never raised to the caller. With
+    BACKGROUND_TASKS_EAGER the call happens immediately and synchronously.
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        func(*args, **kwargs)
+        return
+
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, func, args, kwargs)
+    )
@@ -0,0 +1,217 @@
+"""
+Read-replica database router.
+
+With a replica configured (DATABASE_REPLICA_ALIAS naming an entry of
+DATABASES, e.g. a Cloud SQL read replica via DB_REPLICA_HOST), the reads of
+designated read-only views (DATABASE_REPLICA_VIEWS, URL names: aggregato,
+KPI, mappatura) and of designated management commands (@replica_reads) go to
+the replica, so they don't compete with the scrutinio writes. Everything
+else, and every write, goes to the primary ('default').
+
+The replica is skipped (reads go to the primary) when:
+- the request already wrote: the rest of it reads its own writes
+- the user wrote in the last DATABASE_REPLICA_PIN_SECONDS: a request that
+  writes pins its user to the primary (cache key, shared by all workers),
+  so a saved scrutinio shows up in the aggregato right after
+- the replica lags more than DATABASE_REPLICA_MAX_LAG seconds, or is
+  unreachable: checked at most every DATABASE_REPLICA_LAG_CHECK_INTERVAL
+  seconds per process
+- the model is the database cache table (auth versions must be fresh)
+
+Usage (settings):
+    DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+    MIDDLEWARE = [..., 'core.middleware.ReadReplicaMiddleware', ...]
+
+Usage (management commands):
+    @replica_reads
+    def handle(self, *args, **options): ...
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+_CACHE_APP_LABEL = 'django_cache'  # DatabaseCache's pseudo-model
+
+_REPLICA_LAG_SQL = {
+    # 0 when caught up: replay_timestamp ages while the primary is idle
+    'postgresql': """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    """,
+}
+
+_state = contextvars.ContextVar('db_read_state', default=None)
+
+
+def replica_alias():
+    """The replica's alias, or None when no replica is configured."""
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', '')
+    return alias if alias and alias in settings.DATABASES else None
+
+
+def _pin_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Read-your-writes: the user's reads skip the replica for a while."""
+    try:
+        cache.set(_pin_key(user_id), True, timeout=getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10))
+    except Exception as e:
+        logger.warning("Replica pin not stored: %s", e)
+
+
+def is_pinned(user_id) -> bool:
+    try:
+        return bool(cache.get(_pin_key(user_id)))
+    except Exception as e:
+        logger.warning("Replica pin not readable, reading from primary: %s", e)
+        return True
+
+
+class _ReplicaHealth:
+    """Per-process replica lag, measured at most every check interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._lag = None
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = None
+            self._lag = None
+
+    def lag(self, alias) -> float:
+        """Seconds behind the primary (inf if unreachable or not measured yet)."""
+        interval = getattr(settings, 'DATABASE_REPLICA_LAG_CHECK_INTERVAL', 5)
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < interval:
+                return self._lag if self._lag is not None else float('inf')
+            self._checked_at = now  # one thread measures, the others use the last value
+        lag = self._measure(alias)
+        with self._lock:
+            self._lag = lag
+        return lag
+
+    @staticmethod
+    def _measure(alias) -> float:
+        connection = connections[alias]
+        sql = _REPLICA_LAG_SQL.get(connection.vendor)
+        if sql is None:
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                return float(cursor.fetchone()[0] or 0)
+        except DatabaseError as e:
+            logger.warning("Replica %s unavailable, reading from primary: %s", alias, e)
+            return float('inf')
+
+
+health = _ReplicaHealth()
+
+
+def replica_usable(alias) -> bool:
+    return health.lag(alias) <= getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
+
+
+class ReadState:
+    """Routing state of one request or command (held in a context variable)."""
+
+    def __init__(self, request=None, replica=False):
+        self.request = request
+        self.replica = replica  # reads may go to the replica
+        self.wrote = False
+        self._alias = None
+
+    def user(self):
+        """The authenticated user, False before authentication has run."""
+        user = self.request.__dict__.get('user')
+        if user is None or isinstance(user, SimpleLazyObject):
+            # Not authenticated yet (DRF sets the real user on the request)
+            return False
+        return user
+
+    def read_alias(self):
+        if not self.replica or self.wrote:
+            return PRIMARY
+        if self._alias is None:
+            alias = replica_alias()
+            if alias is None:
+                return PRIMARY
+            if self.request is not None:
+                user = self.user()
+                if user is False:
+                    return PRIMARY  # decided once the user is known
+                if user.is_authenticated and is_pinned(user.pk):
+                    alias = PRIMARY
+            if alias != PRIMARY and not replica_usable(alias):
+                alias = PRIMARY
+            self._alias = alias
+        return self._alias
+
+
+@contextlib.contextmanager
+def read_state(request=None, replica=False):
+    """Route the reads of the block; yields the ReadState."""
+    state = ReadState(request, replica)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def current_state():
+    return _state.get()
+
+
+def use_replica():
+    """Reads of the block go to the replica (when configured and healthy)."""
+    return read_state(replica=True)
+
+
+def replica_reads(func):
+    """Decorator for read-only management commands: handle() reads from the replica."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads to the replica inside replica-enabled requests/commands, writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or model._meta.app_label == _CACHE_APP_LABEL:
+            return PRIMARY
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label != _CACHE_APP_LABEL:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
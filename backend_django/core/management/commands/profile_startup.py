@@ -0,0 +1,86 @@
+"""
+Management command to profile the cold start of the Cloud Run services.
+
+Starts each service (config/wsgi_<service>.py) in a fresh interpreter and
+reports its startup time, the slowest packages it imports and the budget
+violations (core/startup.py): over STARTUP_BUDGETS, a STARTUP_LAZY_MODULES
+module imported at startup, a database query at startup.
+
+The time of a service is the fastest of --runs starts, the others being
+slowed down by a cold filesystem cache or a busy machine.
+
+Usage:
+    # All services
+    python manage.py profile_startup
+
+    # Only the RDL service, with its 20 slowest packages
+    python manage.py profile_startup --service rdl --top 20
+
+    # CI: exit with an error on any budget violation
+    python manage.py profile_startup --check
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import SERVICES, profile_service
+
+
+class Command(BaseCommand):
+    help = 'Profile the cold start of the Cloud Run services against their budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--service',
+            action='append',
+            choices=SERVICES,
+            help='Service to profile (repeatable, default: all)',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Starts per service, the fastest counts (default: 3)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Slowest packages to list per service (default: 10)',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Fail when a service exceeds its budget',
+        )
+
+    def handle(self, *args, **options):
+        budgets = getattr(settings, 'STARTUP_BUDGETS', {})
+        lazy_modules = getattr(settings, 'STARTUP_LAZY_MODULES', [])
+
+        problems = []
+        for service in options['service'] or SERVICES:
+            try:
+                profile = min(
+                    (profile_service(service) for _ in range(max(options['runs'], 1))),
+                    key=lambda profile: profile.seconds,
+                )
+            except RuntimeError as e:
+                raise CommandError(str(e))
+
+            budget = budgets.get(service)
+            budget_label = f' (budget {budget:.2f}s)' if budget is not None else ''
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{service}: {profile.seconds:.3f}s{budget_label}, {len(profile.modules)} modules'
+            ))
+            for package, seconds in profile.packages[:options['top']]:
+                self.stdout.write(f'  {seconds * 1000:8.1f}ms  {package}')
+
+            service_problems = profile.problems(budget, lazy_modules)
+            for problem in service_problems:
+                self.stdout.write(self.style.ERROR(f'  {problem}'))
+            problems.extend(service_problems)
+
+        if problems and options['check']:
+            raise CommandError(f'{len(problems)} startup budget violation(s):\n' + '\n'.join(problems))
+        if not problems:
+            self.stdout.write(self.style.SUCCESS('All services within budget'))
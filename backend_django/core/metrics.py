@@ -0,0 +1,281 @@
+"""
+Per-endpoint request metrics: Server-Timing headers and Prometheus histograms.
+
+RequestMetricsMiddleware times every request and, for a sample of them,
+also counts what the view did:
+
+- db: queries and time spent in the database (all connections, through
+  connection.execute_wrapper)
+- cache: hits and misses of get()/get_many() on every configured cache
+
+Each response carries the figures in a Server-Timing header (browser
+devtools show them next to the request):
+
+    Server-Timing: total;dur=41.2, db;dur=12.5;desc="7 queries", cache;desc="2 hit, 1 miss"
+
+and they are aggregated in-process, per resolved URL name and method,
+into histograms served in Prometheus text format by MetricsView
+(GET /api/internal/metrics, header X-Internal-Secret: INTERNAL_API_SECRET).
+Each process (gunicorn worker) reports its own series.
+
+Counting queries and cache calls costs a few microseconds per call, so
+only METRICS_SAMPLE_RATE of the requests are instrumented (per-view
+overrides in METRICS_SAMPLE_RATES, lower for the scrutinio views polled
+on election day); total time is recorded for every request.
+
+Settings:
+    METRICS_ENABLED: install the instrumentation (default True)
+    METRICS_SAMPLE_RATE: fraction of requests with db/cache figures
+    METRICS_SAMPLE_RATES: {url name: rate} overrides
+    METRICS_SERVER_TIMING: add the Server-Timing header (default True)
+
+Usage (settings):
+    MIDDLEWARE = ['core.middleware.RequestMetricsMiddleware', ...]
+"""
+import bisect
+import contextlib
+import hmac
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views import View
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# name: (type, help, buckets)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request duration', DURATION_BUCKETS),
+    'http_request_db_queries': ('histogram', 'Database queries per sampled request', QUERY_BUCKETS),
+    'http_request_db_duration_seconds': ('histogram', 'Database time per sampled request', DURATION_BUCKETS),
+    'http_request_cache_hits_total': ('counter', 'Cache hits in sampled requests', None),
+    'http_request_cache_misses_total': ('counter', 'Cache misses in sampled requests', None),
+    'http_requests_sampled_total': ('counter', 'Requests with db/cache figures', None),
+}
+
+UNRESOLVED = '<unresolved>'
+
+# Method label values: any other verb is 'other' (one series per distinct
+# label value, and the method comes from the client)
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'})
+OTHER_METHOD = 'other'
+
+_MISSING = object()
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics: value <= le)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """In-process metric store, shared by the threads of a worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}  # (name, labels) -> Histogram | number
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._series.get(key)
+            if histogram is None:
+                histogram = self._series[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            series = sorted(
+                (key, (value.buckets, list(value.counts), value.sum, value.count)
+                 if isinstance(value, Histogram) else value)
+                for key, value in self._series.items()
+            )
+        lines = []
+        for name, (kind, help_text, _) in METRICS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for (series_name, labels), value in series:
+                if series_name != name:
+                    continue
+                label_text = _format_labels(labels)
+                if kind == 'counter':
+                    lines.append(f'{name}{{{label_text}}} {_format_value(value)}')
+                    continue
+                buckets, counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    le = bound if isinstance(bound, str) else _format_value(float(bound))
+                    lines.append(f'{name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label_text}}} {_format_value(total)}')
+                lines.append(f'{name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestSample:
+    """DB and cache figures of one instrumented request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._in_cache = False
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def _wrap_get(self, get):
+        def counted_get(key, default=None, version=None):
+            if self._in_cache:  # e.g. DatabaseCache.get() calls get_many()
+                return get(key, default, version=version)
+            self._in_cache = True
+            try:
+                value = get(key, _MISSING, version=version)
+            finally:
+                self._in_cache = False
+            if value is _MISSING:
+                self.cache_misses += 1
+                return default
+            self.cache_hits += 1
+            return value
+
+        return counted_get
+
+    def _wrap_get_many(self, get_many):
+        def counted_get_many(keys, version=None):
+            if self._in_cache:
+                return get_many(keys, version=version)
+            keys = list(keys)
+            self._in_cache = True
+            try:
+                found = get_many(keys, version=version)
+            finally:
+                self._in_cache = False
+            self.cache_hits += len(found)
+            self.cache_misses += len(set(keys)) - len(found)
+            return found
+
+        return counted_get_many
+
+    @contextlib.contextmanager
+    def _count_cache(self):
+        # Cache backends are per-thread instances: patching them only affects this request
+        backends = [caches[alias] for alias in settings.CACHES]
+        for backend in backends:
+            backend.get = self._wrap_get(type(backend).get.__get__(backend))
+            backend.get_many = self._wrap_get_many(type(backend).get_many.__get__(backend))
+        try:
+            yield
+        finally:
+            for backend in backends:
+                backend.__dict__.pop('get', None)
+                backend.__dict__.pop('get_many', None)
+
+    def start(self):
+        stack = contextlib.ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        stack.enter_context(self._count_cache())
+        self._stack = stack
+        return self
+
+    def stop(self):
+        if self._stack is not None:
+            self._stack.close()
+            self._stack = None
+
+
+def view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNRESOLVED
+
+
+def method_label(request) -> str:
+    return request.method if request.method in HTTP_METHODS else OTHER_METHOD
+
+
+def should_sample(name) -> bool:
+    rates = getattr(settings, 'METRICS_SAMPLE_RATES', {})
+    rate = rates.get(name, getattr(settings, 'METRICS_SAMPLE_RATE', 0.1))
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def server_timing(duration, sample=None) -> str:
+    parts = [f'total;dur={duration * 1000:.1f}']
+    if sample is not None:
+        parts.append(f'db;dur={sample.db_time * 1000:.1f};desc="{sample.queries} queries"')
+        parts.append(f'cache;desc="{sample.cache_hits} hit, {sample.cache_misses} miss"')
+    return ', '.join(parts)
+
+
+def record(request, duration, sample=None) -> None:
+    labels = (('view', view_name(request)), ('method', method_label(request)))
+    registry.observe('http_request_duration_seconds', labels, duration)
+    if sample is not None:
+        registry.inc('http_requests_sampled_total', labels)
+        registry.observe('http_request_db_queries', labels, sample.queries)
+        registry.observe('http_request_db_duration_seconds', labels, sample.db_time)
+        registry.inc('http_request_cache_hits_total', labels, sample.cache_hits)
+        registry.inc('http_request_cache_misses_total', labels, sample.cache_misses)
+
+
+class MetricsView(View):
+    """
+    GET /api/internal/metrics
+
+    Prometheus scrape endpoint of this process. Requires the header
+    X-Internal-Secret: INTERNAL_API_SECRET (any request in DEBUG).
+    """
+
+    def get(self, request):
+        secret = getattr(settings, 'INTERNAL_API_SECRET', '')
+        provided = request.META.get('HTTP_X_INTERNAL_SECRET', '')
+        if not (secret and hmac.compare_digest(provided.encode(), secret.encode())) and not settings.DEBUG:
+            return HttpResponseForbidden()
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,91 @@
+"""
+Middleware for core app.
+
+UserIdentityMapMiddleware opens one email -> user identity map per request
+(core.models.user_identity_map), so the assigned_by / approved_by /
+created_by ... properties resolve each email once per request, and list
+serializers can load a whole page of users with one query
+(core.serializers.UserPrefetchListSerializer).
+
+RequestMetricsMiddleware records duration, DB queries/time and cache
+hits/misses per URL name (core.metrics): Server-Timing headers and the
+/api/internal/metrics endpoint. It goes first, to time the whole stack.
+
+ReadReplicaMiddleware sends the reads of the views in DATABASE_REPLICA_VIEWS
+to the read replica and pins users who wrote to the primary
+(core.db_router). Not installed when no replica is configured.
+
+Usage (settings):
+    MIDDLEWARE = [
+        'core.middleware.RequestMetricsMiddleware',
+        'core.middleware.ReadReplicaMiddleware',
+        ...,
+        'core.middleware.UserIdentityMapMiddleware',
+    ]
+"""
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import db_router, metrics
+from .models import user_identity_map
+
+
+class UserIdentityMapMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with user_identity_map():
+            return self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            sample = getattr(request, '_metrics_sample', None)
+            if sample is not None:
+                sample.stop()
+        duration = time.perf_counter() - started
+
+        metrics.record(request, duration, sample)
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing(duration, sample)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The URL is resolved here: sampling rates are per view
+        if metrics.should_sample(metrics.view_name(request)):
+            request._metrics_sample = metrics.RequestSample().start()
+
+
+class ReadReplicaMiddleware:
+    def __init__(self, get_response):
+        if db_router.replica_alias() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.views = frozenset(getattr(settings, 'DATABASE_REPLICA_VIEWS', ()))
+
+    def __call__(self, request):
+        with db_router.read_state(request) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            user = state.user()
+            if user and user.is_authenticated:
+                db_router.pin_to_primary(user.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = db_router.current_state()
+        if state is not None and metrics.view_name(request) in self.views:
+            state.replica = True
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_add_can_download_designazioni_permission'),
+        ('elections', '0004_add_data_version_and_has_subdelegations'),
+        ('territory', '0008_add_comune_nome_upper_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='roleassignment',
+            index=models.Index(fields=['role', 'scope_type'], name='core_roleas_role_83c343_idx'),
+        ),
+    ]
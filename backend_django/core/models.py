@@ -3,6 +3,9 @@ Core models: User, RoleAssignment
 
 Custom User model supporting multi-provider authentication and hierarchical roles.
 """
+import contextlib
+import contextvars
+
 from django.contrib.auth.models import AbstractUser, BaseUserManager, Group as AuthGroup
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -18,6 +21,21 @@ class Gruppo(AuthGroup):
         verbose_name_plural = _('gruppi')
 
 
+# Request-scoped identity map email -> User (or placeholder), see user_identity_map()
+_users_by_email = contextvars.ContextVar('users_by_email', default=None)
+
+
+def _placeholder_user(email):
+    """Oggetto User non salvato per un'email senza utente (vedi get_user_by_email)."""
+    placeholder = User(email=email)
+    placeholder.display_name = f'[Rimosso: {email}]'
+    placeholder.first_name = 'N/A'
+    placeholder.last_name = ''
+    placeholder.is_active = False
+    placeholder.pk = None  # Non salvato
+    return placeholder
+
+
 def get_user_by_email(email):
     """
     Restituisce l'utente associato all'email, o un oggetto placeholder se non esiste.
@@ -27,22 +45,62 @@ def get_user_by_email(email):
     - display_name: '[Rimosso: {email}]'
     - is_active: False
     - pk: None (non salvato)
+
+    Dentro user_identity_map() il risultato è memorizzato per la durata
+    della richiesta: la stessa email non genera una seconda query.
     """
     if not email:
         return None
 
-    user = User.objects.filter(email=email).first()
-    if user:
-        return user
+    identity_map = _users_by_email.get()
+    if identity_map is not None and email in identity_map:
+        return identity_map[email]
 
-    # Crea un oggetto placeholder (non salvato in DB)
-    placeholder = User(email=email)
-    placeholder.display_name = f'[Rimosso: {email}]'
-    placeholder.first_name = 'N/A'
-    placeholder.last_name = ''
-    placeholder.is_active = False
-    placeholder.pk = None  # Non salvato
-    return placeholder
+    user = User.objects.filter(email=email).first() or _placeholder_user(email)
+    if identity_map is not None:
+        identity_map[email] = user
+    return user
+
+
+@contextlib.contextmanager
+def user_identity_map():
+    """
+    Scope dell'identity map usata da get_user_by_email (una per richiesta,
+    vedi core.middleware.UserIdentityMapMiddleware). Se uno scope è già
+    attivo viene riusato.
+    """
+    if _users_by_email.get() is not None:
+        yield
+        return
+    token = _users_by_email.set({})
+    try:
+        yield
+    finally:
+        _users_by_email.reset(token)
+
+
+def prefetch_users_by_email(emails):
+    """
+    Carica con una sola query (email__in) gli utenti di queste email
+    nell'identity map corrente; le email senza utente ricevono il placeholder.
+    Senza uno scope attivo non fa nulla.
+    """
+    identity_map = _users_by_email.get()
+    if identity_map is None:
+        return
+    missing = {email for email in emails if email and email not in identity_map}
+    if not missing:
+        return
+    found = {user.email: user for user in User.objects.filter(email__in=missing)}
+    for email in missing:
+        identity_map[email] = found.get(email) or _placeholder_user(email)
+
+
+def clear_user_identity_map():
+    """Svuota l'identity map corrente (un utente è stato creato, modificato o eliminato)."""
+    identity_map = _users_by_email.get()
+    if identity_map is not None:
+        identity_map.clear()
 
 
 class UserManager(BaseUserManager):
@@ -249,6 +307,7 @@ class RoleAssignment(models.Model):
         indexes = [
             models.Index(fields=['user', 'role']),
             models.Index(fields=['scope_type', 'scope_value']),
+            models.Index(fields=['role', 'scope_type']),
         ]
 
     def __str__(self):
@@ -0,0 +1,53 @@
+"""
+Keys and invalidation of the AI assistant profile snapshots.
+
+The snapshots (role, consultazione, assigned sections, scrutinio data of a
+user) are built and read by the AI service (ai_assistant.orchestrator.context),
+but the rows they summarize are written by the RDL and API services, which
+don't install ai_assistant. The invalidation therefore lives in core:
+core.signals and delegations.signals.designazioni_changed drop the
+snapshots wherever the write happens.
+
+Settings:
+    AI_PROFILE_CACHE_ALIAS: cache holding the snapshots ('shared' in the
+        settings, 'default' if unset)
+
+Usage:
+    invalidate_profiles([(consultazione_id, email), ...])
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def profile_cache_key(consultazione_id, email: str) -> str:
+    digest = hashlib.sha1(email.strip().lower().encode()).hexdigest()
+    return f"ai:profile:{consultazione_id}:{digest}"
+
+
+def profile_cache():
+    return caches[getattr(settings, "AI_PROFILE_CACHE_ALIAS", "default")]
+
+
+def invalidate_profiles(pairs):
+    """
+    Drop the cached snapshots of (consultazione_id, email) pairs once the
+    current transaction commits (so a concurrent turn can't re-cache the
+    pre-commit state).
+    """
+    keys = {profile_cache_key(c, e) for c, e in pairs if c and e}
+    if not keys:
+        return
+
+    def delete():
+        try:
+            profile_cache().delete_many(list(keys))
+        except Exception as e:
+            logger.warning("Profile cache invalidation failed: %s", e)
+
+    transaction.on_commit(delete)
@@ -3,11 +3,32 @@ Serializers for core models.
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import RoleAssignment, AuditLog
+from django.db import models
+from .models import RoleAssignment, AuditLog, prefetch_users_by_email, user_identity_map
 
 User = get_user_model()
 
 
+class UserPrefetchListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer that loads with one query the users behind the email
+    fields listed in the child's Meta.user_email_fields, so properties
+    like approvata_da / created_by don't query once per row.
+
+    Usage:
+        class Meta:
+            list_serializer_class = UserPrefetchListSerializer
+            user_email_fields = ['approvata_da_email', 'created_by_email']
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        fields = getattr(self.child.Meta, 'user_email_fields', ())
+        with user_identity_map():
+            prefetch_users_by_email(getattr(item, field) for item in items for field in fields)
+            return super().to_representation(items)
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model."""
 
@@ -0,0 +1,161 @@
+"""
+Signals for core app.
+
+Keep the cached users of core.authentication in sync: any change to a
+user, its groups/permissions, its role assignments or its place in the
+delegation chain gives it a new auth version (stale cache entry, stale
+role claims in its tokens).
+
+Changes to users also empty the request-scoped email -> user identity map
+(core.models.get_user_by_email), so a user created during a request isn't
+shadowed by the placeholder resolved before.
+
+Changes to designations, scrutinio data and delegate roles drop the cached
+AI profile snapshots of the users they concern (core.profile_cache). They
+are connected here, not in ai_assistant, because the services writing
+those rows (rdl, api) don't install ai_assistant. An update that changes
+a delegation email invalidates the previous owner as well (read in
+pre_save).
+"""
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_all, invalidate_emails, invalidate_users
+from .models import RoleAssignment, User, clear_user_identity_map
+from .profile_cache import invalidate_profiles
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, **kwargs):
+    clear_user_identity_map()
+    invalidate_users([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def _user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_users([instance.pk])
+    elif pk_set is not None:
+        # group.user_set.add(...): pk_set are users
+        invalidate_users(pk_set)
+    else:
+        invalidate_all()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_all()
+
+
+@receiver(post_save, sender=RoleAssignment)
+@receiver(post_delete, sender=RoleAssignment)
+def _role_assignment_changed(sender, instance, **kwargs):
+    invalidate_users([instance.user_id])
+
+
+# Delegation rows: fields that decide whose cached state a row affects, and
+# the (consultazione_id, email...) lookups to read them before an update
+_DELEGATION_FIELDS = {
+    'Delegato': (
+        {'email', 'consultazione'},
+        ('consultazione_id', 'email'),
+    ),
+    'SubDelega': (
+        {'email', 'delegato'},
+        ('delegato__consultazione_id', 'email'),
+    ),
+    'DesignazioneRDL': (
+        {'effettivo_email', 'supplente_email', 'processo'},
+        ('processo__consultazione_id', 'effettivo_email', 'supplente_email'),
+    ),
+}
+
+
+def _pairs(row):
+    consultazione_id, *emails = row
+    return [(consultazione_id, email) for email in emails]
+
+
+def _delegation_changed(instance, pairs):
+    """Invalidate the users of a saved/deleted row, and those it had before the save."""
+    pairs = pairs + instance.__dict__.pop('_previous_delegation_pairs', [])
+    invalidate_emails([email for _, email in pairs])
+    invalidate_profiles(pairs)
+
+
+@receiver(pre_save, sender='delegations.Delegato')
+@receiver(pre_save, sender='delegations.SubDelega')
+@receiver(pre_save, sender='delegations.DesignazioneRDL')
+def _remember_delegation_emails(sender, instance, update_fields=None, **kwargs):
+    """An update may change the email: the previous owner's state is stale too."""
+    fields, lookups = _DELEGATION_FIELDS[sender.__name__]
+    if instance._state.adding or (update_fields is not None and not fields & set(update_fields)):
+        return
+    row = sender.objects.filter(pk=instance.pk).values_list(*lookups).first()
+    instance._previous_delegation_pairs = _pairs(row) if row else []
+
+
+@receiver(post_save, sender='delegations.Delegato')
+@receiver(post_delete, sender='delegations.Delegato')
+def _delegato_changed(sender, instance, **kwargs):
+    _delegation_changed(instance, [(instance.consultazione_id, instance.email)])
+
+
+@receiver(post_save, sender='delegations.SubDelega')
+@receiver(post_delete, sender='delegations.SubDelega')
+def _subdelega_changed(sender, instance, **kwargs):
+    from delegations.models import Delegato
+
+    consultazione_id = Delegato.objects.filter(pk=instance.delegato_id).values_list(
+        'consultazione_id', flat=True
+    ).first()
+    _delegation_changed(instance, [(consultazione_id, instance.email)])
+
+
+@receiver(post_save, sender='delegations.DesignazioneRDL')
+@receiver(post_delete, sender='delegations.DesignazioneRDL')
+def _designazione_changed(sender, instance, **kwargs):
+    from delegations.models import ProcessoDesignazione
+
+    consultazione_id = (
+        ProcessoDesignazione.objects.filter(pk=instance.processo_id)
+        .values_list('consultazione_id', flat=True).first()
+        if instance.processo_id else None
+    )
+    _delegation_changed(instance, _pairs((consultazione_id, instance.effettivo_email, instance.supplente_email)))
+
+
+def _section_rdl_pairs(sezione_id, consultazione_id):
+    """(consultazione_id, email) of the RDL designated for a section."""
+    from delegations.models import DesignazioneRDL
+
+    pairs = []
+    for effettivo, supplente in DesignazioneRDL.objects.filter(
+        sezione_id=sezione_id, processo__consultazione_id=consultazione_id
+    ).values_list('effettivo_email', 'supplente_email'):
+        pairs += [(consultazione_id, effettivo), (consultazione_id, supplente)]
+    return pairs
+
+
+@receiver(post_save, sender='data.DatiSezione')
+@receiver(post_delete, sender='data.DatiSezione')
+def _dati_sezione_changed(sender, instance, **kwargs):
+    invalidate_profiles(_section_rdl_pairs(instance.sezione_id, instance.consultazione_id))
+
+
+@receiver(post_save, sender='data.DatiScheda')
+@receiver(post_delete, sender='data.DatiScheda')
+def _dati_scheda_changed(sender, instance, **kwargs):
+    from data.models import DatiSezione
+
+    row = DatiSezione.objects.filter(pk=instance.dati_sezione_id).values_list(
+        'sezione_id', 'consultazione_id'
+    ).first()
+    if row:
+        invalidate_profiles(_section_rdl_pairs(*row))
@@ -0,0 +1,112 @@
+"""
+Cold start profiling of the split Cloud Run services.
+
+Each service (config/wsgi_<service>.py with config/settings_<service>.py) is
+started in a fresh interpreter under `python -X importtime`, doing what
+gunicorn does before the first request: build the WSGI app (settings,
+django.setup(), every AppConfig.ready()) and load the URLconf. The probe
+reports:
+
+- seconds: wall time of that startup (interpreter boot excluded)
+- packages: import time per top-level package (self times from
+  -X importtime, summed), the slowest first
+- lazy_loaded: the STARTUP_LAZY_MODULES imported during startup. Heavy
+  integrations (vertexai, firebase_admin, reportlab, ...) belong behind
+  accessor functions or imports inside the views/services using them
+- connections: database connections opened during startup. Module imports
+  and ready() hooks must not query the database: on Cloud Run every new
+  instance would wait on it before serving
+
+Settings:
+    STARTUP_BUDGETS: {service: seconds}
+    STARTUP_LAZY_MODULES: modules that must not be imported at startup
+
+Usage:
+    profile = profile_service('api')
+    problems = profile.problems(budget=1.5, lazy_modules=['reportlab'])
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+
+SERVICES = ('api', 'rdl', 'pdf', 'ai', 'admin')
+
+_PROBE = """
+import importlib, json, sys, time
+from django.db.backends.signals import connection_created
+
+connections = []
+connection_created.connect(
+    lambda sender, connection, **kwargs: connections.append(connection.alias), weak=False,
+)
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+from django.urls import get_resolver
+get_resolver().url_patterns
+seconds = time.perf_counter() - started
+print(json.dumps({'seconds': seconds, 'modules': sorted(sys.modules), 'connections': connections}))
+"""
+
+_IMPORTTIME_PREFIX = 'import time:'
+
+
+class StartupProfile(NamedTuple):
+    service: str
+    seconds: float
+    packages: list  # [(package, seconds)], slowest first
+    modules: frozenset
+    connections: list
+
+    def lazy_loaded(self, lazy_modules) -> list:
+        return [name for name in lazy_modules if name in self.modules]
+
+    def problems(self, budget=None, lazy_modules=()) -> list:
+        """Budget violations, empty when the service starts as it should."""
+        problems = []
+        if budget is not None and self.seconds > budget:
+            problems.append(f'{self.service}: startup {self.seconds:.2f}s over the {budget:.2f}s budget')
+        for name in self.lazy_loaded(lazy_modules):
+            problems.append(f'{self.service}: {name} imported at startup')
+        if self.connections:
+            problems.append(
+                f'{self.service}: database queried at startup ({", ".join(sorted(set(self.connections)))})'
+            )
+        return problems
+
+
+def _package_times(importtime_output) -> list:
+    totals = defaultdict(int)
+    for line in importtime_output.splitlines():
+        if not line.startswith(_IMPORTTIME_PREFIX):
+            continue
+        self_us, _, name = line[len(_IMPORTTIME_PREFIX):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # header
+        totals[name.strip().split('.')[0]] += int(self_us)
+    return sorted(((package, us / 1e6) for package, us in totals.items()), key=lambda item: -item[1])
+
+
+def profile_service(service, timeout=120) -> StartupProfile:
+    """Start `service` in a fresh interpreter and profile it."""
+    if service not in SERVICES:
+        raise ValueError(f'Unknown service: {service}')
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': f'config.settings_{service}'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE, f'config.wsgi_{service}'],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'{service} failed to start:\n{result.stderr[-2000:]}')
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return StartupProfile(
+        service=service,
+        seconds=report['seconds'],
+        packages=_package_times(result.stderr),
+        modules=frozenset(report['modules']),
+        connections=report['connections'],
+    )
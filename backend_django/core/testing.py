@@ -0,0 +1,17 @@
+"""
+Settings shared by the test modules.
+
+Usage:
+    from core.testing import LOCMEM_CACHE
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    class MyTest(TestCase): ...
+"""
+
+# In-memory stand-ins for the production caches. The settings point the
+# auth, permissions, AI profile, RAG and Telegram rate caches at 'shared'
+# (Redis); tests that touch them override CACHES with this instead.
+LOCMEM_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
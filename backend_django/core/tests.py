@@ -1,10 +1,14 @@
 """
 Tests for core app.
 """
+from types import SimpleNamespace
+
 import pytest
 from django.contrib.auth import get_user_model
 from rest_framework import status
 
+from core.testing import LOCMEM_CACHE
+
 User = get_user_model()
 
 
@@ -74,3 +78,735 @@ class TestUserProfileView:
         assert response.status_code == status.HTTP_200_OK
         user.refresh_from_db()
         assert user.display_name == 'New Name'
+
+
+@pytest.fixture
+def auth_cache(settings):
+    """Fresh local-memory cache for core.authentication."""
+    from django.core.cache import cache
+
+    settings.CACHES = LOCMEM_CACHE
+    settings.AUTH_JWT_ROLE_CLAIMS = True
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture
+def consultazione(db):
+    from datetime import date
+    from elections.models import ConsultazioneElettorale
+
+    return ConsultazioneElettorale.objects.create(
+        nome='Referendum 2026', data_inizio=date(2026, 6, 8), data_fine=date(2026, 6, 9), is_attiva=True,
+    )
+
+
+def _bearer(user):
+    from core.views import get_tokens_for_user
+
+    tokens = get_tokens_for_user(user)
+    return tokens, {'HTTP_AUTHORIZATION': f"Bearer {tokens['access']}"}
+
+
+def _user_queries(queries):
+    return [q['sql'] for q in queries if 'FROM "core_user"' in q['sql']]
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    """Tests for core.authentication (cached users, role claims)."""
+
+    def test_repeat_requests_skip_users_table(self, api_client, user, auth_cache):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        _, headers = _bearer(user)
+        assert api_client.get('/api/auth/profile/', **headers).status_code == status.HTTP_200_OK
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/auth/profile/', **headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['email'] == user.email
+        assert _user_queries(queries) == []
+
+    def test_user_save_invalidates(self, api_client, user, auth_cache, django_capture_on_commit_callbacks):
+        _, headers = _bearer(user)
+        api_client.get('/api/auth/profile/', **headers)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            user.display_name = 'Nuovo Nome'
+            user.save()
+        assert api_client.get('/api/auth/profile/', **headers).data['display_name'] == 'Nuovo Nome'
+
+    def test_inactive_user_rejected(self, api_client, user, auth_cache, django_capture_on_commit_callbacks):
+        _, headers = _bearer(user)
+        api_client.get('/api/auth/profile/', **headers)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            user.is_active = False
+            user.save()
+        assert api_client.get('/api/auth/profile/', **headers).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_group_change_invalidates_permissions(self, user, auth_cache, django_capture_on_commit_callbacks):
+        from django.contrib.auth.models import Group, Permission
+        from core.authentication import get_cached_user
+
+        group = Group.objects.create(name='Test scrutinio')
+        cached, _ = get_cached_user(user.pk)
+        assert not cached.has_perm('core.has_scrutinio_access')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            group.permissions.add(Permission.objects.get(codename='has_scrutinio_access'))
+            user.groups.add(group)
+        cached, _ = get_cached_user(user.pk)
+        assert cached.has_perm('core.has_scrutinio_access')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            group.permissions.clear()
+        cached, _ = get_cached_user(user.pk)
+        assert not cached.has_perm('core.has_scrutinio_access')
+
+    def test_role_claims(self, api_client, user, consultazione, auth_cache, django_capture_on_commit_callbacks):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework_simplejwt.tokens import AccessToken
+        from core.authentication import CachedJWTAuthentication
+        from delegations.models import Delegato
+        from delegations.permissions import get_user_delegation_roles
+
+        def authenticate(access):
+            request = SimpleNamespace(META={'HTTP_AUTHORIZATION': f'Bearer {access}'})
+            return CachedJWTAuthentication().authenticate(request)[0]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Delegato.objects.create(
+                consultazione=consultazione, cognome='Rossi', nome='Mario',
+                carica=Delegato.Carica.DEPUTATO, email=user.email,
+            )
+        tokens, _ = _bearer(user)
+        claims = AccessToken(tokens['access'])['roles']
+        assert claims == {str(consultazione.id): {'is_delegato': True, 'is_sub_delegato': False, 'is_rdl': False}}
+
+        # Flags come from the token: no delegation-chain queries
+        authenticated = authenticate(tokens['access'])
+        with CaptureQueriesContext(connection) as queries:
+            roles = get_user_delegation_roles(authenticated, consultazione.id)
+        assert roles['is_delegato'] and not roles['is_rdl']
+        assert len(queries) == 0
+
+        # Role change: the claims are ignored until the token is refreshed
+        with django_capture_on_commit_callbacks(execute=True):
+            Delegato.objects.filter(email=user.email).delete()
+        authenticated = authenticate(tokens['access'])
+        assert not hasattr(authenticated, 'delegation_flags')
+        assert not get_user_delegation_roles(authenticated, consultazione.id)['is_delegato']
+
+        response = api_client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        refreshed = AccessToken(response.data['access'])
+        assert refreshed['roles'][str(consultazione.id)]['is_delegato'] is False
+        assert authenticate(response.data['access']).delegation_flags == refreshed['roles']
+
+
+@pytest.mark.django_db
+class TestSharedCache:
+    """The auth caches against the configured backend (no CACHES override)."""
+
+    def test_hot_path_caches_use_the_shared_alias(self, settings):
+        from django.core.cache import caches
+        from django.core.cache.backends.db import DatabaseCache
+
+        for name in ('AUTH_CACHE_ALIAS', 'PERMISSIONS_CACHE_ALIAS', 'AI_PROFILE_CACHE_ALIAS', 'RAG_CACHE_ALIAS'):
+            assert getattr(settings, name) == 'shared'
+        shared = caches['shared']
+        if isinstance(shared, DatabaseCache):
+            assert shared._table != caches['default']._table
+            assert shared._max_entries >= 100000
+
+    def test_cached_user_survives_default_cache_cull(self, api_client, user):
+        from django.core.cache import cache, caches
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        caches['shared'].clear()
+        _, headers = _bearer(user)
+        assert api_client.get('/api/auth/profile/', **headers).status_code == status.HTTP_200_OK
+
+        # Fill the default cache past MAX_ENTRIES: it culls, the shared one doesn't
+        for i in range(cache._max_entries + 10):
+            cache.set(f'filler:{i}', i)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/auth/profile/', **headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert _user_queries(queries) == []
+
+
+@pytest.mark.django_db
+class TestPermissionsSnapshot:
+    """Tests for the cached /api/permissions snapshot."""
+
+    def test_snapshot_invalidated_by_delegation_change(
+        self, api_client, user, consultazione, auth_cache, django_capture_on_commit_callbacks,
+    ):
+        from delegations.models import Delegato
+
+        api_client.force_authenticate(user=user)
+        url = f'/api/permissions?consultazione={consultazione.id}'
+        assert api_client.get(url).data['is_delegato'] is False
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Delegato.objects.create(
+                consultazione=consultazione, cognome='Rossi', nome='Mario',
+                carica=Delegato.Carica.DEPUTATO, email=user.email,
+            )
+        response = api_client.get(url)
+        assert response.data['is_delegato'] is True
+        assert response.data['can_manage_delegations'] == user.has_perm('core.can_manage_delegations')
+        # Other consultazioni have their own snapshot
+        assert api_client.get(f'/api/permissions?consultazione={consultazione.id + 1}').data['is_delegato'] is False
+
+    def test_group_permission_change_invalidates(
+        self, api_client, user, auth_cache, django_capture_on_commit_callbacks,
+    ):
+        from django.contrib.auth.models import Group, Permission
+
+        with django_capture_on_commit_callbacks(execute=True):
+            group = Group.objects.create(name='Test KPI')
+            user.groups.add(group)
+        api_client.force_authenticate(user=user)
+        assert api_client.get('/api/permissions').data['can_view_kpi'] is False
+
+        with django_capture_on_commit_callbacks(execute=True):
+            group.permissions.add(Permission.objects.get(codename='can_view_kpi'))
+        api_client.force_authenticate(user=User.objects.get(pk=user.pk))
+        assert api_client.get('/api/permissions').data['can_view_kpi'] is True
+
+    def test_processo_conferma_invalidates_revoked_rdl(
+        self, api_client, user, consultazione, comune, auth_cache, django_capture_on_commit_callbacks,
+    ):
+        from delegations.models import Delegato, DesignazioneRDL, ProcessoDesignazione
+        from territory.models import SezioneElettorale
+
+        admin = User.objects.create_superuser(email='admin@example.com', password='x')
+        sezione = SezioneElettorale.objects.create(numero=1, comune=comune)
+        delegato = Delegato.objects.create(
+            consultazione=consultazione, cognome='Rossi', nome='Mario',
+            carica=Delegato.Carica.DEPUTATO, email=admin.email,
+        )
+        vecchio = ProcessoDesignazione.objects.create(
+            consultazione=consultazione, comune=comune, delegato=delegato, stato='APPROVATO',
+        )
+        nuovo = ProcessoDesignazione.objects.create(
+            consultazione=consultazione, comune=comune, delegato=delegato, stato='GENERATO',
+            created_by_email=admin.email,
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            DesignazioneRDL.objects.create(
+                processo=vecchio, sezione=sezione, delegato=delegato, stato='CONFERMATA',
+                effettivo_cognome='Bianchi', effettivo_nome='Anna', effettivo_email=user.email,
+            )
+            DesignazioneRDL.objects.create(
+                processo=nuovo, sezione=sezione, delegato=delegato, stato='BOZZA',
+                effettivo_cognome='Verdi', effettivo_nome='Luca', effettivo_email='verdi@example.com',
+            )
+
+        api_client.force_authenticate(user=user)
+        url = f'/api/permissions?consultazione={consultazione.id}'
+        assert api_client.get(url).data['is_rdl'] is True
+
+        # conferma revokes the old designazione with a queryset update (no signals)
+        api_client.force_authenticate(user=admin)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(f'/api/deleghe/processi/{nuovo.id}/conferma/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['designazioni_precedenti_disattivate'] == 1
+
+        api_client.force_authenticate(user=User.objects.get(pk=user.pk))
+        assert api_client.get(url).data['is_rdl'] is False
+
+    def test_email_change_invalidates_previous_owner(
+        self, api_client, user, consultazione, comune, auth_cache, django_capture_on_commit_callbacks,
+    ):
+        from core.profile_cache import profile_cache, profile_cache_key
+        from delegations.models import Delegato, DesignazioneRDL, ProcessoDesignazione
+        from territory.models import SezioneElettorale
+
+        with django_capture_on_commit_callbacks(execute=True):
+            delegato = Delegato.objects.create(
+                consultazione=consultazione, cognome='Rossi', nome='Mario',
+                carica=Delegato.Carica.DEPUTATO, email=user.email,
+            )
+            processo = ProcessoDesignazione.objects.create(consultazione=consultazione, delegato=delegato)
+            designazione = DesignazioneRDL.objects.create(
+                processo=processo, delegato=delegato, sezione=SezioneElettorale.objects.create(numero=1, comune=comune),
+                effettivo_email=user.email,
+            )
+        api_client.force_authenticate(user=user)
+        url = f'/api/permissions?consultazione={consultazione.id}'
+        data = api_client.get(url).data
+        assert (data['is_delegato'], data['is_rdl']) == (True, True)
+
+        key = profile_cache_key(consultazione.id, user.email)
+        profile_cache().set(key, {'sections': [1]})
+        with django_capture_on_commit_callbacks(execute=True):
+            designazione.effettivo_email = 'altro@example.com'
+            designazione.save()
+        assert profile_cache().get(key) is None
+        assert api_client.get(url).data['is_rdl'] is False
+
+        with django_capture_on_commit_callbacks(execute=True):
+            delegato.email = 'altro@example.com'
+            delegato.save()
+        api_client.force_authenticate(user=User.objects.get(pk=user.pk))
+        assert api_client.get(url).data['is_delegato'] is False
+
+    def test_warm_cache_without_db(self, api_client, user, consultazione, auth_cache):
+        """Cold vs warm /api/permissions with JWT auth: the warm path makes no query."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        _, headers = _bearer(user)
+        url = f'/api/permissions?consultazione={consultazione.id}'
+
+        with CaptureQueriesContext(connection) as cold:
+            assert api_client.get(url, **headers).status_code == status.HTTP_200_OK
+        with CaptureQueriesContext(connection) as warm:
+            for _ in range(3):
+                assert api_client.get(url, **headers).status_code == status.HTTP_200_OK
+
+        assert len(cold) > 0
+        assert len(warm) == 0
+
+
+@pytest.fixture
+def without_ai_assistant(settings):
+    """INSTALLED_APPS of the rdl/api services: ai_assistant and its receivers absent."""
+    import weakref
+    from django.apps import apps
+    from django.db.models.signals import post_delete, post_save
+
+    settings.INSTALLED_APPS = [app for app in settings.INSTALLED_APPS if not app.startswith('ai_assistant')]
+    assert not apps.is_installed('ai_assistant')
+
+    def outside_ai_assistant(entry):
+        receiver = entry[1]
+        if isinstance(receiver, weakref.ReferenceType):
+            receiver = receiver()
+        return not getattr(receiver, '__module__', '').startswith('ai_assistant')
+
+    saved = {signal: signal.receivers for signal in (post_save, post_delete)}
+    for signal, receivers in saved.items():
+        signal.receivers = [entry for entry in receivers if outside_ai_assistant(entry)]
+        signal.sender_receivers_cache.clear()
+    yield
+    for signal, receivers in saved.items():
+        signal.receivers = receivers
+        signal.sender_receivers_cache.clear()
+
+
+@pytest.mark.django_db
+class TestProfileSnapshotInvalidation:
+    """AI profile snapshots are dropped by the services that don't install ai_assistant."""
+
+    def test_saves_invalidate_without_ai_assistant(
+        self, user, consultazione, comune, auth_cache, without_ai_assistant, django_capture_on_commit_callbacks,
+    ):
+        from core.profile_cache import profile_cache, profile_cache_key
+        from data.models import DatiSezione
+        from delegations.models import Delegato, DesignazioneRDL, ProcessoDesignazione
+        from territory.models import SezioneElettorale
+
+        sezione = SezioneElettorale.objects.create(numero=1, comune=comune)
+        delegato = Delegato.objects.create(
+            consultazione=consultazione, cognome='Rossi', nome='Mario',
+            carica=Delegato.Carica.DEPUTATO, email='delegato@example.com',
+        )
+        processo = ProcessoDesignazione.objects.create(consultazione=consultazione, delegato=delegato)
+        designazione = DesignazioneRDL.objects.create(
+            processo=processo, delegato=delegato, sezione=sezione, effettivo_email=user.email,
+        )
+        dati = DatiSezione.objects.create(sezione=sezione, consultazione=consultazione)
+        key = profile_cache_key(consultazione.id, user.email)
+
+        profile_cache().set(key, {'sections': [1]})
+        with django_capture_on_commit_callbacks(execute=True):
+            dati.votanti_maschi = 120
+            dati.save()
+        assert profile_cache().get(key) is None
+
+        profile_cache().set(key, {'sections': [1]})
+        with django_capture_on_commit_callbacks(execute=True):
+            designazione.is_attiva = False
+            designazione.save()
+        assert profile_cache().get(key) is None
+
+
+@pytest.fixture
+def comune(db):
+    from territory.models import Comune, Provincia, Regione
+
+    regione = Regione.objects.create(codice_istat='12', nome='Lazio')
+    provincia = Provincia.objects.create(codice_istat='058', sigla='RM', nome='Roma', regione=regione)
+    return Comune.objects.create(codice_istat='058091', nome='Roma', provincia=provincia)
+
+
+def _approvers(count):
+    """`count` approver emails: all but the last one have a user."""
+    emails = [f'approver{i}@example.com' for i in range(count)]
+    for email in emails[:-1]:
+        User.objects.create_user(email=email, password='x', first_name='Ref', last_name=email[:9])
+    return emails
+
+
+@pytest.mark.django_db
+class TestUserIdentityMap:
+    """Tests for the request-scoped email -> user identity map (get_user_by_email)."""
+
+    def test_lookups_within_scope(self, user, django_assert_num_queries):
+        from core.models import get_user_by_email, prefetch_users_by_email, user_identity_map
+
+        with user_identity_map():
+            with django_assert_num_queries(1):
+                prefetch_users_by_email([user.email, 'gone@example.com', '', None])
+            with django_assert_num_queries(0):
+                assert get_user_by_email(user.email) == user
+                placeholder = get_user_by_email('gone@example.com')
+                assert get_user_by_email('') is None
+
+        assert placeholder.pk is None
+        assert placeholder.display_name == '[Rimosso: gone@example.com]'
+        # Outside the scope every call queries, as before
+        with django_assert_num_queries(1):
+            assert get_user_by_email(user.email) == user
+
+    def test_user_created_during_request_replaces_placeholder(self):
+        from core.models import get_user_by_email, user_identity_map
+
+        with user_identity_map():
+            assert get_user_by_email('new@example.com').pk is None
+            created = User.objects.create_user(email='new@example.com', password='x')
+            assert get_user_by_email('new@example.com') == created
+
+    def _designazioni(self, user, consultazione, comune, count):
+        from delegations.models import Delegato, DesignazioneRDL, ProcessoDesignazione
+        from territory.models import SezioneElettorale
+
+        delegato = Delegato.objects.create(
+            consultazione=consultazione, cognome='Rossi', nome='Mario',
+            carica=Delegato.Carica.DEPUTATO, email='delegato@example.com',
+        )
+        processo = ProcessoDesignazione.objects.create(
+            consultazione=consultazione, comune=comune, delegato=delegato, stato='BOZZA',
+        )
+        for numero, email in enumerate(_approvers(count), start=1):
+            DesignazioneRDL.objects.create(
+                processo=processo,
+                delegato=delegato,
+                sezione=SezioneElettorale.objects.create(numero=numero, comune=comune),
+                effettivo_cognome='Test', effettivo_nome='User', effettivo_email=user.email,
+                approvata_da_email=email,
+            )
+
+    @pytest.mark.parametrize('count', [2, 6])
+    def test_designazioni_ricevute_one_user_query(self, api_client, user, consultazione, comune, count):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._designazioni(user, consultazione, comune, count)
+        api_client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f'/api/deleghe/mia-catena/?consultazione={consultazione.id}')
+        assert response.status_code == status.HTTP_200_OK
+        names = [d['approvata_da_nome'] for d in response.data['designazioni_ricevute']]
+        assert len(names) == count
+        assert names[-1] == f'[Rimosso: approver{count - 1}@example.com]'
+        assert len(_user_queries(queries)) == 1
+
+    @pytest.mark.parametrize('count', [2, 6])
+    def test_registrations_list_one_user_query(self, api_client, admin_user, consultazione, comune, count):
+        from datetime import date
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from campaign.models import RdlRegistration
+
+        RdlRegistration.objects.bulk_create([
+            RdlRegistration(
+                email=f'rdl{i}@example.com', nome='Nome', cognome=f'Cognome{i}', telefono='3331234567',
+                comune_nascita='Roma', data_nascita=date(1990, 1, 1),
+                comune_residenza='Roma', indirizzo_residenza='Via Roma 1',
+                comune=comune, consultazione=consultazione,
+                status=RdlRegistration.Status.APPROVED, approved_by_email=email,
+            )
+            for i, email in enumerate(_approvers(count))
+        ])
+        api_client.force_authenticate(user=admin_user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/rdl/registrations')
+        assert response.status_code == status.HTTP_200_OK
+        approved_by = {r['approved_by'] for r in response.data['registrations']}
+        assert approved_by == {f'approver{i}@example.com' for i in range(count)}
+        assert len(_user_queries(queries)) == 1
+
+    @pytest.mark.parametrize('count', [2, 6])
+    def test_role_assignments_list_constant_queries(self, api_client, user, count):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from core.models import RoleAssignment
+
+        for email in _approvers(count):
+            RoleAssignment.objects.create(user=user, role=RoleAssignment.Role.RDL, assigned_by_email=email)
+        api_client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get('/api/auth/roles/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == count
+        # COUNT + page, whatever the number of assigners
+        assert len([q for q in queries if 'core_roleassignment' in q['sql']]) == 2
+        assert _user_queries(queries) == []
+
+
+@pytest.fixture
+def metrics_registry(settings, auth_cache):
+    from core.metrics import registry
+
+    settings.METRICS_SAMPLE_RATES = {}
+    registry.reset()
+    yield registry
+    registry.reset()
+
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+    """Tests for core.metrics (Server-Timing headers, Prometheus endpoint)."""
+
+    def test_sampled_request_reports_db_and_cache(self, api_client, user, settings, metrics_registry):
+        settings.METRICS_SAMPLE_RATE = 1
+        _, headers = _bearer(user)
+
+        response = api_client.get('/api/permissions', **headers)
+        assert response.status_code == status.HTTP_200_OK
+        timing = response['Server-Timing']
+        assert timing.startswith('total;dur=')
+        assert 'db;dur=' in timing and 'queries"' in timing
+        # Cold auth cache: the user and the snapshot are misses
+        assert 'miss"' in timing and '0 miss' not in timing
+
+        response = api_client.get('/api/permissions', **headers)
+        assert '0 miss' in response['Server-Timing']
+
+    def test_unsampled_request_only_total(self, api_client, user, settings, metrics_registry):
+        settings.METRICS_SAMPLE_RATE = 0
+        api_client.force_authenticate(user=user)
+
+        timing = api_client.get('/api/permissions')['Server-Timing']
+        assert timing.startswith('total;dur=')
+        assert 'db;' not in timing
+        text = metrics_registry.render()
+        assert 'http_request_duration_seconds_count{view="permissions",method="GET"} 1' in text
+        assert 'http_requests_sampled_total{' not in text
+
+    def test_metrics_endpoint_requires_secret(self, api_client, user, settings, metrics_registry):
+        settings.DEBUG = False
+        settings.INTERNAL_API_SECRET = 's3cret'
+        settings.METRICS_SAMPLE_RATE = 1
+        api_client.force_authenticate(user=user)
+        api_client.get('/api/permissions')
+
+        assert api_client.get('/api/internal/metrics').status_code == status.HTTP_403_FORBIDDEN
+        assert api_client.get(
+            '/api/internal/metrics', HTTP_X_INTERNAL_SECRET='wrong',
+        ).status_code == status.HTTP_403_FORBIDDEN
+
+        response = api_client.get('/api/internal/metrics', HTTP_X_INTERNAL_SECRET='s3cret')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        text = response.content.decode()
+        assert '# TYPE http_request_duration_seconds histogram' in text
+        assert 'http_request_duration_seconds_bucket{view="permissions",method="GET",le="+Inf"} 1' in text
+        assert 'http_requests_sampled_total{view="permissions",method="GET"} 1' in text
+        assert 'http_request_db_queries_count{view="permissions",method="GET"} 1' in text
+
+    def test_unknown_methods_share_one_series(self, api_client, user, settings, metrics_registry):
+        settings.METRICS_SAMPLE_RATE = 0
+        api_client.force_authenticate(user=user)
+
+        for method in ('PROPFIND', 'FOO', 'BAR'):
+            api_client.generic(method, '/api/permissions')
+        text = metrics_registry.render()
+        assert 'http_request_duration_seconds_count{view="permissions",method="other"} 3' in text
+        assert 'PROPFIND' not in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        from core.metrics import Registry
+
+        registry = Registry()
+        labels = (('view', 'x'), ('method', 'GET'))
+        for value in (0, 1, 3, 1000):
+            registry.observe('http_request_db_queries', labels, value)
+        text = registry.render()
+        assert 'http_request_db_queries_bucket{view="x",method="GET",le="0.0"} 1' in text
+        assert 'http_request_db_queries_bucket{view="x",method="GET",le="1.0"} 2' in text
+        assert 'http_request_db_queries_bucket{view="x",method="GET",le="5.0"} 3' in text
+        assert 'http_request_db_queries_bucket{view="x",method="GET",le="500.0"} 3' in text
+        assert 'http_request_db_queries_bucket{view="x",method="GET",le="+Inf"} 4' in text
+        assert 'http_request_db_queries_sum{view="x",method="GET"} 1004.0' in text
+
+
+@pytest.mark.django_db
+class TestReadReplicaRouter:
+    """
+    Tests for core.db_router. The test 'replica' mirrors 'default' (routing
+    decisions); stale_replica is a separate database with its own rows.
+    """
+
+    @pytest.fixture(autouse=True)
+    def replica(self, settings):
+        from core import db_router
+
+        settings.DATABASE_REPLICA_ALIAS = 'replica'
+        db_router.health.reset()
+        yield
+        db_router.health.reset()
+
+    def _call(self, user, path, view):
+        from django.test import RequestFactory
+        from django.urls import resolve
+        from core.middleware import ReadReplicaMiddleware
+
+        request = RequestFactory().get(path)
+        request.resolver_match = resolve(path)
+        request.user = user
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReadReplicaMiddleware(get_response)
+        return middleware(request)
+
+    def test_reads_go_to_replica_only_when_enabled(self):
+        from django.db import router
+        from core.db_router import use_replica
+
+        assert router.db_for_read(User) == 'default'
+        with use_replica():
+            assert router.db_for_read(User) == 'replica'
+            assert router.db_for_write(User) == 'default'
+
+    def test_reads_after_a_write_go_to_primary(self):
+        from django.db import router
+        from core.db_router import use_replica
+
+        with use_replica() as state:
+            User.objects.create_user(email='new@example.com', password='x')
+            assert state.wrote
+            assert router.db_for_read(User) == 'default'
+
+    def test_lagging_replica_falls_back_to_primary(self, monkeypatch):
+        from django.db import router
+        from core import db_router
+
+        monkeypatch.setattr(db_router._ReplicaHealth, '_measure', staticmethod(lambda alias: 60.0))
+
+        with db_router.use_replica():
+            assert router.db_for_read(User) == 'default'
+
+    def test_cache_reads_stay_on_primary(self):
+        from django.core.cache.backends.db import DatabaseCache
+        from django.db import router
+        from core.db_router import use_replica
+
+        cache_model = DatabaseCache('django_cache', {}).cache_model_class
+        with use_replica():
+            assert router.db_for_read(cache_model) == 'default'
+            assert router.db_for_read(User) == 'replica'
+
+    def test_designated_views_use_replica_until_user_writes(self, user):
+        from django.db import router
+        from django.http import HttpResponse
+
+        def read_view(request):
+            return HttpResponse(router.db_for_read(User))
+
+        def write_view(request):
+            User.objects.filter(pk=request.user.pk).update(display_name='Nuovo nome')
+            return HttpResponse()
+
+        assert self._call(user, '/api/kpi/dati', read_view).content == b'replica'
+        assert self._call(user, '/api/permissions', read_view).content == b'default'
+
+        # Read-your-writes: after a write the user reads from the primary
+        self._call(user, '/api/permissions', write_view)
+        assert self._call(user, '/api/kpi/dati', read_view).content == b'default'
+
+    @pytest.fixture
+    def stale_replica(self, settings, tmp_path, user):
+        """A second SQLite database holding an older copy of the user."""
+        from django.db import connections
+        from django.db.utils import load_backend
+
+        alias = 'stale_replica'
+        config = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(tmp_path / 'replica.sqlite3')}
+        settings.DATABASES = {**settings.DATABASES, alias: config}
+        settings.DATABASE_REPLICA_ALIAS = alias
+        # A connection created at run time, outside the test databases
+        config = connections.configure_settings({'default': {}, alias: config})[alias]
+        connections[alias] = load_backend(config['ENGINE']).DatabaseWrapper(config, alias)
+        with connections[alias].schema_editor() as editor:
+            editor.create_model(User)
+        User.objects.using(alias).bulk_create([
+            User(pk=user.pk, email=user.email, password=user.password, display_name='Replica'),
+        ])
+        User.objects.filter(pk=user.pk).update(display_name='Primario')
+        yield alias
+        connections[alias].close()
+        del connections[alias]
+
+    def test_designated_views_read_the_replica_database(self, user, auth_cache, stale_replica):
+        from django.http import HttpResponse
+
+        def read_view(request):
+            return HttpResponse(User.objects.get(pk=request.user.pk).display_name)
+
+        def write_then_read_view(request):
+            User.objects.filter(pk=request.user.pk).update(display_name='Nuovo nome')
+            return read_view(request)
+
+        assert self._call(user, '/api/kpi/dati', read_view).content == b'Replica'
+        assert self._call(user, '/api/permissions', read_view).content == b'Primario'
+
+        # The request reads its own write, then the user stays on the primary
+        assert self._call(user, '/api/kpi/dati', write_then_read_view).content == b'Nuovo nome'
+        assert self._call(user, '/api/kpi/dati', read_view).content == b'Nuovo nome'
+        assert User.objects.using(stale_replica).get(pk=user.pk).display_name == 'Replica'
+
+    def test_middleware_not_used_without_replica(self, settings):
+        from django.core.exceptions import MiddlewareNotUsed
+        from core.middleware import ReadReplicaMiddleware
+
+        settings.DATABASE_REPLICA_ALIAS = ''
+        with pytest.raises(MiddlewareNotUsed):
+            ReadReplicaMiddleware(lambda request: None)
+
+
+class TestStartupProfile:
+    """Budget checks of core.startup (the timed runs are in benchmarks/test_startup.py)."""
+
+    def test_problems(self):
+        from core.startup import StartupProfile
+
+        profile = StartupProfile(
+            service='rdl', seconds=0.8, packages=[('django', 0.2)],
+            modules=frozenset({'django', 'reportlab', 'reportlab.lib'}), connections=['default'],
+        )
+        assert profile.problems(budget=1.0) == ['rdl: database queried at startup (default)']
+        assert profile.problems(budget=0.5, lazy_modules=['reportlab', 'vertexai']) == [
+            'rdl: startup 0.80s over the 0.50s budget',
+            'rdl: reportlab imported at startup',
+            'rdl: database queried at startup (default)',
+        ]
@@ -7,7 +7,6 @@ from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.signing import TimestampSigner, BadSignature, SignatureExpired
 from django.core.mail import send_mail
-from django.db.models import Q
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -15,8 +14,8 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from .authentication import RoleClaimsRefreshToken, cached_for_user
 from .models import RoleAssignment
 from .serializers import (
     UserSerializer,
@@ -32,7 +31,7 @@ signer = TimestampSigner()
 
 def get_tokens_for_user(user):
     """Generate JWT tokens for a user."""
-    refresh = RefreshToken.for_user(user)
+    refresh = RoleClaimsRefreshToken.for_user(user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -597,14 +596,29 @@ class PermissionsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from delegations.models import Delegato, SubDelega, DesignazioneRDL
-
         user = request.user
         consultazione_id = request.query_params.get('consultazione')
 
+        # Snapshot per (utente, consultazione), valido finché la versione
+        # auth dell'utente non cambia (deleghe, gruppi, ruoli: core.signals)
+        if consultazione_id is None or consultazione_id.isdigit():
+            snapshot = cached_for_user(
+                user.pk, f'permissions:{consultazione_id or "all"}',
+                lambda: self._compute(user, consultazione_id),
+                timeout=getattr(settings, 'PERMISSIONS_CACHE_TTL', 3600),
+                alias=getattr(settings, 'PERMISSIONS_CACHE_ALIAS', None),
+            )
+        else:
+            snapshot = self._compute(user, consultazione_id)
+        return Response(snapshot)
+
+    @staticmethod
+    def _compute(user, consultazione_id):
+        from delegations.permissions import get_user_delegation_roles
+
         # Superuser has all permissions
         if user.is_superuser:
-            return Response({
+            return {
                 'is_superuser': True,
 
                 # Menu permissions (uno per voce)
@@ -644,32 +658,13 @@ class PermissionsView(APIView):
                 'is_delegato': True,
                 'is_sub_delegato': True,
                 'is_rdl': True,
-            })
-
-        # Check delegation chain for info flags
-        # 1. Is user a Delegato?
-        deleghe_lista = Delegato.objects.filter(email=user.email)
-        if consultazione_id:
-            deleghe_lista = deleghe_lista.filter(consultazione_id=consultazione_id)
-        is_delegato = deleghe_lista.exists()
-
-        # 2. Is user a Sub-Delegato?
-        sub_deleghe = SubDelega.objects.filter(email=user.email, is_attiva=True)
-        if consultazione_id:
-            sub_deleghe = sub_deleghe.filter(delegato__consultazione_id=consultazione_id)
-        is_sub_delegato = sub_deleghe.exists()
-
-        # 3. Is user an RDL?
-        designazioni = DesignazioneRDL.objects.filter(
-            Q(effettivo_email=user.email) | Q(supplente_email=user.email),
-            is_attiva=True
-        )
-        if consultazione_id:
-            designazioni = designazioni.filter(
-                Q(delegato__consultazione_id=consultazione_id) |
-                Q(sub_delega__delegato__consultazione_id=consultazione_id)
-            )
-        is_rdl = designazioni.exists()
+            }
+
+        # Catena deleghe (dai claim del token se aggiornati)
+        roles = get_user_delegation_roles(user, consultazione_id)
+        is_delegato = roles['is_delegato']
+        is_sub_delegato = roles['is_sub_delegato']
+        is_rdl = roles['is_rdl']
 
         # Check Django permissions (assegnati automaticamente dai signals)
         permissions = {
@@ -714,4 +709,4 @@ class PermissionsView(APIView):
             'is_rdl': is_rdl,
         }
 
-        return Response(permissions)
+        return permissions
@@ -0,0 +1,411 @@
+"""
+Management command to generate a synthetic, election-scale dataset.
+
+Builds a national dataset shaped like the real one, for benchmarks and
+query-plan work (the Rome CSVs are two orders of magnitude smaller):
+
+- the 20 regioni, 107 province, consultazione and scheda of
+  setup_referendum_2026
+- ~7,900 comuni and ~61,000 sezioni, skewed like Italy: a few large
+  capoluoghi (split in municipi) and a long tail of small comuni
+- ~100,000 RdlRegistration (mostly approved)
+- the delegation chain: one national Delegato, one SubDelega per provincia
+  with its ProcessoDesignazione
+- for `--coverage` of the sezioni an RDL (and often a supplente):
+  SectionAssignment, confirmed DesignazioneRDL and RDL users
+- DatiSezione/DatiScheda for every designated sezione, filled in for
+  `--completion` of them
+
+Sizes are multiplied by `--scale` (the benchmark suite uses ~0.02).
+Everything is bulk-inserted (no per-row signals) and deterministic for a
+given `--seed`. Intended for an empty, dedicated database.
+
+Usage:
+    python manage.py generate_election_dataset
+    python manage.py generate_election_dataset --scale 0.1 --completion 0.3
+"""
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from campaign.models import RdlRegistration
+from core.models import RoleAssignment
+from data.models import DatiScheda, DatiSezione, SectionAssignment
+from delegations.models import Delegato, DesignazioneRDL, ProcessoDesignazione, SubDelega
+from elections.models import ConsultazioneElettorale, SchedaElettorale
+from territory.models import Comune, Municipio, Provincia, Regione, SezioneElettorale
+
+User = get_user_model()
+
+COMUNI = 7900
+SEZIONI = 61000
+REGISTRAZIONI = 100000
+
+# Sezioni from which a comune is split in municipi (at scale 1)
+MUNICIPI_THRESHOLD = 300
+MAX_MUNICIPI = 15
+
+EMAIL_DOMAIN = 'rdl.example.org'
+
+NOMI = [
+    'Marco', 'Giulia', 'Luca', 'Francesca', 'Alessandro', 'Chiara', 'Andrea', 'Sara',
+    'Matteo', 'Martina', 'Lorenzo', 'Elena', 'Davide', 'Valentina', 'Simone', 'Anna',
+]
+COGNOMI = [
+    'Rossi', 'Russo', 'Ferrari', 'Esposito', 'Bianchi', 'Romano', 'Colombo', 'Ricci',
+    'Marino', 'Greco', 'Bruno', 'Gallo', 'Conti', 'De Luca', 'Mancini', 'Costa',
+]
+VIE = ['Via Roma', 'Via Garibaldi', 'Via Mazzini', 'Corso Italia', 'Via Verdi', 'Piazza Dante']
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic national dataset (territory, RDL, deleghe, scrutinio) for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Size multiplier (1 = 7,900 comuni, 61k sezioni, 100k registrazioni)')
+        parser.add_argument('--coverage', type=float, default=0.85,
+                            help='Fraction of sezioni with an assigned and designated RDL')
+        parser.add_argument('--completion', type=float, default=0.6,
+                            help='Fraction of designated sezioni with scrutinio data entered')
+        parser.add_argument('--seed', type=int, default=2026)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--force', action='store_true',
+                            help='Run even if the database already contains comuni')
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        if scale <= 0:
+            raise CommandError('--scale deve essere positivo')
+        if Comune.objects.exists() and not options['force']:
+            raise CommandError(
+                'Il database contiene già dei comuni: usare un database dedicato (o --force)'
+            )
+
+        self.rng = random.Random(options['seed'])
+        self.scale = scale
+        self.batch_size = options['batch_size']
+        self.coverage = options['coverage']
+        self.now = timezone.now()
+
+        with transaction.atomic():
+            call_command('setup_referendum_2026', stdout=self.stdout)
+            self.consultazione = ConsultazioneElettorale.objects.filter(is_attiva=True).latest('data_inizio')
+            self.schede = list(SchedaElettorale.objects.filter(tipo_elezione__consultazione=self.consultazione))
+
+            comuni = self._create_comuni()
+            sezioni = self._create_sezioni(comuni)
+            chain = self._create_delegation_chain()
+            registrations = self._create_registrations(comuni, sezioni, chain)
+            designated = self._create_assignments(sezioni, registrations, chain)
+            self._create_rdl_users(designated)
+            self._create_dati(designated, options['completion'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nDataset generato: {Comune.objects.count()} comuni, '
+            f'{SezioneElettorale.objects.count()} sezioni, '
+            f'{RdlRegistration.objects.count()} registrazioni, '
+            f'{SectionAssignment.objects.count()} assegnazioni, '
+            f'{DesignazioneRDL.objects.count()} designazioni, '
+            f'{DatiSezione.objects.filter(is_complete=True).count()}/{DatiSezione.objects.count()} sezioni scrutinate'
+        ))
+
+    def _scaled(self, full):
+        return max(1, round(full * self.scale))
+
+    def _bulk(self, model, objs):
+        return model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    # =========================================================================
+    # Territorio
+    # =========================================================================
+
+    def _create_comuni(self):
+        """Comuni per provincia (~7,900 in total); the first is the capoluogo."""
+        province = list(Provincia.objects.order_by('codice_istat'))
+        weights = [self.rng.uniform(0.4, 1.6) for _ in province]
+        target = self._scaled(COMUNI)
+        comuni = []
+        catastale = 0
+        for provincia, weight in zip(province, weights):
+            count = max(1, round(target * weight / sum(weights)))
+            for n in range(1, count + 1):
+                comuni.append(Comune(
+                    provincia=provincia,
+                    codice_istat=f'{provincia.codice_istat}{n:03d}',
+                    codice_catastale=f'{chr(65 + catastale // 1000 % 26)}{catastale % 1000:03d}',
+                    nome=provincia.nome if n == 1 else f'{provincia.nome} {n}',
+                ))
+                catastale += 1
+        comuni = self._bulk(Comune, comuni)
+        self.stdout.write(f'  {len(comuni)} comuni')
+        return comuni
+
+    def _create_sezioni(self, comuni):
+        """Sezioni skewed towards the capoluoghi; large comuni get municipi."""
+        weights = []
+        for comune in comuni:
+            weight = self.rng.lognormvariate(0, 1.1)
+            if comune.nome == comune.provincia.nome:
+                weight *= 40 if comune.provincia.is_citta_metropolitana else 8
+            weights.append(weight)
+        target = self._scaled(SEZIONI)
+        total_weight = sum(weights)
+        threshold = max(10, round(MUNICIPI_THRESHOLD * self.scale))
+
+        municipi = {}
+        counts = {}
+        for comune, weight in zip(comuni, weights):
+            count = max(1, round(target * weight / total_weight))
+            counts[comune.id] = count
+            comune.sopra_15000_abitanti = count > 15
+            if count >= threshold:
+                municipi[comune.id] = [
+                    Municipio(comune=comune, numero=n, nome=f'Municipio {n}')
+                    for n in range(1, min(MAX_MUNICIPI, 1 + count // threshold * 2) + 1)
+                ]
+        Comune.objects.bulk_update(comuni, ['sopra_15000_abitanti'], batch_size=self.batch_size)
+        self._bulk(Municipio, [m for items in municipi.values() for m in items])
+
+        sezioni = []
+        for comune in comuni:
+            comune_municipi = municipi.get(comune.id)
+            for numero in range(1, counts[comune.id] + 1):
+                sezioni.append(SezioneElettorale(
+                    comune=comune,
+                    municipio=comune_municipi[numero % len(comune_municipi)] if comune_municipi else None,
+                    numero=numero,
+                    indirizzo=f'{self.rng.choice(VIE)} {self.rng.randint(1, 200)}',
+                    denominazione=f'Scuola {self.rng.choice(COGNOMI)}',
+                    n_elettori=self.rng.randint(400, 1200),
+                ))
+        sezioni = self._bulk(SezioneElettorale, sezioni)
+        self.stdout.write(f'  {len(sezioni)} sezioni, {sum(len(m) for m in municipi.values())} municipi')
+        return sezioni
+
+    # =========================================================================
+    # Deleghe
+    # =========================================================================
+
+    def _create_delegation_chain(self):
+        """National Delegato (all regioni), one SubDelega + processo per provincia."""
+        delegato = Delegato.objects.create(
+            consultazione=self.consultazione,
+            cognome='Nazionale', nome='Delegato',
+            carica=Delegato.Carica.DEPUTATO,
+            email=f'delegato@{EMAIL_DOMAIN}',
+        )
+        delegato.regioni.set(Regione.objects.all())
+
+        chain = {}
+        for provincia in Provincia.objects.order_by('codice_istat'):
+            sub_delega = SubDelega.objects.create(
+                delegato=delegato,
+                cognome=provincia.nome, nome='Subdelegato',
+                luogo_nascita=provincia.nome, data_nascita=date(1975, 1, 1),
+                domicilio=f'Via Roma 1, {provincia.nome}',
+                tipo_documento="Carta d'identità", numero_documento=f'CA{provincia.codice_istat}000',
+                data_delega=date(2026, 1, 15),
+                email=f'sub.{provincia.sigla.lower()}@{EMAIL_DOMAIN}',
+            )
+            sub_delega.province.set([provincia])
+            processo = ProcessoDesignazione.objects.create(
+                consultazione=self.consultazione,
+                delegato=delegato,
+                stato=ProcessoDesignazione.Stato.APPROVATO,
+                created_by_email=sub_delega.email,
+            )
+            chain[provincia.id] = (sub_delega, processo)
+        self.stdout.write(f'  1 delegato, {len(chain)} sub-deleghe')
+        return chain
+
+    # =========================================================================
+    # RDL
+    # =========================================================================
+
+    def _create_registrations(self, comuni, sezioni, chain):
+        """Registrations spread like the sezioni: 80% approved, 15% pending."""
+        sezioni_per_comune = {}
+        for sezione in sezioni:
+            sezioni_per_comune.setdefault(sezione.comune_id, []).append(sezione)
+        municipi = {}
+        for municipio in Municipio.objects.filter(comune__in=comuni):
+            municipi.setdefault(municipio.comune_id, []).append(municipio)
+
+        weights = [len(sezioni_per_comune[comune.id]) for comune in comuni]
+        count = self._scaled(REGISTRAZIONI)
+        registrations = []
+        for i, comune in enumerate(self.rng.choices(comuni, weights=weights, k=count)):
+            status = self.rng.choices(
+                [RdlRegistration.Status.APPROVED, RdlRegistration.Status.PENDING, RdlRegistration.Status.REJECTED],
+                weights=[80, 15, 5],
+            )[0]
+            approved = status == RdlRegistration.Status.APPROVED
+            comune_municipi = municipi.get(comune.id)
+            registrations.append(RdlRegistration(
+                email=f'rdl{i:06d}@{EMAIL_DOMAIN}',
+                nome=self.rng.choice(NOMI),
+                cognome=self.rng.choice(COGNOMI),
+                telefono=f'3{self.rng.randint(100000000, 999999999)}',
+                comune_nascita=comune.nome,
+                data_nascita=date(1950, 1, 1) + timedelta(days=self.rng.randint(0, 20000)),
+                comune_residenza=comune.nome,
+                indirizzo_residenza=f'{self.rng.choice(VIE)} {self.rng.randint(1, 200)}',
+                comune=comune,
+                municipio=self.rng.choice(comune_municipi) if comune_municipi else None,
+                status=status,
+                approved_by_email=chain[comune.provincia_id][0].email if approved else '',
+                approved_at=self.now if approved else None,
+                source=self.rng.choices(['SELF', 'CAMPAGNA', 'IMPORT'], weights=[50, 40, 10])[0],
+                consultazione=self.consultazione,
+            ))
+        registrations = self._bulk(RdlRegistration, registrations)
+        self.stdout.write(f'  {len(registrations)} registrazioni RDL')
+        return registrations
+
+    def _create_assignments(self, sezioni, registrations, chain):
+        """
+        RDL (and ~half the time a supplente) from the same comune for
+        `coverage` of the sezioni: SectionAssignment + confirmed designazione.
+
+        Returns [(sezione, effettivo, supplente or None)].
+        """
+        pool = {}
+        for registration in registrations:
+            if registration.status == RdlRegistration.Status.APPROVED:
+                pool.setdefault(registration.comune_id, []).append(registration)
+
+        designated = []
+        assignments = []
+        designazioni = []
+        for sezione in sezioni:
+            candidates = pool.get(sezione.comune_id)
+            if not candidates or self.rng.random() >= self.coverage:
+                continue
+            effettivo = candidates.pop()
+            supplente = candidates.pop() if candidates and self.rng.random() < 0.5 else None
+            sub_delega, processo = chain[sezione.comune.provincia_id]
+            designated.append((sezione, effettivo, supplente))
+
+            for registration, role in ((effettivo, SectionAssignment.Role.RDL),
+                                       (supplente, SectionAssignment.Role.SUPPLENTE)):
+                if registration is not None:
+                    assignments.append(SectionAssignment(
+                        sezione=sezione, consultazione=self.consultazione,
+                        rdl_registration=registration, role=role,
+                        assigned_by_email=sub_delega.email,
+                    ))
+            designazioni.append(DesignazioneRDL(
+                sub_delega=sub_delega, processo=processo, sezione=sezione,
+                stato=DesignazioneRDL.Stato.CONFERMATA, is_attiva=True,
+                approvata_da_email=sub_delega.email, data_approvazione=self.now,
+                created_by_email=sub_delega.email,
+                **self._rdl_snapshot('effettivo', effettivo),
+                **self._rdl_snapshot('supplente', supplente),
+            ))
+        self._bulk(SectionAssignment, assignments)
+        self._bulk(DesignazioneRDL, designazioni)
+        self.stdout.write(f'  {len(assignments)} assegnazioni, {len(designazioni)} designazioni')
+        return designated
+
+    @staticmethod
+    def _rdl_snapshot(prefix, registration):
+        if registration is None:
+            return {}
+        return {
+            f'{prefix}_cognome': registration.cognome,
+            f'{prefix}_nome': registration.nome,
+            f'{prefix}_email': registration.email,
+            f'{prefix}_telefono': registration.telefono,
+            f'{prefix}_luogo_nascita': registration.comune_nascita,
+            f'{prefix}_data_nascita': registration.data_nascita,
+            f'{prefix}_domicilio': f'{registration.indirizzo_residenza}, {registration.comune_residenza}',
+        }
+
+    def _create_rdl_users(self, designated):
+        """Users, RDL group and role for the designated RDLs (what provision_rdl_users does)."""
+        registrations = {}
+        for sezione, effettivo, supplente in designated:
+            for registration in (effettivo, supplente):
+                if registration is not None:
+                    registrations[registration.email] = (registration, sezione)
+
+        password = make_password(None)
+        users = self._bulk(User, [
+            User(
+                email=email, password=password,
+                display_name=f'{registration.cognome} {registration.nome}',
+                first_name=registration.nome, last_name=registration.cognome,
+                phone_number=registration.telefono,
+            )
+            for email, (registration, _) in registrations.items()
+        ])
+
+        group, _ = Group.objects.get_or_create(name='RDL')
+        self._bulk(User.groups.through, [User.groups.through(user_id=user.id, group_id=group.id) for user in users])
+        self._bulk(RoleAssignment, [
+            RoleAssignment(
+                user=user, role=RoleAssignment.Role.RDL,
+                scope_type=RoleAssignment.ScopeType.SEZIONE,
+                scope_value=str(registrations[user.email][1].numero),
+                consultazione=self.consultazione,
+            )
+            for user in users
+        ])
+        self.stdout.write(f'  {len(users)} utenti RDL')
+
+    # =========================================================================
+    # Scrutinio
+    # =========================================================================
+
+    def _create_dati(self, designated, completion):
+        """DatiSezione/DatiScheda for every designated sezione, `completion` of them filled in."""
+        dati = []
+        filled = []
+        for sezione, effettivo, _ in designated:
+            complete = self.rng.random() < completion
+            filled.append(complete)
+            if not complete:
+                dati.append(DatiSezione(sezione=sezione, consultazione=self.consultazione))
+                continue
+            elettori = sezione.n_elettori
+            maschi = elettori * self.rng.randint(45, 52) // 100
+            affluenza = self.rng.uniform(0.35, 0.75)
+            dati.append(DatiSezione(
+                sezione=sezione, consultazione=self.consultazione,
+                elettori_maschi=maschi, elettori_femmine=elettori - maschi,
+                votanti_maschi=int(maschi * affluenza), votanti_femmine=int((elettori - maschi) * affluenza),
+                is_complete=True,
+                inserito_da_email=effettivo.email, inserito_at=self.now,
+                updated_by_email=effettivo.email,
+            ))
+        dati = self._bulk(DatiSezione, dati)
+
+        schede = []
+        for dati_sezione, complete in zip(dati, filled):
+            for scheda in self.schede:
+                if not complete:
+                    schede.append(DatiScheda(dati_sezione=dati_sezione, scheda=scheda))
+                    continue
+                votanti = dati_sezione.votanti_maschi + dati_sezione.votanti_femmine
+                bianche = self.rng.randint(0, votanti // 50)
+                nulle = self.rng.randint(0, votanti // 50)
+                si = self.rng.randint(0, votanti - bianche - nulle)
+                schede.append(DatiScheda(
+                    dati_sezione=dati_sezione, scheda=scheda,
+                    schede_ricevute=dati_sezione.elettori_maschi + dati_sezione.elettori_femmine + 20,
+                    schede_autenticate=votanti,
+                    schede_bianche=bianche, schede_nulle=nulle, schede_contestate=0,
+                    voti={'si': si, 'no': votanti - bianche - nulle - si},
+                    inserito_at=self.now,
+                    updated_by_email=dati_sezione.updated_by_email,
+                ))
+        self._bulk(DatiScheda, schede)
+        self.stdout.write(f'  {len(dati)} dati sezione ({sum(filled)} completi), {len(schede)} dati scheda')
@@ -3,6 +3,7 @@ Serializers for sections models.
 """
 from rest_framework import serializers
 from django.utils import timezone
+from core.serializers import UserPrefetchListSerializer
 from .models import SectionAssignment, DatiSezione, DatiScheda, SectionDataHistory
 
 
@@ -110,6 +111,8 @@ class DatiSezioneSerializer(serializers.ModelSerializer):
             'id', 'totale_elettori', 'totale_votanti', 'affluenza_percentuale',
             'verified_by', 'verified_at', 'inserito_da', 'aggiornato_at'
         ]
+        list_serializer_class = UserPrefetchListSerializer
+        user_email_fields = ['inserito_da_email', 'verified_by_email']
 
 
 class DatiSezioneUpdateSerializer(serializers.ModelSerializer):
@@ -156,3 +159,5 @@ class SectionDataHistorySerializer(serializers.ModelSerializer):
             'valore_precedente', 'valore_nuovo',
             'modificato_da', 'modificato_da_email', 'modificato_at', 'ip_address'
         ]
+        list_serializer_class = UserPrefetchListSerializer
+        user_email_fields = ['modificato_da_email']
@@ -0,0 +1,50 @@
+"""
+Tests for the data app.
+"""
+import io
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from campaign.models import RdlRegistration
+from data.models import DatiScheda, DatiSezione, SectionAssignment
+from delegations.models import DesignazioneRDL, SubDelega
+from territory.models import Comune, Provincia, Regione, SezioneElettorale
+
+
+def _generate(**options):
+    call_command('generate_election_dataset', stdout=io.StringIO(), **options)
+
+
+@pytest.mark.django_db
+class TestGenerateElectionDataset:
+    def test_builds_a_consistent_dataset(self):
+        _generate(scale=0.005, coverage=0.5, completion=0.5)
+
+        assert Regione.objects.count() == 20
+        assert Provincia.objects.count() == 107
+        assert SubDelega.objects.count() == 107
+        assert Comune.objects.count() >= 107  # at least the capoluoghi
+        assert SezioneElettorale.objects.count() >= Comune.objects.count()
+        assert RdlRegistration.objects.count() > 0
+
+        designazioni = DesignazioneRDL.objects.filter(stato='CONFERMATA', is_attiva=True)
+        assert designazioni.exists()
+        # Every designated sezione has an assignment, dati and an RDL user
+        designated = set(designazioni.values_list('sezione_id', flat=True))
+        assert designated <= set(SectionAssignment.objects.values_list('sezione_id', flat=True))
+        assert designated == set(DatiSezione.objects.values_list('sezione_id', flat=True))
+        assert DatiScheda.objects.count() == DatiSezione.objects.count()
+        emails = set(designazioni.values_list('effettivo_email', flat=True))
+        assert get_user_model().objects.filter(email__in=emails).count() == len(emails)
+
+        complete = DatiSezione.objects.filter(is_complete=True).count()
+        assert 0 < complete < DatiSezione.objects.count()
+
+    def test_refuses_a_populated_database(self):
+        _generate(scale=0.001)
+
+        with pytest.raises(CommandError):
+            _generate(scale=0.001)
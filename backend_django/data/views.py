@@ -16,6 +16,7 @@ from core.permissions import (
     CanManageRDL, HasScrutinioAccess, CanManageDelegations, CanManageMappatura,
     CanManageTerritory
 )
+from core.models import prefetch_users_by_email
 from .models import SectionAssignment, DatiSezione, DatiScheda
 from campaign.models import RdlRegistration
 from elections.models import ConsultazioneElettorale
@@ -1976,6 +1977,10 @@ class RdlRegistrationListView(APIView):
         if error:
             return error
 
+        registrations = list(registrations)
+        # approved_by: one query for the page instead of one per registration
+        prefetch_users_by_email(reg.approved_by_email for reg in registrations)
+
         result = []
         for reg in registrations:
             result.append({
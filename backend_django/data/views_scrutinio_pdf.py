@@ -10,7 +10,6 @@ from django.db.models import Q
 from elections.models import ConsultazioneElettorale, SchedaElettorale
 from territory.models import SezioneElettorale
 from delegations.models import DesignazioneRDL
-from .scrutinio_pdf import generate_scrutinio_form
 
 logger = logging.getLogger(__name__)
 
@@ -96,6 +95,9 @@ class ScrutinioFormPDFView(APIView):
             f"consultazione={consultazione.id} sezioni={len(sezioni_with_schede)}"
         )
 
+        # Import here: reportlab (with PIL and numpy) would slow down the cold start
+        from .scrutinio_pdf import generate_scrutinio_form
+
         # Generate PDF
         pdf_buffer = generate_scrutinio_form(consultazione, sezioni_with_schede)
 
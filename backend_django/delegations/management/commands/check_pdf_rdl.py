@@ -8,6 +8,7 @@ Uso:
 from django.core.management.base import BaseCommand
 from django.core.files.storage import default_storage
 from django.db.models import Q
+from core.db_router import replica_reads
 from delegations.models import ProcessoDesignazione, DesignazioneRDL
 import hashlib
 
@@ -21,6 +22,7 @@ class Command(BaseCommand):
         parser.add_argument('--only-missing', action='store_true',
                           help='Mostra solo RDL senza PDF')
 
+    @replica_reads
     def handle(self, *args, **options):
         consultazione_id = options['consultazione']
         only_missing = options['only_missing']
@@ -14,6 +14,7 @@ Uso:
 from django.core.management.base import BaseCommand
 from django.core.files.storage import default_storage
 from django.db.models import Q
+from core.db_router import replica_reads
 from delegations.models import DesignazioneRDL, ProcessoDesignazione
 import hashlib
 
@@ -27,6 +28,7 @@ class Command(BaseCommand):
         parser.add_argument('--check-exists', action='store_true',
                           help='Verifica se il file esiste su GCS')
 
+    @replica_reads
     def handle(self, *args, **options):
         email = options['email'].strip().lower()
         processo_id = options['processo']
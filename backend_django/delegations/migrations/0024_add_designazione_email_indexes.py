@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delegations', '0023_alter_processodesignazione_stato'),
+        ('territory', '0008_add_comune_nome_upper_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='designazionerdl',
+            index=models.Index(condition=models.Q(('is_attiva', True)), fields=['effettivo_email'], name='deleg_rdl_effettivo_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='designazionerdl',
+            index=models.Index(condition=models.Q(('is_attiva', True)), fields=['supplente_email'], name='deleg_rdl_supplente_email_idx'),
+        ),
+    ]
@@ -464,6 +464,13 @@ class DesignazioneRDL(models.Model):
                 name='designazione_ha_almeno_un_rdl'
             ),
         ]
+        indexes = [
+            # "Le mie sezioni" of an RDL: effettivo OR supplente, attive
+            models.Index(fields=['effettivo_email'], condition=models.Q(is_attiva=True),
+                         name='deleg_rdl_effettivo_email_idx'),
+            models.Index(fields=['supplente_email'], condition=models.Q(is_attiva=True),
+                         name='deleg_rdl_supplente_email_idx'),
+        ]
 
     def __str__(self):
         stato_label = f" [{self.get_stato_display()}]" if self.stato != self.Stato.CONFERMATA else ""
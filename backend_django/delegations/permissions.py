@@ -45,10 +45,21 @@ def get_user_delegation_roles(user, consultazione_id=None):
             Q(sub_delega__delegato__consultazione_id=consultazione_id)
         )
 
+    # Flags from the JWT role claims (core.authentication), when current
+    flags = getattr(user, 'delegation_flags', {}).get(str(consultazione_id)) if consultazione_id else None
+    if flags is not None:
+        is_delegato, is_sub_delegato, is_rdl = (
+            flags['is_delegato'], flags['is_sub_delegato'], flags['is_rdl']
+        )
+    else:
+        is_delegato, is_sub_delegato, is_rdl = (
+            deleghe_lista.exists(), sub_deleghe.exists(), designazioni.exists()
+        )
+
     return {
-        'is_delegato': deleghe_lista.exists(),
-        'is_sub_delegato': sub_deleghe.exists(),
-        'is_rdl': designazioni.exists(),
+        'is_delegato': is_delegato,
+        'is_sub_delegato': is_sub_delegato,
+        'is_rdl': is_rdl,
         'deleghe_lista': deleghe_lista,
         'sub_deleghe': sub_deleghe,
         'designazioni': designazioni,
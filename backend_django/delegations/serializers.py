@@ -7,6 +7,7 @@ from django.db import models
 from rest_framework import serializers
 from .models import Delegato, SubDelega, DesignazioneRDL, ProcessoDesignazione
 from campaign.models import CampagnaReclutamento, RdlRegistration
+from core.serializers import UserPrefetchListSerializer
 
 
 class DelegatoSerializer(serializers.ModelSerializer):
@@ -188,6 +189,8 @@ class DesignazioneRDLSerializer(serializers.ModelSerializer):
             'catena_deleghe'
         ]
         read_only_fields = ['id', 'data_designazione', 'created_at', 'data_approvazione']
+        list_serializer_class = UserPrefetchListSerializer
+        user_email_fields = ['approvata_da_email']
 
     def get_effettivo(self, obj):
         if not obj.effettivo_email:
@@ -566,6 +569,8 @@ class CampagnaReclutamentoSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'created_by_nome']
+        list_serializer_class = UserPrefetchListSerializer
+        user_email_fields = ['created_by_email']
 
     def get_delegato_nome(self, obj):
         if obj.delegato:
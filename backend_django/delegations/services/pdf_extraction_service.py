@@ -2,7 +2,6 @@
 Servizio per estrazione pagine specifiche da PDF di designazione.
 Pre-genera PDF individuali per ogni RDL su GCS per download diretto.
 """
-from PyPDF2 import PdfReader, PdfWriter
 from io import BytesIO
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
@@ -46,6 +45,9 @@ class PDFExtractionService:
         Returns:
             dict con {'generati': int, 'errori': int, 'dettagli': [...]}
         """
+        # Importato qui: PyPDF2 rallenterebbe l'avvio dei servizi che non generano PDF
+        from PyPDF2 import PdfReader, PdfWriter
+
         from delegations.models import DesignazioneRDL
 
         if not processo.documento_individuale:
@@ -171,6 +173,8 @@ class PDFExtractionService:
         Estrae pagine del PDF individuale per un RDL.
         Prima prova il PDF pre-generato su GCS, altrimenti estrae al volo.
         """
+        from PyPDF2 import PdfReader, PdfWriter
+
         if not designazioni.exists():
             raise ValueError("Nessuna designazione fornita")
 
@@ -18,7 +18,9 @@ from django.db import IntegrityError, transaction
 from django.db.models.signals import post_save, pre_save, m2m_changed
 from django.dispatch import receiver
 
+from core.authentication import invalidate_emails
 from core.models import User, RoleAssignment, AuditLog
+from core.profile_cache import invalidate_profiles
 from .models import Delegato, SubDelega, DesignazioneRDL
 
 # Cache per tracciare i valori pre-save (email precedente)
@@ -26,6 +28,23 @@ _pre_save_cache = {}
 
 logger = logging.getLogger(__name__)
 
+# Rows for designazioni_changed(), read before a bulk or queryset write
+DESIGNAZIONE_CACHE_FIELDS = ('processo__consultazione_id', 'effettivo_email', 'supplente_email')
+
+
+def designazioni_changed(rows):
+    """
+    bulk_create/bulk_update/QuerySet.update() send no post_save: call this
+    with the (consultazione_id, effettivo_email, supplente_email) rows they
+    touched, to drop the cached state of those RDL: auth versions, role
+    claims, /api/permissions snapshots (core.signals) and AI profile
+    snapshots, whose section list the assistant trusts (core.profile_cache).
+    """
+    invalidate_emails({email for _, *emails in rows for email in emails})
+    invalidate_profiles([
+        (consultazione_id, email) for consultazione_id, *emails in rows for email in emails
+    ])
+
 
 def ensure_user_exists(email, defaults=None):
     """
@@ -12,6 +12,7 @@ from core.permissions import CanManageDelegations, CanGenerateDocuments
 from elections.models import ConsultazioneElettorale
 from territory.models import SezioneElettorale
 from .models import Delegato, SubDelega, DesignazioneRDL, ProcessoDesignazione
+from .signals import DESIGNAZIONE_CACHE_FIELDS, designazioni_changed
 from .serializers import (
     DelegatoSerializer,
     SubDelegaSerializer, SubDelegaCreateSerializer,
@@ -1161,8 +1162,10 @@ class ProcessoDesignazioneLegacyViewSet(viewsets.ModelViewSet):
             n_designazioni=designazioni.count()
         )
 
-        # Collega designazioni al batch
+        # Collega designazioni al batch (update: no signals)
+        touched = list(designazioni.values_list(*DESIGNAZIONE_CACHE_FIELDS))
         designazioni.update(processo=batch)
+        designazioni_changed(touched)
 
         return Response(
             ProcessoDesignazioneSerializer(batch).data,
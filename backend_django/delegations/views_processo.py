@@ -17,6 +17,7 @@ from django.db.models import Q
 import logging
 
 from .models import ProcessoDesignazione, DesignazioneRDL, Delegato, SubDelega, EmailDesignazioneLog
+from .signals import DESIGNAZIONE_CACHE_FIELDS, designazioni_changed
 from .services import RDLEmailService, PDFExtractionService
 from .serializers import (
     ProcessoDesignazioneSerializer,
@@ -594,6 +595,12 @@ class ProcessoDesignazioneViewSet(viewsets.ModelViewSet):
             logger.warning(f"[configura] Processo {processo.id} nessuna designazione creata, sezioni={processo.sezione_ids}")
             return Response({'error': 'Nessuna designazione creata'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # RDL replaced in the existing bozze (read before they're overwritten)
+        previous_rdl = [
+            (processo.consultazione_id, d.effettivo_email, d.supplente_email)
+            for d in DesignazioneRDL.objects.filter(pk__in=[d.pk for d in to_update])
+        ]
+
         # Bulk operations (skip signals, much faster)
         if to_update:
             update_fields = [
@@ -611,6 +618,9 @@ class ProcessoDesignazioneViewSet(viewsets.ModelViewSet):
             DesignazioneRDL.objects.bulk_create(to_create, batch_size=500)
 
         designazioni_create = to_update + to_create
+        designazioni_changed(previous_rdl + [
+            (processo.consultazione_id, d.effettivo_email, d.supplente_email) for d in designazioni_create
+        ])
 
         # Step 2: Salva configurazione processo
         processo.template_individuale = template_ind
@@ -830,6 +840,12 @@ class ProcessoDesignazioneViewSet(viewsets.ModelViewSet):
             stato='CONFERMATA'
         ).exclude(processo=processo)
 
+        # Queryset updates send no signals: RDL whose designazione changes
+        touched = (
+            list(vecchie_designazioni.values_list(*DESIGNAZIONE_CACHE_FIELDS))
+            + list(designazioni.values_list(*DESIGNAZIONE_CACHE_FIELDS))
+        )
+
         n_disattivate = vecchie_designazioni.update(is_attiva=False)
         logger.info(f"[conferma] Processo {processo.id}: disattivate {n_disattivate} designazioni precedenti")
 
@@ -838,6 +854,7 @@ class ProcessoDesignazioneViewSet(viewsets.ModelViewSet):
             stato='CONFERMATA',
             data_approvazione=timezone.now()
         )
+        designazioni_changed(touched)
 
         return Response({
             'success': True,
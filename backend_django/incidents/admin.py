@@ -16,7 +16,7 @@ class IncidentCommentInline(admin.TabularInline):
 class IncidentAttachmentInline(admin.TabularInline):
     model = IncidentAttachment
     extra = 0
-    readonly_fields = ['uploaded_by', 'uploaded_at', 'file_size', 'file_type']
+    readonly_fields = ['uploaded_by', 'uploaded_at', 'file_size', 'file_type', 'processing_status']
 
 
 @admin.register(IncidentReport)
@@ -71,8 +71,8 @@ class IncidentCommentAdmin(admin.ModelAdmin):
 
 @admin.register(IncidentAttachment)
 class IncidentAttachmentAdmin(admin.ModelAdmin):
-    list_display = ['filename', 'incident', 'file_type', 'file_size', 'uploaded_by', 'uploaded_at']
-    list_filter = ['file_type', 'uploaded_at']
+    list_display = ['filename', 'incident', 'file_type', 'file_size', 'processing_status', 'uploaded_by', 'uploaded_at']
+    list_filter = ['file_type', 'processing_status', 'uploaded_at']
     search_fields = ['filename', 'description', 'incident__title']
     raw_id_fields = ['incident', 'uploaded_by']
-    readonly_fields = ['uploaded_at', 'file_size', 'file_type', 'filename']
+    readonly_fields = ['uploaded_at', 'file_size', 'file_type', 'filename', 'thumbnail', 'preview', 'processing_status']
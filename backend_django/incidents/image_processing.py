@@ -0,0 +1,130 @@
+"""
+Image pipeline for incident attachments.
+
+RDLs upload full-resolution phone photos. Reviewers (and the AI assistant)
+only need a bounded-size preview and a small thumbnail, so each image
+attachment gets two WebP variants:
+
+- thumbnail: max THUMBNAIL_SIZE, for lists and galleries
+- preview:   max PREVIEW_SIZE, for the detail view
+
+Both are rotated according to the EXIF orientation and re-encoded without
+metadata (GPS, device info). The original upload is never modified.
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+PREVIEW_SIZE = (1600, 1600)
+THUMBNAIL_QUALITY = 75
+PREVIEW_QUALITY = 82
+
+
+def _normalize_mode(img):
+    """Convert to a mode WebP can encode (RGB, or RGBA if transparent)."""
+    if img.mode in ('RGB', 'RGBA'):
+        return img
+    if img.mode in ('P', 'LA', 'PA') and (
+        'transparency' in img.info or img.mode in ('LA', 'PA')
+    ):
+        return img.convert('RGBA')
+    return img.convert('RGB')
+
+
+def _encode_webp(img, quality):
+    buffer = io.BytesIO()
+    # No exif/icc arguments: the encoded file carries no metadata.
+    img.save(buffer, format='WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def build_variants(fileobj):
+    """
+    Build thumbnail and preview variants from an image file object.
+
+    Returns:
+        dict: {'thumbnail': bytes, 'preview': bytes}
+
+    Raises:
+        PIL.UnidentifiedImageError / OSError if the file is not a readable image.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(fileobj) as img:
+        # JPEG only: let the decoder downscale by 1/2, 1/4, 1/8 while
+        # decoding, which is much faster than decoding 12MP and resizing.
+        img.draft('RGB', PREVIEW_SIZE)
+        img = ImageOps.exif_transpose(img)
+        img = _normalize_mode(img)
+
+        preview = img.copy()
+        preview.thumbnail(PREVIEW_SIZE, Image.Resampling.LANCZOS)
+
+        thumbnail = preview.copy()
+        thumbnail.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+
+        return {
+            'thumbnail': _encode_webp(thumbnail, THUMBNAIL_QUALITY),
+            'preview': _encode_webp(preview, PREVIEW_QUALITY),
+        }
+
+
+def process_attachment(attachment_id):
+    """
+    Generate and store the variants of an IncidentAttachment.
+
+    Safe to call repeatedly (e.g. to reprocess): existing variants are
+    replaced. Runs in a background thread, see core.background.submit.
+    """
+    from .models import IncidentAttachment
+
+    try:
+        attachment = IncidentAttachment.objects.get(pk=attachment_id)
+    except IncidentAttachment.DoesNotExist:
+        logger.warning(f"IncidentAttachment {attachment_id} not found, skipping processing")
+        return
+
+    if attachment.file_type != IncidentAttachment.FileType.IMAGE:
+        IncidentAttachment.objects.filter(pk=attachment.pk).update(
+            processing_status=IncidentAttachment.ProcessingStatus.SKIPPED
+        )
+        return
+
+    try:
+        with attachment.file.open('rb') as f:
+            variants = build_variants(f)
+    except Exception as e:
+        logger.warning(f"Image processing failed for attachment {attachment.pk}: {e}")
+        IncidentAttachment.objects.filter(pk=attachment.pk).update(
+            processing_status=IncidentAttachment.ProcessingStatus.FAILED
+        )
+        return
+
+    base = os.path.splitext(os.path.basename(attachment.file.name))[0]
+    old_names = [f.name for f in (attachment.thumbnail, attachment.preview) if f]
+
+    attachment.thumbnail.save(f'{base}_thumb.webp', ContentFile(variants['thumbnail']), save=False)
+    attachment.preview.save(f'{base}_preview.webp', ContentFile(variants['preview']), save=False)
+
+    # update() instead of save(): save() recomputes filename/size from the
+    # original file, which may live on remote storage.
+    IncidentAttachment.objects.filter(pk=attachment.pk).update(
+        thumbnail=attachment.thumbnail.name,
+        preview=attachment.preview.name,
+        processing_status=IncidentAttachment.ProcessingStatus.READY,
+    )
+
+    storage = attachment.file.storage
+    for name in old_names:
+        if name not in (attachment.thumbnail.name, attachment.preview.name):
+            storage.delete(name)
+
+    logger.info(
+        f"Processed attachment {attachment.pk}: "
+        f"thumbnail={len(variants['thumbnail'])}B preview={len(variants['preview'])}B"
+    )
@@ -0,0 +1,43 @@
+"""
+Genera miniature e anteprime per gli allegati immagine delle segnalazioni.
+
+Serve per gli allegati caricati prima della pipeline immagini o rimasti
+in stato PENDING/FAILED (es. istanza terminata durante l'elaborazione).
+
+Usage:
+    python manage.py process_incident_attachments
+    python manage.py process_incident_attachments --force
+"""
+from django.core.management.base import BaseCommand
+
+from incidents.image_processing import process_attachment
+from incidents.models import IncidentAttachment
+
+
+class Command(BaseCommand):
+    help = "Genera miniature/anteprime WebP per gli allegati immagine"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rielabora anche gli allegati già pronti",
+        )
+
+    def handle(self, *args, **options):
+        qs = IncidentAttachment.objects.filter(file_type=IncidentAttachment.FileType.IMAGE)
+        if not options["force"]:
+            qs = qs.exclude(processing_status=IncidentAttachment.ProcessingStatus.READY)
+
+        ids = list(qs.values_list("id", flat=True))
+        self.stdout.write(f"Allegati da elaborare: {len(ids)}")
+
+        for i, attachment_id in enumerate(ids, 1):
+            process_attachment(attachment_id)
+            if i % 100 == 0:
+                self.stdout.write(f"  {i}/{len(ids)}")
+
+        ready = IncidentAttachment.objects.filter(
+            id__in=ids, processing_status=IncidentAttachment.ProcessingStatus.READY
+        ).count()
+        self.stdout.write(self.style.SUCCESS(f"Completato: {ready}/{len(ids)} pronti"))
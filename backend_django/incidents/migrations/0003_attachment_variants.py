@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:02
+
+from django.db import migrations, models
+
+
+def mark_non_images_skipped(apps, schema_editor):
+    IncidentAttachment = apps.get_model('incidents', 'IncidentAttachment')
+    IncidentAttachment.objects.exclude(file_type='IMAGE').update(processing_status='SKIPPED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incidents', '0002_incidentreport_is_platform_issue_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidentattachment',
+            name='preview',
+            field=models.FileField(blank=True, upload_to='incidents/previews/%Y/%m/%d/', verbose_name='anteprima'),
+        ),
+        migrations.AddField(
+            model_name='incidentattachment',
+            name='processing_status',
+            field=models.CharField(choices=[('PENDING', 'In elaborazione'), ('READY', 'Pronto'), ('SKIPPED', 'Non applicabile'), ('FAILED', 'Errore')], default='PENDING', max_length=20, verbose_name='stato elaborazione'),
+        ),
+        migrations.AddField(
+            model_name='incidentattachment',
+            name='thumbnail',
+            field=models.FileField(blank=True, upload_to='incidents/thumbnails/%Y/%m/%d/', verbose_name='miniatura'),
+        ),
+        migrations.RunPython(mark_non_images_skipped, migrations.RunPython.noop),
+    ]
@@ -204,6 +204,12 @@ class IncidentAttachment(models.Model):
         VIDEO = 'VIDEO', _('Video')
         OTHER = 'OTHER', _('Altro')
 
+    class ProcessingStatus(models.TextChoices):
+        PENDING = 'PENDING', _('In elaborazione')
+        READY = 'READY', _('Pronto')
+        SKIPPED = 'SKIPPED', _('Non applicabile')
+        FAILED = 'FAILED', _('Errore')
+
     incident = models.ForeignKey(
         IncidentReport,
         on_delete=models.CASCADE,
@@ -236,6 +242,25 @@ class IncidentAttachment(models.Model):
         blank=True
     )
 
+    # Image variants (see incidents/image_processing.py): EXIF-rotated,
+    # metadata-stripped WebP. The original file is kept untouched.
+    thumbnail = models.FileField(
+        _('miniatura'),
+        upload_to='incidents/thumbnails/%Y/%m/%d/',
+        blank=True
+    )
+    preview = models.FileField(
+        _('anteprima'),
+        upload_to='incidents/previews/%Y/%m/%d/',
+        blank=True
+    )
+    processing_status = models.CharField(
+        _('stato elaborazione'),
+        max_length=20,
+        choices=ProcessingStatus.choices,
+        default=ProcessingStatus.PENDING
+    )
+
     uploaded_at = models.DateTimeField(_('data caricamento'), auto_now_add=True)
 
     class Meta:
@@ -260,4 +285,7 @@ class IncidentAttachment(models.Model):
             elif ext in ['mp4', 'mov', 'avi', 'webm']:
                 self.file_type = self.FileType.VIDEO
 
+            if self.file_type != self.FileType.IMAGE:
+                self.processing_status = self.ProcessingStatus.SKIPPED
+
         super().save(*args, **kwargs)
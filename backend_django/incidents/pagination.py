@@ -0,0 +1,43 @@
+"""
+Pagination for incidents API endpoints.
+"""
+from django.utils import timezone
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class IncidentCursorPagination(CursorPagination):
+    """
+    Cursor pagination for the incident board.
+
+    Stable under concurrent inserts (new reports don't shift pages) and
+    doesn't need a COUNT(*) per request. The response also carries
+    ``server_time``: clients pass it back as ``?since=`` on the next poll
+    to fetch only the incidents that changed in the meantime.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Taken before the query runs so that changes committed while the
+        # page is being built are picked up by the next poll.
+        self.server_time = timezone.now()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'server_time': self.server_time.isoformat(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['server_time'] = {
+            'type': 'string',
+            'format': 'date-time',
+        }
+        return schema
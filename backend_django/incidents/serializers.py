@@ -9,15 +9,21 @@ class IncidentAttachmentSerializer(serializers.ModelSerializer):
     """Serializer for IncidentAttachment model."""
     file_type_display = serializers.CharField(source='get_file_type_display', read_only=True)
     uploaded_by_email = serializers.EmailField(source='uploaded_by.email', read_only=True)
+    thumbnail_url = serializers.FileField(source='thumbnail', read_only=True)
+    preview_url = serializers.FileField(source='preview', read_only=True)
 
     class Meta:
         model = IncidentAttachment
         fields = [
-            'id', 'file', 'file_type', 'file_type_display',
+            'id', 'incident', 'file', 'file_type', 'file_type_display',
             'filename', 'file_size', 'description',
+            'thumbnail_url', 'preview_url', 'processing_status',
             'uploaded_by', 'uploaded_by_email', 'uploaded_at'
         ]
-        read_only_fields = ['id', 'filename', 'file_size', 'file_type', 'uploaded_by', 'uploaded_at']
+        read_only_fields = [
+            'id', 'filename', 'file_size', 'file_type', 'processing_status',
+            'uploaded_by', 'uploaded_at'
+        ]
 
 
 class IncidentCommentSerializer(serializers.ModelSerializer):
@@ -112,13 +118,23 @@ class IncidentReportUpdateSerializer(serializers.ModelSerializer):
 
 
 class IncidentReportListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for lists."""
+    """
+    Lightweight serializer for lists.
+
+    Expects the annotated queryset built by IncidentReportViewSet for list
+    actions (comments_count, attachments_count, last_activity_at,
+    cover_thumbnail).
+    """
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     severity_display = serializers.CharField(source='get_severity_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     location_description = serializers.CharField(read_only=True)
     reporter_email = serializers.EmailField(source='reporter.email', read_only=True)
     reporter_name = serializers.CharField(source='reporter.display_name', read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
+    attachments_count = serializers.IntegerField(read_only=True)
+    last_activity_at = serializers.DateTimeField(read_only=True)
+    cover_thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = IncidentReport
@@ -127,5 +143,16 @@ class IncidentReportListSerializer(serializers.ModelSerializer):
             'severity', 'severity_display', 'status', 'status_display',
             'location_description', 'reporter', 'reporter_email', 'reporter_name',
             'assigned_to', 'is_verbalizzato',
-            'is_platform_issue', 'created_at'
+            'is_platform_issue', 'created_at',
+            'comments_count', 'attachments_count', 'last_activity_at',
+            'cover_thumbnail_url'
         ]
+
+    def get_cover_thumbnail_url(self, obj):
+        """Thumbnail of the latest processed image attachment, if any."""
+        name = getattr(obj, 'cover_thumbnail', None)
+        if not name:
+            return None
+        url = IncidentAttachment._meta.get_field('thumbnail').storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
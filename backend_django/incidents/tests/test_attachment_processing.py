@@ -0,0 +1,137 @@
+"""
+Tests for the incident attachment image pipeline (Pillow + local storage).
+"""
+import io
+import shutil
+import tempfile
+from datetime import date
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import User
+from core.testing import LOCMEM_CACHE
+from elections.models import ConsultazioneElettorale
+from incidents.image_processing import PREVIEW_SIZE, THUMBNAIL_SIZE, build_variants
+from incidents.models import IncidentReport, IncidentAttachment
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+EXIF_ORIENTATION = 0x0112
+EXIF_MAKE = 0x010F
+
+
+def _phone_photo(width=2400, height=1800, orientation=6):
+    """Landscape JPEG with an EXIF 'rotate 90° CW' tag, like a portrait phone shot."""
+    img = Image.new('RGB', (width, height), (200, 30, 30))
+    # Mark the top-left corner to check rotation
+    img.paste((0, 0, 255), (0, 0, width // 4, height // 4))
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = orientation
+    exif[EXIF_MAKE] = 'PhoneCorp'
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', exif=exif.tobytes(), quality=90)
+    return buffer.getvalue()
+
+
+class BuildVariantsTest(TestCase):
+
+    def test_rotates_resizes_and_strips_metadata(self):
+        variants = build_variants(io.BytesIO(_phone_photo()))
+
+        preview = Image.open(io.BytesIO(variants['preview']))
+        thumbnail = Image.open(io.BytesIO(variants['thumbnail']))
+
+        self.assertEqual(preview.format, 'WEBP')
+        self.assertEqual(thumbnail.format, 'WEBP')
+        # Orientation 6 on a landscape sensor image -> portrait
+        self.assertLess(preview.width, preview.height)
+        self.assertLessEqual(max(preview.size), max(PREVIEW_SIZE))
+        self.assertLessEqual(max(thumbnail.size), max(THUMBNAIL_SIZE))
+        self.assertEqual(len(preview.getexif()), 0)
+        self.assertNotIn('exif', preview.info)
+        self.assertNotIn('exif', thumbnail.info)
+
+    def test_small_image_not_upscaled(self):
+        variants = build_variants(io.BytesIO(_phone_photo(200, 100, orientation=1)))
+        preview = Image.open(io.BytesIO(variants['preview']))
+        self.assertEqual(preview.size, (200, 100))
+
+    def test_palette_with_transparency(self):
+        img = Image.new('P', (64, 64))
+        img.info['transparency'] = 0
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG', transparency=0)
+        variants = build_variants(io.BytesIO(buffer.getvalue()))
+        self.assertEqual(Image.open(io.BytesIO(variants['thumbnail'])).mode, 'RGBA')
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=MEDIA_ROOT, BACKGROUND_TASKS_EAGER=True)
+class AttachmentUploadTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='admin@example.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        consultazione = ConsultazioneElettorale.objects.create(
+            nome='Test 2026', data_inizio=date(2026, 6, 8), data_fine=date(2026, 6, 9)
+        )
+        self.incident = IncidentReport.objects.create(
+            consultazione=consultazione,
+            reporter=self.user,
+            category=IncidentReport.Category.MATERIALS,
+            title='Schede mancanti',
+            description='...',
+        )
+
+    def _upload(self, name, content, content_type):
+        return self.client.post('/api/incidents/attachments/', {
+            'incident': self.incident.id,
+            'file': SimpleUploadedFile(name, content, content_type=content_type),
+        }, format='multipart')
+
+    def test_image_upload_generates_variants(self):
+        original = _phone_photo()
+        response = self._upload('foto.jpg', original, 'image/jpeg')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        attachment = IncidentAttachment.objects.get(pk=response.data['id'])
+        self.assertEqual(attachment.processing_status, IncidentAttachment.ProcessingStatus.READY)
+        self.assertTrue(attachment.thumbnail.name.endswith('_thumb.webp'))
+        self.assertTrue(attachment.preview.name.endswith('_preview.webp'))
+        # Original kept untouched
+        with attachment.file.open('rb') as f:
+            self.assertEqual(f.read(), original)
+
+        detail = self.client.get(f'/api/incidents/reports/{self.incident.id}/').data
+        serialized = detail['attachments'][0]
+        self.assertTrue(serialized['thumbnail_url'].endswith('.webp'))
+        self.assertTrue(serialized['preview_url'].endswith('.webp'))
+        self.assertEqual(serialized['processing_status'], 'READY')
+
+        rows = self.client.get('/api/incidents/reports/').data['results']
+        self.assertTrue(rows[0]['cover_thumbnail_url'].endswith('_thumb.webp'))
+
+    def test_document_upload_skipped(self):
+        response = self._upload('verbale.pdf', b'%PDF-1.4 ...', 'application/pdf')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['processing_status'], 'SKIPPED')
+        self.assertIsNone(response.data['thumbnail_url'])
+
+        rows = self.client.get('/api/incidents/reports/').data['results']
+        self.assertIsNone(rows[0]['cover_thumbnail_url'])
+
+    def test_corrupt_image_marked_failed(self):
+        response = self._upload('rotta.jpg', b'not really a jpeg', 'image/jpeg')
+        self.assertEqual(response.status_code, 201)
+        attachment = IncidentAttachment.objects.get(pk=response.data['id'])
+        self.assertEqual(attachment.processing_status, IncidentAttachment.ProcessingStatus.FAILED)
+        self.assertFalse(attachment.thumbnail)
@@ -0,0 +1,134 @@
+"""
+Query-count tests for IncidentReportViewSet.
+
+The incident board is polled constantly on election day: list actions must
+run a constant number of queries regardless of how many incidents, comments
+and attachments exist. Only retrieve prefetches comments and attachments.
+"""
+import shutil
+import tempfile
+from datetime import date, timedelta
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import User
+from core.testing import LOCMEM_CACHE
+from elections.models import ConsultazioneElettorale
+from territory.models import Regione, Provincia, Comune, SezioneElettorale
+from incidents.models import IncidentReport, IncidentComment, IncidentAttachment
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MEDIA_ROOT=MEDIA_ROOT)
+class IncidentListQueriesTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='rdl@example.com', password='x')
+        cls.other = User.objects.create_user(email='other@example.com', password='x')
+        cls.consultazione = ConsultazioneElettorale.objects.create(
+            nome='Test 2026', data_inizio=date(2026, 6, 8), data_fine=date(2026, 6, 9)
+        )
+        regione = Regione.objects.create(codice_istat='12', nome='Lazio')
+        provincia = Provincia.objects.create(
+            codice_istat='058', sigla='RM', nome='Roma', regione=regione
+        )
+        comune = Comune.objects.create(codice_istat='058091', nome='Roma', provincia=provincia)
+
+        cls.incidents = []
+        for i in range(6):
+            sezione = SezioneElettorale.objects.create(numero=i + 1, comune=comune)
+            incident = IncidentReport.objects.create(
+                consultazione=cls.consultazione,
+                sezione=sezione,
+                reporter=cls.user if i % 2 == 0 else cls.other,
+                assigned_to=cls.user if i % 3 == 0 else None,
+                category=IncidentReport.Category.PROCEDURAL,
+                title=f'Segnalazione {i}',
+                description='...',
+            )
+            for j in range(i):
+                IncidentComment.objects.create(incident=incident, author=cls.other, content=f'c{j}')
+            for j in range(i % 3):
+                attachment = IncidentAttachment(incident=incident, uploaded_by=cls.other)
+                attachment.file.save(f'foto{j}.txt', ContentFile(b'x'), save=False)
+                attachment.save()
+            cls.incidents.append(incident)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _results(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id']: row for row in response.data['results']}
+
+    def test_list_is_constant_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/incidents/reports/')
+        rows = self._results(response)
+        self.assertEqual(len(rows), 6)
+        self.assertIn('server_time', response.data)
+        for incident in self.incidents:
+            row = rows[incident.id]
+            self.assertEqual(row['comments_count'], incident.comments.count())
+            self.assertEqual(row['attachments_count'], incident.attachments.count())
+            self.assertNotIn('comments', row)
+
+    def test_list_cursor_pagination(self):
+        response = self.client.get('/api/incidents/reports/', {'page_size': 4})
+        first = self._results(response)
+        self.assertEqual(len(first), 4)
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get(response.data['next'])
+        second = self._results(response)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+
+    def test_my_is_constant_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/incidents/reports/my/')
+        rows = self._results(response)
+        self.assertEqual(set(rows), {i.id for i in self.incidents if i.reporter_id == self.user.id})
+
+    def test_assigned_is_constant_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/incidents/reports/assigned/')
+        rows = self._results(response)
+        self.assertEqual(set(rows), {i.id for i in self.incidents if i.assigned_to_id == self.user.id})
+
+    def test_retrieve_prefetches_comments_and_attachments(self):
+        incident = self.incidents[5]
+        # incident + comments (with author) + attachments (with uploader)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/incidents/reports/{incident.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['comments']), 5)
+        self.assertEqual(len(response.data['attachments']), 2)
+
+    def test_since_returns_only_changed_incidents(self):
+        since = timezone.now()
+        commented, updated = self.incidents[1], self.incidents[2]
+        IncidentComment.objects.create(incident=commented, author=self.other, content='nuovo')
+        IncidentReport.objects.filter(pk=updated.pk).update(updated_at=since + timedelta(seconds=1))
+
+        response = self.client.get('/api/incidents/reports/', {'since': since.isoformat()})
+        rows = self._results(response)
+        self.assertEqual(set(rows), {commented.id, updated.id})
+        self.assertGreater(
+            rows[commented.id]['last_activity_at'], rows[commented.id]['created_at']
+        )
+
+    def test_since_invalid(self):
+        response = self.client.get('/api/incidents/reports/', {'since': 'ieri'})
+        self.assertEqual(response.status_code, 400)
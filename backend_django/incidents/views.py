@@ -5,11 +5,18 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import ValidationError
+from django.db.models import Count, Exists, IntegerField, Max, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 
+from core import background
 from core.permissions import CanManageIncidents
+from .image_processing import process_attachment
 from .models import IncidentReport, IncidentComment, IncidentAttachment
+from .pagination import IncidentCursorPagination
 from .serializers import (
     IncidentReportSerializer, IncidentReportCreateSerializer,
     IncidentReportUpdateSerializer, IncidentReportListSerializer,
@@ -18,12 +25,39 @@ from .serializers import (
 )
 
 
+def _count_subquery(model, field='id'):
+    """Correlated COUNT over a reverse FK of IncidentReport."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(incident=OuterRef('pk'))
+            .order_by()
+            .values('incident')
+            .annotate(n=Count(field))
+            .values('n'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _max_subquery(model, field):
+    """Correlated MAX over a reverse FK of IncidentReport."""
+    return Subquery(
+        model.objects.filter(incident=OuterRef('pk'))
+        .order_by()
+        .values('incident')
+        .annotate(latest=Max(field))
+        .values('latest')
+    )
+
+
 class IncidentReportViewSet(viewsets.ModelViewSet):
     """
     ViewSet for IncidentReport.
 
-    GET /api/incidents/ - List all incidents
+    GET /api/incidents/ - List all incidents (cursor-paginated, ?since=<iso> for polling)
     GET /api/incidents/my/ - List user's own incidents
+    GET /api/incidents/assigned/ - List incidents assigned to current user
     POST /api/incidents/ - Create incident
     GET /api/incidents/{id}/ - Get incident detail
     PUT/PATCH /api/incidents/{id}/ - Update incident
@@ -33,8 +67,16 @@ class IncidentReportViewSet(viewsets.ModelViewSet):
     queryset = IncidentReport.objects.select_related(
         'consultazione', 'sezione', 'sezione__comune',
         'reporter', 'resolved_by', 'assigned_to'
-    ).prefetch_related('comments', 'attachments').all()
+    ).prefetch_related(
+        Prefetch('comments', queryset=IncidentComment.objects.select_related('author')),
+        Prefetch('attachments', queryset=IncidentAttachment.objects.select_related('uploaded_by')),
+    ).all()
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = IncidentCursorPagination
+    ordering_fields = ['created_at']
+
+    # Board actions: no prefetch, only counts and latest activity
+    LIST_ACTIONS = ('list', 'my', 'assigned')
 
     def get_permissions(self):
         """Read operations open to all authenticated; write requires CanManageIncidents."""
@@ -47,12 +89,61 @@ class IncidentReportViewSet(viewsets.ModelViewSet):
     ]
     search_fields = ['title', 'description', 'sezione__comune__nome']
 
+    def get_queryset(self):
+        if self.action in self.LIST_ACTIONS:
+            return self._get_list_queryset()
+        return super().get_queryset()
+
+    def _get_list_queryset(self):
+        """
+        Lightweight queryset for the incident board.
+
+        Only joins what IncidentReportListSerializer reads (sezione/comune for
+        location_description, reporter) and replaces the comments/attachments
+        prefetch with correlated COUNT/MAX subqueries.
+        """
+        queryset = IncidentReport.objects.select_related(
+            'sezione', 'sezione__comune', 'reporter'
+        ).annotate(
+            comments_count=_count_subquery(IncidentComment),
+            attachments_count=_count_subquery(IncidentAttachment),
+            last_activity_at=Greatest(
+                'updated_at',
+                Coalesce(_max_subquery(IncidentComment, 'created_at'), 'updated_at'),
+                Coalesce(_max_subquery(IncidentAttachment, 'uploaded_at'), 'updated_at'),
+            ),
+            cover_thumbnail=Subquery(
+                IncidentAttachment.objects.filter(
+                    incident=OuterRef('pk'),
+                    processing_status=IncidentAttachment.ProcessingStatus.READY,
+                ).order_by('-uploaded_at').values('thumbnail')[:1]
+            ),
+        )
+
+        since = self.request.query_params.get('since')
+        if since:
+            since_dt = parse_datetime(since)
+            if since_dt is None:
+                raise ValidationError({'since': 'Invalid ISO 8601 datetime'})
+            if timezone.is_naive(since_dt):
+                since_dt = timezone.make_aware(since_dt)
+            # EXISTS instead of filtering on last_activity_at so each branch
+            # can use its own index.
+            queryset = queryset.filter(
+                Q(updated_at__gt=since_dt)
+                | Exists(IncidentComment.objects.filter(
+                    incident=OuterRef('pk'), created_at__gt=since_dt))
+                | Exists(IncidentAttachment.objects.filter(
+                    incident=OuterRef('pk'), uploaded_at__gt=since_dt))
+            )
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'create':
             return IncidentReportCreateSerializer
         if self.action in ['update', 'partial_update']:
             return IncidentReportUpdateSerializer
-        if self.action == 'list':
+        if self.action in self.LIST_ACTIONS:
             return IncidentReportListSerializer
         return IncidentReportSerializer
 
@@ -64,24 +155,25 @@ class IncidentReportViewSet(viewsets.ModelViewSet):
         # Re-serialize with full detail serializer for the response
         instance = serializer.instance
         # Re-fetch with select_related to avoid N+1
-        instance = self.queryset.get(pk=instance.pk)
+        instance = super().get_queryset().get(pk=instance.pk)
         detail_serializer = IncidentReportSerializer(instance)
         headers = self.get_success_headers(serializer.data)
         return Response(detail_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    def _list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['get'])
     def my(self, request):
         """Get incidents reported by current user."""
-        incidents = self.queryset.filter(reporter=request.user)
-        serializer = IncidentReportListSerializer(incidents, many=True)
-        return Response(serializer.data)
+        return self._list_response(self.get_queryset().filter(reporter=request.user))
 
     @action(detail=False, methods=['get'])
     def assigned(self, request):
         """Get incidents assigned to current user."""
-        incidents = self.queryset.filter(assigned_to=request.user)
-        serializer = IncidentReportListSerializer(incidents, many=True)
-        return Response(serializer.data)
+        return self._list_response(self.get_queryset().filter(assigned_to=request.user))
 
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
@@ -210,6 +302,9 @@ class IncidentAttachmentViewSet(viewsets.ModelViewSet):
     GET /api/incidents/attachments/ - List all attachments
     POST /api/incidents/attachments/ - Upload attachment
     DELETE /api/incidents/attachments/{id}/ - Delete attachment
+
+    Images are processed after the response (thumbnail + preview, see
+    image_processing.py): processing_status is PENDING until then.
     """
     queryset = IncidentAttachment.objects.select_related('incident', 'uploaded_by').all()
     serializer_class = IncidentAttachmentSerializer
@@ -218,7 +313,9 @@ class IncidentAttachmentViewSet(viewsets.ModelViewSet):
     filterset_fields = ['incident', 'file_type', 'uploaded_by']
 
     def perform_create(self, serializer):
-        serializer.save(uploaded_by=self.request.user)
+        attachment = serializer.save(uploaded_by=self.request.user)
+        if attachment.processing_status == IncidentAttachment.ProcessingStatus.PENDING:
+            background.submit(process_attachment, attachment.pk)
 
 
 from rest_framework.views import APIView
@@ -0,0 +1,50 @@
+"""
+Tests for the KPI app.
+"""
+from datetime import date
+
+import pytest
+from rest_framework import status
+
+from data.models import DatiSezione
+from elections.models import ConsultazioneElettorale
+from territory.models import Comune, Provincia, Regione, SezioneElettorale
+
+
+@pytest.fixture
+def consultazione(db):
+    return ConsultazioneElettorale.objects.create(
+        nome='Referendum 2026', data_inizio=date(2026, 6, 8), data_fine=date(2026, 6, 9), is_attiva=True,
+    )
+
+
+@pytest.fixture
+def sezioni(db, consultazione):
+    regione = Regione.objects.create(codice_istat='12', nome='Lazio')
+    provincia = Provincia.objects.create(codice_istat='058', sigla='RM', nome='Roma', regione=regione)
+    comune = Comune.objects.create(codice_istat='058091', nome='Roma', provincia=provincia)
+    sezioni = [SezioneElettorale.objects.create(numero=numero, comune=comune) for numero in (1, 2)]
+    DatiSezione.objects.create(
+        sezione=sezioni[0], consultazione=consultazione, is_complete=True, votanti_maschi=120,
+    )
+    return sezioni
+
+
+@pytest.mark.django_db
+class TestKPISezioni:
+    """Tests for GET /api/kpi/sezioni."""
+
+    def test_lists_sections_with_their_data(self, api_client, admin_user, sezioni):
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get('/api/kpi/sezioni')
+
+        assert response.status_code == status.HTTP_200_OK
+        values = response.data['values']
+        assert [(v['comune'], v['sezione'], v['is_complete']) for v in values] == [
+            ('Roma', 1, True), ('Roma', 2, False),
+        ]
+        assert values[0]['votanti_maschi'] == 120
+
+    def test_requires_kpi_permission(self, authenticated_client, sezioni):
+        response = authenticated_client.get('/api/kpi/sezioni')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -110,9 +110,6 @@ class KPISezioniView(APIView):
             'comune',
             'comune__provincia',
             'municipio'
-        ).prefetch_related(
-            'assignments',
-            'dati_sezioni'
         ).order_by('comune__nome', 'numero')
 
         # Build assignments map (consultazione-specific)
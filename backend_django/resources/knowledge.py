@@ -0,0 +1,143 @@
+"""
+FAQ and Documento as knowledge-base source documents.
+
+Builds the ai_assistant.ingestion.SourceDocument for each FAQ / Documento
+(text extraction included) and syncs it. Used by the post_save hooks
+(resources.signals, off the request thread) and by the sync commands,
+which batch the whole base into one sync_documents call.
+
+Usage:
+    from resources.knowledge import sync_faqs, sync_documenti
+    sync_faqs([faq.pk])          # Counter(embedded=1, unchanged=0, ...)
+    sync_documenti(Documento.objects.filter(is_attivo=True))
+"""
+import logging
+
+from .models import FAQ, Documento
+
+logger = logging.getLogger(__name__)
+
+# Documento.tipo_file → KnowledgeSource.source_type
+SOURCE_TYPE_MAP = {
+    'PDF': 'MANUAL',
+    'Word': 'MANUAL',
+    'PowerPoint': 'SLIDE',
+    'Excel': 'MANUAL',
+    'LINK': 'PROCEDURE',
+}
+
+
+def faq_source_key(pk):
+    return f'faq:{pk}'
+
+
+def documento_source_key(pk):
+    return f'doc:{pk}'
+
+
+def faq_document(faq):
+    """SourceDocument for a FAQ (domanda + risposta, one chunk)."""
+    from ai_assistant.ingestion import SourceDocument
+
+    title = f"FAQ: {faq.domanda[:100]}"
+    return SourceDocument(
+        source_key=faq_source_key(faq.pk),
+        title=title,
+        source_type='FAQ',
+        chunks=[f"DOMANDA: {faq.domanda}\n\nRISPOSTA: {faq.risposta}"],
+        is_active=faq.is_attivo,
+        legacy_titles=(title,),
+    )
+
+
+def extract_documento_text(documento):
+    """Text of an uploaded PDF, an external PDF or a web page ('' if none)."""
+    from ai_assistant.extractors import PDFExtractor, WebExtractor
+
+    if documento.file and documento.file.name.endswith('.pdf'):
+        return PDFExtractor.extract_text(documento.file.path)
+    if documento.url_esterno:
+        url = documento.url_esterno
+        if url.endswith('.pdf'):
+            # PDF esterno: download + extract
+            return PDFExtractor.extract_text(url)
+        # Web page: scraping
+        return WebExtractor.extract_text(url)
+    return ''
+
+
+def documento_document(documento):
+    """SourceDocument for a Documento, or None if no text could be extracted."""
+    from ai_assistant.ingestion import SourceDocument, chunk_text
+
+    content = extract_documento_text(documento)
+    if not content:
+        logger.warning(f"No content extracted from Documento {documento.id}")
+        return None
+
+    # Prepend titolo + descrizione
+    header = f"DOCUMENTO: {documento.titolo}\n"
+    if documento.descrizione:
+        header += f"DESCRIZIONE: {documento.descrizione}\n\n"
+
+    source_url = ''
+    if documento.file:
+        # File caricato: usa URL del media file
+        source_url = documento.file.url
+    elif documento.url_esterno:
+        source_url = documento.url_esterno
+
+    title = f"Doc: {documento.titolo[:100]}"
+    return SourceDocument(
+        source_key=documento_source_key(documento.pk),
+        title=title,
+        source_type=SOURCE_TYPE_MAP.get(documento.tipo_file, 'MANUAL'),
+        chunks=chunk_text(header + content),
+        source_url=source_url,
+        is_active=documento.is_attivo,
+        legacy_titles=(title,),
+    )
+
+
+def sync_faqs(faqs):
+    """Sync FAQ instances or pks into the knowledge base."""
+    from ai_assistant.ingestion import sync_documents
+
+    faqs = list(faqs)
+    pks = [faq for faq in faqs if not isinstance(faq, FAQ)]
+    if pks:
+        faqs = [faq for faq in faqs if isinstance(faq, FAQ)] + list(FAQ.objects.filter(pk__in=pks))
+    return sync_documents([faq_document(faq) for faq in faqs])
+
+
+def sync_documenti(documenti):
+    """Sync Documento instances or pks; extraction failures are logged and skipped."""
+    from ai_assistant.ingestion import sync_documents
+
+    documenti = list(documenti)
+    pks = [doc for doc in documenti if not isinstance(doc, Documento)]
+    if pks:
+        documenti = [doc for doc in documenti if isinstance(doc, Documento)] + list(Documento.objects.filter(pk__in=pks))
+
+    sources, failed = [], 0
+    for documento in documenti:
+        try:
+            source = documento_document(documento)
+        except Exception as e:
+            logger.error(f"Failed to extract Documento {documento.id}: {e}", exc_info=True)
+            source = None
+        if source is None:
+            failed += 1
+        else:
+            sources.append(source)
+
+    stats = sync_documents(sources)
+    stats['failed'] += failed
+    return stats
+
+
+def remove_source(source_key):
+    """Drop every chunk of a deleted FAQ / Documento."""
+    from ai_assistant.ingestion import remove_documents
+
+    return remove_documents([source_key])
@@ -4,13 +4,17 @@ Management command to sync all Documenti and FAQ into KnowledgeSource.
 Usage:
     python manage.py sync_knowledge_base
     python manage.py sync_knowledge_base --clear  # Clear existing first
+
+Unchanged chunks keep their embedding (resources.knowledge, ai_assistant.ingestion),
+so a re-sync only pays for what was edited since the last one.
 """
 from django.core.management.base import BaseCommand
+from resources.knowledge import sync_documenti, sync_faqs
 from resources.models import Documento, FAQ
 
 
 class Command(BaseCommand):
-    help = 'Sync all Documenti and FAQ to KnowledgeSource (triggers signals)'
+    help = 'Sync all Documenti and FAQ to KnowledgeSource (incremental)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -32,44 +36,25 @@ class Command(BaseCommand):
             KnowledgeSource.objects.all().delete()
             self.stdout.write(self.style.WARNING(f'Deleted {count} existing KnowledgeSource entries'))
 
-        # Sync Documenti (triggers post_save signal)
-        documenti = Documento.objects.filter(is_attivo=True)
-        self.stdout.write(f'Syncing {documenti.count()} Documenti...')
-
-        synced_docs = 0
-        failed_docs = 0
-        for doc in documenti:
-            try:
-                # Re-save triggers the signal
-                doc.save()
-                synced_docs += 1
-                if synced_docs % 10 == 0:
-                    self.stdout.write(f'  Processed {synced_docs} documents...')
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'  Failed to sync Documento {doc.id}: {e}'))
-                failed_docs += 1
-
-        self.stdout.write(self.style.SUCCESS(f'✓ Synced {synced_docs} Documenti ({failed_docs} failed)'))
-
-        # Sync FAQ (triggers post_save signal)
-        faqs = FAQ.objects.filter(is_attivo=True)
-        self.stdout.write(f'Syncing {faqs.count()} FAQ...')
+        # Sync Documenti: one batched sync, only changed chunks are embedded
+        documenti = list(Documento.objects.filter(is_attivo=True))
+        self.stdout.write(f'Syncing {len(documenti)} Documenti...')
+        stats = sync_documenti(documenti)
+        self.stdout.write(self.style.SUCCESS(self._summary('Documenti', len(documenti), stats)))
 
-        synced_faqs = 0
-        failed_faqs = 0
-        for faq in faqs:
-            try:
-                # Re-save triggers the signal
-                faq.save()
-                synced_faqs += 1
-                if synced_faqs % 10 == 0:
-                    self.stdout.write(f'  Processed {synced_faqs} FAQs...')
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'  Failed to sync FAQ {faq.id}: {e}'))
-                failed_faqs += 1
-
-        self.stdout.write(self.style.SUCCESS(f'✓ Synced {synced_faqs} FAQ ({failed_faqs} failed)'))
+        # Sync FAQ
+        faqs = list(FAQ.objects.filter(is_attivo=True))
+        self.stdout.write(f'Syncing {len(faqs)} FAQ...')
+        stats = sync_faqs(faqs)
+        self.stdout.write(self.style.SUCCESS(self._summary('FAQ', len(faqs), stats)))
 
         # Summary
         total_ks = KnowledgeSource.objects.count()
         self.stdout.write(self.style.SUCCESS(f'\n✓ Done! Total KnowledgeSource entries: {total_ks}'))
+
+    @staticmethod
+    def _summary(label, total, stats):
+        return (
+            f'✓ Synced {total} {label}: {stats["embedded"]} chunks embedded, '
+            f'{stats["unchanged"]} unchanged, {stats["deleted"]} removed ({stats["failed"]} failed)'
+        )
@@ -13,7 +13,6 @@ from .serializers import (
     CategoriaDocumentoSerializer, DocumentoSerializer,
     CategoriaFAQSerializer, FAQSerializer, FAQListSerializer
 )
-from .badge_generator import generate_badge_to_bytes, get_available_variants
 
 
 class PDFProxyView(views.APIView):
@@ -278,6 +277,9 @@ class BadgeVariantsView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
+        # Importato qui: PIL e numpy rallenterebbero l'avvio dei servizi API e RDL
+        from .badge_generator import get_available_variants
+
         variants = get_available_variants()
         return Response({
             'variants': variants,
@@ -295,6 +297,8 @@ class GenerateBadgeView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
+        from .badge_generator import generate_badge_to_bytes
+
         variant_id = request.query_params.get('variant', 'card_1')
 
         # Ottieni nome utente
@@ -13,10 +13,10 @@ class TelegramIdentityBindingAdmin(admin.ModelAdmin):
 
 @admin.register(TelegramUpdateLog)
 class TelegramUpdateLogAdmin(admin.ModelAdmin):
-    list_display = ('update_id', 'telegram_user_id', 'chat_id', 'update_type', 'processing_status', 'processed_at')
+    list_display = ('update_id', 'telegram_user_id', 'chat_id', 'update_type', 'processing_status', 'received_at', 'processed_at')
     list_filter = ('processing_status', 'update_type')
     search_fields = ('update_id', 'telegram_user_id')
-    readonly_fields = ('processed_at',)
+    readonly_fields = ('received_at', 'started_at', 'processed_at')
 
 
 @admin.register(ExternalChannelConversationLink)
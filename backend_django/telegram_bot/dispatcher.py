@@ -0,0 +1,226 @@
+"""
+Telegram update inbox: acknowledge fast, process per chat in order.
+
+The webhook only persists the update (TelegramUpdateLog, unique update_id:
+a redelivered update fails the insert instead of racing an exists()
+check) and answers 200 right away, so Telegram never waits on the AI
+pipeline. Processing happens after commit on a small bounded thread pool:
+
+- updates of the same chat are handled one at a time, in update_id order
+  (Telegram assigns increasing ids), so replies never overtake each other
+- different chats run concurrently, at most TELEGRAM_UPDATE_WORKERS at once
+- the per-chat queue lives in the database: a worker claims the oldest
+  PENDING row of its chat with a conditional UPDATE and stops when the head
+  of the queue is PROCESSING elsewhere (another instance owns the chat)
+- a claim is a lease: a head PROCESSING for longer than
+  TELEGRAM_UPDATE_LEASE_SECONDS belongs to a worker that died (instance
+  shut down mid AI call) and is claimed again by the next update of the
+  chat, so the chat doesn't stay stuck behind it
+
+`manage.py telegram_process_updates` drains what is still pending (chats
+with no new update after a crash) and can also requeue stale rows.
+
+Settings:
+    TELEGRAM_UPDATE_WORKERS: size of the processing pool (default 4)
+    TELEGRAM_UPDATE_LEASE_SECONDS: lease of a PROCESSING claim (default 600)
+    BACKGROUND_TASKS_EAGER: process inline on commit (tests, commands)
+
+Usage:
+    from telegram_bot import dispatcher
+
+    dispatcher.enqueue(update)        # in the webhook; False for duplicates
+    dispatcher.drain_chat(chat_id)    # process what is queued for a chat
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .handlers import handle_update
+from .models import TelegramUpdateLog
+
+logger = logging.getLogger(__name__)
+
+Status = TelegramUpdateLog.ProcessingStatus
+
+_executor = None
+_lock = threading.Lock()
+# Chats with a worker in this process, and chats enqueued again meanwhile
+_active = set()
+_rerun = set()
+
+
+def classify_update(update: dict) -> str:
+    """Classify the type of Telegram update for logging."""
+    msg = update.get('message', {})
+    if msg.get('contact'):
+        return 'contact'
+    text = msg.get('text', '')
+    if text.startswith('/'):
+        return f'command:{text.split()[0]}'[:30]
+    if text:
+        return 'text'
+    # Non-text content types
+    for content_type in ('photo', 'video', 'audio', 'voice', 'document', 'sticker', 'location'):
+        if msg.get(content_type):
+            return content_type
+    return 'unknown'
+
+
+def enqueue(update: dict) -> bool:
+    """
+    Persist an update and schedule its chat for processing after commit.
+
+    Returns False if the update_id was already received (Telegram retry).
+    """
+    message = update.get('message', {})
+    chat_id = message.get('chat', {}).get('id')
+    try:
+        with transaction.atomic():
+            TelegramUpdateLog.objects.create(
+                update_id=update['update_id'],
+                telegram_user_id=message.get('from', {}).get('id'),
+                chat_id=chat_id,
+                update_type=classify_update(update),
+                processing_status=Status.PENDING,
+                payload=update,
+            )
+        created = True
+    except IntegrityError:
+        logger.debug("Telegram update_id=%s already received, skipping", update['update_id'])
+        created = False
+
+    # Also on duplicates: harmless if the chat is idle, and it restarts a
+    # queue whose first delivery was acknowledged but never processed
+    transaction.on_commit(partial(schedule, chat_id))
+    return created
+
+
+def _get_executor():
+    """Lazy-init the processing pool (one per process)."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'TELEGRAM_UPDATE_WORKERS', 4),
+                    thread_name_prefix='telegram',
+                )
+    return _executor
+
+
+def schedule(chat_id) -> None:
+    """Make sure a worker drains this chat's queue (one worker per chat)."""
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        drain_chat(chat_id)
+        return
+
+    with _lock:
+        if chat_id in _active:
+            # The running worker checks again before exiting
+            _rerun.add(chat_id)
+            return
+        _active.add(chat_id)
+    _get_executor().submit(_worker, chat_id)
+
+
+def _worker(chat_id) -> None:
+    try:
+        while True:
+            drain_chat(chat_id)
+            with _lock:
+                if chat_id in _rerun:
+                    _rerun.discard(chat_id)
+                    continue
+                _active.discard(chat_id)
+                return
+    except Exception:
+        logger.exception("Telegram worker for chat %s failed", chat_id)
+        with _lock:
+            _active.discard(chat_id)
+            _rerun.discard(chat_id)
+    finally:
+        connections.close_all()
+
+
+def _claim_next(chat_id) -> TelegramUpdateLog | None:
+    """
+    Oldest queued update of the chat, switched to PROCESSING.
+
+    None when the queue is empty or its head is being processed by
+    another worker (which will go on with the rest of the queue). A head
+    whose lease expired is claimed again.
+    """
+    lease = timedelta(seconds=getattr(settings, 'TELEGRAM_UPDATE_LEASE_SECONDS', 600))
+    while True:
+        head = (
+            TelegramUpdateLog.objects
+            .filter(chat_id=chat_id, processing_status__in=[Status.PENDING, Status.PROCESSING])
+            .order_by('update_id')
+            .first()
+        )
+        if head is None:
+            return None
+        now = timezone.now()
+        if head.processing_status == Status.PROCESSING:
+            if head.started_at is not None and head.started_at > now - lease:
+                return None
+            logger.warning("Telegram update_id=%s: lease expired, processing it again", head.update_id)
+        # Conditional on the state read above: one claimant wins
+        claimed = TelegramUpdateLog.objects.filter(
+            pk=head.pk, processing_status=head.processing_status, started_at=head.started_at,
+        ).update(processing_status=Status.PROCESSING, started_at=now)
+        if claimed:
+            return head
+
+
+def process(log: TelegramUpdateLog) -> None:
+    """Run the handlers on a claimed update and record the outcome."""
+    try:
+        handle_update(log.payload)
+        outcome = {'processing_status': Status.OK, 'error_message': ''}
+    except Exception as e:
+        logger.error(
+            "Telegram update processing failed: update_id=%s tg_user=%s error=%s",
+            log.update_id, log.telegram_user_id, e,
+            exc_info=True,
+        )
+        outcome = {'processing_status': Status.ERROR, 'error_message': str(e)[:500]}
+    TelegramUpdateLog.objects.filter(pk=log.pk).update(processed_at=timezone.now(), **outcome)
+
+
+def drain_chat(chat_id) -> int:
+    """Process the queued updates of a chat in order; returns how many."""
+    count = 0
+    while (log := _claim_next(chat_id)) is not None:
+        process(log)
+        count += 1
+    return count
+
+
+def requeue_stale(older_than: timedelta) -> int:
+    """Put back in the queue updates left PROCESSING (worker died) for too long."""
+    return TelegramUpdateLog.objects.filter(
+        processing_status=Status.PROCESSING,
+        started_at__lt=timezone.now() - older_than,
+    ).update(processing_status=Status.PENDING, started_at=None)
+
+
+def pending_chats() -> list:
+    """Chats with queued updates, oldest first."""
+    chats = []
+    queryset = (
+        TelegramUpdateLog.objects
+        .filter(processing_status=Status.PENDING)
+        .order_by('update_id')
+        .values_list('chat_id', flat=True)
+    )
+    for chat_id in queryset:
+        if chat_id not in chats:
+            chats.append(chat_id)
+    return chats
@@ -0,0 +1,49 @@
+"""
+Process queued Telegram updates (see telegram_bot.dispatcher).
+
+Updates are normally processed in the background right after the webhook
+stores them. Run this after a restart or from a scheduler to put back in
+the queue updates left PROCESSING by a worker that died, and to process
+everything still PENDING, chat by chat in update order.
+
+Usage:
+    python manage.py telegram_process_updates
+    python manage.py telegram_process_updates --stale-minutes 5
+    python manage.py telegram_process_updates --dry-run
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from telegram_bot import dispatcher
+from telegram_bot.models import TelegramUpdateLog
+
+
+class Command(BaseCommand):
+    help = 'Requeue stale Telegram updates and process the pending ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes', type=int, default=10,
+            help='Requeue updates PROCESSING for longer than this (default 10)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report the queue')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            pending = TelegramUpdateLog.objects.filter(
+                processing_status=TelegramUpdateLog.ProcessingStatus.PENDING,
+            ).count()
+            chats = len(dispatcher.pending_chats())
+            self.stdout.write(f'{pending} pending updates in {chats} chats')
+            return
+
+        requeued = dispatcher.requeue_stale(timedelta(minutes=options['stale_minutes']))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale updates'))
+
+        processed = 0
+        chats = dispatcher.pending_chats()
+        for chat_id in chats:
+            processed += dispatcher.drain_chat(chat_id)
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} updates in {len(chats)} chats'))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_bot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='telegramupdatelog',
+            options={'ordering': ['-received_at'], 'verbose_name': 'log update Telegram', 'verbose_name_plural': 'log update Telegram'},
+        ),
+        migrations.AddField(
+            model_name='telegramupdatelog',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict, verbose_name='update'),
+        ),
+        migrations.AddField(
+            model_name='telegramupdatelog',
+            name='received_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='ricevuto il'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='telegramupdatelog',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='elaborazione iniziata il'),
+        ),
+        migrations.AlterField(
+            model_name='telegramupdatelog',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='elaborato il'),
+        ),
+        migrations.AlterField(
+            model_name='telegramupdatelog',
+            name='processing_status',
+            field=models.CharField(choices=[('PENDING', 'In coda'), ('PROCESSING', 'In elaborazione'), ('OK', 'Elaborato'), ('ERROR', 'Errore'), ('SKIPPED', 'Ignorato')], default='PENDING', max_length=10, verbose_name='stato elaborazione'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramupdatelog',
+            index=models.Index(fields=['chat_id', 'processing_status', 'update_id'], name='telegram_bo_chat_id_dd6995_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramupdatelog',
+            index=models.Index(fields=['processing_status', 'received_at'], name='telegram_bo_process_1fabc7_idx'),
+        ),
+    ]
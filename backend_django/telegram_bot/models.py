@@ -71,9 +71,15 @@ class TelegramIdentityBinding(models.Model):
 
 class TelegramUpdateLog(models.Model):
     """
-    Idempotency log: tracks processed Telegram updates to prevent double processing.
+    Inbox and idempotency log of Telegram updates.
+
+    The webhook inserts one row per update_id (unique, so a redelivered
+    update is rejected atomically) with the raw payload; telegram_bot.dispatcher
+    then processes PENDING rows per chat in update_id order.
     """
     class ProcessingStatus(models.TextChoices):
+        PENDING = 'PENDING', _('In coda')
+        PROCESSING = 'PROCESSING', _('In elaborazione')
         OK = 'OK', _('Elaborato')
         ERROR = 'ERROR', _('Errore')
         SKIPPED = 'SKIPPED', _('Ignorato')
@@ -100,17 +106,30 @@ class TelegramUpdateLog(models.Model):
         _('stato elaborazione'),
         max_length=10,
         choices=ProcessingStatus.choices,
+        default=ProcessingStatus.PENDING,
+    )
+    payload = models.JSONField(
+        _('update'),
+        default=dict,
+        blank=True,
     )
     error_message = models.TextField(
         _('messaggio errore'),
         blank=True,
     )
-    processed_at = models.DateTimeField(_('elaborato il'), auto_now_add=True)
+    received_at = models.DateTimeField(_('ricevuto il'), auto_now_add=True)
+    started_at = models.DateTimeField(_('elaborazione iniziata il'), null=True, blank=True)
+    processed_at = models.DateTimeField(_('elaborato il'), null=True, blank=True)
 
     class Meta:
         verbose_name = _('log update Telegram')
         verbose_name_plural = _('log update Telegram')
-        ordering = ['-processed_at']
+        ordering = ['-received_at']
+        indexes = [
+            # Per-chat queue scan (dispatcher.drain_chat)
+            models.Index(fields=['chat_id', 'processing_status', 'update_id']),
+            models.Index(fields=['processing_status', 'received_at']),
+        ]
 
     def __str__(self):
         return f'Update {self.update_id} ({self.processing_status})'
@@ -3,41 +3,356 @@ Telegram Bot API client.
 
 Wraps HTTP calls to the Telegram Bot API for sending messages,
 setting webhooks, and managing reply keyboards.
+
+All calls go through one TelegramClient per process (get_client()):
+- keep-alive HTTP: one pooled requests.Session, so replies reuse open TLS
+  connections instead of paying a handshake each
+- rate limits: one global budget shared by every worker and instance
+  through the cache (Telegram allows about 30 messages/s per bot, however
+  many processes send), and one token bucket per chat (1/s) shared by the
+  threads of a process; senders wait instead of being rejected
+- 429 responses: parameters.retry_after pauses the chat (or everything,
+  for calls without a chat) and the call is retried
+- broadcast(): bulk sends in batches on a small pool, paced by the buckets
+
+Settings:
+    TELEGRAM_API_URL: API base, "{token}" is replaced (tests: local stub)
+    TELEGRAM_RATE_GLOBAL / TELEGRAM_RATE_PER_CHAT: messages per second
+    TELEGRAM_RATE_CACHE_ALIAS: cache holding the global budget
+    TELEGRAM_RATE_CHAT_BURST: messages a chat may receive back to back
+    TELEGRAM_MAX_RETRIES: retries after 429 / connection errors
+    TELEGRAM_BROADCAST_BATCH: recipients per broadcast batch
+
+Usage:
+    telegram_client.send_message(chat_id, 'Ciao')
+    telegram_client.broadcast([chat_id, ...], 'Seggi aperti fino alle 23')
 """
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+import requests.adapters
 from django.conf import settings
+from django.core.cache import caches
 
 logger = logging.getLogger(__name__)
 
 TELEGRAM_API_BASE = 'https://api.telegram.org/bot{token}'
 
+# Methods that deliver something to a chat (per-chat limit applies)
+_SEND_METHODS = frozenset({
+    'sendMessage', 'sendPhoto', 'sendDocument', 'sendLocation', 'sendContact',
+    'editMessageText', 'forwardMessage', 'copyMessage',
+})
 
-def _api_url(method: str) -> str:
-    token = settings.TELEGRAM_BOT_TOKEN
-    return f'{TELEGRAM_API_BASE.format(token=token)}/{method}'
+# Idle per-chat buckets kept before pruning
+_MAX_CHAT_BUCKETS = 10000
 
+# Open connections kept to the API (dispatcher workers + broadcast threads)
+_POOL_SIZE = 10
+
+
+# =============================================================================
+# Rate limiting
+# =============================================================================
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `capacity`.
+
+    acquire() reserves a token and sleeps until it is available, so
+    concurrent callers are spaced out instead of failing.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token; returns how long the caller must wait before using it."""
+        with self._lock:
+            now = self._clock()
+            wait = 0.0
+            if self.rate:
+                self._refill(now)
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            self._sleep(wait)
+
+    def pause(self, seconds) -> None:
+        """No token is usable for `seconds` (Telegram retry_after)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def is_idle(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            return self._tokens >= self.capacity and now >= self._paused_until
+
+
+class SharedBucket:
+    """
+    At most `rate` tokens per one-second window (wall clock), counted in a
+    cache shared by every process and instance.
+
+    reserve() books the first window with room left and returns the wait
+    until it starts. While the cache is unreachable it falls back to a
+    local TokenBucket.
+    """
+
+    _KEY = 'telegram:rate:{}'
+    _PAUSE_KEY = 'telegram:rate:paused_until'
+    # Windows looked ahead before giving up on booking one
+    _MAX_WINDOWS = 60
+
+    def __init__(self, rate, cache, clock=time.time, sleep=time.sleep):
+        self.rate = rate
+        self._cache = cache
+        self._clock = clock
+        self._sleep = sleep
+        self._local = TokenBucket(rate, max(1, int(rate or 1)), sleep=sleep)
+
+    def _book(self, window) -> int:
+        key = self._KEY.format(window)
+        if self._cache.add(key, 1, timeout=self._MAX_WINDOWS + 5):
+            return 1
+        try:
+            return self._cache.incr(key)
+        except ValueError:  # expired between add() and incr()
+            self._cache.set(key, 1, timeout=self._MAX_WINDOWS + 5)
+            return 1
+
+    def reserve(self) -> float:
+        try:
+            now = self._clock()
+            paused_until = self._cache.get(self._PAUSE_KEY) or 0.0
+            if not self.rate:
+                return max(0.0, paused_until - now)
+            per_window = max(1, int(self.rate))
+            window = int(max(now, paused_until))
+            for window in range(window, window + self._MAX_WINDOWS):
+                if self._book(window) <= per_window:
+                    break
+            return max(0.0, window - now)
+        except Exception as e:
+            logger.warning("Telegram shared rate limit unavailable, limiting this process only: %s", e)
+            return self._local.reserve()
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            self._sleep(wait)
+
+    def pause(self, seconds) -> None:
+        """No token is usable for `seconds`, in every process (Telegram retry_after)."""
+        try:
+            self._cache.set(self._PAUSE_KEY, self._clock() + seconds, timeout=int(seconds) + 1)
+        except Exception as e:
+            logger.warning("Telegram shared rate limit pause not stored: %s", e)
+            self._local.pause(seconds)
+
+
+class RateLimiter:
+    """
+    Global bucket plus one bucket per chat, shared by all threads. With a
+    cache, the global bucket is a SharedBucket: the limit holds across
+    workers and instances.
+    """
+
+    def __init__(self, global_rate, chat_rate, chat_burst=1, clock=time.monotonic, sleep=time.sleep, cache=None):
+        self._clock = clock
+        self._sleep = sleep
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        if cache is not None:
+            self.global_bucket = SharedBucket(global_rate, cache, sleep=sleep)
+        else:
+            self.global_bucket = TokenBucket(global_rate, max(1, int(global_rate or 1)), clock, sleep)
+        self._chats = {}
+        self._lock = threading.Lock()
+
+    def chat_bucket(self, chat_id) -> TokenBucket:
+        with self._lock:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                if len(self._chats) >= _MAX_CHAT_BUCKETS:
+                    self._chats = {k: b for k, b in self._chats.items() if not b.is_idle()}
+                bucket = self._chats[chat_id] = TokenBucket(
+                    self.chat_rate, self.chat_burst, self._clock, self._sleep,
+                )
+            return bucket
+
+    def acquire(self, chat_id=None) -> None:
+        """Wait for a chat token (if any) and a global token."""
+        wait = self.chat_bucket(chat_id).reserve() if chat_id is not None else 0.0
+        wait = max(wait, self.global_bucket.reserve())
+        if wait > 0:
+            self._sleep(wait)
+
+    def pause(self, seconds, chat_id=None) -> None:
+        bucket = self.chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+        bucket.pause(seconds)
+
+
+# =============================================================================
+# Client
+# =============================================================================
+
+class TelegramClient:
+    """Bot API client with keep-alive sessions, rate limits and retries."""
+
+    def __init__(self, token=None, api_url=None, limiter=None, max_retries=None, sleep=time.sleep):
+        self.token = token if token is not None else settings.TELEGRAM_BOT_TOKEN
+        self.api_url = api_url or getattr(settings, 'TELEGRAM_API_URL', TELEGRAM_API_BASE)
+        self.limiter = limiter or RateLimiter(
+            getattr(settings, 'TELEGRAM_RATE_GLOBAL', 25),
+            getattr(settings, 'TELEGRAM_RATE_PER_CHAT', 1),
+            getattr(settings, 'TELEGRAM_RATE_CHAT_BURST', 3),
+            cache=caches[getattr(settings, 'TELEGRAM_RATE_CACHE_ALIAS', 'default')],
+        )
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'TELEGRAM_MAX_RETRIES', 3)
+        self._sleep = sleep
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        Keep-alive session shared by all threads (urllib3 pools are
+        thread-safe): up to _POOL_SIZE connections to the API stay open.
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=_POOL_SIZE)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def close(self) -> None:
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+    def _url(self, method):
+        return f'{self.api_url.format(token=self.token)}/{method}'
+
+    def call(self, method: str, payload: dict, timeout: int = 10) -> dict | None:
+        """Make an API call to Telegram. Returns the result dict or None on error."""
+        chat_id = payload.get('chat_id') if method in _SEND_METHODS else None
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(chat_id)
+            try:
+                resp = self.session.post(self._url(method), json=payload, timeout=timeout)
+                data = resp.json()
+            except (requests.RequestException, ValueError) as e:
+                if attempt < self.max_retries:
+                    logger.warning("Telegram API request failed method=%s error=%s, retrying", method, e)
+                    self._sleep(min(2 ** attempt * 0.5, 5))
+                    continue
+                logger.error("Telegram API request failed method=%s error=%s", method, e)
+                return None
+
+            if data.get('ok'):
+                return data.get('result')
+
+            retry_after = (data.get('parameters') or {}).get('retry_after')
+            if resp.status_code == 429 and retry_after is not None and attempt < self.max_retries:
+                logger.warning(
+                    "Telegram API flood limit method=%s chat=%s retry_after=%ss",
+                    method, chat_id, retry_after,
+                )
+                self.limiter.pause(retry_after, chat_id)
+                continue
 
-def _call(method: str, payload: dict, timeout: int = 10) -> dict | None:
-    """Make an API call to Telegram. Returns the result dict or None on error."""
-    url = _api_url(method)
-    try:
-        resp = requests.post(url, json=payload, timeout=timeout)
-        data = resp.json()
-        if not data.get('ok'):
             logger.error(
                 "Telegram API error method=%s status=%s description=%s",
                 method, resp.status_code, data.get('description'),
             )
             return None
-        return data.get('result')
-    except requests.RequestException as e:
-        logger.error("Telegram API request failed method=%s error=%s", method, e)
         return None
 
+    def send_message(self, chat_id: int, text: str, reply_markup: dict | None = None) -> dict | None:
+        """Send a text message to a Telegram chat."""
+        return self.call('sendMessage', _message_payload(chat_id, text, reply_markup))
 
-def send_message(chat_id: int, text: str, reply_markup: dict | None = None) -> dict | None:
-    """Send a text message to a Telegram chat."""
+    def broadcast(self, chat_ids, text, reply_markup=None, batch_size=None, max_workers=4) -> dict:
+        """
+        Send the same message to many chats.
+
+        Recipients go out in batches of `batch_size` on a pool of
+        `max_workers` threads; the global bucket paces the whole run and a
+        chat appearing twice is sent to once.
+
+        Returns:
+            dict: {chat_id: result or None}
+        """
+        if batch_size is None:
+            batch_size = getattr(settings, 'TELEGRAM_BROADCAST_BATCH', 100)
+        recipients = list(dict.fromkeys(chat_ids))
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='telegram-broadcast') as pool:
+            for start in range(0, len(recipients), batch_size):
+                batch = recipients[start:start + batch_size]
+                sent = pool.map(lambda chat_id: self.send_message(chat_id, text, reply_markup), batch)
+                results.update(zip(batch, sent))
+        failed = sum(1 for result in results.values() if result is None)
+        logger.info("Telegram broadcast: %d recipients, %d failed", len(results), failed)
+        return results
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> TelegramClient:
+    """The process-wide client (shared sessions and rate limits)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TelegramClient()
+    return _client
+
+
+def reset_client() -> None:
+    """Drop the process-wide client, e.g. after changing settings (tests)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def _call(method: str, payload: dict, timeout: int = 10) -> dict | None:
+    """Make an API call to Telegram. Returns the result dict or None on error."""
+    return get_client().call(method, payload, timeout=timeout)
+
+
+def _message_payload(chat_id, text, reply_markup=None) -> dict:
     payload = {
         'chat_id': chat_id,
         'text': text,
@@ -45,7 +360,17 @@ def send_message(chat_id: int, text: str, reply_markup: dict | None = None) -> d
     }
     if reply_markup:
         payload['reply_markup'] = reply_markup
-    return _call('sendMessage', payload)
+    return payload
+
+
+def send_message(chat_id: int, text: str, reply_markup: dict | None = None) -> dict | None:
+    """Send a text message to a Telegram chat."""
+    return _call('sendMessage', _message_payload(chat_id, text, reply_markup))
+
+
+def broadcast(chat_ids, text: str, reply_markup: dict | None = None) -> dict:
+    """Send a text message to many chats (see TelegramClient.broadcast)."""
+    return get_client().broadcast(chat_ids, text, reply_markup=reply_markup)
 
 
 def send_contact_request_keyboard(chat_id: int, text: str) -> dict | None:
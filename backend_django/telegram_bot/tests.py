@@ -2,16 +2,27 @@
 Tests for the Telegram Bot adapter.
 """
 import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
 from unittest.mock import patch, MagicMock
 
-from django.test import TestCase, RequestFactory, override_settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, RequestFactory, override_settings
 from django.test.client import Client as DjangoTestClient
+from django.utils import timezone
 
 from core.models import User
+from core.testing import LOCMEM_CACHE
 from ai_assistant.models import ChatSession
 from .models import TelegramIdentityBinding, TelegramUpdateLog, ExternalChannelConversationLink
 from . import binding_service
+from . import dispatcher
 from . import handlers
+from . import telegram_client
 
 
 def _make_update(update_id, tg_user_id=111, chat_id=111, text=None, contact=None):
@@ -295,44 +306,70 @@ class HandlersTest(TestCase):
         self.assertIn('Non hai', mock_send.call_args[0][1])
 
 
-@override_settings(TELEGRAM_BOT_TOKEN='test-token', TELEGRAM_WEBHOOK_SECRET='')
+@override_settings(TELEGRAM_BOT_TOKEN='test-token', TELEGRAM_WEBHOOK_SECRET='', BACKGROUND_TASKS_EAGER=True)
 class WebhookViewTest(TestCase):
     def setUp(self):
         self.client = DjangoTestClient()
 
-    @patch('telegram_bot.views.handle_update')
+    def _post(self, update):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/telegram/webhook/',
+                data=json.dumps(update),
+                content_type='application/json',
+            )
+
+    @patch('telegram_bot.dispatcher.handle_update')
     def test_webhook_processes_valid_update(self, mock_handle):
         update = _make_update(100, text='/start')
-        resp = self.client.post(
-            '/api/telegram/webhook/',
-            data=json.dumps(update),
-            content_type='application/json',
-        )
+        resp = self._post(update)
         self.assertEqual(resp.status_code, 200)
-        mock_handle.assert_called_once()
+        mock_handle.assert_called_once_with(update)
 
         # Check idempotency log
-        self.assertTrue(TelegramUpdateLog.objects.filter(update_id=100).exists())
+        log = TelegramUpdateLog.objects.get(update_id=100)
+        self.assertEqual(log.processing_status, TelegramUpdateLog.ProcessingStatus.OK)
+        self.assertEqual(log.update_type, 'command:/start')
+        self.assertIsNotNone(log.processed_at)
 
-    @patch('telegram_bot.views.handle_update')
+    @patch('telegram_bot.dispatcher.handle_update')
     def test_webhook_idempotent_duplicate(self, mock_handle):
         update = _make_update(200, text='test')
         # First call
-        self.client.post(
-            '/api/telegram/webhook/',
-            data=json.dumps(update),
-            content_type='application/json',
-        )
+        self._post(update)
         # Second call (duplicate)
-        resp = self.client.post(
-            '/api/telegram/webhook/',
-            data=json.dumps(update),
-            content_type='application/json',
-        )
+        resp = self._post(update)
         self.assertEqual(resp.status_code, 200)
         # handle_update called only once
         self.assertEqual(mock_handle.call_count, 1)
 
+    @patch('telegram_bot.dispatcher.handle_update')
+    def test_webhook_acknowledges_before_processing(self, mock_handle):
+        update = _make_update(250, text='test')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            resp = self.client.post(
+                '/api/telegram/webhook/',
+                data=json.dumps(update),
+                content_type='application/json',
+            )
+        self.assertEqual(resp.status_code, 200)
+        mock_handle.assert_not_called()
+        log = TelegramUpdateLog.objects.get(update_id=250)
+        self.assertEqual(log.processing_status, TelegramUpdateLog.ProcessingStatus.PENDING)
+        self.assertEqual(log.payload, update)
+
+        for callback in callbacks:
+            callback()
+        mock_handle.assert_called_once_with(update)
+
+    @patch('telegram_bot.dispatcher.handle_update', side_effect=RuntimeError('boom'))
+    def test_webhook_handler_error_is_logged(self, mock_handle):
+        resp = self._post(_make_update(260, text='test'))
+        self.assertEqual(resp.status_code, 200)
+        log = TelegramUpdateLog.objects.get(update_id=260)
+        self.assertEqual(log.processing_status, TelegramUpdateLog.ProcessingStatus.ERROR)
+        self.assertEqual(log.error_message, 'boom')
+
     def test_webhook_invalid_json(self):
         resp = self.client.post(
             '/api/telegram/webhook/',
@@ -445,3 +482,366 @@ class GroupChatRejectionTest(TestCase):
         handlers.handle_update(update)
         mock_send.assert_called_once()
         self.assertIn('privata', mock_send.call_args[0][1])
+
+
+class FakeTelegram:
+    """
+    In-memory Telegram Bot API: replaces telegram_client._call and records
+    every outgoing call as (method, payload).
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+        self._patcher = patch('telegram_bot.telegram_client._call', side_effect=self._call)
+
+    def _call(self, method, payload, timeout=10):
+        with self._lock:
+            self.calls.append((method, payload))
+            return {'message_id': len(self.calls), 'chat': {'id': payload.get('chat_id')}}
+
+    def texts(self, chat_id):
+        return [p['text'] for m, p in self.calls if m == 'sendMessage' and p['chat_id'] == chat_id]
+
+    def __enter__(self):
+        self._patcher.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._patcher.stop()
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='test-token', TELEGRAM_WEBHOOK_SECRET='', BACKGROUND_TASKS_EAGER=True)
+class DispatcherEndToEndTest(TestCase):
+    """Webhook -> inbox -> dispatcher -> handlers -> (fake) Telegram API."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            phone_number='+393471234567',
+        )
+        self.telegram = FakeTelegram()
+        self.telegram.__enter__()
+        self.addCleanup(self.telegram.__exit__)
+
+    def _post(self, update):
+        return self.client.post(
+            '/api/telegram/webhook/',
+            data=json.dumps(update),
+            content_type='application/json',
+        )
+
+    def test_onboarding_conversation(self):
+        contact = {'phone_number': '+393471234567', 'first_name': 'Mario', 'user_id': 111}
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post(_make_update(1, text='/start'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post(_make_update(2, contact=contact))
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post(_make_update(2, contact=contact))  # Telegram retry
+
+        texts = self.telegram.texts(111)
+        self.assertEqual(len(texts), 2)
+        self.assertIn('riconoscerti', texts[0])
+        self.assertIn('riconosciuto', texts[1])
+        self.assertIsNotNone(binding_service.get_active_binding(111))
+        self.assertEqual(TelegramUpdateLog.objects.filter(processing_status='OK').count(), 2)
+
+    @patch('telegram_bot.message_service.forward_message_to_backend', side_effect=lambda b, text, m: f'eco: {text}')
+    def test_per_chat_fifo(self, mock_forward):
+        binding_service.create_binding(111, 111, '+393471234567', self.user)
+        # Updates acknowledged but not processed yet, delivered out of order
+        with self.captureOnCommitCallbacks(execute=False):
+            self._post(_make_update(12, text='secondo'))
+            self._post(_make_update(11, text='primo'))
+            self._post(_make_update(13, tg_user_id=222, chat_id=222, text='/help'))
+        self.assertFalse(self.telegram.calls)
+
+        self.assertEqual(dispatcher.pending_chats(), [111, 222])
+        self.assertEqual(dispatcher.drain_chat(111), 2)
+        self.assertEqual(self.telegram.texts(111), ['eco: primo', 'eco: secondo'])
+        self.assertEqual(self.telegram.texts(222), [])
+
+        self.assertEqual(dispatcher.drain_chat(222), 1)
+        self.assertIn('Comandi disponibili', self.telegram.texts(222)[0])
+
+    @patch('telegram_bot.dispatcher.handle_update')
+    def test_chat_busy_elsewhere_is_not_overtaken(self, mock_handle):
+        with self.captureOnCommitCallbacks(execute=False):
+            self._post(_make_update(21, text='a'))
+            self._post(_make_update(22, text='b'))
+        # Another instance is working on the head of the queue
+        TelegramUpdateLog.objects.filter(update_id=21).update(
+            processing_status='PROCESSING', started_at=timezone.now(),
+        )
+        self.assertEqual(dispatcher.drain_chat(111), 0)
+        mock_handle.assert_not_called()
+
+    @patch('telegram_bot.dispatcher.handle_update')
+    def test_stale_head_is_claimed_again(self, mock_handle):
+        with self.captureOnCommitCallbacks(execute=False):
+            self._post(_make_update(41, text='a'))
+        # The worker processing 41 died with the instance
+        TelegramUpdateLog.objects.filter(update_id=41).update(
+            processing_status='PROCESSING', started_at=timezone.now() - timedelta(hours=1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post(_make_update(42, text='b'))
+
+        self.assertEqual(
+            [c.args[0]['update_id'] for c in mock_handle.call_args_list], [41, 42],
+        )
+        self.assertFalse(TelegramUpdateLog.objects.exclude(processing_status='OK').exists())
+
+    @patch('telegram_bot.dispatcher.handle_update')
+    def test_process_updates_command_requeues_stale(self, mock_handle):
+        with self.captureOnCommitCallbacks(execute=False):
+            self._post(_make_update(31, text='a'))
+            self._post(_make_update(32, text='b'))
+        TelegramUpdateLog.objects.filter(update_id=31).update(
+            processing_status='PROCESSING', started_at=timezone.now() - timedelta(hours=1),
+        )
+        call_command('telegram_process_updates', stdout=StringIO())
+
+        self.assertEqual(
+            [c.args[0]['update_id'] for c in mock_handle.call_args_list], [31, 32],
+        )
+        self.assertFalse(TelegramUpdateLog.objects.exclude(processing_status='OK').exists())
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=False, TELEGRAM_UPDATE_WORKERS=2)
+class DispatcherSchedulingTest(SimpleTestCase):
+    """In-process scheduling: one worker per chat, bounded pool."""
+
+    def setUp(self):
+        patcher = patch.object(dispatcher, '_executor', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: dispatcher._executor and dispatcher._executor.shutdown(wait=True))
+
+    def test_one_worker_per_chat_and_bounded_concurrency(self):
+        lock = threading.Lock()
+        running, peak, drains = set(), [0], []
+        release = threading.Event()
+
+        def fake_drain(chat_id):
+            with lock:
+                self.assertNotIn(chat_id, running)
+                running.add(chat_id)
+                peak[0] = max(peak[0], len(running))
+                drains.append(chat_id)
+            release.wait(5)
+            time.sleep(0.01)
+            with lock:
+                running.discard(chat_id)
+            return 1
+
+        with patch.object(dispatcher, 'drain_chat', side_effect=fake_drain):
+            for chat_id in (1, 2, 3, 1, 1):
+                dispatcher.schedule(chat_id)
+            release.set()
+            dispatcher._get_executor().shutdown(wait=True)
+
+        self.assertEqual(peak[0], 2)
+        # Chat 1 scheduled again while its worker ran: drained once more, not in parallel
+        self.assertEqual(sorted(drains), [1, 1, 2, 3])
+        self.assertFalse(dispatcher._active)
+        self.assertFalse(dispatcher._rerun)
+
+
+class StubBotAPI:
+    """
+    Local HTTP server speaking enough of the Bot API for client tests.
+
+    Records (method, payload) per request and counts TCP connections;
+    chats in `flood` get one 429 with that retry_after, chats in `blocked`
+    a 403 (bot blocked by the user).
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.connections = 0
+        self.flood = {}
+        self.blocked = set()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                payload = json.loads(body or b'{}')
+                method = self.path.rsplit('/', 1)[-1]
+                chat_id = payload.get('chat_id')
+                with stub._lock:
+                    stub.requests.append((method, payload))
+                    retry_after = stub.flood.pop(chat_id, None)
+                if retry_after is not None:
+                    status_code, data = 429, {
+                        'ok': False, 'error_code': 429,
+                        'description': f'Too Many Requests: retry after {retry_after}',
+                        'parameters': {'retry_after': retry_after},
+                    }
+                elif chat_id in stub.blocked:
+                    status_code, data = 403, {
+                        'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user',
+                    }
+                else:
+                    status_code, data = 200, {'ok': True, 'result': {'message_id': len(stub.requests)}}
+                encoded = json.dumps(data).encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/bot{{token}}'
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sent_to(self, chat_id):
+        return [p for m, p in self.requests if m == 'sendMessage' and p.get('chat_id') == chat_id]
+
+
+class TokenBucketTest(SimpleTestCase):
+
+    def setUp(self):
+        self.now = [100.0]
+        self.sleeps = []
+
+    def _clock(self):
+        return self.now[0]
+
+    def test_bucket_burst_then_rate(self):
+        bucket = telegram_client.TokenBucket(1, capacity=2, clock=self._clock, sleep=self.sleeps.append)
+        self.assertEqual([bucket.reserve() for _ in range(4)], [0.0, 0.0, 1.0, 2.0])
+        self.now[0] += 10
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_pause(self):
+        bucket = telegram_client.TokenBucket(0, clock=self._clock)
+        bucket.pause(3)
+        self.assertEqual(bucket.reserve(), 3.0)
+        self.assertFalse(bucket.is_idle())
+        self.now[0] += 3
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_limiter_per_chat_and_global(self):
+        limiter = telegram_client.RateLimiter(2, 1, chat_burst=1, clock=self._clock, sleep=self.sleeps.append)
+        limiter.acquire(1)
+        limiter.acquire(2)       # another chat: only the global budget counts
+        self.assertEqual(self.sleeps, [])
+        limiter.acquire(1)       # same chat again: 1/s
+        self.assertEqual(self.sleeps, [1.0])
+        limiter.acquire()        # not chat-bound, global bucket (2/s) now empty
+        self.assertEqual(self.sleeps[-1], 1.0)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_global_budget_shared_by_workers(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Two gunicorn workers: separate limiters, one budget
+        workers = [
+            telegram_client.SharedBucket(2, cache, clock=self._clock, sleep=self.sleeps.append)
+            for _ in range(2)
+        ]
+        waits = [workers[i % 2].reserve() for i in range(5)]
+        self.assertEqual(waits, [0.0, 0.0, 1.0, 1.0, 2.0])
+
+        workers[0].pause(3)  # 429 retry_after seen by one worker
+        self.assertEqual(workers[1].reserve(), 3.0)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='test-token', CACHES=LOCMEM_CACHE)
+class TelegramClientStubServerTest(SimpleTestCase):
+    """TelegramClient against a local HTTP stub of the Bot API."""
+
+    def setUp(self):
+        self.stub = StubBotAPI()
+        self.addCleanup(self.stub.stop)
+        self.sleeps = []
+        self.client_ = telegram_client.TelegramClient(
+            token='test-token',
+            api_url=self.stub.url,
+            limiter=telegram_client.RateLimiter(0, 0, sleep=self.sleeps.append),
+            max_retries=2,
+            sleep=self.sleeps.append,
+        )
+        self.addCleanup(self.client_.close)
+
+    def test_keep_alive_session(self):
+        for i in range(5):
+            self.assertEqual(self.client_.send_message(42, f'msg {i}'), {'message_id': i + 1})
+        self.assertEqual(len(self.stub.sent_to(42)), 5)
+        self.assertEqual(self.stub.connections, 1)
+
+    def test_retry_after_is_honoured(self):
+        self.stub.flood[42] = 2
+        result = self.client_.send_message(42, 'ciao')
+        self.assertIsNotNone(result)
+        self.assertEqual(len(self.stub.sent_to(42)), 2)
+        # The retry waited for the chat's pause
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertAlmostEqual(self.sleeps[0], 2, delta=0.5)
+
+    def test_api_error_is_not_retried(self):
+        self.stub.blocked.add(42)
+        self.assertIsNone(self.client_.send_message(42, 'ciao'))
+        self.assertEqual(len(self.stub.sent_to(42)), 1)
+
+    def test_connection_error_retries_then_gives_up(self):
+        self.stub.stop()
+        self.assertIsNone(self.client_.send_message(42, 'ciao'))
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_broadcast_batches(self):
+        self.stub.blocked.add(7)
+        chat_ids = list(range(1, 121)) + [1, 2, 3]
+        results = self.client_.broadcast(chat_ids, 'Seggi aperti', batch_size=50)
+
+        self.assertEqual(len(results), 120)
+        self.assertIsNone(results[7])
+        self.assertEqual(sum(1 for r in results.values() if r is None), 1)
+        self.assertEqual(len(self.stub.requests), 120)
+        self.assertLessEqual(self.stub.connections, 4)  # pool threads reuse connections
+
+    def test_rate_limits_pace_real_sends(self):
+        self.client_.limiter = telegram_client.RateLimiter(1000, 20, chat_burst=1)
+        started = time.monotonic()
+        for _ in range(3):
+            self.client_.send_message(42, 'ciao')
+        # Per-chat 20/s with no burst: 2 waits of 50ms
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='test-token', TELEGRAM_WEBHOOK_SECRET='', CACHES=LOCMEM_CACHE)
+class WebhookRateLimitTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @patch('telegram_bot.views.TelegramWebhookView.RATE_LIMIT', 2)
+    @patch('telegram_bot.dispatcher.handle_update')
+    def test_rate_limit_shared_through_cache(self, mock_handle):
+        statuses = [
+            self.client.post(
+                '/api/telegram/webhook/', data=json.dumps(_make_update(600 + i, text='x')),
+                content_type='application/json',
+            ).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses, [200, 200, 429])
@@ -1,8 +1,8 @@
 """
 Telegram webhook controller and management views.
 
-Receives Telegram updates via webhook, validates them, and dispatches
-to the appropriate handler based on update type.
+Receives Telegram updates via webhook, validates them, and queues them
+for the dispatcher, which runs the handlers after the response is sent.
 """
 import hashlib
 import hmac
@@ -10,6 +10,7 @@ import logging
 import time
 
 from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -19,9 +20,7 @@ from rest_framework.response import Response
 from rest_framework import permissions, status
 import json
 
-from . import telegram_client
-from .models import TelegramUpdateLog
-from .handlers import handle_update
+from . import dispatcher, telegram_client
 
 logger = logging.getLogger(__name__)
 
@@ -32,11 +31,10 @@ class TelegramWebhookView(View):
     Receives Telegram webhook updates.
 
     POST /api/telegram/webhook/
-    Telegram sends JSON updates here. Validated via secret token header.
+    Telegram sends JSON updates here. Validated via secret token header;
+    answered as soon as the update is stored.
     """
 
-    # Simple in-memory rate limiter: {ip: [timestamps]}
-    _rate_cache: dict[str, list[float]] = {}
     RATE_LIMIT = 60  # max requests per minute per IP
 
     def post(self, request):
@@ -62,42 +60,10 @@ class TelegramWebhookView(View):
         if not update_id:
             return JsonResponse({'error': 'missing update_id'}, status=400)
 
-        # Idempotency check
-        if TelegramUpdateLog.objects.filter(update_id=update_id).exists():
-            logger.debug("Telegram webhook: duplicate update_id=%s, skipping", update_id)
-            return JsonResponse({'ok': True})
-
-        # Extract common metadata for logging
-        message = update.get('message', {})
-        tg_user_id = message.get('from', {}).get('id')
-        chat_id = message.get('chat', {}).get('id')
-
-        # Process update
-        try:
-            handle_update(update)
-            TelegramUpdateLog.objects.create(
-                update_id=update_id,
-                telegram_user_id=tg_user_id,
-                chat_id=chat_id,
-                update_type=self._classify_update(update),
-                processing_status=TelegramUpdateLog.ProcessingStatus.OK,
-            )
-        except Exception as e:
-            logger.error(
-                "Telegram update processing failed: update_id=%s tg_user=%s error=%s",
-                update_id, tg_user_id, e,
-                exc_info=True,
-            )
-            TelegramUpdateLog.objects.create(
-                update_id=update_id,
-                telegram_user_id=tg_user_id,
-                chat_id=chat_id,
-                update_type=self._classify_update(update),
-                processing_status=TelegramUpdateLog.ProcessingStatus.ERROR,
-                error_message=str(e)[:500],
-            )
-
-        # Always return 200 to Telegram to prevent retries
+        # Persist and acknowledge: processing happens after commit, per chat
+        # in update_id order (see dispatcher). A duplicate update_id fails the
+        # unique insert, so retries from Telegram are never processed twice.
+        dispatcher.enqueue(update)
         return JsonResponse({'ok': True})
 
     def _verify_secret(self, request) -> bool:
@@ -110,33 +76,16 @@ class TelegramWebhookView(View):
         return hmac.compare_digest(actual, expected)
 
     def _is_rate_limited(self, ip: str) -> bool:
-        """Simple sliding window rate limiter."""
-        now = time.time()
-        window = 60  # seconds
-        timestamps = self._rate_cache.get(ip, [])
-        timestamps = [t for t in timestamps if now - t < window]
-        if len(timestamps) >= self.RATE_LIMIT:
-            return True
-        timestamps.append(now)
-        self._rate_cache[ip] = timestamps
-        return False
-
-    @staticmethod
-    def _classify_update(update: dict) -> str:
-        """Classify the type of Telegram update for logging."""
-        msg = update.get('message', {})
-        if msg.get('contact'):
-            return 'contact'
-        text = msg.get('text', '')
-        if text.startswith('/'):
-            return f'command:{text.split()[0]}'
-        if text:
-            return 'text'
-        # Non-text content types
-        for content_type in ('photo', 'video', 'audio', 'voice', 'document', 'sticker', 'location'):
-            if msg.get(content_type):
-                return content_type
-        return 'unknown'
+        """Fixed one-minute window per IP, shared by all instances (Django cache)."""
+        key = f'telegram:webhook_rate:{ip}:{int(time.time() // 60)}'
+        if cache.add(key, 1, timeout=70):
+            return False
+        try:
+            count = cache.incr(key)
+        except ValueError:  # expired between add() and incr()
+            cache.set(key, 1, timeout=70)
+            return False
+        return count > self.RATE_LIMIT
 
 
 class TelegramSetupView(APIView):
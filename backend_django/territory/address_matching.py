@@ -0,0 +1,318 @@
+"""
+Address matching engine for sections ↔ schools (plessi).
+
+Matching every section against every school of its comune with
+SequenceMatcher / token Jaccard is O(sections × schools). Here each comune
+gets an AddressIndex: addresses are parsed once into (DUG, street name,
+civic number), street names are indexed by character trigrams, and a query
+only scores the candidates sharing trigrams with it. Since the trigram
+Dice coefficient is computed exactly from the posting counts, candidates
+that cannot reach the threshold are discarded before scoring.
+
+Scoring (0.0-1.0):
+    1.0   same normalized address
+    0.95  same street, same civic number
+    0.85  same street, civic number missing on one side
+    0.75-0.8  same street, different civic (closer numbers score higher)
+    ≤0.9 × Dice  different street name (fuzzy, typos/abbreviations)
+    ≤0.5 × Dice  different street type ("VIA ROMA" vs "PIAZZA ROMA")
+
+Usage:
+    index = AddressIndex([(school['indirizzo'], school) for school in schools])
+    match = index.match("V.LE GIULIO CESARE, 12", min_score=0.75)
+    if match:
+        match.payload, match.score
+"""
+import csv
+import re
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+
+# Leading street types ("denominazione urbanistica generica")
+_DUG = {
+    'VIA', 'VIALE', 'PIAZZA', 'PIAZZALE', 'PIAZZETTA', 'LARGO', 'CORSO',
+    'VICOLO', 'STRADA', 'LOCALITA', 'FRAZIONE', 'CONTRADA', 'BORGO',
+    'LUNGOTEVERE', 'LUNGOMARE', 'CIRCONVALLAZIONE', 'SALITA', 'VIUZZO',
+    'BORGATA', 'RIONE', 'TRAVERSA', 'CALLE', 'CAMPO',
+}
+
+# Dotted abbreviations, applied before punctuation is stripped
+_ABBREVIATIONS = [
+    (re.compile(r'\bV\.?\s?LE\b'), 'VIALE'),
+    (re.compile(r'\bP\.?\s?ZZ?A\b'), 'PIAZZA'),
+    (re.compile(r'\bP\.?\s?(?:ZZ?A)?LE\b'), 'PIAZZALE'),
+    (re.compile(r'\bL\.?\s?GO\s?TEVERE\b|\bLGT\b'), 'LUNGOTEVERE'),
+    (re.compile(r'\bL\.?\s?GO\b'), 'LARGO'),
+    (re.compile(r'\bC\.?\s?SO\b'), 'CORSO'),
+    (re.compile(r'\bV\.?\s?LO\b'), 'VICOLO'),
+    (re.compile(r'\bS\.\s?N\.\s?C\b\.?'), 'SNC'),
+]
+
+# Single-token aliases, applied after normalization
+_TOKEN_ALIASES = {
+    'V': 'VIA',
+    'STR': 'STRADA',
+    'LOC': 'LOCALITA',
+    'FRAZ': 'FRAZIONE',
+    'FR': 'FRAZIONE',
+    'CDA': 'CONTRADA',
+    'CIRC': 'CIRCONVALLAZIONE',
+    'PZ': 'PIAZZA',
+    # Saints: S. / SAN / SANTO / SANTA / STA / STO all collapse to S
+    'SAN': 'S',
+    'SANTO': 'S',
+    'SANTA': 'S',
+    'STA': 'S',
+    'STO': 'S',
+}
+
+# Words ignored in street names ("VIA DI SETTEBAGNI" == "VIA SETTEBAGNI",
+# "VIA DR. G. GARIBALDI" == "VIA GARIBALDI"); single letters other than S
+# (saints) are initials and are ignored too
+_STOPWORDS = {
+    'DI', 'DEL', 'DELLA', 'DELLO', 'DELLE', 'DEI', 'DEGLI', 'DELL',
+    'LA', 'LE', 'IL', 'LO', 'GLI', 'DA', 'DAL', 'DALLA',
+    'NR', 'NUM', 'CIV', 'DR', 'DOTT', 'PROF', 'ING', 'AVV', 'MONS',
+}
+
+_GLUED_CIVIC_RE = re.compile(r'([A-Z]{2,}?)(?:N\.\s?)?(\d)')
+_CIVIC_RE = re.compile(r'^N?(\d+)([A-Z]?)$')
+_NO_CIVIC = {'SNC', 'SN', 'NC'}
+
+ParsedAddress = namedtuple('ParsedAddress', 'key dug name civic')
+Match = namedtuple('Match', 'payload score address')
+
+
+def normalize_text(s):
+    """
+    Normalize text for robust matching:
+    uppercase, strip accents and punctuation, collapse spaces.
+    """
+    if not s:
+        return ''
+    s = str(s).strip().upper()
+    s = unicodedata.normalize('NFKD', s)
+    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+    s = re.sub(r'[^A-Z0-9\s]', ' ', s)
+    return re.sub(r'\s+', ' ', s).strip()
+
+
+def _expand(s):
+    s = unicodedata.normalize('NFKD', str(s).upper())
+    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+    for pattern, repl in _ABBREVIATIONS:
+        s = pattern.sub(repl, s)
+    # Civic glued to the street name: "VIA ALDO MORO3", "VIA CORTIN.6"
+    s = _GLUED_CIVIC_RE.sub(r'\1 \2', s)
+    return [_TOKEN_ALIASES.get(t, t) for t in normalize_text(s).split()]
+
+
+def _parse_civic(tokens):
+    """First civic number in tokens → (number, suffix) or None."""
+    for i, token in enumerate(tokens):
+        m = _CIVIC_RE.match(token)
+        if m:
+            suffix = m.group(2)
+            if not suffix and i + 1 < len(tokens) and len(tokens[i + 1]) == 1:
+                suffix = tokens[i + 1]
+            return (int(m.group(1)), suffix)
+    return None
+
+
+def parse_address(address):
+    """
+    Split an address into (key, dug, name, civic).
+
+    The civic number is whatever follows the first comma, or a trailing
+    number ("VIA ROMA 12", "VIA ROMA 12 B", "VIA ROMA SNC"); numbers inside
+    the street name ("VIA 4 NOVEMBRE") are kept in the name.
+
+    Examples:
+        "V.LE GIULIO CESARE, 12/A" -> ('VIALE GIULIO CESARE 12 A', 'VIALE', 'GIULIO CESARE', (12, 'A'))
+        "VIA DI SETTEBAGNI 231"    -> ('VIA SETTEBAGNI 231', 'VIA', 'SETTEBAGNI', (231, ''))
+    """
+    if not address:
+        return ParsedAddress('', '', '', None)
+
+    street, sep, rest = str(address).partition(',')
+    tokens = _expand(street)
+    civic_tokens = _expand(rest) if sep else []
+
+    if not sep:
+        # Trailing civic: "... 12", "... 12A", "... 12 A", "... SNC"
+        if tokens and tokens[-1] in _NO_CIVIC:
+            tokens = tokens[:-1]
+        elif len(tokens) >= 3 and len(tokens[-1]) == 1 and tokens[-2].isdigit():
+            tokens, civic_tokens = tokens[:-2], tokens[-2:]
+        elif len(tokens) >= 2 and _CIVIC_RE.match(tokens[-1]):
+            tokens, civic_tokens = tokens[:-1], tokens[-1:]
+
+    dug = ''
+    if len(tokens) > 1 and tokens[0] in _DUG:
+        dug, tokens = tokens[0], tokens[1:]
+
+    name_tokens = [
+        t for t in tokens
+        if t not in _STOPWORDS and t not in _NO_CIVIC
+        and (len(t) > 1 or t == 'S' or t.isdigit())
+    ] or tokens
+    name = ' '.join(name_tokens)
+    civic = _parse_civic(civic_tokens)
+
+    key_parts = [dug, name]
+    if civic:
+        key_parts.append(f'{civic[0]} {civic[1]}'.strip())
+    key = ' '.join(p for p in key_parts if p)
+    return ParsedAddress(key, dug, name, civic)
+
+
+def trigrams(name):
+    """Character trigrams of a street name, with word-boundary padding."""
+    if not name:
+        return frozenset()
+    padded = f' {name} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def score_pair(a, b, dice):
+    """
+    Similarity of two parsed addresses, given the Dice coefficient of
+    their street-name trigrams.
+    """
+    if a.key and a.key == b.key:
+        return 1.0
+    dug_ok = not a.dug or not b.dug or a.dug == b.dug
+    if a.name == b.name and dug_ok:
+        if a.civic is None or b.civic is None:
+            return 0.85
+        if a.civic[0] == b.civic[0]:
+            return 0.95
+        return 0.8 - 0.05 * min(1.0, abs(a.civic[0] - b.civic[0]) / 200)
+    # Same name but different DUG ("VIA ROMA" vs "PIAZZA ROMA") is weak evidence
+    return 0.9 * dice if dug_ok else 0.5 * dice
+
+
+class AddressIndex:
+    """Trigram inverted index over the addresses of one block (comune)."""
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries: iterable of (address, payload)
+        """
+        self.payloads = []
+        self.parsed = []
+        self._sizes = []
+        self._postings = defaultdict(list)
+        self._by_key = {}
+        self._memo = {}
+
+        for idx, (address, payload) in enumerate(entries):
+            parsed = parse_address(address)
+            grams = trigrams(parsed.name)
+            self.payloads.append(payload)
+            self.parsed.append(parsed)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(idx)
+            if parsed.key:
+                self._by_key.setdefault(parsed.key, idx)
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def match(self, address, min_score=0.0):
+        """
+        Best candidate for an address, or None below min_score.
+
+        Ties keep the candidate that comes first in the index. Results are
+        memoized per normalized address (sections of a plesso share one).
+        """
+        parsed = parse_address(address)
+        memo_key = (parsed.key, min_score)
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+
+        result = self._match(parsed, min_score)
+        self._memo[memo_key] = result
+        return result
+
+    def _match(self, parsed, min_score):
+        if not parsed.key:
+            return None
+        idx = self._by_key.get(parsed.key)
+        if idx is not None:
+            return Match(self.payloads[idx], 1.0, self.parsed[idx].key)
+
+        grams = trigrams(parsed.name)
+        if not grams:
+            return None
+
+        shared = Counter()
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings:
+                shared.update(postings)
+
+        n = len(grams)
+        best_idx, best_score = None, -1.0
+        for idx, count in shared.items():
+            dice = 2.0 * count / (n + self._sizes[idx])
+            # Different names score at most 0.9 × dice: prune before scoring
+            if dice < 1.0 and 0.9 * dice < min_score:
+                continue
+            score = score_pair(parsed, self.parsed[idx], dice)
+            if score > best_score or (score == best_score and idx < best_idx):
+                best_idx, best_score = idx, score
+
+        if best_idx is None or best_score < min_score:
+            return None
+        return Match(self.payloads[best_idx], round(best_score, 4), self.parsed[best_idx].key)
+
+
+# =============================================================================
+# MIM school registry (Open Data CSV)
+# =============================================================================
+
+MIM_SCHOOL_FILES = [
+    'SCUANAGRAFESTAT20252620250901.csv',  # Scuole statali
+    'SCUANAGRAFEPAR20252620250901.csv',   # Scuole paritarie
+    'SCUANAAUTSTAT20252620250901.csv',    # Scuole autonome statali
+    'SCUANAAUTPAR20252620250901.csv',     # Scuole autonome paritarie
+]
+
+
+def iter_mim_schools(path, codici_catastali=None):
+    """
+    Yield (codice_catastale, denominazione, indirizzo) from a MIM CSV.
+
+    Rows without name or address ("Non Disponibile") are skipped.
+    CODICECOMUNESCUOLA is the codice catastale of the comune (e.g. H501).
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            codice = (row.get('CODICECOMUNESCUOLA') or '').strip()
+            if not codice or (codici_catastali is not None and codice not in codici_catastali):
+                continue
+            denom = (row.get('DENOMINAZIONESCUOLA') or '').strip()
+            addr = (row.get('INDIRIZZOSCUOLA') or '').strip()
+            if not denom or not addr or addr.lower() == 'non disponibile':
+                continue
+            yield codice, denom, addr
+
+
+def build_school_indexes(paths, codici_catastali=None):
+    """
+    Load MIM CSVs into one AddressIndex per comune.
+
+    Returns:
+        (dict codice_catastale -> AddressIndex, total schools loaded)
+    Payloads are {'denominazione', 'indirizzo'} dicts.
+    """
+    by_comune = defaultdict(list)
+    total = 0
+    for path in paths:
+        for codice, denom, addr in iter_mim_schools(path, codici_catastali):
+            by_comune[codice].append((addr, {'denominazione': denom, 'indirizzo': addr}))
+            total += 1
+    return {codice: AddressIndex(entries) for codice, entries in by_comune.items()}, total
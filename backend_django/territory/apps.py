@@ -5,3 +5,6 @@ class TerritoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'territory'
     verbose_name = 'Territorio'
+
+    def ready(self):
+        import territory.signals  # noqa: F401
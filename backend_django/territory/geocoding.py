@@ -2,7 +2,8 @@
 Geocoding helpers for electoral sections and RDL addresses.
 
 Uses Google Geocoding API to convert addresses to lat/lon coordinates.
-Shared by geocode_sezioni and geocode_rdl management commands.
+The cached, concurrent entry point is territory.geocoding_service; this
+module holds the raw API call and the address builders.
 
 API Key resolution (in order):
 1. GOOGLE_MAPS_API_KEY env var / Django setting
@@ -97,15 +98,19 @@ def _get_maps_api_key(api_key=None):
     return None
 
 
-def geocode_address(address, api_key=None, max_retries=3, base_delay=1.0):
+def geocode_address(address, api_key=None, max_retries=3, base_delay=1.0, session=None):
     """
     Geocode an address via Google Geocoding API.
 
+    No caching here: use territory.geocoding_service for cached, rate
+    limited lookups.
+
     Args:
         address: Full address string (e.g. "Via Roma 1, Roma, RM, Italia")
         api_key: Google Maps API key (optional, resolved automatically)
         max_retries: Max retry attempts on transient errors
         base_delay: Base delay in seconds for exponential backoff
+        session: optional requests.Session (keep-alive across calls)
 
     Returns:
         Tuple (lat, lon, place_id, location_type) on success, None on failure.
@@ -129,7 +134,7 @@ def geocode_address(address, api_key=None, max_retries=3, base_delay=1.0):
 
     for attempt in range(max_retries + 1):
         try:
-            resp = requests.get(url, params=params, timeout=10)
+            resp = (session or requests).get(url, params=params, timeout=10)
         except requests.RequestException as e:
             logger.warning("Geocode request error (attempt %d): %s", attempt + 1, e)
             if attempt < max_retries:
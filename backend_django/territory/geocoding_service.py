@@ -0,0 +1,310 @@
+"""
+Geocoding service: persistent cache + pluggable provider + bounded concurrency.
+
+    service = get_geocoding_service()
+    service.geocode("Via Roma 1, Roma, RM, Italia")        # one address
+    service.geocode_many(addresses, max_workers=4)        # bulk (commands)
+
+Lookups go through GeocodeCacheEntry first (normalized address key), so
+sections sharing a plesso and RDLs at the same address cost one provider
+call in total. Provider calls from all worker threads of a service share
+one QPS limiter.
+
+Providers are selected with settings.GEOCODING_PROVIDER (dotted path):
+- GoogleGeocodingProvider: Google Geocoding API (production)
+- FakeGeocodingProvider: deterministic coordinates, no network (tests/dev)
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_ADDRESS_KEY_MAX_LENGTH = 255
+
+
+def normalize_address_key(address):
+    """
+    Normalize an address for cache deduplication.
+    Uppercase, strip accents and punctuation, collapse whitespace.
+    """
+    if not address:
+        return ""
+    s = str(address).strip().upper()
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = re.sub(r"[^A-Z0-9\s]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s[:_ADDRESS_KEY_MAX_LENGTH]
+
+
+# =============================================================================
+# Providers
+# =============================================================================
+
+class GeocodingProvider:
+    """
+    Provider interface.
+
+    geocode() returns (lat, lon, place_id, location_type) or None. It must
+    be thread-safe and must not use the database: geocode_many() calls it
+    from several threads.
+    """
+    name = ''
+
+    def geocode(self, address):
+        raise NotImplementedError
+
+
+class GoogleGeocodingProvider(GeocodingProvider):
+    """Google Geocoding API, one keep-alive HTTP session per thread."""
+    name = 'google'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+
+    def geocode(self, address):
+        from territory.geocoding import geocode_address
+        return geocode_address(address, session=self._session())
+
+
+class FakeGeocodingProvider(GeocodingProvider):
+    """
+    Deterministic offline provider.
+
+    Maps the normalized address to a stable point inside Italy's bounding
+    box. Addresses containing "NON TROVATO" return None.
+    """
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        with self._lock:
+            self.calls.append(address)
+        key = normalize_address_key(address)
+        if 'NON TROVATO' in key:
+            return None
+        digest = hashlib.sha1(key.encode()).digest()
+        lat = 37.0 + int.from_bytes(digest[:4], 'big') / 2**32 * 9.0
+        lon = 7.0 + int.from_bytes(digest[4:8], 'big') / 2**32 * 11.0
+        return (round(lat, 6), round(lon, 6), f'fake-{digest[:6].hex()}', 'ROOFTOP')
+
+
+# =============================================================================
+# Rate limiting
+# =============================================================================
+
+class RateLimiter:
+    """Process-wide QPS limiter: spaces acquisitions 1/qps seconds apart."""
+
+    def __init__(self, qps):
+        self.interval = 1.0 / qps if qps and qps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# =============================================================================
+# Service
+# =============================================================================
+
+class GeocodingService:
+    """Cache-backed geocoding on top of a provider."""
+
+    def __init__(self, provider, qps=None):
+        self.provider = provider
+        self.limiter = RateLimiter(qps)
+        self.stats_lock = threading.Lock()
+        self.stats = {'cache_hits': 0, 'api_calls': 0, 'failures': 0}
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def cached(self, address):
+        """Cached result for an address, or None (no provider call)."""
+        from territory.models import GeocodeCacheEntry
+
+        key = normalize_address_key(address)
+        if not key:
+            return None
+        entry = GeocodeCacheEntry.objects.filter(address_key=key).first()
+        return entry.as_result() if entry else None
+
+    def _fetch(self, address):
+        """Provider call under the QPS limiter (no DB access: thread-safe)."""
+        self.limiter.acquire()
+        result = self.provider.geocode(address)
+        self._count('api_calls')
+        if result is None:
+            self._count('failures')
+        return result
+
+    def geocode(self, address, use_cache=True):
+        """
+        Geocode one address.
+
+        Returns (lat, lon, place_id, location_type) or None. Successful
+        results are stored in the cache; failures are not (they may be
+        transient).
+        """
+        key = normalize_address_key(address)
+        if not key:
+            return None
+
+        if use_cache:
+            result = self.cached(address)
+            if result is not None:
+                self._count('cache_hits')
+                return result
+
+        result = self._fetch(address)
+        if result is not None:
+            self._store({key: (address, result)})
+        return result
+
+    def _store(self, resolved):
+        """Upsert {address_key: (address, result)} into the cache."""
+        from territory.models import GeocodeCacheEntry
+
+        entries = [
+            GeocodeCacheEntry(
+                address_key=key,
+                address=address[:500],
+                latitudine=result[0],
+                longitudine=result[1],
+                place_id=result[2] or '',
+                location_type=result[3] or '',
+                provider=self.provider.name,
+            )
+            for key, (address, result) in resolved.items()
+        ]
+        GeocodeCacheEntry.objects.bulk_create(
+            entries,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['address_key'],
+            update_fields=['address', 'latitudine', 'longitudine', 'place_id', 'location_type', 'provider'],
+        )
+
+    def geocode_many(self, addresses, max_workers=None, use_cache=True, on_result=None):
+        """
+        Geocode many addresses with a bounded thread pool.
+
+        Addresses are deduplicated by normalized key, cache hits are read
+        with one query per 500 keys, and only misses reach the provider.
+        Worker threads never touch the database: results are written to
+        the cache from the calling thread.
+
+        Args:
+            addresses: iterable of address strings
+            max_workers: pool size (default settings.GEOCODING_MAX_WORKERS)
+            use_cache: read the cache before calling the provider
+            on_result: optional callable(address, result), called from the
+                caller's thread as provider results complete
+
+        Returns:
+            dict: {address_key: result or None}
+        """
+        from territory.models import GeocodeCacheEntry
+
+        unique = {}
+        for address in addresses:
+            key = normalize_address_key(address)
+            if key and key not in unique:
+                unique[key] = address
+
+        results = {}
+        if use_cache and unique:
+            keys = list(unique)
+            for start in range(0, len(keys), 500):
+                for entry in GeocodeCacheEntry.objects.filter(address_key__in=keys[start:start + 500]):
+                    results[entry.address_key] = entry.as_result()
+            with self.stats_lock:
+                self.stats['cache_hits'] += len(results)
+
+        misses = {key: address for key, address in unique.items() if key not in results}
+        if not misses:
+            return results
+
+        if max_workers is None:
+            max_workers = getattr(settings, 'GEOCODING_MAX_WORKERS', 4)
+
+        resolved = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='geocode') as pool:
+            futures = {pool.submit(self._fetch, address): key for key, address in misses.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning("Geocode worker failed for '%s': %s", misses[key], e)
+                    result = None
+                results[key] = result
+                if result is not None:
+                    resolved[key] = (misses[key], result)
+                if on_result:
+                    on_result(misses[key], result)
+
+        if resolved:
+            self._store(resolved)
+        return results
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def build_geocoding_service(qps=None):
+    """New GeocodingService with the configured provider (own stats)."""
+    provider_cls = import_string(getattr(
+        settings, 'GEOCODING_PROVIDER',
+        'territory.geocoding_service.GoogleGeocodingProvider',
+    ))
+    if qps is None:
+        qps = getattr(settings, 'GEOCODING_QPS', 10)
+    return GeocodingService(provider_cls(), qps=qps)
+
+
+def get_geocoding_service():
+    """Process-wide GeocodingService built from settings."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = build_geocoding_service()
+    return _service
+
+
+def reset_geocoding_service():
+    """Drop the process-wide service (tests, settings changes)."""
+    global _service
+    with _service_lock:
+        _service = None
@@ -4,40 +4,34 @@ Geocode electoral sections using Google Geocoding API.
 Works in two phases:
 1. PROPAGATE: sections sharing an address with already-geocoded sections
    get coordinates copied (zero API calls).
-2. GEOCODE: resolve --limit unique addresses via API, then update all
-   sections at those addresses.
+2. GEOCODE: resolve --limit unique addresses through the geocoding service
+   (persistent cache first, then the provider with --workers concurrent
+   requests under a global --qps limit), then update all sections at
+   those addresses.
 
-So --limit 5 means 5 API calls, but could update 25 sections if each
-address has 5 sections.
+So --limit 5 means at most 5 API calls, but could update 25 sections if
+each address has 5 sections.
 
 Usage:
     python manage.py geocode_sezioni --provincia RM --limit 500 --dry-run
     python manage.py geocode_sezioni --provincia RM --limit 5
     python manage.py geocode_sezioni --provincia RM --force
-    python manage.py geocode_sezioni --comune-id 058091 --limit 100
+    python manage.py geocode_sezioni --comune-id 058091 --limit 100 --workers 8 --qps 20
 """
-import re
-import time
-import unicodedata
 from collections import defaultdict
 
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
-from territory.geocoding import build_section_address, geocode_address
+from territory.geocoding import build_section_address
+from territory.geocoding_service import build_geocoding_service, normalize_address_key as _normalize_key
 from territory.models import SezioneElettorale
 
-
-def _normalize_key(address):
-    """Normalize address for grouping/deduplication."""
-    if not address:
-        return ""
-    s = str(address).strip().upper()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = re.sub(r"[^A-Z0-9\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+_GEOCODE_FIELDS = [
+    "latitudine", "longitudine",
+    "geocoded_at", "geocode_source",
+    "geocode_quality", "geocode_place_id",
+]
 
 
 class Command(BaseCommand):
@@ -64,10 +58,16 @@ class Command(BaseCommand):
             help="Numero massimo di indirizzi unici da geocodificare (default: 500)",
         )
         parser.add_argument(
-            "--sleep-ms",
+            "--workers",
             type=int,
-            default=120,
-            help="Pausa tra richieste API in millisecondi (default: 120)",
+            default=None,
+            help="Richieste API concorrenti (default: GEOCODING_MAX_WORKERS)",
+        )
+        parser.add_argument(
+            "--qps",
+            type=float,
+            default=None,
+            help="Limite globale richieste/secondo (default: GEOCODING_QPS)",
         )
         parser.add_argument(
             "--dry-run",
@@ -84,7 +84,8 @@ class Command(BaseCommand):
         provincia = options["provincia"]
         comune_id = options["comune_id"]
         limit = options["limit"]
-        sleep_ms = options["sleep_ms"]
+        workers = options["workers"]
+        qps = options["qps"]
         dry_run = options["dry_run"]
         force = options["force"]
 
@@ -133,7 +134,7 @@ class Command(BaseCommand):
             return
 
         geocoded_count = self._geocode_addresses(
-            to_resolve, addr_groups, sleep_ms, dry_run
+            to_resolve, addr_groups, workers, qps, dry_run, force
         )
 
         if not dry_run:
@@ -142,6 +143,7 @@ class Command(BaseCommand):
                 geocoded_count["ok_sections"],
                 geocoded_count["fail_addrs"],
                 geocoded_count["api_calls"],
+                geocoded_count["cache_hits"],
             )
 
     # ────────────────────────────────────────────────────────────────────
@@ -159,6 +161,7 @@ class Command(BaseCommand):
 
         propagated = 0
         now = timezone.now()
+        to_update = []
 
         for key, group in by_addr.items():
             # Find a geocoded donor in this group
@@ -189,13 +192,12 @@ class Command(BaseCommand):
                     s.geocode_source = donor.geocode_source or "propagated"
                     s.geocode_quality = donor.geocode_quality
                     s.geocode_place_id = donor.geocode_place_id
-                    s.save(update_fields=[
-                        "latitudine", "longitudine",
-                        "geocoded_at", "geocode_source",
-                        "geocode_quality", "geocode_place_id",
-                    ])
+                    to_update.append(s)
                 propagated += 1
 
+        if to_update:
+            SezioneElettorale.objects.bulk_update(to_update, _GEOCODE_FIELDS, batch_size=500)
+
         label = "DRY RUN " if dry_run else ""
         self.stdout.write(
             f"Fase 1: {label}{propagated} sezioni propagate "
@@ -203,87 +205,89 @@ class Command(BaseCommand):
         )
         return propagated
 
-    def _geocode_addresses(self, addr_keys, addr_groups, sleep_ms, dry_run):
+    def _geocode_addresses(self, addr_keys, addr_groups, workers, qps, dry_run, force):
         """
-        Geocode unique addresses via API and update all sections at each address.
+        Geocode unique addresses via the geocoding service and update all
+        sections at each address.
         """
-        sleep_sec = sleep_ms / 1000.0
         total = len(addr_keys)
         pad = len(str(total))
 
-        ok_sections = 0
-        fail_addrs = 0
-        api_calls = 0
-        now = timezone.now()
-
-        for i, key in enumerate(addr_keys, 1):
-            sections = addr_groups[key]
-            # Use first section to build the display address
-            address = build_section_address(sections[0])
-            n_sez = len(sections)
-            sez_nums = ", ".join(str(s.numero) for s in sections[:5])
-            if n_sez > 5:
-                sez_nums += f" (+{n_sez - 5})"
-
-            if dry_run:
+        if dry_run:
+            ok_sections = 0
+            for i, key in enumerate(addr_keys, 1):
+                sections = addr_groups[key]
                 self.stdout.write(
-                    f"[{i:>{pad}}/{total}] {address} "
-                    f"({n_sez} sez: {sez_nums}) [DRY RUN]"
+                    f"[{i:>{pad}}/{total}] {build_section_address(sections[0])} "
+                    f"({len(sections)} sez: {self._sez_nums(sections)}) [DRY RUN]"
                 )
-                ok_sections += n_sez
-                continue
+                ok_sections += len(sections)
+            self.stdout.write(self.style.WARNING(
+                f"\nDRY RUN: {total} indirizzi, {ok_sections} sezioni"
+            ))
+            return {"ok_sections": ok_sections, "fail_addrs": 0, "api_calls": 0, "cache_hits": 0}
 
-            result = geocode_address(address)
-            api_calls += 1
+        service = build_geocoding_service(qps=qps)
+        # Use first section of each group to build the address
+        addresses = [build_section_address(addr_groups[key][0]) for key in addr_keys]
+        done = [0]
 
+        def on_result(address, result):
+            done[0] += 1
+            n_sez = len(addr_groups[_normalize_key(address)])
             if result is None:
-                fail_addrs += 1
-                self.stderr.write(
-                    f"[{i:>{pad}}/{total}] {address} "
-                    f"({n_sez} sez) -> FALLITA"
-                )
+                self.stderr.write(f"[{done[0]:>{pad}}/{total}] {address} ({n_sez} sez) -> FALLITA")
             else:
-                lat, lon, place_id, location_type = result
-
-                for s in sections:
-                    s.latitudine = lat
-                    s.longitudine = lon
-                    s.geocoded_at = now
-                    s.geocode_source = "google"
-                    s.geocode_quality = location_type
-                    s.geocode_place_id = place_id
-                    s.save(update_fields=[
-                        "latitudine", "longitudine",
-                        "geocoded_at", "geocode_source",
-                        "geocode_quality", "geocode_place_id",
-                    ])
-
-                ok_sections += n_sez
+                lat, lon, _, location_type = result
                 self.stdout.write(
-                    f"[{i:>{pad}}/{total}] {address} "
-                    f"-> {lat}, {lon} ({location_type}) "
-                    f"[{n_sez} sez: {sez_nums}]"
+                    f"[{done[0]:>{pad}}/{total}] {address} "
+                    f"-> {lat}, {lon} ({location_type}) [{n_sez} sez]"
                 )
 
-            if sleep_sec > 0 and i < total:
-                time.sleep(sleep_sec)
+        results = service.geocode_many(
+            addresses, max_workers=workers, use_cache=not force, on_result=on_result
+        )
 
-        if dry_run:
-            self.stdout.write(self.style.WARNING(
-                f"\nDRY RUN: {total} indirizzi, {ok_sections} sezioni"
-            ))
+        now = timezone.now()
+        to_update = []
+        fail_addrs = 0
+        for key in addr_keys:
+            result = results.get(key)
+            if result is None:
+                fail_addrs += 1
+                continue
+            lat, lon, place_id, location_type = result
+            for s in addr_groups[key]:
+                s.latitudine = lat
+                s.longitudine = lon
+                s.geocoded_at = now
+                s.geocode_source = service.provider.name
+                s.geocode_quality = location_type
+                s.geocode_place_id = place_id
+                to_update.append(s)
+
+        SezioneElettorale.objects.bulk_update(to_update, _GEOCODE_FIELDS, batch_size=500)
 
         return {
-            "ok_sections": ok_sections,
+            "ok_sections": len(to_update),
             "fail_addrs": fail_addrs,
-            "api_calls": api_calls,
+            "api_calls": service.stats["api_calls"],
+            "cache_hits": service.stats["cache_hits"],
         }
 
-    def _summary(self, propagated, geocoded, failed, api_calls):
+    @staticmethod
+    def _sez_nums(sections):
+        sez_nums = ", ".join(str(s.numero) for s in sections[:5])
+        if len(sections) > 5:
+            sez_nums += f" (+{len(sections) - 5})"
+        return sez_nums
+
+    def _summary(self, propagated, geocoded, failed, api_calls, cache_hits=0):
         self.stdout.write(self.style.SUCCESS(
             f"\nCompletato: "
             f"{propagated} propagate, "
             f"{geocoded} geocodificate, "
             f"{failed} indirizzi falliti, "
-            f"{api_calls} chiamate API"
+            f"{api_calls} chiamate API, "
+            f"{cache_hits} dalla cache"
         ))
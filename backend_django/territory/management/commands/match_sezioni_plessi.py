@@ -2,18 +2,18 @@
 Management command to match electoral sections with school buildings (plessi)
 based on address similarity.
 
-Uses CSV from MIUR with school data (SCUANAGRAFESTAT*.csv).
+Uses CSV from MIUR with school data (SCUANAGRAFESTAT*.csv), matched
+through territory.address_matching (trigram index, civic-aware scoring).
 
 Usage:
     python manage.py match_sezioni_plessi
     python manage.py match_sezioni_plessi --comune-codice=058091
     python manage.py match_sezioni_plessi --dry-run
 """
-import csv
-import re
-from difflib import SequenceMatcher
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db.models import Q
+
+from territory.address_matching import AddressIndex, iter_mim_schools
 from territory.models import Comune, SezioneElettorale
 
 
@@ -49,33 +49,6 @@ class Command(BaseCommand):
             help='Force update even if denominazione exists'
         )
 
-    def normalize_address(self, address):
-        """Normalize address for comparison."""
-        if not address:
-            return ''
-
-        addr = address.lower().strip()
-        addr = re.sub(r'\broma\b', '', addr, flags=re.IGNORECASE)
-
-        replacements = {
-            r'\bv\.': 'via',
-            r'\bv\.le': 'viale',
-            r'\bp\.za': 'piazza',
-            r'\bl\.go': 'largo',
-        }
-        for pattern, repl in replacements.items():
-            addr = re.sub(pattern, repl, addr, flags=re.IGNORECASE)
-
-        addr = re.sub(r'[,.\'\"]', ' ', addr)
-        addr = re.sub(r'\b\d+[a-z]?\b', '', addr)
-        addr = re.sub(r'\s+', ' ', addr).strip()
-
-        return addr
-
-    def similarity(self, str1, str2):
-        """Calculate similarity ratio (0.0-1.0)."""
-        return SequenceMatcher(None, str1, str2).ratio()
-
     def handle(self, *args, **options):
         file_path = options['file']
         comune_codice = options['comune_codice']
@@ -92,23 +65,11 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Loading schools from {file_path}...')
 
-        schools = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
-                if row.get('CODICECOMUNESCUOLA', '').strip() != comune_codice:
-                    continue
-
-                denom = row.get('DENOMINAZIONESCUOLA', '').strip()
-                indirizzo = row.get('INDIRIZZOSCUOLA', '').strip()
-
-                if denom and indirizzo:
-                    schools.append({
-                        'denominazione': denom,
-                        'indirizzo': indirizzo,
-                        'indirizzo_normalized': self.normalize_address(indirizzo)
-                    })
+        # CODICECOMUNESCUOLA in the MIM files is the codice catastale
+        schools = [
+            (indirizzo, {'denominazione': denom, 'indirizzo': indirizzo})
+            for _, denom, indirizzo in iter_mim_schools(file_path, {comune.codice_catastale})
+        ]
 
         self.stdout.write(f'Loaded {len(schools)} schools')
 
@@ -116,58 +77,37 @@ class Command(BaseCommand):
             self.stderr.write('No schools found!')
             return
 
-        if force:
-            sezioni = SezioneElettorale.objects.filter(
-                comune=comune, is_attiva=True
-            ).exclude(indirizzo__isnull=True).exclude(indirizzo='')
-        else:
-            sezioni = SezioneElettorale.objects.filter(
-                comune=comune, is_attiva=True
-            ).filter(
-                denominazione__isnull=True
-            ).exclude(indirizzo__isnull=True).exclude(indirizzo='') | \
-            SezioneElettorale.objects.filter(
-                comune=comune, is_attiva=True, denominazione=''
-            ).exclude(indirizzo__isnull=True).exclude(indirizzo='')
-
-        self.stdout.write(f'Processing {sezioni.count()} sezioni...')
+        index = AddressIndex(schools)
+
+        sezioni = SezioneElettorale.objects.filter(
+            comune=comune, is_attiva=True
+        ).exclude(indirizzo__isnull=True).exclude(indirizzo='')
+        if not force:
+            sezioni = sezioni.filter(Q(denominazione__isnull=True) | Q(denominazione=''))
+        sezioni = list(sezioni.order_by('numero'))
+
+        self.stdout.write(f'Processing {len(sezioni)} sezioni...')
 
         matched_count = 0
         unmatched_count = 0
-        matches = []
+        to_update = []
 
         for sezione in sezioni:
-            sezione_addr_norm = self.normalize_address(sezione.indirizzo)
-
-            if not sezione_addr_norm:
+            match = index.match(sezione.indirizzo, min_score=threshold)
+            if match is None:
                 unmatched_count += 1
                 continue
 
-            best_match = None
-            best_score = 0.0
-
-            for school in schools:
-                score = self.similarity(sezione_addr_norm, school['indirizzo_normalized'])
-
-                if score > best_score:
-                    best_score = score
-                    best_match = school
-
-            if best_match and best_score >= threshold:
-                matches.append({
-                    'sezione': sezione,
-                    'school': best_match,
-                    'score': best_score
-                })
-                matched_count += 1
-
-                if dry_run:
-                    self.stdout.write(
-                        f'  Match ({best_score:.2f}): Sezione {sezione.numero} → '
-                        f'"{best_match["denominazione"]}"'
-                    )
-            else:
-                unmatched_count += 1
+            school = match.payload
+            matched_count += 1
+            sezione.denominazione = school['denominazione']
+            to_update.append(sezione)
+
+            if dry_run:
+                self.stdout.write(
+                    f'  Match ({match.score:.2f}): Sezione {sezione.numero} → '
+                    f'"{school["denominazione"]}"'
+                )
 
         self.stdout.write(f'\nMatched:   {matched_count}')
         self.stdout.write(f'Unmatched: {unmatched_count}')
@@ -177,14 +117,6 @@ class Command(BaseCommand):
             return
 
         self.stdout.write('\nUpdating database...')
+        SezioneElettorale.objects.bulk_update(to_update, ['denominazione'], batch_size=500)
 
-        updated_count = 0
-        with transaction.atomic():
-            for match in matches:
-                sezione = match['sezione']
-                school = match['school']
-                sezione.denominazione = school['denominazione']
-                sezione.save(update_fields=['denominazione'])
-                updated_count += 1
-
-        self.stdout.write(f'\n✓ Updated {updated_count} sezioni')
+        self.stdout.write(f'\n✓ Updated {len(to_update)} sezioni')
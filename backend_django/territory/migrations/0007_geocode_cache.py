@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('territory', '0006_sezione_geocode_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address_key', models.CharField(help_text='Indirizzo normalizzato (maiuscolo, senza accenti/punteggiatura)', max_length=255, unique=True, verbose_name='chiave indirizzo')),
+                ('address', models.CharField(max_length=500, verbose_name='indirizzo')),
+                ('latitudine', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='latitudine')),
+                ('longitudine', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='longitudine')),
+                ('place_id', models.CharField(blank=True, default='', max_length=255, verbose_name='place ID')),
+                ('location_type', models.CharField(blank=True, default='', help_text='ROOFTOP, RANGE_INTERPOLATED, GEOMETRIC_CENTER, APPROXIMATE', max_length=30, verbose_name='qualità geocodifica')),
+                ('provider', models.CharField(default='google', max_length=30, verbose_name='provider')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='data creazione')),
+            ],
+            options={
+                'verbose_name': 'cache geocodifica',
+                'verbose_name_plural': 'cache geocodifica',
+            },
+        ),
+    ]
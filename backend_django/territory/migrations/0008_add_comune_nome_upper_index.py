@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:46
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('territory', '0007_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comune',
+            index=models.Index(django.db.models.functions.text.Upper('nome'), name='terr_comune_nome_upper_idx'),
+        ),
+    ]
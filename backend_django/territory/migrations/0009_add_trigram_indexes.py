@@ -0,0 +1,41 @@
+"""
+Trigram GIN indexes for the text searches on comuni and sezioni.
+
+icontains compiles to UPPER(col::text) LIKE UPPER('%q%') on PostgreSQL,
+which no btree can serve; gin_trgm_ops indexes on the same UPPER()
+expressions can (comuni autocomplete, search in mappatura, plesso and
+indirizzo searches on sezioni). PostgreSQL only, like pgvector in
+ai_assistant.
+"""
+from django.db import migrations
+
+TRIGRAM_INDEXES = {
+    'terr_comune_nome_trgm_idx': ('territory_comune', 'nome'),
+    'terr_sez_denominazione_trgm_idx': ('territory_sezioneelettorale', 'denominazione'),
+    'terr_sez_indirizzo_trgm_idx': ('territory_sezioneelettorale', 'indirizzo'),
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+        for name, (table, column) in TRIGRAM_INDEXES.items():
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}) gin_trgm_ops);'
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name in TRIGRAM_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name};')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('territory', '0008_add_comune_nome_upper_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
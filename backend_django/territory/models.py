@@ -12,6 +12,7 @@ Data sources:
 - ISTAT: https://www.istat.it/classificazione/codici-dei-comuni-delle-province-e-delle-regioni/
 """
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils.translation import gettext_lazy as _
 
 
@@ -113,6 +114,10 @@ class Comune(models.Model):
         verbose_name = _('comune')
         verbose_name_plural = _('comuni')
         ordering = ['nome']
+        indexes = [
+            # nome__iexact compiles to UPPER(nome) = UPPER(%s)
+            models.Index(Upper('nome'), name='terr_comune_nome_upper_idx'),
+        ]
 
     def __str__(self):
         return f'{self.nome} ({self.provincia.sigla})'
@@ -444,3 +449,43 @@ class TerritorialPartitionMembership(models.Model):
     def __str__(self):
         territorio = self.comune or self.provincia or self.regione
         return f'{territorio} → {self.unit}'
+
+
+class GeocodeCacheEntry(models.Model):
+    """
+    Persistent geocoding cache, keyed by normalized address.
+
+    Shared by sections and RDL registrations: sections in the same plesso
+    (and RDLs living at the same address) are geocoded once. See
+    territory.geocoding_service.
+    """
+    address_key = models.CharField(
+        _('chiave indirizzo'),
+        max_length=255,
+        unique=True,
+        help_text=_('Indirizzo normalizzato (maiuscolo, senza accenti/punteggiatura)')
+    )
+    address = models.CharField(_('indirizzo'), max_length=500)
+    latitudine = models.DecimalField(_('latitudine'), max_digits=9, decimal_places=6)
+    longitudine = models.DecimalField(_('longitudine'), max_digits=9, decimal_places=6)
+    place_id = models.CharField(_('place ID'), max_length=255, blank=True, default='')
+    location_type = models.CharField(
+        _('qualità geocodifica'),
+        max_length=30,
+        blank=True,
+        default='',
+        help_text=_('ROOFTOP, RANGE_INTERPOLATED, GEOMETRIC_CENTER, APPROXIMATE')
+    )
+    provider = models.CharField(_('provider'), max_length=30, default='google')
+    created_at = models.DateTimeField(_('data creazione'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('cache geocodifica')
+        verbose_name_plural = _('cache geocodifica')
+
+    def __str__(self):
+        return f'{self.address} → {self.latitudine}, {self.longitudine}'
+
+    def as_result(self):
+        """(lat, lon, place_id, location_type), like geocode_address()."""
+        return (float(self.latitudine), float(self.longitudine), self.place_id, self.location_type)
@@ -0,0 +1,17 @@
+"""
+Signals for territory app.
+
+Keeps the per-process plessi index (territory.spatial) in sync with
+SezioneElettorale changes. Bulk updates via queryset.update() don't fire
+signals: the index TTL covers those.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender='territory.SezioneElettorale')
+@receiver(post_delete, sender='territory.SezioneElettorale')
+def _invalidate_plessi_index(sender, instance, **kwargs):
+    from territory.spatial import invalidate_plessi_index
+
+    invalidate_plessi_index(instance.comune_id)
@@ -0,0 +1,180 @@
+"""
+Per-comune spatial index of plessi (polling places).
+
+A plesso is the set of sections sharing the same address. For each comune
+the index keeps the plessi coordinates as NumPy arrays (radians, with
+cos(lat) precomputed), so finding the nearest plessi to a point is a single
+vectorized haversine instead of a Python loop over every section.
+
+Indexes are cached per process (LRU + TTL) and dropped when a section of
+the comune is saved or deleted (see territory.signals).
+
+Usage:
+    index = get_plessi_index(comune_id)
+    index.nearest(41.90, 12.49, k=10)
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Distance matrix rows per chunk in nearest_many (rows × plessi float64)
+_BATCH_ROWS = 512
+
+_CACHE_TTL_SECONDS = 600
+_CACHE_MAX_COMUNI = 64
+
+_cache = OrderedDict()  # comune_id -> (built_at, PlessiIndex)
+_cache_lock = threading.Lock()
+
+
+class PlessiIndex:
+    """Nearest-plesso lookup for one comune."""
+
+    def __init__(self, plessi):
+        """
+        Args:
+            plessi: list of (indirizzo, lat, lon, [numeri]) tuples
+        """
+        self.indirizzi = [p[0] for p in plessi]
+        self.sezioni = [sorted(p[3]) for p in plessi]
+        self.lat = np.radians(np.array([p[1] for p in plessi], dtype=np.float64))
+        self.lon = np.radians(np.array([p[2] for p in plessi], dtype=np.float64))
+        self.cos_lat = np.cos(self.lat)
+
+    def __len__(self):
+        return len(self.indirizzi)
+
+    @classmethod
+    def from_sezioni(cls, rows):
+        """
+        Build from (numero, indirizzo, lat, lon) rows.
+
+        Sections are grouped by normalized address; the first section of
+        each group gives the plesso coordinates.
+        """
+        groups = defaultdict(list)
+        first = {}
+        for numero, indirizzo, lat, lon in rows:
+            key = (indirizzo or '').strip().upper()
+            if key not in first:
+                first[key] = (indirizzo or '', float(lat), float(lon))
+            groups[key].append(numero)
+
+        return cls([
+            (indirizzo, lat, lon, groups[key])
+            for key, (indirizzo, lat, lon) in first.items()
+        ])
+
+    @classmethod
+    def for_comune(cls, comune_id):
+        """Build the index from the geocoded sections of a comune (1 query)."""
+        from territory.models import SezioneElettorale
+
+        rows = SezioneElettorale.objects.filter(
+            comune_id=comune_id,
+            latitudine__isnull=False,
+            longitudine__isnull=False,
+        ).order_by('numero').values_list('numero', 'indirizzo', 'latitudine', 'longitudine')
+        return cls.from_sezioni(rows)
+
+    def distances_km(self, lat, lon):
+        """Haversine distance (km) from a point to every plesso."""
+        lat_r = np.radians(lat)
+        lon_r = np.radians(lon)
+        return self._haversine(lat_r, np.cos(lat_r), lon_r)
+
+    def _haversine(self, lat_r, cos_lat_r, lon_r):
+        # Same formula as territory.geocoding.haversine_km, broadcast over
+        # plessi (and over query points when lat_r is a column vector).
+        a = (
+            np.sin((self.lat - lat_r) / 2) ** 2
+            + cos_lat_r * self.cos_lat * np.sin((self.lon - lon_r) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    def _top_k(self, distances, k):
+        """Indices of the k smallest distances, ascending (ties by position)."""
+        n = distances.shape[-1]
+        if k < n:
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(n)
+        return candidates[np.lexsort((candidates, distances[candidates]))]
+
+    def _format(self, distances, order):
+        return [
+            {
+                'indirizzo': self.indirizzi[i],
+                'distanza_km': round(float(distances[i]), 2),
+                'sezioni': list(self.sezioni[i]),
+            }
+            for i in order
+        ]
+
+    def nearest(self, lat, lon, k=10):
+        """
+        Top k nearest plessi to a point.
+
+        Returns list of dicts sorted by distance ascending:
+        [{"indirizzo": "VIA CAMPANIA, 63", "distanza_km": 0.34, "sezioni": [18, 19]}, ...]
+        """
+        if not len(self):
+            return []
+        distances = self.distances_km(float(lat), float(lon))
+        return self._format(distances, self._top_k(distances, k))
+
+    def nearest_many(self, points, k=10):
+        """
+        Top k nearest plessi for many points at once.
+
+        Args:
+            points: sequence of (lat, lon)
+
+        Returns:
+            list of results, one per point, same format as nearest().
+        """
+        if not len(self) or not len(points):
+            return [[] for _ in points]
+
+        coords = np.radians(np.asarray(points, dtype=np.float64))
+        results = []
+        for start in range(0, len(coords), _BATCH_ROWS):
+            chunk = coords[start:start + _BATCH_ROWS]
+            lat_r = chunk[:, 0:1]
+            lon_r = chunk[:, 1:2]
+            matrix = self._haversine(lat_r, np.cos(lat_r), lon_r)
+            for row in matrix:
+                results.append(self._format(row, self._top_k(row, k)))
+        return results
+
+
+def get_plessi_index(comune_id):
+    """Cached PlessiIndex for a comune (per process)."""
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(comune_id)
+        if entry and now - entry[0] < _CACHE_TTL_SECONDS:
+            _cache.move_to_end(comune_id)
+            return entry[1]
+
+    index = PlessiIndex.for_comune(comune_id)
+
+    with _cache_lock:
+        _cache[comune_id] = (now, index)
+        _cache.move_to_end(comune_id)
+        while len(_cache) > _CACHE_MAX_COMUNI:
+            _cache.popitem(last=False)
+    return index
+
+
+def invalidate_plessi_index(comune_id=None):
+    """Drop the cached index of a comune (or all of them)."""
+    with _cache_lock:
+        if comune_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(comune_id, None)
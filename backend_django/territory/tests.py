@@ -0,0 +1,279 @@
+"""
+Tests for territory app: geocoding service, address matching.
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from territory.address_matching import (
+    MIM_SCHOOL_FILES, AddressIndex, build_school_indexes, parse_address, score_pair, trigrams,
+)
+from territory.geocoding_service import (
+    FakeGeocodingProvider, GeocodingService, RateLimiter,
+    get_geocoding_service, normalize_address_key, reset_geocoding_service,
+)
+from territory.models import GeocodeCacheEntry, Regione, Provincia, Comune, SezioneElettorale
+
+FAKE_PROVIDER = 'territory.geocoding_service.FakeGeocodingProvider'
+
+
+class GeocodingServiceTest(TestCase):
+
+    def setUp(self):
+        self.provider = FakeGeocodingProvider()
+        self.service = GeocodingService(self.provider)
+
+    def test_normalize_address_key(self):
+        self.assertEqual(
+            normalize_address_key("Via dell'Università, 12 - Roma"),
+            'VIA DELL UNIVERSITA 12 ROMA',
+        )
+        self.assertEqual(normalize_address_key(None), '')
+
+    def test_cache_hit_for_equivalent_address(self):
+        first = self.service.geocode('Via Roma 1, Roma, RM, Italia')
+        second = self.service.geocode('VIA ROMA, 1 - ROMA (RM) ITALIA')
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.provider.calls), 1)
+        self.assertEqual(self.service.stats, {'cache_hits': 1, 'api_calls': 1, 'failures': 0})
+        self.assertEqual(GeocodeCacheEntry.objects.count(), 1)
+
+    def test_failures_not_cached(self):
+        self.assertIsNone(self.service.geocode('Indirizzo NON TROVATO'))
+        self.assertIsNone(self.service.geocode('Indirizzo NON TROVATO'))
+        self.assertEqual(len(self.provider.calls), 2)
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
+
+    def test_geocode_many_dedupes(self):
+        results = self.service.geocode_many(
+            ['Via A 1, Roma', 'via a 1 roma', 'Via B 2, Roma', ''], max_workers=1
+        )
+        self.assertEqual(set(results), {'VIA A 1 ROMA', 'VIA B 2 ROMA'})
+        self.assertEqual(len(self.provider.calls), 2)
+
+    def test_rate_limiter_spacing(self):
+        limiter = RateLimiter(qps=50)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        # 6 acquisitions at 50 QPS: first is immediate, then 5 × 20ms
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    @override_settings(GEOCODING_PROVIDER=FAKE_PROVIDER)
+    def test_provider_from_settings(self):
+        reset_geocoding_service()
+        try:
+            self.assertIsInstance(get_geocoding_service().provider, FakeGeocodingProvider)
+        finally:
+            reset_geocoding_service()
+
+
+class GeocodeManyConcurrencyTest(TransactionTestCase):
+
+    def test_concurrent_workers(self):
+        provider = FakeGeocodingProvider()
+        service = GeocodingService(provider)
+        addresses = [f'Via Test {i}, Roma' for i in range(20)]
+        results = service.geocode_many(addresses, max_workers=4)
+        self.assertEqual(len(results), 20)
+        self.assertTrue(all(results.values()))
+        self.assertEqual(len(provider.calls), 20)
+        self.assertEqual(GeocodeCacheEntry.objects.count(), 20)
+
+
+@override_settings(GEOCODING_PROVIDER=FAKE_PROVIDER, GEOCODING_QPS=0)
+class GeocodeSezioniCommandTest(TestCase):
+
+    def setUp(self):
+        regione = Regione.objects.create(codice_istat='12', nome='Lazio')
+        provincia = Provincia.objects.create(codice_istat='058', sigla='RM', nome='Roma', regione=regione)
+        comune = Comune.objects.create(codice_istat='058091', nome='Roma', provincia=provincia)
+        # 3 plessi, 2 sections each
+        for numero in range(1, 7):
+            SezioneElettorale.objects.create(
+                comune=comune, numero=numero, indirizzo=f'Via Plesso {(numero + 1) // 2}'
+            )
+
+    def test_one_lookup_per_plesso_then_cache(self):
+        out = StringIO()
+        call_command('geocode_sezioni', '--comune-id', '058091', '--workers', '1', stdout=out, stderr=StringIO())
+        self.assertIn('3 chiamate API', out.getvalue())
+        self.assertFalse(SezioneElettorale.objects.filter(latitudine__isnull=True).exists())
+        self.assertEqual(GeocodeCacheEntry.objects.count(), 3)
+
+        # Reset coordinates: second run is served by the cache
+        SezioneElettorale.objects.update(latitudine=None, longitudine=None)
+        out = StringIO()
+        call_command('geocode_sezioni', '--comune-id', '058091', '--workers', '1', stdout=out, stderr=StringIO())
+        self.assertIn('0 chiamate API, 3 dalla cache', out.getvalue())
+        self.assertFalse(SezioneElettorale.objects.filter(latitudine__isnull=True).exists())
+
+
+class AddressMatchingTest(SimpleTestCase):
+
+    def test_parse_address(self):
+        self.assertEqual(
+            parse_address('V.LE GIULIO CESARE, 12/A'),
+            ('VIALE GIULIO CESARE 12 A', 'VIALE', 'GIULIO CESARE', (12, 'A')),
+        )
+        self.assertEqual(parse_address('Via di Settebagni 231').key, 'VIA SETTEBAGNI 231')
+        self.assertEqual(parse_address('P.ZA S. GIOVANNI SNC').key, 'PIAZZA S GIOVANNI')
+        # Numbers inside the street name are not civic numbers
+        self.assertEqual(parse_address('VIA 4 NOVEMBRE').civic, None)
+        self.assertEqual(parse_address('VIA 4 NOVEMBRE 10').civic, (10, ''))
+
+    def test_civic_aware_scoring(self):
+        index = AddressIndex([
+            ('VIALE GIULIO CESARE 300', 'far'),
+            ('VIALE GIULIO CESARE 14', 'near'),
+            ('VIALE GIULIO CESARE 12', 'same'),
+        ])
+        self.assertEqual(index.match('V.LE GIULIO CESARE, 12').payload, 'same')
+        self.assertEqual(index.match('V.LE GIULIO CESARE, 16').payload, 'near')
+        self.assertEqual(index.match('VIALE GIULIO CESARE').score, 0.85)
+
+    def test_fuzzy_and_threshold(self):
+        index = AddressIndex([('VIA DANIELE MANIN 72', 'manin'), ('PIAZZA ROMA 1', 'roma')])
+        self.assertEqual(index.match('VIA DANIELE MANNIN 72', min_score=0.6).payload, 'manin')
+        self.assertIsNone(index.match('VIA DANIELE MANNIN 72', min_score=0.9))
+        # Same name, different street type is not a match at the default thresholds
+        self.assertIsNone(index.match('VIA ROMA 1', min_score=0.6))
+
+    def test_index_agrees_with_exhaustive_scoring(self):
+        rng = random.Random(3)
+        words = ['ROMA', 'MILANO', 'GARIBALDI', 'MAZZINI', 'VERDI', 'DANTE', 'CAVOUR', 'MARCONI']
+        dugs = ['VIA', 'VIALE', 'PIAZZA', 'LARGO']
+        addresses = [
+            f'{rng.choice(dugs)} {rng.choice(words)} {rng.choice(words)} {rng.randint(1, 200)}'
+            for _ in range(300)
+        ]
+        index = AddressIndex([(a, i) for i, a in enumerate(addresses)])
+        for query in addresses[:50] + [a.replace('I', 'E', 1) for a in addresses[50:100]]:
+            parsed = parse_address(query)
+            grams = trigrams(parsed.name)
+            best_idx, best = None, -1.0
+            for i, cand in enumerate(index.parsed):
+                cand_grams = trigrams(cand.name)
+                dice = 2 * len(grams & cand_grams) / (len(grams) + len(cand_grams))
+                score = score_pair(parsed, cand, dice)
+                if score > best:
+                    best_idx, best = i, score
+            match = index.match(query, min_score=0.5)
+            if best < 0.5:
+                self.assertIsNone(match)
+            else:
+                self.assertEqual((match.payload, match.score), (best_idx, round(best, 4)))
+
+
+class MatchSezioniPlessiCommandTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.csv_path = os.path.join(cls.tmpdir, 'scuole.csv')
+        with open(cls.csv_path, 'w', encoding='utf-8') as f:
+            f.write(
+                'CODICESCUOLA,DENOMINAZIONESCUOLA,INDIRIZZOSCUOLA,CODICECOMUNESCUOLA\n'
+                'RMEE1,SCUOLA MANIN,VIA DANIELE MANIN 72,H501\n'
+                'RMEE2,SCUOLA SETTEBAGNI,VIA DI SETTEBAGNI 231,H501\n'
+                'MIEE1,SCUOLA MILANO,VIA DANIELE MANIN 72,F205\n'
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        regione = Regione.objects.create(codice_istat='12', nome='Lazio')
+        provincia = Provincia.objects.create(codice_istat='058', sigla='RM', nome='Roma', regione=regione)
+        comune = Comune.objects.create(
+            codice_istat='058091', codice_catastale='H501', nome='Roma', provincia=provincia
+        )
+        for numero, indirizzo in [(1, 'V. DANIELE MANIN, 72'), (2, 'VIA SETTEBAGNI, 231'), (3, 'VIA INESISTENTE 1')]:
+            SezioneElettorale.objects.create(comune=comune, numero=numero, indirizzo=indirizzo)
+
+    def test_matches_by_codice_catastale(self):
+        call_command('match_sezioni_plessi', '--file', self.csv_path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(
+            dict(SezioneElettorale.objects.values_list('numero', 'denominazione')),
+            {1: 'SCUOLA MANIN', 2: 'SCUOLA SETTEBAGNI', 3: None},
+        )
+
+
+FIXTURES_DIR = Path(settings.BASE_DIR) / 'fixtures'
+
+
+class NationalMatchingTest(SimpleTestCase):
+    """
+    Match a national-scale set of sections (61k, the size of the Italian
+    register) against the MIM school files in fixtures/.
+
+    The full section register is not shipped, so sections are synthesized
+    from the school addresses of each comune with the variations seen in
+    the real data: abbreviations, comma before the civic number, other
+    civic numbers on the same street, typos and unrelated addresses.
+    """
+    N_SEZIONI = 61000
+
+    @staticmethod
+    def _variant(rng, address):
+        parsed = parse_address(address)
+        roll = rng.random()
+        street = address.upper()
+        if parsed.civic:
+            street = f'{parsed.dug} {parsed.name}'.strip()
+        if roll < 0.3:
+            return address, True
+        if roll < 0.5:
+            civic = parsed.civic[0] if parsed.civic else 1
+            return f'{street.replace("VIALE", "V.LE").replace("PIAZZA", "P.ZA")}, {civic}', True
+        if roll < 0.7:
+            return f'{street}, {rng.randint(1, 300)}', True
+        if roll < 0.85 and len(parsed.name) > 6:
+            i = rng.randrange(1, len(parsed.name) - 1)
+            return f'{parsed.dug} {parsed.name[:i]}{parsed.name[i + 1:]}, 1', None
+        return f'VIA SINTETICA {rng.randint(1, 10**6)}, 1', False
+
+    def test_match_italy(self):
+        paths = [FIXTURES_DIR / name for name in MIM_SCHOOL_FILES if (FIXTURES_DIR / name).exists()]
+        if not paths:
+            self.skipTest('MIM school files not available')
+
+        indexes, _ = build_school_indexes(paths)
+
+        rng = random.Random(11)
+        comuni = sorted(indexes)
+        sezioni = []
+        for _ in range(self.N_SEZIONI):
+            index = indexes[rng.choice(comuni)]
+            school = rng.choice(index.payloads)
+            address, expected = self._variant(rng, school['indirizzo'])
+            sezioni.append((index, address, school, expected))
+
+        results = [index.match(address, min_score=0.6) for index, address, _, _ in sezioni]
+
+        wrong_street = missed = false_positive = 0
+        for (_, _, school, expected), match in zip(sezioni, results):
+            if expected is True:
+                if match is None:
+                    missed += 1
+                elif parse_address(match.payload['indirizzo']).name != parse_address(school['indirizzo']).name:
+                    wrong_street += 1
+            elif expected is False and match is not None:
+                false_positive += 1
+
+        # "Wrong street" is mostly register noise: the same street spelled
+        # twice ("VIA S. BOTTICELLI" / "VIA BOTTICELLI", "PIERSANTIMATTARELLA")
+        self.assertEqual(missed, 0)
+        self.assertLess(wrong_street, self.N_SEZIONI * 0.001)
+        self.assertLess(false_positive, self.N_SEZIONI * 0.01)
@@ -189,9 +189,9 @@ echo -e "${YELLOW}🔍 Test connessione database...${NC}"
 cd backend_django
 
 if python3 -c "
-import psycopg2
+import psycopg
 try:
-    conn = psycopg2.connect(
+    conn = psycopg.connect(
         host='${DB_HOST}',
         port=${DB_PORT},
         dbname='${DB_NAME}',
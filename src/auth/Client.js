@@ -2378,6 +2378,58 @@ const Client = (server, pdfServer, token, getValidToken, onAuthFailure) => {
             });
         },
 
+        // Send a text message and stream the answer (SSE).
+        // onText(text) receives the answer so far; resolves with the same
+        // payload as chat() once the assistant message is saved.
+        chatStream: async (data, onText) => {
+            try {
+                const response = await fetch(`${server}/api/ai/chat/stream/`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Authorization': authHeader
+                    },
+                    body: JSON.stringify(data)
+                });
+                const contentType = response.headers.get('content-type') || '';
+                if (!contentType.includes('text/event-stream') || !response.body) {
+                    return safeJson(response);
+                }
+
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                let text = '';
+                let result = null;
+                for (;;) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    const frames = buffer.split('\n\n');
+                    buffer = frames.pop();
+                    for (const frame of frames) {
+                        const event = frame.match(/^event: (.*)$/m)?.[1];
+                        const payload = frame.match(/^data: (.*)$/m)?.[1];
+                        if (!event || payload === undefined) continue;
+                        const eventData = JSON.parse(payload);
+                        if (event === 'token') {
+                            text += eventData.text;
+                            onText?.(text);
+                        } else if (event === 'reset') {
+                            text = '';
+                            onText?.(text);
+                        } else if (event === 'done') {
+                            result = eventData;
+                        }
+                    }
+                }
+                return result || { error: 'Stream interrotto' };
+            } catch (error) {
+                console.error(error);
+                return { error: error.message };
+            }
+        },
+
         // Get messages from a session
         getSession: async (sessionId) =>
             fetch(`${server}/api/ai/chat/?session_id=${sessionId}`, {
@@ -8,6 +8,7 @@ function ChatInterface({ client, show, onClose }) {
     const [inputText, setInputText] = useState('');
     const [isRecording, setIsRecording] = useState(false);
     const [isLoading, setIsLoading] = useState(false);
+    const [streamingText, setStreamingText] = useState('');
     const [sessionId, setSessionId] = useState(() => {
         // Recupera sessionId salvato in localStorage
         const saved = localStorage.getItem('ai_chat_session_id');
@@ -283,11 +284,16 @@ function ChatInterface({ client, show, onClose }) {
         setIsLoading(true);
 
         try {
-            // Call AI chat API
-            const response = await client.ai.chat({
-                session_id: sessionId,
-                message: userMessage,
-            }, fileToSend || null);
+            // Call AI chat API (text-only messages are streamed)
+            const response = fileToSend
+                ? await client.ai.chat({
+                    session_id: sessionId,
+                    message: userMessage,
+                }, fileToSend)
+                : await client.ai.chatStream({
+                    session_id: sessionId,
+                    message: userMessage,
+                }, setStreamingText);
 
             // Handle error response or missing data gracefully
             if (!response || response.error || !response.message) {
@@ -344,6 +350,7 @@ function ChatInterface({ client, show, onClose }) {
             }]);
         } finally {
             setIsLoading(false);
+            setStreamingText('');
         }
     };
 
@@ -785,8 +792,14 @@ function ChatInterface({ client, show, onClose }) {
                     {isLoading && (
                         <div className="chat-message assistant">
                             <div className="message-bubble">
-                                <span className="spinner-border spinner-border-sm me-2"></span>
-                                Sto pensando...
+                                {streamingText ? (
+                                    <ReactMarkdown>{streamingText}</ReactMarkdown>
+                                ) : (
+                                    <>
+                                        <span className="spinner-border spinner-border-sm me-2"></span>
+                                        Sto pensando...
+                                    </>
+                                )}
                             </div>
                         </div>
                     )}
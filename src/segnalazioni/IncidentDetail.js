@@ -191,7 +191,14 @@ function IncidentDetail({
                             <li key={attachment.id} className="file-item">
                                 <div className="file-item-info">
                                     <div className="file-item-icon">
-                                        {attachment.file_type === 'IMAGE' ? (
+                                        {attachment.thumbnail_url ? (
+                                            <img
+                                                src={attachment.thumbnail_url}
+                                                alt={attachment.filename}
+                                                loading="lazy"
+                                                style={{ width: 48, height: 48, objectFit: 'cover', borderRadius: 4 }}
+                                            />
+                                        ) : attachment.file_type === 'IMAGE' ? (
                                             <i className="fas fa-image"></i>
                                         ) : attachment.file_type === 'DOCUMENT' ? (
                                             <i className="fas fa-file-pdf"></i>